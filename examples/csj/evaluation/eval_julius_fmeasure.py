@@ -1,21 +1,22 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
+"""Evaluate the results of Julius by F-measure of fillers & disfluencies
+   (CSJ corpus)."""
+
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import re
-import os
 import sys
-import codecs
 from glob import glob
-import numpy as np
 import pandas as pd
 
 sys.path.append('../../../')
-from utils.io.labels.character import Char2idx
 from experiments.csj.data.load_dataset_ctc_ss import Dataset
+from utils.evaluation.hypothesis import HypothesisStore
+
+NUM_JOBS = 8
 
 
 def main():
@@ -24,45 +25,15 @@ def main():
     mean_f_f = 0
     mean_f_d = 0
     for data_type in ['eval1', 'eval2', 'eval3']:
-        results_paths = [path for path in glob(
-            '/home/lab5/inaguma/asru2017/csj_results_0710/' + data_type + '/*.log')]
-        result_dict = {}
-
-        for path in results_paths:
-            with codecs.open(path, 'r', 'euc_jp') as f:
-                start_flag = False
-                file_name = ''
-                output, output_pos = '', ''
-                for line in f:
-                    line = line.strip()
-                    if line == '----------------------- System Information end -----------------------':
-                        start_flag = True
-                    if start_flag:
-                        if 'input MFCC file' in line:
-                            file_name = line.split(': ')[-1]
-                            if data_type != 'dialog':
-                                file_name = '_'.join(file_name.split('/')[-2:])
-                            else:
-                                file_name = os.path.basename(file_name)
-                            file_name = re.sub('.wav', '', file_name)
-                            file_name = re.sub('.htk', '', file_name)
-
-                        if 'sentence1' in line:
-                            output = line.split(': ')[-1]
-                            output = re.sub('<s>', '', output)
-                            output = re.sub('</s>', '', output)
-                            output = re.sub('<sp>', '', output)
-                            output = re.sub(r'[\sー]', '', output)
-
-                        if 'wseq1' in line:
-                            output_pos = line.split(': ')[-1]
-                            output_pos = re.sub('<s>', '', output_pos)
-                            output_pos = re.sub('</s>', '', output_pos)
-                            output_pos = re.sub('<sp>', '', output_pos)
-                            output_pos = re.sub('感動詞', 'f', output_pos)
-                            output_pos = re.sub('言いよどみ', 'd', output_pos)
-                            result_dict[file_name] = [output, output_pos[1:]]
-
+        hyp_store = HypothesisStore.from_files(
+            glob('/home/lab5/inaguma/asru2017/csj_results_0710/' +
+                 data_type + '/*.log'),
+            file_format='julius_log',
+            num_jobs=NUM_JOBS,
+            field='wseq1',
+            basename_only=data_type == 'dialog')
+
+        # Load references from the same index as the CTC evaluation
         label_type = 'kana'
         dataset = Dataset(data_type=data_type,
                           label_type=label_type,
@@ -71,32 +42,22 @@ def main():
                           max_epoch=1,
                           train_data_size='train_subset',
                           shuffle=False)
+        ref_store = HypothesisStore.from_dataset(dataset, num_jobs=NUM_JOBS)
 
         tp_f, fp_f, fn_f = 0., 0., 0.
         tp_d, fp_d, fn_d = 0., 0., 0.
 
-        for data, is_new_epoch in dataset:
-
-            # Create feed dictionary for next mini batch
-            inputs, labels_true, inputs_seq_len, input_names = data
-
-            if input_names[0][0] not in result_dict.keys():
+        for utt_name, str_true in ref_store.items():
+            if utt_name not in hyp_store:
                 continue
+            output_pos = hyp_store[utt_name]
 
-            output, output_pos = result_dict[input_names[0][0]]
-
-            detected_f_num = output_pos.count('f')
-            detected_d_num = output_pos.count('d')
-
-            # if detected_d_num != 0:
-            #     print(output_pos)
-            #     print(output)
-            #     str_true = labels_true[0][0][0]
-            #     print(str_true)
-            #     print('-----')
+            # NOTE: 感動詞 => filler, 言いよどみ => disfluency
+            detected_f_num = output_pos.count('感動詞')
+            detected_d_num = output_pos.count('言いよどみ')
 
-            true_f_num = np.sum(labels_true[0][0][0].count('f'))
-            true_d_num = np.sum(labels_true[0][0][0].count('d'))
+            true_f_num = str_true.count('f')
+            true_d_num = str_true.count('d')
 
             # Filler
             if detected_f_num <= true_f_num:
@@ -21,7 +21,7 @@ from experiments.csj.metrics.ctc import do_eval_cer
 from utils.io.labels.sparsetensor import list2sparsetensor
 from utils.training.learning_rate_controller import Controller
 from utils.training.plot import plot_loss, plot_ler
-from utils.training.multi_gpu import average_gradients
+from utils.training.multi_gpu import average_gradients, average_losses
 from utils.directory import mkdir_join, mkdir
 from utils.parameter import count_total_parameters
 from models.ctc.ctc import CTC
@@ -115,14 +115,17 @@ def do_train(model, params, gpu_indices):
                         ler_ops.append(ler_op_tower)
 
         # Aggregate losses, then calculate average loss
-        total_losses = tf.concat(axis=0, values=total_losses)
-        loss_op = tf.reduce_mean(total_losses, axis=0)
-        ler_ops = tf.concat(axis=0, values=ler_ops)
-        ler_op = tf.reduce_mean(ler_ops, axis=0)
+        # NOTE: towers are weighted by the number of utterances, which
+        # differs between towers
+        tower_weights = [tf.shape(seq_len)[0]
+                         for seq_len in model.inputs_seq_len_pl_list]
+        loss_op = average_losses(total_losses, tower_weights)
+        ler_op = average_losses(ler_ops, tower_weights)
 
         # We must calculate the mean of each gradient. Note that this is the
         # synchronization point across all towers
-        average_grads_and_vars = average_gradients(total_grads_and_vars)
+        average_grads_and_vars = average_gradients(total_grads_and_vars,
+                                                   weights=tower_weights)
 
         # Apply the gradients to adjust the shared variables.
         train_op = optimizer.apply_gradients(average_grads_and_vars,
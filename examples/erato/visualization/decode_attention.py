@@ -56,20 +56,12 @@ def do_decode(model, params, epoch, beam_width, eval_batch_size):
         shuffle=False, progressbar=True)
 
     # Define placeholders
-    model.create_placeholders()
+    model.create_placeholders_inference()
 
     # Add to the graph each operation (including model definition)
-    _, _, decoder_outputs_train, decoder_outputs_infer = model.compute_loss(
+    decode_op_infer, _ = model.predict(
         model.inputs_pl_list[0],
-        model.labels_pl_list[0],
-        model.inputs_seq_len_pl_list[0],
-        model.labels_seq_len_pl_list[0],
-        model.keep_prob_encoder_pl_list[0],
-        model.keep_prob_decoder_pl_list[0],
-        model.keep_prob_embedding_pl_list[0])
-    _, decode_op_infer = model.decode(
-        decoder_outputs_train,
-        decoder_outputs_infer)
+        model.inputs_seq_len_pl_list[0])
 
     # Create a saver for writing training checkpoints
     saver = tf.train.Saver()
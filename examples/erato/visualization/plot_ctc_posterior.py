@@ -60,13 +60,11 @@ def do_plot(model, params, epoch, beam_width, eval_batch_size):
         shuffle=False, progressbar=True)
 
     # Define placeholders
-    model.create_placeholders()
+    model.create_placeholders_inference()
 
     # Add to the graph each operation (including model definition)
-    _, logits = model.compute_loss(model.inputs_pl_list[0],
-                                   model.labels_pl_list[0],
-                                   model.inputs_seq_len_pl_list[0],
-                                   model.keep_prob_pl_list[0])
+    logits = model.build_inference(model.inputs_pl_list[0],
+                                   model.inputs_seq_len_pl_list[0])
     posteriors_op = model.posteriors(logits)
 
     # Create a saver for writing training checkpoints
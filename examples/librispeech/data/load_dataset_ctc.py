@@ -23,7 +23,7 @@ class Dataset(DatasetBase):
                  max_epoch=None, splice=1,
                  num_stack=1, num_skip=1,
                  shuffle=False, sort_utt=False, sort_stop_epoch=None,
-                 progressbar=False, num_gpu=1):
+                 progressbar=False, num_gpu=1, seed=None):
         """A class for loading dataset.
         Args:
             data_type (stirng): train or dev_clean or dev_other or
@@ -44,8 +44,9 @@ class Dataset(DatasetBase):
                 will revert back to a random order
             progressbar (bool, optional): if True, visualize progressbar
             num_gpu (int, optional): if more than 1, divide batch_size by num_gpu
+            seed (int, optional): the seed of the random generator
         """
-        super(Dataset, self).__init__()
+        super(Dataset, self).__init__(seed=seed)
 
         self.data_type = data_type
         self.train_data_size = train_data_size
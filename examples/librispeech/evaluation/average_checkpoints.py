@@ -0,0 +1,66 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Average the last or the best checkpoints of a training run (Librispeech
+   corpus). The averaged model is saved with the config file, so it can be
+   evaluated by the evaluation scripts as well as the original model.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, abspath, basename
+import sys
+import shutil
+import argparse
+
+sys.path.append(abspath('../../../'))
+from utils.directory import mkdir, mkdir_join
+from utils.training.checkpoint import select_checkpoints, average_checkpoints
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model_path', type=str,
+                    help='path to the model to average')
+parser.add_argument('--num_checkpoints', type=int, default=3,
+                    help='the number of checkpoints to average')
+parser.add_argument('--criterion', type=str, default='best',
+                    help='last or best. best selects checkpoints by the ' +
+                    'metric on the dev set (CER or WER), which is limited to ' +
+                    'the checkpoints kept by keep_best_checkpoints. last ' +
+                    'selects consecutive checkpoints only if ' +
+                    'keep_last_checkpoints >= num_checkpoints.')
+parser.add_argument('--save_path', type=str, default=None,
+                    help='path to save the averaged model. Default is ' +
+                    'model_path/average_(criterion)(num_checkpoints).')
+
+
+def main():
+
+    args = parser.parse_args()
+
+    checkpoint_paths = select_checkpoints(
+        args.model_path, args.num_checkpoints, criterion=args.criterion)
+    for checkpoint_path in checkpoint_paths:
+        print('  %s' % checkpoint_path)
+
+    if args.save_path is None:
+        save_path = mkdir_join(args.model_path, 'average_' + args.criterion +
+                               str(args.num_checkpoints))
+    else:
+        save_path = mkdir(args.save_path)
+
+    # NOTE: the averaged checkpoint is named after the latest epoch
+    global_step = max(int(basename(path).split('-')[-1])
+                      for path in checkpoint_paths)
+    checkpoint_path = average_checkpoints(
+        checkpoint_paths, save_path, global_step=global_step)
+    print('Averaged model saved in file: %s' % checkpoint_path)
+
+    # Copy the config file for evaluation scripts
+    shutil.copyfile(join(args.model_path, 'config.yml'),
+                    join(save_path, 'config.yml'))
+
+
+if __name__ == '__main__':
+    main()
@@ -66,14 +66,11 @@ def do_eval(model, params, epoch, eval_batch_size, beam_width):
 
     with tf.name_scope('tower_gpu0'):
         # Define placeholders
-        model.create_placeholders()
+        model.create_placeholders_inference()
 
         # Add to the graph each operation (including model definition)
-        _, logits = model.compute_loss(model.inputs_pl_list[0],
-                                       model.labels_pl_list[0],
-                                       model.inputs_seq_len_pl_list[0],
-                                       model.keep_prob_pl_list[0],
-                                       is_training=False)
+        logits = model.build_inference(model.inputs_pl_list[0],
+                                       model.inputs_seq_len_pl_list[0])
         decode_op = model.decoder(logits,
                                   model.inputs_seq_len_pl_list[0],
                                   beam_width=beam_width)
@@ -221,7 +218,11 @@ def main():
                 clip_grad_norm=params['clip_grad_norm'],
                 clip_activation=params['clip_activation'],
                 num_proj=params['num_proj'],
-                weight_decay=params['weight_decay'])
+                weight_decay=params['weight_decay'],
+                subsample_list=params.get('subsample_list', None),
+                subsample_type=params.get('subsample_type', 'concat'),
+                chunk_size=params.get('chunk_size', None),
+                right_context=params.get('right_context', 0))
 
     model.save_path = args.model_path
     do_eval(model=model, params=params,
@@ -63,15 +63,12 @@ def do_eval(model, params, epoch, beam_width, eval_batch_size):
 
     with tf.name_scope('tower_gpu0'):
         # Define placeholders
-        model.create_placeholders()
+        model.create_placeholders_inference()
 
         # Add to the graph each operation (including model definition)
-        _, logits_word, logits_char = model.compute_loss(
+        logits_word, logits_char = model.build_inference(
             model.inputs_pl_list[0],
-            model.labels_pl_list[0],
-            model.labels_sub_pl_list[0],
-            model.inputs_seq_len_pl_list[0],
-            model.keep_prob_pl_list[0])
+            model.inputs_seq_len_pl_list[0])
         decode_op_word, decode_op_char = model.decoder(
             logits_word, logits_char,
             model.inputs_seq_len_pl_list[0],
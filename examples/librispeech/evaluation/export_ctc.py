@@ -0,0 +1,208 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Export the trained CTC model as a frozen inference graph (Librispeech
+   corpus). The exported graph can be loaded by `utils.frozen_graph.FrozenGraph`
+   without the model definitions.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, abspath
+import sys
+import tensorflow as tf
+import yaml
+import argparse
+
+sys.path.append(abspath('../../../'))
+from models.ctc.ctc import CTC
+from utils.directory import mkdir_join
+from utils.frozen_graph import export_frozen_graph, load_frozen_graph
+from utils.frozen_graph import save_frozen_graph
+from utils.sparse_graph import sparsify_graph_def
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--epoch', type=int, default=-1,
+                    help='the epoch to restore')
+parser.add_argument('--model_path', type=str,
+                    help='path to the model to export')
+parser.add_argument('--beam_width', type=int, default=20,
+                    help='beam_width (int, optional): beam width for beam search.' +
+                    ' 1 disables beam search, which mean greedy decoding.')
+parser.add_argument('--min_sparsity', type=float, default=None,
+                    help='If given, weights of pruned models whose ratios of ' +
+                    'zeros are not less than this are also exported in a ' +
+                    'sparse format.')
+
+
+def load_vocab(params):
+    """Load the vocabulary of the model.
+    Args:
+        params (dict): A dictionary of parameters
+    Returns:
+        vocab (list): tokens sorted by indices
+    """
+    if params['label_type'] == 'character':
+        map_file_name = 'character.txt'
+    else:
+        map_file_name = params['label_type'] + '_' + \
+            params['train_data_size'] + '.txt'
+
+    map_dict = {}
+    with open(join('../metrics/mapping_files', map_file_name), 'r') as f:
+        for line in f:
+            line = line.strip().split()
+            map_dict[int(line[1])] = line[0]
+    return [map_dict[i] for i in sorted(map_dict.keys())]
+
+
+def do_export(model, params, epoch, beam_width, min_sparsity=None):
+    """Export the model.
+    Args:
+        model: the model to restore
+        params (dict): A dictionary of parameters
+        epoch (int): the epoch to restore
+        beam_width (int): beam width for beam search.
+            1 disables beam search, which mean greedy decoding.
+        min_sparsity (float, optional): If given, the graph is also exported
+            with sparse weights whose ratios of zeros are >= min_sparsity
+    """
+    # Define placeholders
+    model.create_placeholders_inference()
+    inputs = model.inputs_pl_list[0]
+    inputs_seq_len = model.inputs_seq_len_pl_list[0]
+
+    # Add to the graph each operation (including model definition)
+    logits = model.build_inference(inputs, inputs_seq_len)
+    decode_op = model.decoder(logits, inputs_seq_len, beam_width=beam_width)
+    outputs_seq_len = model.output_seq_len(inputs_seq_len)
+
+    # Name outputs
+    # NOTE: posteriors are batch-major: `[B, T, num_classes]`
+    posteriors_op = tf.reshape(
+        model.posteriors(logits),
+        shape=[tf.shape(logits)[1], tf.shape(logits)[0], model.num_classes],
+        name='posteriors')
+    outputs_seq_len = tf.identity(outputs_seq_len, name='outputs_seq_len')
+    decoded_indices = tf.identity(decode_op.indices, name='decoded_indices')
+    decoded_values = tf.identity(decode_op.values, name='decoded_values')
+    decoded_shape = tf.identity(decode_op.dense_shape, name='decoded_shape')
+
+    # Create a saver for restoring checkpoints
+    saver = tf.train.Saver()
+
+    with tf.Session() as sess:
+        ckpt = tf.train.get_checkpoint_state(model.save_path)
+
+        # If check point exists
+        if ckpt:
+            model_path = ckpt.model_checkpoint_path
+            if epoch != -1:
+                model_path = model_path.split('/')[:-1]
+                model_path = '/'.join(model_path) + '/model.ckpt-' + str(epoch)
+            saver.restore(sess, model_path)
+            print("Model restored: " + model_path)
+        else:
+            raise ValueError('There are not any checkpoints.')
+
+        metadata = {
+            'label_type': params['label_type'],
+            'vocab': load_vocab(params),
+            'num_classes': model.num_classes,
+            'blank_index': model.num_classes - 1,
+            'input_size': params['input_size'],
+            'num_stack': params['num_stack'],
+            'num_skip': params['num_skip'],
+            'splice': params['splice'],
+            'beam_width': beam_width
+        }
+        graph_path = export_frozen_graph(
+            sess,
+            save_path=mkdir_join(model.save_path, 'frozen'),
+            inputs={'inputs': inputs,
+                    'inputs_seq_len': inputs_seq_len},
+            outputs={'posteriors': posteriors_op,
+                     'outputs_seq_len': outputs_seq_len,
+                     'decoded_indices': decoded_indices,
+                     'decoded_values': decoded_values,
+                     'decoded_shape': decoded_shape},
+            metadata=metadata)
+        print("Frozen graph saved in file: %s" % graph_path)
+
+    if min_sparsity is not None:
+        graph_def, metadata = load_frozen_graph(join(model.save_path, 'frozen'))
+        sparse_graph_def, sparsity = sparsify_graph_def(
+            graph_def, min_sparsity=min_sparsity)
+        if len(sparsity) == 0:
+            print('There are not any sparse weights.')
+            return
+
+        metadata['sparsity'] = sparsity
+        graph_path = save_frozen_graph(
+            mkdir_join(model.save_path, 'frozen_sparse'),
+            sparse_graph_def, metadata)
+        print("Sparse graph saved in file: %s" % graph_path)
+        for name in sorted(sparsity.keys()):
+            print('  %s: %.3f' % (name, sparsity[name]))
+        print('  size: %.1f MB -> %.1f MB' %
+              (graph_def.ByteSize() / 1e6, sparse_graph_def.ByteSize() / 1e6))
+
+
+def main():
+
+    args = parser.parse_args()
+
+    # Load config file
+    with open(join(args.model_path, 'config.yml'), "r") as f:
+        config = yaml.load(f)
+        params = config['param']
+
+    # Except for a blank class
+    if params['label_type'] == 'character':
+        params['num_classes'] = 28
+    elif params['label_type'] == 'character_capital_divide':
+        if params['train_data_size'] == 'train100h':
+            params['num_classes'] = 72
+        elif params['train_data_size'] == 'train460h':
+            params['num_classes'] = 77
+        elif params['train_data_size'] == 'train960h':
+            params['num_classes'] = 77
+    elif params['label_type'] == 'word_freq10':
+        if params['train_data_size'] == 'train100h':
+            params['num_classes'] = 7213
+        elif params['train_data_size'] == 'train460h':
+            params['num_classes'] = 18641
+        elif params['train_data_size'] == 'train960h':
+            params['num_classes'] = 26642
+    else:
+        raise TypeError
+
+    # Model setting
+    model = CTC(encoder_type=params['encoder_type'],
+                input_size=params['input_size'],
+                splice=params['splice'],
+                num_stack=params['num_stack'],
+                num_units=params['num_units'],
+                num_layers=params['num_layers'],
+                num_classes=params['num_classes'],
+                lstm_impl=params['lstm_impl'],
+                use_peephole=params['use_peephole'],
+                parameter_init=params['weight_init'],
+                clip_grad_norm=params['clip_grad_norm'],
+                clip_activation=params['clip_activation'],
+                num_proj=params['num_proj'],
+                weight_decay=params['weight_decay'],
+                subsample_list=params.get('subsample_list', None),
+                subsample_type=params.get('subsample_type', 'concat'),
+                chunk_size=params.get('chunk_size', None),
+                right_context=params.get('right_context', 0))
+
+    model.save_path = args.model_path
+    do_export(model=model, params=params, epoch=args.epoch,
+              beam_width=args.beam_width, min_sparsity=args.min_sparsity)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Quantize weights of the exported CTC model to 8 bits, and compare it with
+   the float model (Librispeech corpus). Run `export_ctc.py` beforehand.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, abspath
+import sys
+import re
+import time
+import numpy as np
+import yaml
+import argparse
+from tqdm import tqdm
+
+sys.path.append(abspath('../../../'))
+from experiments.librispeech.data.load_dataset_ctc import Dataset
+from utils.directory import mkdir_join
+from utils.frozen_graph import FrozenGraph, load_frozen_graph, save_frozen_graph
+from utils.quantization import quantize_graph_def
+from utils.io.labels.character import Idx2char
+from utils.io.labels.word import Idx2word
+from utils.io.labels.ragged import padded2ragged, sparsetensor2ragged
+from utils.evaluation.edit_distance import compute_cer, compute_wer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model_path', type=str,
+                    help='path to the model to quantize')
+parser.add_argument('--eval_batch_size', type=int, default=16,
+                    help='the size of mini-batch when evaluation.')
+parser.add_argument('--num_calibration_batches', type=int, default=2,
+                    help='the number of mini-batches of dev_clean used ' +
+                    'for calibration')
+parser.add_argument('--min_agreement', type=float, default=0.99,
+                    help='the minimum ratio of frames whose best classes ' +
+                    'are the same as the float model in calibration')
+parser.add_argument('--min_elements', type=int, default=1024,
+                    help='the minimum number of elements of weights to quantize')
+
+FRAME_SHIFT = 0.01  # [sec]
+
+
+def frame_agreement(outputs_ref, outputs):
+    """Compute the ratio of frames whose best classes are the same.
+    Args:
+        outputs_ref (list): outputs of the float model
+        outputs (list): outputs of the quantized model
+    Returns:
+        agreement (float): the ratio of frames in [0, 1]
+    """
+    num_same, num_frames = 0, 0
+    for ref, hyp in zip(outputs_ref, outputs):
+        for i_batch, seq_len in enumerate(ref['outputs_seq_len']):
+            num_same += np.sum(
+                np.argmax(ref['posteriors'][i_batch, :seq_len], axis=-1) ==
+                np.argmax(hyp['posteriors'][i_batch, :seq_len], axis=-1))
+            num_frames += seq_len
+    return num_same / max(num_frames, 1)
+
+
+def calibrate(graph_def, metadata, feeds_list, min_agreement, min_elements):
+    """Quantize weights, keeping the weights with the largest quantization
+       errors in float until outputs on calibration data agree with those
+       of the float model.
+    Args:
+        graph_def: A frozen `GraphDef` of the float model
+        metadata (dict): metadata of the graph
+        feeds_list (list): feeds of calibration mini-batches
+        min_agreement (float): the minimum ratio of frames whose best classes
+            are the same as the float model
+        min_elements (int): the minimum number of elements of weights to
+            quantize
+    Returns:
+        graph_def: A quantized `GraphDef`
+        errors (dict): relative quantization errors of quantized weights
+        exclude (list): names of weights kept in float
+        agreement (float): the ratio of frames in calibration
+    """
+    fetches = ['posteriors', 'outputs_seq_len']
+
+    model = FrozenGraph(graph_def=graph_def, metadata=metadata)
+    outputs_ref = [model(feeds, fetches) for feeds in feeds_list]
+    model.close()
+
+    exclude = []
+    while True:
+        quantized_graph_def, errors = quantize_graph_def(
+            graph_def, min_elements=min_elements, exclude=exclude)
+        if len(errors) == 0:
+            return quantized_graph_def, errors, exclude, 1.0
+
+        model = FrozenGraph(graph_def=quantized_graph_def, metadata=metadata)
+        outputs = [model(feeds, fetches) for feeds in feeds_list]
+        model.close()
+
+        agreement = frame_agreement(outputs_ref, outputs)
+        print('  %d weights quantized, agreement: %.4f' %
+              (len(errors), agreement))
+        if agreement >= min_agreement:
+            return quantized_graph_def, errors, exclude, agreement
+
+        # Keep the most sensitive weights in float
+        exclude.append(max(errors, key=errors.get))
+
+
+def do_eval(model, dataset, label_type, train_data_size, num_skip):
+    """Evaluate the exported model by CER, WER and real time factor.
+    Args:
+        model: An instance of `FrozenGraph` class
+        dataset: An instance of a `Dataset` class
+        label_type (string): character or character_capital_divide or
+            word_freq10
+        train_data_size (string): train100h or train460h or train960h
+        num_skip (int): the number of frames to skip
+    Returns:
+        cer_mean (float): An average of CER (None for word models)
+        wer_mean (float): An average of WER
+        rtf (float): real time factor
+    """
+    if label_type == 'character':
+        idx2label = Idx2char(
+            map_file_path='../metrics/mapping_files/character.txt')
+    elif label_type == 'character_capital_divide':
+        idx2label = Idx2char(
+            map_file_path='../metrics/mapping_files/character_capital_divide_' +
+            train_data_size + '.txt',
+            capital_divide=True,
+            space_mark='_')
+    else:
+        idx2label = Idx2word(
+            map_file_path='../metrics/mapping_files/' + label_type + '_' +
+            train_data_size + '.txt')
+
+    fetches = ['decoded_indices', 'decoded_values', 'decoded_shape']
+
+    dataset.reset()
+    cer_mean, wer_mean = 0, 0
+    decode_time, audio_time = 0, 0
+    pbar = tqdm(total=len(dataset))
+    for data, is_new_epoch in dataset:
+        inputs, labels_true, inputs_seq_len, _ = data
+        batch_size = len(inputs[0])
+
+        start_time = time.time()
+        outputs = model({'inputs': inputs[0],
+                         'inputs_seq_len': inputs_seq_len[0]}, fetches)
+        decode_time += time.time() - start_time
+        audio_time += np.sum(inputs_seq_len[0]) * num_skip * FRAME_SHIFT
+
+        labels_pred = sparsetensor2ragged(
+            [outputs[k] for k in fetches], batch_size)
+        labels_true = padded2ragged(
+            labels_true[0], padded_value=dataset.padded_value)
+
+        if 'word' in label_type:
+            for word_true, word_pred in zip(idx2label.batch(*labels_true),
+                                            idx2label.batch(*labels_pred)):
+                wer_mean += compute_wer(ref=word_true, hyp=word_pred,
+                                        normalize=True)
+        else:
+            for str_true, str_pred in zip(idx2label.batch(*labels_true),
+                                          idx2label.batch(*labels_pred)):
+                # Remove consecutive spaces and garbage labels
+                str_pred = re.sub(r'[_]+', '_', str_pred)
+                str_true = re.sub(r'[\']+', '', str_true)
+                str_pred = re.sub(r'[\']+', '', str_pred)
+
+                wer_mean += compute_wer(ref=str_true.split('_'),
+                                        hyp=str_pred.split('_'),
+                                        normalize=True)
+                cer_mean += compute_cer(str_pred=re.sub(r'[_]+', '', str_pred),
+                                        str_true=re.sub(r'[_]+', '', str_true),
+                                        normalize=True)
+        pbar.update(batch_size)
+
+        if is_new_epoch:
+            break
+
+    cer_mean = None if 'word' in label_type else cer_mean / len(dataset)
+    wer_mean /= len(dataset)
+    rtf = decode_time / audio_time
+
+    return cer_mean, wer_mean, rtf
+
+
+def main():
+
+    args = parser.parse_args()
+
+    # Load config file
+    with open(join(args.model_path, 'config.yml'), "r") as f:
+        config = yaml.load(f)
+        params = config['param']
+
+    graph_def, metadata = load_frozen_graph(join(args.model_path, 'frozen'))
+
+    dev_clean_data = Dataset(
+        data_type='dev_clean', train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=args.eval_batch_size,
+        splice=metadata['splice'],
+        num_stack=metadata['num_stack'], num_skip=metadata['num_skip'],
+        shuffle=False)
+
+    # Calibration on the first mini-batches of dev_clean
+    feeds_list = []
+    for data, is_new_epoch in dev_clean_data:
+        inputs, _, inputs_seq_len, _ = data
+        feeds_list.append({'inputs': inputs[0],
+                           'inputs_seq_len': inputs_seq_len[0]})
+        if len(feeds_list) == args.num_calibration_batches or is_new_epoch:
+            break
+
+    print('Calibration:')
+    quantized_graph_def, errors, exclude, agreement = calibrate(
+        graph_def, metadata, feeds_list,
+        min_agreement=args.min_agreement, min_elements=args.min_elements)
+
+    quantized_metadata = dict(metadata)
+    quantized_metadata['quantization'] = {
+        'num_bits': 8,
+        'per_channel': True,
+        'weights': sorted(errors.keys()),
+        'exclude': exclude,
+        'calibration_agreement': agreement
+    }
+    graph_path = save_frozen_graph(
+        mkdir_join(args.model_path, 'frozen_int8'),
+        quantized_graph_def, quantized_metadata)
+    print('Quantized graph saved in file: %s' % graph_path)
+    print('  size: %.1f MB -> %.1f MB' %
+          (graph_def.ByteSize() / 1e6, quantized_graph_def.ByteSize() / 1e6))
+
+    # Compare on dev_clean
+    results = {}
+    for name, (g, m) in [('float', (graph_def, metadata)),
+                         ('int8', (quantized_graph_def, quantized_metadata))]:
+        model = FrozenGraph(graph_def=g, metadata=m)
+        results[name] = do_eval(model, dev_clean_data,
+                                label_type=params['label_type'],
+                                train_data_size=params['train_data_size'],
+                                num_skip=metadata['num_skip'])
+        model.close()
+
+    print('dev_clean:')
+    for name in ['float', 'int8']:
+        cer, wer, rtf = results[name]
+        print('  %s: CER %s / WER %f %% / RTF %f' %
+              (name, 'N/A' if cer is None else '%f %%' % (cer * 100),
+               wer * 100, rtf))
+    if results['float'][0] is not None:
+        print('  CER delta: %+f %%' %
+              ((results['int8'][0] - results['float'][0]) * 100))
+    print('  WER delta: %+f %%' %
+          ((results['int8'][1] - results['float'][1]) * 100))
+    print('  RTF speedup: x%.2f' % (results['float'][2] / results['int8'][2]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/bin/bash
+
+# Select GPU
+if [ $# -ne 2 ]; then
+  echo "Error: set GPU number & config path." 1>&2
+  echo "Usage: ./run_average_blstmctc.sh path_to_saved_model gpu_index" 1>&2
+  exit 1
+fi
+
+# Set path to CUDA
+export PATH=$PATH:/usr/local/cuda-8.0/bin
+export LD_LIBRARY_PATH=$LD_LIBRARY_PATH:/usr/local/cuda-8.0/lib64:/usr/local/cuda-8.0/extras/CUPTI/lib64
+
+# Set path to python
+PYTHON=/home/lab5/inaguma/.pyenv/versions/anaconda3-4.1.1/bin/python
+
+model_path=$1
+gpu_index=$2
+
+# Average checkpoints instead of ensembling models
+# NOTE: criterion=last requires keep_last_checkpoints >= num_checkpoints in
+# the config file for training, because only keep_best_checkpoints (3 by
+# default) and keep_last_checkpoints (1 by default) checkpoints are kept
+num_checkpoints=3
+criterion=best
+beam_width=100
+eval_batch_size=-1
+
+$PYTHON average_checkpoints.py \
+  --model_path $model_path \
+  --num_checkpoints $num_checkpoints \
+  --criterion $criterion
+
+CUDA_VISIBLE_DEVICES=$gpu_index $PYTHON eval_ctc.py \
+  --model_path $model_path/average_$criterion$num_checkpoints \
+  --epoch -1 \
+  --beam_width $beam_width \
+  --eval_batch_size $eval_batch_size
@@ -105,15 +105,12 @@ def do_save(model, params, epoch, eval_batch_size, temperature):
 
     with tf.name_scope('tower_gpu0'):
         # Define placeholders
-        model.create_placeholders()
+        model.create_placeholders_inference()
 
         # Add to the graph each operation (including model definition)
-        _, logits = model.compute_loss(
-            model.inputs_pl_list[0],
-            model.labels_pl_list[0],
-            model.inputs_seq_len_pl_list[0],
-            model.keep_prob_pl_list[0])
-        logits /= temperature
+        logits = model.build_inference(model.inputs_pl_list[0],
+                                       model.inputs_seq_len_pl_list[0],
+                                       softmax_temperature=temperature)
         posteriors_op = model.posteriors(logits, blank_prior=1)
 
     # Create a saver for writing training checkpoints
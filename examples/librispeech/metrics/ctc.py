@@ -12,7 +12,7 @@ from tqdm import tqdm
 
 from utils.io.labels.character import Idx2char, Char2idx
 from utils.io.labels.word import Idx2word
-from utils.io.labels.sparsetensor import sparsetensor2list
+from utils.io.labels.ragged import padded2ragged, sparsetensor2ragged
 from utils.evaluation.edit_distance import compute_cer, compute_wer, wer_align
 from models.ctc.decoders.beam_search_decoder import BeamSearchDecoder
 
@@ -58,7 +58,6 @@ def do_eval_cer(session, decode_ops, model, dataset, label_type,
         raise TypeError
 
     cer_mean, wer_mean = 0, 0
-    skip_data_num = 0
     if progressbar:
         pbar = tqdm(total=len(dataset))
     for data, is_new_epoch in dataset:
@@ -79,64 +78,55 @@ def do_eval_cer(session, decode_ops, model, dataset, label_type,
         labels_pred_st_list = session.run(decode_ops, feed_dict=feed_dict)
         for i_device, labels_pred_st in enumerate(labels_pred_st_list):
             batch_size_device = len(inputs[i_device])
-            try:
-                labels_pred = sparsetensor2list(labels_pred_st,
-                                                batch_size_device)
-                for i_batch in range(batch_size_device):
-
-                    # Convert from list of index to string
-                    if is_test:
-                        str_true = labels_true[i_device][i_batch][0]
-                        # NOTE: transcript is seperated by space('_')
-                    else:
-                        str_true = idx2char(labels_true[i_device][i_batch],
-                                            padded_value=dataset.padded_value)
-                    str_pred = idx2char(labels_pred[i_batch])
-
-                    # Remove consecutive spaces
-                    str_pred = re.sub(r'[_]+', '_', str_pred)
-
-                    # Remove garbage labels
-                    str_true = re.sub(r'[\']+', '', str_true)
-                    str_pred = re.sub(r'[\']+', '', str_pred)
-
-                    # Compute WER
-                    wer_mean += compute_wer(ref=str_true.split('_'),
-                                            hyp=str_pred.split('_'),
-                                            normalize=True)
-                    # substitute, insert, delete = wer_align(
-                    #     ref=str_pred.split('_'),
-                    #     hyp=str_true.split('_'))
-                    # print('SUB: %d' % substitute)
-                    # print('INS: %d' % insert)
-                    # print('DEL: %d' % delete)
-
-                    # Remove spaces
-                    str_true = re.sub(r'[_]+', '', str_true)
-                    str_pred = re.sub(r'[_]+', '', str_pred)
-
-                    # Compute CER
-                    cer_mean += compute_cer(str_pred=str_pred,
-                                            str_true=str_true,
-                                            normalize=True)
-
-                    if progressbar:
-                        pbar.update(1)
-
-            except IndexError:
-                print('skipped')
-                skip_data_num += batch_size_device
-                # TODO: Conduct decoding again with batch size 1
+
+            # Convert from list of index to string per mini-batch
+            if is_test:
+                str_true_list = [labels_true[i_device][i_batch][0]
+                                 for i_batch in range(batch_size_device)]
+                # NOTE: transcript is seperated by space('_')
+            else:
+                str_true_list = idx2char.batch(*padded2ragged(
+                    labels_true[i_device], padded_value=dataset.padded_value))
+            str_pred_list = idx2char.batch(*sparsetensor2ragged(
+                labels_pred_st, batch_size_device))
+
+            for str_true, str_pred in zip(str_true_list, str_pred_list):
+
+                # Remove consecutive spaces
+                str_pred = re.sub(r'[_]+', '_', str_pred)
+
+                # Remove garbage labels
+                str_true = re.sub(r'[\']+', '', str_true)
+                str_pred = re.sub(r'[\']+', '', str_pred)
+
+                # Compute WER
+                wer_mean += compute_wer(ref=str_true.split('_'),
+                                        hyp=str_pred.split('_'),
+                                        normalize=True)
+                # substitute, insert, delete = wer_align(
+                #     ref=str_pred.split('_'),
+                #     hyp=str_true.split('_'))
+                # print('SUB: %d' % substitute)
+                # print('INS: %d' % insert)
+                # print('DEL: %d' % delete)
+
+                # Remove spaces
+                str_true = re.sub(r'[_]+', '', str_true)
+                str_pred = re.sub(r'[_]+', '', str_pred)
+
+                # Compute CER
+                cer_mean += compute_cer(str_pred=str_pred,
+                                        str_true=str_true,
+                                        normalize=True)
 
                 if progressbar:
-                    pbar.update(batch_size_device)
+                    pbar.update(1)
 
         if is_new_epoch:
             break
 
-    cer_mean /= (len(dataset) - skip_data_num)
-    wer_mean /= (len(dataset) - skip_data_num)
-    # TODO: Fix this
+    cer_mean /= len(dataset)
+    wer_mean /= len(dataset)
 
     # Register original batch size
     if eval_batch_size is not None:
@@ -306,7 +296,6 @@ def do_eval_wer(session, decode_ops, model, dataset, train_data_size,
         map_file_path='../metrics/mapping_files/word_' + train_data_size + '.txt')
 
     wer_mean = 0
-    skip_data_num = 0
     if progressbar:
         pbar = tqdm(total=len(dataset))
     for data, is_new_epoch in dataset:
@@ -327,50 +316,38 @@ def do_eval_wer(session, decode_ops, model, dataset, train_data_size,
         labels_pred_st_list = session.run(decode_ops, feed_dict=feed_dict)
         for i_device, labels_pred_st in enumerate(labels_pred_st_list):
             batch_size_device = len(inputs[i_device])
-            try:
-                labels_pred = sparsetensor2list(labels_pred_st,
-                                                batch_size_device)
-
-                for i_batch in range(batch_size_device):
-
-                    if is_test:
-                        str_true = labels_true[i_device][i_batch][0]
-                        # NOTE: transcript is seperated by space('_')
-                    else:
-                        str_true = '_'.join(
-                            idx2word(labels_true[i_device][i_batch]))
-                    str_pred = '_'.join(idx2word(labels_pred[i_batch]))
-
-                    # if len(str_true.split('_')) == 0:
-                    #     print(str_true)
-                    #     print(str_pred)
-
-                    # Compute WER
-                    wer_mean += compute_wer(ref=str_true.split('_'),
-                                            hyp=str_pred.split('_'),
-                                            normalize=True)
-                    # substitute, insert, delete = wer_align(
-                    #     ref=str_true.split(' '),
-                    #     hyp=str_pred.split(' '))
-                    # print('SUB: %d' % substitute)
-                    # print('INS: %d' % insert)
-                    # print('DEL: %d' % delete)
-
-                    if progressbar:
-                        pbar.update(1)
-
-            except IndexError:
-                print('skipped')
-                skip_data_num += batch_size_device
-                # TODO: Conduct decoding again with batch size 1
+
+            # Convert from list of index to words per mini-batch
+            if is_test:
+                word_true_list = [labels_true[i_device][i_batch][0].split('_')
+                                  for i_batch in range(batch_size_device)]
+                # NOTE: transcript is seperated by space('_')
+            else:
+                word_true_list = idx2word.batch(*padded2ragged(
+                    labels_true[i_device], padded_value=dataset.padded_value))
+            word_pred_list = idx2word.batch(*sparsetensor2ragged(
+                labels_pred_st, batch_size_device))
+
+            for word_true, word_pred in zip(word_true_list, word_pred_list):
+
+                # Compute WER
+                wer_mean += compute_wer(ref=word_true,
+                                        hyp=word_pred,
+                                        normalize=True)
+                # substitute, insert, delete = wer_align(
+                #     ref=word_true,
+                #     hyp=word_pred)
+                # print('SUB: %d' % substitute)
+                # print('INS: %d' % insert)
+                # print('DEL: %d' % delete)
 
                 if progressbar:
-                    pbar.update(batch_size_device)
+                    pbar.update(1)
 
         if is_new_epoch:
             break
 
-    wer_mean /= (len(dataset) - skip_data_num)
+    wer_mean /= len(dataset)
 
     # Register original batch size
     if eval_batch_size is not None:
@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Launch distributed training of the CTC model as local processes, and
+   report scaling efficiency (Librispeech corpus).
+   ex.)
+       python launch_ctc_dist.py config.yml save_path \
+           --num_workers 1 2 4 --max_steps 200 --sync
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, abspath, dirname
+import os
+import sys
+import argparse
+import socket
+import subprocess
+from glob import glob
+
+sys.path.append(abspath('../../../'))
+from utils.training.distributed import scaling_report, print_scaling_report
+
+parser = argparse.ArgumentParser()
+parser.add_argument('config_path', type=str,
+                    help='path to the config file')
+parser.add_argument('model_save_path', type=str,
+                    help='path to save models')
+parser.add_argument('--num_workers', type=int, nargs='+', default=[1, 2],
+                    help='the numbers of workers to run')
+parser.add_argument('--num_ps', type=int, default=1,
+                    help='the number of parameter servers')
+parser.add_argument('--sync', action='store_true',
+                    help='if True, update parameters synchronously')
+parser.add_argument('--max_steps', type=int, default=200,
+                    help='the number of steps of each worker')
+parser.add_argument('--skip', type=int, default=1,
+                    help='the number of summaries skipped for warming up')
+
+
+def get_free_ports(num):
+    """Get free ports on the local machine.
+    Args:
+        num (int): the number of ports
+    Returns:
+        ports (list): list of port numbers
+    """
+    sockets = []
+    for _ in range(num):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(('localhost', 0))
+        sockets.append(s)
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def launch(args, num_workers):
+    """Run parameter servers and workers until all workers finish.
+    Args:
+        args: parsed arguments
+        num_workers (int): the number of workers
+    Returns:
+        log_paths (list): paths to metrics logs of all workers
+    """
+    ports = get_free_ports(args.num_ps + num_workers)
+    ps_hosts = ['localhost:%d' % port for port in ports[:args.num_ps]]
+    worker_hosts = ['localhost:%d' % port for port in ports[args.num_ps:]]
+
+    script_path = join(dirname(abspath(__file__)), 'train_ctc_dist.py')
+    command = [sys.executable, script_path,
+               args.config_path, args.model_save_path,
+               '--ps_hosts', ','.join(ps_hosts),
+               '--worker_hosts', ','.join(worker_hosts),
+               '--max_steps', str(args.max_steps)]
+    if args.sync:
+        command.append('--sync')
+
+    # NOTE: all processes share CPU devices of the machine unless
+    # CUDA_VISIBLE_DEVICES is set for each worker
+    env = dict(os.environ)
+    env['CUDA_VISIBLE_DEVICES'] = ''
+
+    ps_processes = [
+        subprocess.Popen(command + ['--job_name', 'ps', '--task_index',
+                                    str(i)], env=env)
+        for i in range(args.num_ps)]
+    worker_processes = [
+        subprocess.Popen(command + ['--job_name', 'worker', '--task_index',
+                                    str(i)], env=env)
+        for i in range(num_workers)]
+
+    try:
+        for i, p in enumerate(worker_processes):
+            if p.wait() != 0:
+                raise RuntimeError('Worker %d exited with code %d.' %
+                                   (i, p.returncode))
+    finally:
+        for p in worker_processes + ps_processes:
+            if p.poll() is None:
+                p.terminate()
+                p.wait()
+
+    log_paths = []
+    for i in range(num_workers):
+        log_path = glob(join(args.model_save_path, 'ctc', '*', '*',
+                             '*_%s%d' % ('sync' if args.sync else 'async',
+                                         num_workers),
+                             'metrics_worker%d.jsonl' % i))
+        log_paths += sorted(log_path, key=os.path.getmtime)[-1:]
+    return log_paths
+
+
+def main():
+
+    args = parser.parse_args()
+
+    log_paths_dict = {}
+    for num_workers in args.num_workers:
+        print('===== %d worker(s) =====' % num_workers)
+        log_paths_dict[num_workers] = launch(args, num_workers)
+
+    print_scaling_report(scaling_report(log_paths_dict, skip=args.skip))
+
+
+if __name__ == '__main__':
+    main()
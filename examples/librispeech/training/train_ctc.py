@@ -18,10 +18,13 @@ import shutil
 sys.path.append(abspath('../../../'))
 from experiments.librispeech.data.load_dataset_ctc import Dataset
 from experiments.librispeech.metrics.ctc import do_eval_cer, do_eval_wer
-from utils.io.labels.sparsetensor import list2sparsetensor
 from utils.training.learning_rate_controller import Controller
-from utils.training.plot import plot_loss, plot_ler
-from utils.training.multi_gpu import average_gradients
+from utils.training.trainer import Trainer
+from utils.training.checkpoint import CheckpointManager
+from utils.training.multi_gpu import average_gradients, average_losses
+from utils.training.multi_gpu import get_tower_devices
+from utils.training.multi_gpu import get_session_config
+from utils.training.pruning import MagnitudePruning
 from utils.directory import mkdir_join, mkdir
 from utils.parameter import count_total_parameters
 from models.ctc.ctc import CTC
@@ -34,6 +37,16 @@ def do_train(model, params, gpu_indices):
         params (dict): A dictionary of parameters
         gpu_indices (list): GPU indices
     """
+    # NOTE: towers are placed on CPU devices when tower_device is cpu
+    device_type = params.get('tower_device', 'gpu')
+    if device_type == 'cpu':
+        num_towers = params['num_towers']
+    else:
+        num_towers = len(gpu_indices)
+        if num_towers == 0:
+            raise ValueError('GPU indices must be given, or set tower_device '
+                             'to cpu in the config file.')
+
     # Load dataset
     train_data = Dataset(
         data_type='train', train_data_size=params['train_data_size'],
@@ -42,19 +55,20 @@ def do_train(model, params, gpu_indices):
         splice=params['splice'],
         num_stack=params['num_stack'], num_skip=params['num_skip'],
         sort_utt=True, sort_stop_epoch=params['sort_stop_epoch'],
-        num_gpu=len(gpu_indices))
+        seed=params.get('seed', None),
+        num_gpu=num_towers)
     dev_clean_data = Dataset(
         data_type='dev_clean', train_data_size=params['train_data_size'],
         label_type=params['label_type'],
         batch_size=params['batch_size'], splice=params['splice'],
         num_stack=params['num_stack'], num_skip=params['num_skip'],
-        shuffle=True, num_gpu=len(gpu_indices))
+        shuffle=True, num_gpu=num_towers)
     dev_other_data = Dataset(
         data_type='dev_other', train_data_size=params['train_data_size'],
         label_type=params['label_type'],
         batch_size=params['batch_size'], splice=params['splice'],
         num_stack=params['num_stack'], num_skip=params['num_skip'],
-        shuffle=True, num_gpu=len(gpu_indices))
+        shuffle=True, num_gpu=num_towers)
     test_clean_data = Dataset(
         data_type='test_clean', train_data_size=params['train_data_size'],
         label_type=params['label_type'],
@@ -82,7 +96,9 @@ def do_train(model, params, gpu_indices):
         # Calculate the gradients for each model tower
         total_grads_and_vars, total_losses = [], []
         decode_ops, ler_ops = [], []
-        all_devices = ['/gpu:%d' % i_gpu for i_gpu in range(len(gpu_indices))]
+        monitor_beam_width = params.get('monitor_beam_width', 1)
+        accumulate_steps = params.get('accumulate_steps', 1)
+        all_devices = get_tower_devices(num_towers, device_type)
         # NOTE: /cpu:0 is prepared for evaluation
         with tf.variable_scope(tf.get_variable_scope()):
             for i_gpu in range(len(all_devices)):
@@ -113,8 +129,11 @@ def do_train(model, params, gpu_indices):
                             tower_loss)
 
                         # Gradient clipping
-                        tower_grads_and_vars = model._clip_gradients(
-                            tower_grads_and_vars)
+                        # NOTE: accumulated gradients are clipped when
+                        # applied
+                        if accumulate_steps == 1:
+                            tower_grads_and_vars = model._clip_gradients(
+                                tower_grads_and_vars)
 
                         # TODO: Optionally add gradient noise
 
@@ -127,24 +146,56 @@ def do_train(model, params, gpu_indices):
                             model.inputs_seq_len_pl_list[i_gpu],
                             beam_width=params['beam_width'])
                         decode_ops.append(decode_op_tower)
+
+                        # NOTE: LER for monitoring is computed by greedy
+                        # decoding by default
+                        if monitor_beam_width != params['beam_width']:
+                            decode_op_tower = model.decoder(
+                                tower_logits,
+                                model.inputs_seq_len_pl_list[i_gpu],
+                                beam_width=monitor_beam_width)
                         ler_op_tower = model.compute_ler(
                             decode_op_tower, model.labels_pl_list[i_gpu])
                         ler_op_tower = tf.expand_dims(ler_op_tower, axis=0)
                         ler_ops.append(ler_op_tower)
 
         # Aggregate losses, then calculate average loss
-        total_losses = tf.concat(axis=0, values=total_losses)
-        loss_op = tf.reduce_mean(total_losses, axis=0)
-        ler_ops = tf.concat(axis=0, values=ler_ops)
-        ler_op = tf.reduce_mean(ler_ops, axis=0)
+        # NOTE: towers are weighted by the number of utterances, which
+        # differs between towers
+        tower_weights = [tf.shape(seq_len)[0]
+                         for seq_len in model.inputs_seq_len_pl_list]
+        loss_op = average_losses(total_losses, tower_weights)
+        ler_op = average_losses(ler_ops, tower_weights)
 
         # We must calculate the mean of each gradient. Note that this is the
         # synchronization point across all towers
-        average_grads_and_vars = average_gradients(total_grads_and_vars)
-
-        # Apply the gradients to adjust the shared variables.
-        train_op = optimizer.apply_gradients(average_grads_and_vars,
-                                             global_step=global_step)
+        average_grads_and_vars = average_gradients(
+            total_grads_and_vars,
+            reduction=params.get('gradient_reduction', 'tree'),
+            weights=tower_weights)
+
+        if accumulate_steps > 1:
+            # Sum the gradients every step, and apply the average of them
+            # every accumulate_steps steps
+            train_op, accumulators_and_vars = model._accumulate_gradients(
+                average_grads_and_vars)
+            apply_op = model._apply_accumulated_gradients(
+                optimizer, accumulators_and_vars, accumulate_steps,
+                global_step)
+        else:
+            # Apply the gradients to adjust the shared variables.
+            train_op = optimizer.apply_gradients(average_grads_and_vars,
+                                                 global_step=global_step)
+            apply_op = None
+
+        if params.get('pruning', None) is not None:
+            # Prune weights gradually after each parameter update
+            pruning = MagnitudePruning(**params['pruning'])
+            if apply_op is not None:
+                apply_op = pruning.prune(apply_op, global_step)
+            else:
+                train_op = pruning.prune(train_op, global_step)
+            model.summaries_train += pruning.sparsity_summaries()
 
         # Define learning rate controller
         lr_controller = Controller(
@@ -162,8 +213,26 @@ def do_train(model, params, gpu_indices):
         # Add the variable initializer operation
         init_op = tf.global_variables_initializer()
 
-        # Create a saver for writing training checkpoints
-        saver = tf.train.Saver(max_to_keep=None)
+        # Create a saver for initializing parameters with a trained model
+        # (e.g. the teacher to prune)
+        if params.get('init_checkpoint', None) is not None:
+            if not tf.train.checkpoint_exists(params['init_checkpoint']):
+                raise ValueError('init_checkpoint does not exist: %s' %
+                                 params['init_checkpoint'])
+            init_saver = tf.train.Saver(var_list=tf.trainable_variables())
+
+        # Create a checkpoint manager for writing training checkpoints
+        checkpoint_manager = CheckpointManager(
+            save_path=model.save_path,
+            keep_best=params.get('keep_best_checkpoints', 3),
+            keep_last=params.get('keep_last_checkpoints', 1),
+            lower_better=True)
+        # NOTE: the latest checkpoint with the state of training is kept
+        # separately for resuming training
+        resume_manager = CheckpointManager(
+            save_path=mkdir_join(model.save_path, 'resume'),
+            keep_best=0,
+            keep_last=1)
 
         # Count total parameters
         parameters_dict, total_parameters = count_total_parameters(
@@ -174,14 +243,195 @@ def do_train(model, params, gpu_indices):
               (len(parameters_dict.keys()),
                "{:,}".format(total_parameters / 1000000)))
 
-        csv_steps, csv_loss_train, csv_loss_dev = [], [], []
-        csv_ler_train, csv_ler_dev = [], []
+        if params['train_data_size'] in ['train100h', 'train460h']:
+            dev_data = dev_clean_data
+        else:
+            dev_data = dev_other_data
+        trainer = Trainer(model=model,
+                          params=params,
+                          train_data=train_data,
+                          dev_data=dev_data,
+                          train_op=train_op,
+                          loss_op=loss_op,
+                          ler_op=ler_op,
+                          learning_rate_pl=learning_rate_pl,
+                          summary_train=summary_train,
+                          summary_dev=summary_dev,
+                          apply_op=apply_op,
+                          lr_controller=lr_controller,
+                          checkpoint_manager=resume_manager)
+
+        def evaluate(sess, trainer):
+            """Evaluate the model per epoch and save checkpoints.
+            Args:
+                sess: session
+                trainer: An instance of `Trainer`
+            Returns:
+                stop (bool): If True, training is stopped
+            """
+            if trainer.epoch < params['eval_start_epoch']:
+                return False
+
+            start_time_eval = time.time()
+            if 'char' in params['label_type']:
+                print('=== Dev Data Evaluation ===')
+                # dev-clean
+                cer_dev_clean_epoch, wer_dev_clean_epoch = do_eval_cer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_clean_data,
+                    label_type=params['label_type'],
+                    eval_batch_size=1)
+                print('  CER (clean): %f %%' % (cer_dev_clean_epoch * 100))
+                print('  WER (clean): %f %%' % (wer_dev_clean_epoch * 100))
+
+                # dev-other
+                cer_dev_other_epoch, wer_dev_other_epoch = do_eval_cer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_other_data,
+                    label_type=params['label_type'],
+                    eval_batch_size=1)
+                print('  CER (other): %f %%' % (cer_dev_other_epoch * 100))
+                print('  WER (other): %f %%' % (wer_dev_other_epoch * 100))
+
+                if params['train_data_size'] in ['train100h', 'train460h']:
+                    metric_epoch = cer_dev_clean_epoch
+                else:
+                    metric_epoch = cer_dev_other_epoch
+
+                # Save model (check point)
+                # NOTE: checkpoints are written in the background, and only
+                # the best and the latest ones are kept
+                save_path = checkpoint_manager.save(
+                    sess, global_step=trainer.epoch, metric=metric_epoch)
+                print("Model saved in file: %s" % save_path)
+
+                if metric_epoch < trainer.ler_dev_best:
+                    trainer.ler_dev_best = metric_epoch
+                    trainer.not_improved_epoch = 0
+                    print('■■■ ↑Best Score (CER)↑ ■■■')
+
+                    print('=== Test Data Evaluation ===')
+                    # test-clean
+                    cer_test_clean_epoch, wer_test_clean_epoch = do_eval_cer(
+                        session=sess,
+                        decode_ops=decode_ops,
+                        model=model,
+                        dataset=test_clean_data,
+                        label_type=params['label_type'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  CER (clean): %f %%' %
+                          (cer_test_clean_epoch * 100))
+                    print('  WER (clean): %f %%' %
+                          (wer_test_clean_epoch * 100))
+
+                    # test-other
+                    cer_test_other_epoch, wer_test_other_epoch = do_eval_cer(
+                        session=sess,
+                        decode_ops=decode_ops,
+                        model=model,
+                        dataset=test_other_data,
+                        label_type=params['label_type'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  CER (other): %f %%' %
+                          (cer_test_other_epoch * 100))
+                    print('  WER (other): %f %%' %
+                          (wer_test_other_epoch * 100))
+                else:
+                    trainer.not_improved_epoch += 1
+
+            else:
+                print('=== Dev Data Evaluation ===')
+                # dev-clean
+                wer_dev_clean_epoch = do_eval_wer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_clean_data,
+                    train_data_size=params['train_data_size'],
+                    eval_batch_size=1)
+                print('  WER (clean): %f %%' % (wer_dev_clean_epoch * 100))
+
+                # dev-other
+                wer_dev_other_epoch = do_eval_wer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_other_data,
+                    train_data_size=params['train_data_size'],
+                    eval_batch_size=1)
+                print('  WER (other): %f %%' % (wer_dev_other_epoch * 100))
+
+                if params['train_data_size'] in ['train100h', 'train460h']:
+                    metric_epoch = wer_dev_clean_epoch
+                else:
+                    metric_epoch = wer_dev_other_epoch
+
+                # Save model (check point)
+                # NOTE: checkpoints are written in the background, and only
+                # the best and the latest ones are kept
+                save_path = checkpoint_manager.save(
+                    sess, global_step=trainer.epoch, metric=metric_epoch)
+                print("Model saved in file: %s" % save_path)
+
+                if metric_epoch < trainer.ler_dev_best:
+                    trainer.ler_dev_best = metric_epoch
+                    trainer.not_improved_epoch = 0
+                    print('■■■ ↑Best Score (WER)↑ ■■■')
+
+                    print('=== Test Data Evaluation ===')
+                    # test-clean
+                    wer_test_clean_epoch = do_eval_wer(
+                        session=sess,
+                        decode_ops=decode_ops,
+                        model=model,
+                        dataset=test_clean_data,
+                        train_data_size=params['train_data_size'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  WER (clean): %f %%' %
+                          (wer_test_clean_epoch * 100))
+
+                    # test-other
+                    wer_test_other_epoch = do_eval_wer(
+                        session=sess,
+                        decode_ops=decode_ops,
+                        model=model,
+                        dataset=test_other_data,
+                        train_data_size=params['train_data_size'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  WER (other): %f %%' %
+                          (wer_test_other_epoch * 100))
+                else:
+                    trainer.not_improved_epoch += 1
+
+            duration_eval = time.time() - start_time_eval
+            print('Evaluation time: %.3f min' % (duration_eval / 60))
+
+            # Early stopping
+            if trainer.not_improved_epoch == params['not_improved_patient_epoch']:
+                return True
+
+            # Update learning rate
+            trainer.learning_rate = lr_controller.decay_lr(
+                learning_rate=trainer.learning_rate,
+                epoch=trainer.epoch,
+                value=metric_epoch)
+            return False
+
         # Create a session for running operation on the graph
-        # NOTE: Start running operations on the Graph. allow_soft_placement
-        # must be set to True to build towers on GPU, as some of the ops do not
-        # have GPU implementations.
-        with tf.Session(config=tf.ConfigProto(allow_soft_placement=True,
-                                              log_device_placement=False)) as sess:
+        # NOTE: Start running operations on the Graph. Each tower on CPU
+        # devices runs concurrently with its own share of threads.
+        with tf.Session(config=get_session_config(
+                num_towers, device_type,
+                intra_op_threads=params.get('intra_op_threads', 0),
+                inter_op_threads=params.get('inter_op_threads', 0))) as sess:
 
             # Instantiate a SummaryWriter to output summaries and the graph
             summary_writer = tf.summary.FileWriter(
@@ -190,258 +440,21 @@ def do_train(model, params, gpu_indices):
             # Initialize parameters
             sess.run(init_op)
 
+            # Resume training from the latest checkpoint
+            checkpoint_path = trainer.restore(sess)
+            if checkpoint_path is not None:
+                print("Model restored: %s (step %d)" %
+                      (checkpoint_path, trainer.step))
+            elif params.get('init_checkpoint', None) is not None:
+                init_saver.restore(sess, params['init_checkpoint'])
+                print("Model initialized: %s" % params['init_checkpoint'])
+
             # Train model
-            start_time_train = time.time()
-            start_time_epoch = time.time()
-            start_time_step = time.time()
-            ler_dev_best = 1
-            not_improved_epoch = 0
-            learning_rate = float(params['learning_rate'])
-            for step, (data, is_new_epoch) in enumerate(train_data):
-
-                # Create feed dictionary for next mini batch (train)
-                inputs, labels, inputs_seq_len, _ = data
-                feed_dict_train = {}
-                for i_gpu in range(len(gpu_indices)):
-                    feed_dict_train[model.inputs_pl_list[i_gpu]
-                                    ] = inputs[i_gpu]
-                    feed_dict_train[model.labels_pl_list[i_gpu]] = list2sparsetensor(
-                        labels[i_gpu], padded_value=train_data.padded_value)
-                    feed_dict_train[model.inputs_seq_len_pl_list[i_gpu]
-                                    ] = inputs_seq_len[i_gpu]
-                    feed_dict_train[model.keep_prob_pl_list[i_gpu]
-                                    ] = 1 - float(params['dropout'])
-                feed_dict_train[learning_rate_pl] = learning_rate
-
-                # Update parameters
-                sess.run(train_op, feed_dict=feed_dict_train)
-
-                if (step + 1) % int(params['print_step'] / len(gpu_indices)) == 0:
-
-                    # Create feed dictionary for next mini batch (dev)
-                    if params['train_data_size'] in ['train100h', 'train460h']:
-                        inputs, labels, inputs_seq_len, _ = dev_clean_data.next()[
-                            0]
-                    else:
-                        inputs, labels, inputs_seq_len, _ = dev_other_data.next()[
-                            0]
-                    feed_dict_dev = {}
-                    for i_gpu in range(len(gpu_indices)):
-                        feed_dict_dev[model.inputs_pl_list[i_gpu]
-                                      ] = inputs[i_gpu]
-                        feed_dict_dev[model.labels_pl_list[i_gpu]] = list2sparsetensor(
-                            labels[i_gpu], padded_value=dev_clean_data.padded_value)
-                        feed_dict_dev[model.inputs_seq_len_pl_list[i_gpu]
-                                      ] = inputs_seq_len[i_gpu]
-                        feed_dict_dev[model.keep_prob_pl_list[i_gpu]] = 1.0
-
-                    # Compute loss
-                    loss_train = sess.run(loss_op, feed_dict=feed_dict_train)
-                    loss_dev = sess.run(loss_op, feed_dict=feed_dict_dev)
-                    csv_steps.append(step)
-                    csv_loss_train.append(loss_train)
-                    csv_loss_dev.append(loss_dev)
-
-                    # Change to evaluation mode
-                    for i_gpu in range(len(gpu_indices)):
-                        feed_dict_train[model.keep_prob_pl_list[i_gpu]] = 1.0
-
-                    # Compute accuracy & update event files
-                    ler_train, summary_str_train = sess.run(
-                        [ler_op, summary_train], feed_dict=feed_dict_train)
-                    ler_dev, summary_str_dev = sess.run(
-                        [ler_op, summary_dev], feed_dict=feed_dict_dev)
-                    csv_ler_train.append(ler_train)
-                    csv_ler_dev.append(ler_dev)
-                    summary_writer.add_summary(summary_str_train, step + 1)
-                    summary_writer.add_summary(summary_str_dev, step + 1)
-                    summary_writer.flush()
-
-                    duration_step = time.time() - start_time_step
-                    print("Step %d (epoch: %.3f): loss = %.3f (%.3f) / ler = %.3f (%.3f) / lr = %.5f (%.3f min)" %
-                          (step + 1, train_data.epoch_detail, loss_train, loss_dev, ler_train, ler_dev,
-                           learning_rate, duration_step / 60))
-                    sys.stdout.flush()
-                    start_time_step = time.time()
-
-                # Save checkpoint and evaluate model per epoch
-                if is_new_epoch:
-                    duration_epoch = time.time() - start_time_epoch
-                    print('-----EPOCH:%d (%.3f min)-----' %
-                          (train_data.epoch, duration_epoch / 60))
-
-                    # Save fugure of loss & ler
-                    plot_loss(csv_loss_train, csv_loss_dev, csv_steps,
-                              save_path=model.save_path)
-                    plot_ler(csv_ler_train, csv_ler_dev, csv_steps,
-                             label_type=params['label_type'],
-                             save_path=model.save_path)
-
-                    if train_data.epoch >= params['eval_start_epoch']:
-                        start_time_eval = time.time()
-                        if 'char' in params['label_type']:
-                            print('=== Dev Data Evaluation ===')
-                            # dev-clean
-                            cer_dev_clean_epoch, wer_dev_clean_epoch = do_eval_cer(
-                                session=sess,
-                                decode_ops=decode_ops,
-                                model=model,
-                                dataset=dev_clean_data,
-                                label_type=params['label_type'],
-                                eval_batch_size=1)
-                            print('  CER (clean): %f %%' %
-                                  (cer_dev_clean_epoch * 100))
-                            print('  WER (clean): %f %%' %
-                                  (wer_dev_clean_epoch * 100))
-
-                            # dev-other
-                            cer_dev_other_epoch, wer_dev_other_epoch = do_eval_cer(
-                                session=sess,
-                                decode_ops=decode_ops,
-                                model=model,
-                                dataset=dev_other_data,
-                                label_type=params['label_type'],
-                                eval_batch_size=1)
-                            print('  CER (other): %f %%' %
-                                  (cer_dev_other_epoch * 100))
-                            print('  WER (other): %f %%' %
-                                  (wer_dev_other_epoch * 100))
-
-                            if params['train_data_size'] in ['train100h', 'train460h']:
-                                metric_epoch = cer_dev_clean_epoch
-                            else:
-                                metric_epoch = cer_dev_other_epoch
-
-                            if metric_epoch < ler_dev_best:
-                                ler_dev_best = metric_epoch
-                                not_improved_epoch = 0
-                                print('■■■ ↑Best Score (CER)↑ ■■■')
-
-                                # Save model (check point)
-                                checkpoint_file = join(
-                                    model.save_path, 'model.ckpt')
-                                save_path = saver.save(
-                                    sess, checkpoint_file, global_step=train_data.epoch)
-                                print("Model saved in file: %s" % save_path)
-
-                                print('=== Test Data Evaluation ===')
-                                # test-clean
-                                cer_test_clean_epoch, wer_test_clean_epoch = do_eval_cer(
-                                    session=sess,
-                                    decode_ops=decode_ops,
-                                    model=model,
-                                    dataset=test_clean_data,
-                                    label_type=params['label_type'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  CER (clean): %f %%' %
-                                      (cer_test_clean_epoch * 100))
-                                print('  WER (clean): %f %%' %
-                                      (wer_test_clean_epoch * 100))
-
-                                # test-other
-                                cer_test_other_epoch, wer_test_other_epoch = do_eval_cer(
-                                    session=sess,
-                                    decode_ops=decode_ops,
-                                    model=model,
-                                    dataset=test_other_data,
-                                    label_type=params['label_type'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  CER (other): %f %%' %
-                                      (cer_test_other_epoch * 100))
-                                print('  WER (other): %f %%' %
-                                      (wer_test_other_epoch * 100))
-                            else:
-                                not_improved_epoch += 1
-
-                        else:
-                            print('=== Dev Data Evaluation ===')
-                            # dev-clean
-                            wer_dev_clean_epoch = do_eval_wer(
-                                session=sess,
-                                decode_ops=decode_ops,
-                                model=model,
-                                dataset=dev_clean_data,
-                                train_data_size=params['train_data_size'],
-                                eval_batch_size=1)
-                            print('  WER (clean): %f %%' %
-                                  (wer_dev_clean_epoch * 100))
-
-                            # dev-other
-                            wer_dev_other_epoch = do_eval_wer(
-                                session=sess,
-                                decode_ops=decode_ops,
-                                model=model,
-                                dataset=dev_other_data,
-                                train_data_size=params['train_data_size'],
-                                eval_batch_size=1)
-                            print('  WER (other): %f %%' %
-                                  (wer_dev_other_epoch * 100))
-
-                            if params['train_data_size'] in ['train100h', 'train460h']:
-                                metric_epoch = wer_dev_clean_epoch
-                            else:
-                                metric_epoch = wer_dev_other_epoch
-
-                            if metric_epoch < ler_dev_best:
-                                ler_dev_best = metric_epoch
-                                not_improved_epoch = 0
-                                print('■■■ ↑Best Score (WER)↑ ■■■')
-
-                                # Save model (check point)
-                                checkpoint_file = join(
-                                    model.save_path, 'model.ckpt')
-                                save_path = saver.save(
-                                    sess, checkpoint_file, global_step=train_data.epoch)
-                                print("Model saved in file: %s" % save_path)
-
-                                print('=== Test Data Evaluation ===')
-                                # test-clean
-                                cer_test_clean_epoch = do_eval_wer(
-                                    session=sess,
-                                    decode_ops=decode_ops,
-                                    model=model,
-                                    dataset=test_clean_data,
-                                    train_data_size=params['train_data_size'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  WER (clean): %f %%' %
-                                      (cer_test_clean_epoch * 100))
-
-                                # test-other
-                                ler_test_other_epoch = do_eval_wer(
-                                    session=sess,
-                                    decode_ops=decode_ops,
-                                    model=model,
-                                    dataset=test_other_data,
-                                    train_data_size=params['train_data_size'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  WER (other): %f %%' %
-                                      (ler_test_other_epoch * 100))
-                            else:
-                                not_improved_epoch += 1
-
-                        duration_eval = time.time() - start_time_eval
-                        print('Evaluation time: %.3f min' %
-                              (duration_eval / 60))
-
-                        # Early stopping
-                        if not_improved_epoch == params['not_improved_patient_epoch']:
-                            break
-
-                        # Update learning rate
-                        learning_rate = lr_controller.decay_lr(
-                            learning_rate=learning_rate,
-                            epoch=train_data.epoch,
-                            value=metric_epoch)
-
-                    start_time_step = time.time()
-                    start_time_epoch = time.time()
-
-            duration_train = time.time() - start_time_train
-            print('Total time: %.3f hour' % (duration_train / 3600))
+            trainer.run(sess, summary_writer, epoch_end_fn=evaluate)
+
+            # Wait for checkpoints to be written
+            checkpoint_manager.close()
+            resume_manager.close()
 
             # Training was finished correctly
             with open(join(model.save_path, 'complete.txt'), 'w') as f:
@@ -489,7 +502,11 @@ def main(config_path, model_save_path, gpu_indices):
                 clip_grad_norm=params['clip_grad_norm'],
                 clip_activation=params['clip_activation'],
                 num_proj=params['num_proj'],
-                weight_decay=params['weight_decay'])
+                weight_decay=params['weight_decay'],
+                subsample_list=params.get('subsample_list', None),
+                subsample_type=params.get('subsample_type', 'concat'),
+                chunk_size=params.get('chunk_size', None),
+                right_context=params.get('right_context', 0))
 
     # Set process name
     setproctitle(
@@ -509,7 +526,18 @@ def main(config_path, model_save_path, gpu_indices):
         model.name += '_wd' + str(params['weight_decay'])
     if params['bottleneck_dim'] != 0:
         model.name += '_bottle' + str(params['bottleneck_dim'])
-    if len(gpu_indices) >= 2:
+    if params.get('subsample_list', None) is not None:
+        model.name += '_' + params.get('subsample_type', 'concat')
+        model.name += ''.join(str(factor)
+                              for factor in params['subsample_list'])
+    if params['encoder_type'] == 'lc_blstm':
+        model.name += '_chunk' + str(params['chunk_size'])
+        model.name += '_right' + str(params.get('right_context', 0))
+    if params.get('pruning', None) is not None:
+        model.name += '_pruned' + str(params['pruning']['target_sparsity'])
+    if params.get('tower_device', 'gpu') == 'cpu':
+        model.name += '_cpu' + str(params['num_towers'])
+    elif len(gpu_indices) >= 2:
         model.name += '_gpu' + str(len(gpu_indices))
 
     # Set save path
@@ -519,6 +547,7 @@ def main(config_path, model_save_path, gpu_indices):
 
     # Reset model directory
     model_index = 0
+    is_resumed = False
     new_model_path = model.save_path
     while True:
         if isfile(join(new_model_path, 'complete.txt')):
@@ -527,6 +556,10 @@ def main(config_path, model_save_path, gpu_indices):
             new_model_path = model.save_path + '_' + str(model_index)
         elif isfile(join(new_model_path, 'config.yml')):
             # Training of the first model have not been finished yet
+            if params.get('resume', False):
+                # Resume training from the latest checkpoint
+                is_resumed = True
+                break
             model_index += 1
             new_model_path = model.save_path + '_' + str(model_index)
         else:
@@ -534,9 +567,11 @@ def main(config_path, model_save_path, gpu_indices):
     model.save_path = mkdir(new_model_path)
 
     # Save config file
-    shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
+    if not is_resumed:
+        shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
 
-    sys.stdout = open(join(model.save_path, 'train.log'), 'w')
+    sys.stdout = open(join(model.save_path, 'train.log'),
+                      'a' if is_resumed else 'w')
     # TODO(hirofumi): change to logger
     do_train(model=model, params=params, gpu_indices=gpu_indices)
 
@@ -547,4 +582,4 @@ if __name__ == '__main__':
     if len(args) != 3 and len(args) != 4:
         raise ValueError
     main(config_path=args[1], model_save_path=args[2],
-         gpu_indices=list(map(int, args[3].split(','))))
+         gpu_indices=list(map(int, args[3].split(','))) if len(args) == 4 else [])
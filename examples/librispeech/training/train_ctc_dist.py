@@ -0,0 +1,447 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Train the CTC model with between-graph replication (Librispeech corpus).
+   Each worker builds its own graph whose variables are placed on parameter
+   servers, and reads its own shard of the training data.
+   ex.)
+       python train_ctc_dist.py config.yml save_path --job_name ps \
+           --task_index 0 --ps_hosts localhost:2222 \
+           --worker_hosts localhost:2223,localhost:2224
+       python train_ctc_dist.py config.yml save_path --job_name worker \
+           --task_index 0 --ps_hosts localhost:2222 \
+           --worker_hosts localhost:2223,localhost:2224
+       ...
+   See launch_ctc_dist.py to run all processes on the local machine.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, abspath
+import sys
+import time
+import argparse
+import tensorflow as tf
+from setproctitle import setproctitle
+import yaml
+import shutil
+
+sys.path.append(abspath('../../../'))
+from experiments.librispeech.data.load_dataset_ctc import Dataset
+from experiments.librispeech.metrics.ctc import do_eval_cer, do_eval_wer
+from utils.training.learning_rate_controller import Controller
+from utils.training.trainer import Trainer
+from utils.training.checkpoint import CheckpointManager
+from utils.training.distributed import create_cluster, get_server_config, \
+    StopAtSharedStepHook, WorkerBarrierHook
+from utils.directory import mkdir_join
+from utils.parameter import count_total_parameters
+from models.ctc.ctc import CTC
+
+parser = argparse.ArgumentParser()
+parser.add_argument('config_path', type=str,
+                    help='path to the config file')
+parser.add_argument('model_save_path', type=str,
+                    help='path to save the model')
+parser.add_argument('--job_name', type=str, choices=['ps', 'worker'],
+                    help='ps or worker')
+parser.add_argument('--task_index', type=int, default=0,
+                    help='the index of the task in the job')
+parser.add_argument('--ps_hosts', type=str,
+                    help='comma-separated list of hostname:port')
+parser.add_argument('--worker_hosts', type=str,
+                    help='comma-separated list of hostname:port')
+parser.add_argument('--sync', action='store_true',
+                    help='if True, aggregate gradients of all workers before '
+                    'updating parameters. Otherwise, each worker updates '
+                    'parameters asynchronously.')
+parser.add_argument('--max_steps', type=int, default=0,
+                    help='the number of steps of each worker (0: no limit)')
+
+
+def do_train(model, params, server, num_workers, task_index, sync):
+    """Run CTC training on a worker.
+    Args:
+        model: the model to train
+        params (dict): A dictionary of parameters
+        server: A `tf.train.Server`
+        num_workers (int): the number of workers
+        task_index (int): the index of the worker
+        sync (bool): if True, update parameters synchronously
+    """
+    is_chief = task_index == 0
+
+    if params.get('accumulate_steps', 1) > 1:
+        raise ValueError(
+            'accumulate_steps is not supported in distributed training.')
+
+    # Load dataset
+    # NOTE: each worker reads its own shard of the training data
+    train_data = Dataset(
+        data_type='train', train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=params['batch_size'], max_epoch=params['num_epoch'],
+        splice=params['splice'],
+        num_stack=params['num_stack'], num_skip=params['num_skip'],
+        sort_utt=True, sort_stop_epoch=params['sort_stop_epoch'],
+        seed=params.get('seed', None))
+    train_data.shard(num_workers, task_index)
+    if params['train_data_size'] in ['train100h', 'train460h']:
+        dev_data_type = 'dev_clean'
+    else:
+        dev_data_type = 'dev_other'
+    dev_data = Dataset(
+        data_type=dev_data_type, train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=params['batch_size'], splice=params['splice'],
+        num_stack=params['num_stack'], num_skip=params['num_skip'],
+        shuffle=True)
+
+    # Tell TensorFlow that the model will be built into the default graph
+    # NOTE: variables are placed on parameter servers, and the other
+    # operations on the worker
+    with tf.Graph().as_default(), tf.device(tf.train.replica_device_setter(
+            worker_device='/job:worker/task:%d' % task_index,
+            cluster=server.server_def.cluster)):
+
+        # Create a variable to track the global step
+        global_step = tf.Variable(0, name='global_step', trainable=False)
+
+        # NOTE: the learning rate is shared by all workers, and decayed by
+        # the chief
+        learning_rate_pl = tf.placeholder(tf.float32, name='learning_rate')
+        learning_rate_var = tf.Variable(params['learning_rate'],
+                                        name='learning_rate_var',
+                                        trainable=False)
+        update_lr_op = tf.assign(learning_rate_var, learning_rate_pl)
+
+        # Set optimizer
+        optimizer = model._set_optimizer(
+            params['optimizer'], learning_rate_var)
+        if sync:
+            # Aggregate gradients of all workers
+            optimizer = tf.train.SyncReplicasOptimizer(
+                optimizer,
+                replicas_to_aggregate=num_workers,
+                total_num_replicas=num_workers)
+
+        with tf.name_scope('tower_gpu0') as scope:
+            # Define placeholders
+            model.create_placeholders()
+
+            loss_op, logits = model.compute_loss(
+                model.inputs_pl_list[0],
+                model.labels_pl_list[0],
+                model.inputs_seq_len_pl_list[0],
+                model.keep_prob_pl_list[0],
+                scope)
+
+            grads_and_vars = optimizer.compute_gradients(loss_op)
+            grads_and_vars = model._clip_gradients(grads_and_vars)
+            train_op = optimizer.apply_gradients(grads_and_vars,
+                                                 global_step=global_step)
+
+            decode_op = model.decoder(logits,
+                                      model.inputs_seq_len_pl_list[0],
+                                      beam_width=params['beam_width'])
+            decode_ops = [decode_op]
+
+            # NOTE: LER for monitoring is computed by greedy decoding by
+            # default
+            monitor_beam_width = params.get('monitor_beam_width', 1)
+            if monitor_beam_width != params['beam_width']:
+                decode_op = model.decoder(logits,
+                                          model.inputs_seq_len_pl_list[0],
+                                          beam_width=monitor_beam_width)
+            ler_op = model.compute_ler(decode_op, model.labels_pl_list[0])
+
+        hooks = []
+        if sync:
+            hooks.append(optimizer.make_session_run_hook(is_chief))
+
+        # Define learning rate controller
+        lr_controller = Controller(
+            learning_rate_init=params['learning_rate'],
+            decay_start_epoch=params['decay_start_epoch'],
+            decay_rate=params['decay_rate'],
+            decay_patient_epoch=params['decay_patient_epoch'],
+            lower_better=True)
+
+        # Build the summary tensor based on the TensorFlow collection of
+        # summaries
+        summary_train = tf.summary.merge(model.summaries_train)
+        summary_dev = tf.summary.merge(model.summaries_dev)
+
+        # Create a checkpoint manager for writing training checkpoints
+        checkpoint_manager = None
+        if is_chief:
+            checkpoint_manager = CheckpointManager(
+                save_path=model.save_path,
+                keep_best=params.get('keep_best_checkpoints', 3),
+                keep_last=params.get('keep_last_checkpoints', 1),
+                lower_better=True)
+
+            # Count total parameters
+            parameters_dict, total_parameters = count_total_parameters(
+                tf.trainable_variables())
+            for parameter_name in sorted(parameters_dict.keys()):
+                print("%s %d" %
+                      (parameter_name, parameters_dict[parameter_name]))
+            print("Total %d variables, %s M parameters" %
+                  (len(parameters_dict.keys()),
+                   "{:,}".format(total_parameters / 1000000)))
+
+        # NOTE: the decision of early stopping is shared by all workers via
+        # a variable on parameter servers, so that all workers stop after the
+        # same update. These variables are created after the checkpoint
+        # manager, so that they are not saved.
+        stop_step = tf.Variable(0, name='stop_step', trainable=False,
+                                dtype=global_step.dtype)
+        set_stop_step_op = tf.assign(stop_step, global_step + 1)
+        hooks.append(StopAtSharedStepHook(global_step, stop_step))
+
+        # The number of workers which finished training
+        # NOTE: the chief waits for the other workers to stop when the
+        # session is closed, because they cannot finish the last update
+        # without the chief
+        num_finished_workers = tf.Variable(0, name='num_finished_workers',
+                                           trainable=False)
+        hooks.append(WorkerBarrierHook(
+            num_finished_workers, num_workers, is_chief))
+
+        trainer = Trainer(model=model,
+                          params=params,
+                          train_data=train_data,
+                          dev_data=dev_data,
+                          train_op=train_op,
+                          loss_op=loss_op,
+                          ler_op=ler_op,
+                          learning_rate_pl=learning_rate_pl,
+                          summary_train=summary_train,
+                          summary_dev=summary_dev,
+                          lr_controller=lr_controller,
+                          log_path=join(model.save_path,
+                                        'metrics_worker%d.jsonl' % task_index))
+
+        def evaluate(sess, trainer):
+            """Evaluate the model per epoch and save checkpoints (chief).
+            Args:
+                sess: session
+                trainer: An instance of `Trainer`
+            Returns:
+                stop (bool): If True, training is stopped
+            """
+            if not is_chief:
+                # Follow the learning rate decayed by the chief
+                trainer.learning_rate = float(sess.run(learning_rate_var))
+                return False
+
+            if trainer.epoch < params['eval_start_epoch']:
+                return False
+
+            start_time_eval = time.time()
+            print('=== Dev Data Evaluation ===')
+            if 'char' in params['label_type']:
+                metric_epoch, wer_dev_epoch = do_eval_cer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_data,
+                    label_type=params['label_type'],
+                    eval_batch_size=1)
+                print('  CER: %f %%' % (metric_epoch * 100))
+                print('  WER: %f %%' % (wer_dev_epoch * 100))
+            else:
+                metric_epoch = do_eval_wer(
+                    session=sess,
+                    decode_ops=decode_ops,
+                    model=model,
+                    dataset=dev_data,
+                    train_data_size=params['train_data_size'],
+                    eval_batch_size=1)
+                print('  WER: %f %%' % (metric_epoch * 100))
+
+            # Save model (check point)
+            save_path = checkpoint_manager.save(
+                sess, global_step=trainer.epoch, metric=metric_epoch)
+            print("Model saved in file: %s" % save_path)
+
+            if metric_epoch < trainer.ler_dev_best:
+                trainer.ler_dev_best = metric_epoch
+                trainer.not_improved_epoch = 0
+                print('■■■ ↑Best Score↑ ■■■')
+            else:
+                trainer.not_improved_epoch += 1
+
+            duration_eval = time.time() - start_time_eval
+            print('Evaluation time: %.3f min' % (duration_eval / 60))
+
+            # Early stopping
+            # NOTE: all workers stop after the next update. The chief
+            # continues until then, because the other workers are waiting
+            # for its gradients in synchronous training.
+            if trainer.not_improved_epoch == params['not_improved_patient_epoch']:
+                sess.run(set_stop_step_op)
+                return False
+
+            # Update learning rate
+            trainer.learning_rate = lr_controller.decay_lr(
+                learning_rate=trainer.learning_rate,
+                epoch=trainer.epoch,
+                value=metric_epoch)
+            sess.run(update_lr_op,
+                     feed_dict={learning_rate_pl: trainer.learning_rate})
+            return False
+
+        # NOTE: the chief initializes variables, and the other workers wait
+        # for the initialization
+        with tf.train.MonitoredTrainingSession(
+                master=server.target,
+                is_chief=is_chief,
+                hooks=hooks,
+                config=get_server_config('worker', task_index),
+                save_checkpoint_secs=None,
+                save_summaries_steps=None,
+                save_summaries_secs=None,
+                log_step_count_steps=0) as sess:
+
+            # Instantiate a SummaryWriter to output summaries and the graph
+            # NOTE: only the chief writes event files
+            summary_writer = None
+            if is_chief:
+                summary_writer = tf.summary.FileWriter(
+                    model.save_path, sess.graph)
+
+            # Train model
+            trainer.run(sess, summary_writer, epoch_end_fn=evaluate)
+
+        if is_chief:
+            # Wait for checkpoints to be written
+            checkpoint_manager.close()
+
+            # Training was finished correctly
+            with open(join(model.save_path, 'complete.txt'), 'w') as f:
+                f.write('')
+
+
+def main(config_path, model_save_path, job_name, task_index, ps_hosts,
+         worker_hosts, sync, max_steps):
+
+    cluster = create_cluster(ps_hosts, worker_hosts)
+    server = tf.train.Server(cluster, job_name=job_name,
+                             task_index=task_index,
+                             config=get_server_config(job_name, task_index))
+    if job_name == 'ps':
+        server.join()
+        return
+
+    # Load a config file (.yml)
+    with open(config_path, "r") as f:
+        config = yaml.load(f)
+        params = config['param']
+    if max_steps > 0:
+        params['max_steps'] = max_steps
+
+    # Except for a blank class
+    if params['label_type'] == 'character':
+        params['num_classes'] = 28
+    elif params['label_type'] == 'character_capital_divide':
+        if params['train_data_size'] == 'train100h':
+            params['num_classes'] = 72
+        elif params['train_data_size'] == 'train460h':
+            params['num_classes'] = 77
+        elif params['train_data_size'] == 'train960h':
+            params['num_classes'] = 77
+    elif params['label_type'] == 'word_freq10':
+        if params['train_data_size'] == 'train100h':
+            params['num_classes'] = 7213
+        elif params['train_data_size'] == 'train460h':
+            params['num_classes'] = 18641
+        elif params['train_data_size'] == 'train960h':
+            params['num_classes'] = 26642
+    else:
+        raise TypeError
+
+    # Model setting
+    model = CTC(encoder_type=params['encoder_type'],
+                input_size=params['input_size'],
+                splice=params['splice'],
+                num_stack=params['num_stack'],
+                num_units=params['num_units'],
+                num_layers=params['num_layers'],
+                num_classes=params['num_classes'],
+                lstm_impl=params['lstm_impl'],
+                use_peephole=params['use_peephole'],
+                parameter_init=params['weight_init'],
+                clip_grad_norm=params['clip_grad_norm'],
+                clip_activation=params['clip_activation'],
+                num_proj=params['num_proj'],
+                weight_decay=params['weight_decay'],
+                subsample_list=params.get('subsample_list', None),
+                subsample_type=params.get('subsample_type', 'concat'),
+                chunk_size=params.get('chunk_size', None),
+                right_context=params.get('right_context', 0))
+
+    # Set process name
+    setproctitle(
+        'tf_libri_' + model.name + '_' + params['train_data_size'] + '_' +
+        params['label_type'] + '_worker' + str(task_index))
+
+    model.name += '_' + str(params['num_units'])
+    model.name += '_' + str(params['num_layers'])
+    model.name += '_' + params['optimizer']
+    model.name += '_lr' + str(params['learning_rate'])
+    if params['num_proj'] != 0:
+        model.name += '_proj' + str(params['num_proj'])
+    if params['dropout'] != 0:
+        model.name += '_drop' + str(params['dropout'])
+    if params['num_stack'] != 1:
+        model.name += '_stack' + str(params['num_stack'])
+    if params['weight_decay'] != 0:
+        model.name += '_wd' + str(params['weight_decay'])
+    if params['bottleneck_dim'] != 0:
+        model.name += '_bottle' + str(params['bottleneck_dim'])
+    if params.get('subsample_list', None) is not None:
+        model.name += '_' + params.get('subsample_type', 'concat')
+        model.name += ''.join(str(factor)
+                              for factor in params['subsample_list'])
+    if params['encoder_type'] == 'lc_blstm':
+        model.name += '_chunk' + str(params['chunk_size'])
+        model.name += '_right' + str(params.get('right_context', 0))
+    model.name += '_' + ('sync' if sync else 'async') + \
+        str(len(worker_hosts))
+
+    # Set save path
+    # NOTE: all workers must share the same directory, so that the directory
+    # is not renamed even if it exists
+    model.save_path = mkdir_join(
+        model_save_path, 'ctc', params['label_type'],
+        params['train_data_size'], model.name)
+
+    # Save config file
+    if task_index == 0:
+        shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
+
+    sys.stdout = open(join(model.save_path,
+                           'train_worker%d.log' % task_index), 'w')
+    # NOTE: resuming is not supported, so that the metrics log is cleared
+    open(join(model.save_path, 'metrics_worker%d.jsonl' % task_index),
+         'w').close()
+    # TODO(hirofumi): change to logger
+    do_train(model=model, params=params, server=server,
+             num_workers=len(worker_hosts), task_index=task_index, sync=sync)
+
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+    main(config_path=args.config_path,
+         model_save_path=args.model_save_path,
+         job_name=args.job_name,
+         task_index=args.task_index,
+         ps_hosts=args.ps_hosts.split(','),
+         worker_hosts=args.worker_hosts.split(','),
+         sync=args.sync,
+         max_steps=args.max_steps)
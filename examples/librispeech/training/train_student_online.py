@@ -0,0 +1,432 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Train the student model by online distillation with multiple GPUs
+   (Librispeech corpus). Outputs of the teacher are computed for each
+   mini-batch by the frozen graph exported by
+   `evaluation/export_ctc.py`, instead of being dumped by `save_ctc_prob.py`
+   beforehand.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join, isfile, abspath
+import sys
+import time
+import tensorflow as tf
+from setproctitle import setproctitle
+import yaml
+import shutil
+
+sys.path.append(abspath('../../../'))
+from experiments.librispeech.data.load_dataset_ctc import Dataset
+from utils.training.learning_rate_controller import Controller
+from utils.training.trainer import Trainer
+from utils.training.checkpoint import CheckpointManager
+from utils.training.multi_gpu import average_gradients, average_losses
+from utils.frozen_graph import load_frozen_graph, import_frozen_graph
+from utils.directory import mkdir_join, mkdir
+from utils.parameter import count_total_parameters
+from models.ctc.student_ctc import StudentCTC
+
+XE_ENCODERS = ['student_cnn_xe', 'student_cnn_compact_xe']
+
+
+def do_train(model, params, gpu_indices):
+    """Run online distillation.
+    Args:
+        model: the model to train
+        params (dict): A dictionary of parameters
+        gpu_indices (list): GPU indices
+    """
+    # Load the teacher
+    teacher_graph_def, teacher_metadata = load_frozen_graph(
+        join(params['teacher_model_path'], 'frozen'))
+    for key in ['splice', 'num_stack', 'num_skip']:
+        if teacher_metadata[key] != params[key]:
+            raise ValueError('%s must be the same as the teacher (%d).' %
+                             (key, teacher_metadata[key]))
+
+    # Load dataset
+    train_data = Dataset(
+        data_type='train', train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=params['batch_size'], max_epoch=params['num_epoch'],
+        splice=params['splice'],
+        num_stack=params['num_stack'], num_skip=params['num_skip'],
+        sort_utt=True, sort_stop_epoch=params['sort_stop_epoch'],
+        seed=params.get('seed', None),
+        num_gpu=len(gpu_indices))
+    dev_clean_data = Dataset(
+        data_type='dev_clean', train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=params['batch_size'], splice=params['splice'],
+        num_stack=params['num_stack'], num_skip=params['num_skip'],
+        shuffle=True, num_gpu=len(gpu_indices))
+    dev_other_data = Dataset(
+        data_type='dev_other', train_data_size=params['train_data_size'],
+        label_type=params['label_type'],
+        batch_size=params['batch_size'], splice=params['splice'],
+        num_stack=params['num_stack'], num_skip=params['num_skip'],
+        shuffle=True, num_gpu=len(gpu_indices))
+
+    # Tell TensorFlow that the model will be built into the default graph
+    with tf.Graph().as_default(), tf.device('/cpu:0'):
+
+        # Create a variable to track the global step
+        global_step = tf.Variable(0, name='global_step', trainable=False)
+
+        # Set optimizer
+        learning_rate_pl = tf.placeholder(tf.float32, name='learning_rate')
+        optimizer = model._set_optimizer(
+            params['optimizer'], learning_rate_pl)
+
+        # Calculate the gradients for each model tower
+        total_grads_and_vars, total_losses = [], []
+        all_devices = ['/gpu:%d' % i_gpu for i_gpu in range(len(gpu_indices))]
+        # NOTE: /cpu:0 is prepared for evaluation
+        with tf.variable_scope(tf.get_variable_scope()):
+            for i_gpu in range(len(all_devices)):
+                with tf.device(all_devices[i_gpu]):
+                    with tf.name_scope('tower_gpu%d' % i_gpu) as scope:
+
+                        # Define placeholders in each tower
+                        # NOTE: the student and the teacher share utterances
+                        model.inputs_pl_list.append(tf.placeholder(
+                            tf.float32,
+                            shape=[None, None, params['input_size'] *
+                                   params['num_stack'] * params['splice']],
+                            name='input'))
+                        model.inputs_seq_len_pl_list.append(tf.placeholder(
+                            tf.int32, shape=[None], name='inputs_seq_len'))
+                        model.keep_prob_pl_list.append(
+                            tf.placeholder(tf.float32, name='keep_prob'))
+
+                        # Compute outputs of the teacher
+                        teacher_outputs = import_frozen_graph(
+                            teacher_graph_def, teacher_metadata,
+                            inputs={'inputs': model.inputs_pl_list[i_gpu],
+                                    'inputs_seq_len': model.inputs_seq_len_pl_list[i_gpu]},
+                            name='teacher')
+
+                        # Soft targets must be aligned with input frames
+                        check_ops = []
+                        if params['encoder_type'] in XE_ENCODERS:
+                            check_ops.append(tf.assert_equal(
+                                teacher_outputs['outputs_seq_len'],
+                                model.inputs_seq_len_pl_list[i_gpu],
+                                message='The teacher subsamples frames.'))
+
+                        # Calculate the total loss for the current tower of the
+                        # model. This function constructs the entire model but
+                        # shares the variables across all towers.
+                        with tf.control_dependencies(check_ops):
+                            tower_loss, tower_logits = model.compute_distillation_loss(
+                                model.inputs_pl_list[i_gpu],
+                                model.inputs_seq_len_pl_list[i_gpu],
+                                teacher_outputs,
+                                model.keep_prob_pl_list[i_gpu],
+                                scope,
+                                teacher_temperature=params['teacher_temperature'],
+                                softmax_temperature=params['student_temperature'],
+                                num_frames=params.get('num_frames', None),
+                                is_training=True)
+                        tower_loss = tf.expand_dims(tower_loss, axis=0)
+                        total_losses.append(tower_loss)
+
+                        # Reuse variables for the next tower
+                        tf.get_variable_scope().reuse_variables()
+
+                        # Calculate the gradients for the batch of data on this
+                        # tower
+                        tower_grads_and_vars = optimizer.compute_gradients(
+                            tower_loss)
+
+                        # Gradient clipping
+                        tower_grads_and_vars = model._clip_gradients(
+                            tower_grads_and_vars)
+
+                        # Keep track of the gradients across all towers
+                        total_grads_and_vars.append(tower_grads_and_vars)
+
+        # Aggregate losses, then calculate average loss
+        # NOTE: towers are weighted by the number of utterances, which
+        # differs between towers
+        tower_weights = [tf.shape(seq_len)[0]
+                         for seq_len in model.inputs_seq_len_pl_list]
+        loss_op = average_losses(total_losses, tower_weights)
+
+        # We must calculate the mean of each gradient. Note that this is the
+        # synchronization point across all towers
+        average_grads_and_vars = average_gradients(total_grads_and_vars,
+                                                   weights=tower_weights)
+
+        # Apply the gradients to adjust the shared variables.
+        # NOTE: batch normalization statistics are updated in UPDATE_OPS
+        with tf.control_dependencies(tf.get_collection(tf.GraphKeys.UPDATE_OPS)):
+            train_op = optimizer.apply_gradients(average_grads_and_vars,
+                                                 global_step=global_step)
+
+        # Define learning rate controller
+        lr_controller = Controller(
+            learning_rate_init=params['learning_rate'],
+            decay_start_epoch=params['decay_start_epoch'],
+            decay_rate=params['decay_rate'],
+            decay_patient_epoch=params['decay_patient_epoch'],
+            lower_better=True)
+
+        # Build the summary tensor based on the TensorFlow collection of
+        # summaries
+        summary_train = tf.summary.merge(model.summaries_train)
+        summary_dev = tf.summary.merge(model.summaries_dev)
+
+        # Add the variable initializer operation
+        init_op = tf.global_variables_initializer()
+
+        # Create a checkpoint manager for writing training checkpoints
+        # NOTE: the teacher is not saved because it has no variables
+        checkpoint_manager = CheckpointManager(
+            save_path=model.save_path,
+            keep_best=params.get('keep_best_checkpoints', 3),
+            keep_last=params.get('keep_last_checkpoints', 1),
+            lower_better=True)
+        # NOTE: the latest checkpoint with the state of training is kept
+        # separately for resuming training
+        resume_manager = CheckpointManager(
+            save_path=mkdir_join(model.save_path, 'resume'),
+            keep_best=0,
+            keep_last=1)
+
+        # Count total parameters
+        parameters_dict, total_parameters = count_total_parameters(
+            tf.trainable_variables())
+        for parameter_name in sorted(parameters_dict.keys()):
+            print("%s %d" % (parameter_name, parameters_dict[parameter_name]))
+        print("Total %d variables, %s M parameters" %
+              (len(parameters_dict.keys()),
+               "{:,}".format(total_parameters / 1000000)))
+
+        if params['train_data_size'] in ['train100h', 'train460h']:
+            dev_data = dev_clean_data
+        else:
+            dev_data = dev_other_data
+        # NOTE: only the distillation loss is monitored because the student
+        # has no label placeholders
+        trainer = Trainer(model=model,
+                          params=params,
+                          train_data=train_data,
+                          dev_data=dev_data,
+                          train_op=train_op,
+                          loss_op=loss_op,
+                          ler_op=None,
+                          learning_rate_pl=learning_rate_pl,
+                          summary_train=summary_train,
+                          summary_dev=summary_dev,
+                          lr_controller=lr_controller,
+                          checkpoint_manager=resume_manager)
+        # The best loss on the dev set is tracked instead of LER
+        trainer.ler_dev_best = 10000
+
+        def evaluate(sess, trainer):
+            """Evaluate the distillation loss per epoch and save checkpoints.
+            Args:
+                sess: session
+                trainer: An instance of `Trainer`
+            Returns:
+                stop (bool): If True, training is stopped
+            """
+            if trainer.epoch < params['eval_start_epoch']:
+                return False
+
+            start_time_eval = time.time()
+            print('=== Dev Data Evaluation ===')
+            metric_epoch = do_eval_loss(
+                session=sess,
+                loss_op=loss_op,
+                model=model,
+                dataset=dev_data)
+            print('  LOSS (%s): %f' % (dev_data.data_type, metric_epoch))
+
+            # Save model (check point)
+            # NOTE: checkpoints are written in the background, and only the
+            # best and the latest ones are kept
+            save_path = checkpoint_manager.save(
+                sess, global_step=trainer.epoch, metric=metric_epoch)
+            print("Model saved in file: %s" % save_path)
+
+            if metric_epoch < trainer.ler_dev_best:
+                trainer.ler_dev_best = metric_epoch
+                trainer.not_improved_epoch = 0
+                print('■■■ ↑Best Score (LOSS)↑ ■■■')
+            else:
+                trainer.not_improved_epoch += 1
+
+            duration_eval = time.time() - start_time_eval
+            print('Evaluation time: %.3f min' % (duration_eval / 60))
+
+            # Early stopping
+            if trainer.not_improved_epoch == params['not_improved_patient_epoch']:
+                return True
+
+            # Update learning rate
+            trainer.learning_rate = lr_controller.decay_lr(
+                learning_rate=trainer.learning_rate,
+                epoch=trainer.epoch,
+                value=metric_epoch)
+            return False
+
+        # Create a session for running operation on the graph
+        # NOTE: Start running operations on the Graph. allow_soft_placement
+        # must be set to True to build towers on GPU, as some of the ops do not
+        # have GPU implementations.
+        with tf.Session(config=tf.ConfigProto(allow_soft_placement=True,
+                                              log_device_placement=False)) as sess:
+
+            # Instantiate a SummaryWriter to output summaries and the graph
+            summary_writer = tf.summary.FileWriter(
+                model.save_path, sess.graph)
+
+            # Initialize parameters
+            sess.run(init_op)
+
+            # Resume training from the latest checkpoint
+            checkpoint_path = trainer.restore(sess)
+            if checkpoint_path is not None:
+                print("Model restored: %s (step %d)" %
+                      (checkpoint_path, trainer.step))
+
+            # Train model
+            trainer.run(sess, summary_writer, epoch_end_fn=evaluate)
+
+            # Wait for checkpoints to be written
+            checkpoint_manager.close()
+            resume_manager.close()
+
+            # Training was finished correctly
+            with open(join(model.save_path, 'complete.txt'), 'w') as f:
+                f.write('')
+
+
+def do_eval_loss(session, loss_op, model, dataset):
+    """Evaluate the distillation loss.
+    Args:
+        session: session of training model
+        loss_op: operation for computing loss
+        model: the model to evaluate
+        dataset: An instance of a `Dataset` class
+    Returns:
+        loss_mean (float): An average of loss over mini-batches
+    """
+    # Reset data counter
+    dataset.reset()
+
+    loss_sum, num_batches = 0, 0
+    for data, is_new_epoch in dataset:
+
+        # Create feed dictionary for next mini batch
+        inputs, _, inputs_seq_len, _ = data
+
+        feed_dict = {}
+        for i_device in range(dataset.num_gpu):
+            feed_dict[model.inputs_pl_list[i_device]] = inputs[i_device]
+            feed_dict[model.inputs_seq_len_pl_list[i_device]
+                      ] = inputs_seq_len[i_device]
+            feed_dict[model.keep_prob_pl_list[i_device]] = 1.0
+
+        loss_sum += session.run(loss_op, feed_dict=feed_dict)
+        num_batches += 1
+
+        if is_new_epoch:
+            break
+
+    return loss_sum / num_batches
+
+
+def main(config_path, model_save_path, gpu_indices):
+
+    # Load a config file (.yml)
+    with open(config_path, "r") as f:
+        config = yaml.load(f)
+        params = config['param']
+
+    # Except for a blank class
+    params['num_classes'] = 28
+
+    # Model setting
+    # NOTE: frames are spliced in the CTC encoders
+    if params['encoder_type'] in XE_ENCODERS:
+        input_size = params['input_size'] * \
+            params['num_stack'] * params['splice']
+    else:
+        input_size = params['input_size'] * params['num_stack']
+    model = StudentCTC(
+        encoder_type=params['encoder_type'],
+        input_size=input_size,
+        splice=params['splice'],
+        num_stack=params['num_stack'],
+        num_classes=params['num_classes'],
+        parameter_init=params['weight_init'],
+        clip_grad_norm=params['clip_grad_norm'],
+        weight_decay=params['weight_decay'])
+
+    # Set process name
+    setproctitle(
+        'tf_libri_' + model.name + '_' + params['train_data_size'] + '_' + params['label_type'])
+
+    model.name += '_' + params['optimizer']
+    model.name += '_lr' + str(params['learning_rate'])
+    if params['dropout'] != 0:
+        model.name += '_drop' + str(params['dropout'])
+    if params['num_stack'] != 1:
+        model.name += '_stack' + str(params['num_stack'])
+    if params['weight_decay'] != 0:
+        model.name += '_wd' + str(params['weight_decay'])
+    model.name += '_online'
+    if len(gpu_indices) >= 2:
+        model.name += '_gpu' + str(len(gpu_indices))
+
+    # Set save path
+    model.save_path = mkdir_join(
+        model_save_path, 'student_ctc', params['label_type'],
+        params['train_data_size'], model.name)
+
+    # Reset model directory
+    model_index = 0
+    is_resumed = False
+    new_model_path = model.save_path
+    while True:
+        if isfile(join(new_model_path, 'complete.txt')):
+            # Training of the first model have been finished
+            model_index += 1
+            new_model_path = model.save_path + '_' + str(model_index)
+        elif isfile(join(new_model_path, 'config.yml')):
+            # Training of the first model have not been finished yet
+            if params.get('resume', False):
+                # Resume training from the latest checkpoint
+                is_resumed = True
+                break
+            model_index += 1
+            new_model_path = model.save_path + '_' + str(model_index)
+        else:
+            break
+    model.save_path = mkdir(new_model_path)
+
+    # Save config file
+    if not is_resumed:
+        shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
+
+    sys.stdout = open(join(model.save_path, 'train.log'),
+                      'a' if is_resumed else 'w')
+    # TODO(hirofumi): change to logger
+    do_train(model=model, params=params, gpu_indices=gpu_indices)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) != 3 and len(args) != 4:
+        raise ValueError
+    main(config_path=args[1], model_save_path=args[2],
+         gpu_indices=list(map(int, args[3].split(','))))
@@ -66,15 +66,12 @@ def do_decode(model, params, epoch, beam_width, eval_batch_size):
 
     with tf.name_scope('tower_gpu0'):
         # Define placeholders
-        model.create_placeholders()
+        model.create_placeholders_inference()
 
         # Add to the graph each operation (including model definition)
-        _, logits_word, logits_char = model.compute_loss(
+        logits_word, logits_char = model.build_inference(
             model.inputs_pl_list[0],
-            model.labels_pl_list[0],
-            model.labels_sub_pl_list[0],
-            model.inputs_seq_len_pl_list[0],
-            model.keep_prob_pl_list[0])
+            model.inputs_seq_len_pl_list[0])
         decode_op_word, decode_op_char = model.decoder(
             logits_word, logits_char,
             model.inputs_seq_len_pl_list[0],
@@ -155,7 +152,7 @@ def decode(session, decode_op_main, decode_op_sub, model,
         feed_dict = {
             model.inputs_pl_list[0]: inputs[0],
             model.inputs_seq_len_pl_list[0]: inputs_seq_len[0],
-            model.keep_prob_hidden_pl_list[0]: 1.0
+            model.keep_prob_pl_list[0]: 1.0
         }
 
         # Decode
@@ -227,7 +224,7 @@ def main():
 
     # Model setting
     model = MultitaskCTC(encoder_type=params['encoder_type'],
-                         input_size=params['input_size']
+                         input_size=params['input_size'],
                          splice=params['splice'],
                          num_stack=params['num_stack'],
                          num_units=params['num_units'],
@@ -71,14 +71,12 @@ def do_plot(model, params, epoch, eval_batch_size):
 
     with tf.name_scope('tower_gpu0'):
         # Define placeholders
-        model.create_placeholders()
+        model.create_placeholders_inference()
 
         # Add to the graph each operation (including model definition)
-        _, logits = model.compute_loss(
+        logits = model.build_inference(
             model.inputs_pl_list[0],
-            model.labels_pl_list[0],
             model.inputs_seq_len_pl_list[0],
-            model.keep_prob_hidden_pl_list[0],
             # softmax_temperature=params['softmax_temperature'])
             softmax_temperature=10)
         posteriors_op = model.posteriors(logits, blank_prior=1)
@@ -146,7 +144,7 @@ def plot(session, posteriors_op, model, dataset, label_type,
         feed_dict = {
             model.inputs_pl_list[0]: inputs[0],
             model.inputs_seq_len_pl_list[0]: inputs_seq_len[0],
-            model.keep_prob_hidden_pl_list[0]: 1.0
+            model.keep_prob_pl_list[0]: 1.0
         }
 
         batch_size, max_frame_num = inputs[0].shape[:2]
@@ -217,17 +215,16 @@ def main():
 
     # Model setting
     model = CTC(encoder_type=params['encoder_type'],
-                input_size=params['input_size']
+                input_size=params['input_size'],
                 splice=params['splice'],
                 num_stack=params['num_stack'],
-                splice=params['splice'],
                 num_units=params['num_units'],
                 num_layers=params['num_layers'],
                 num_classes=params['num_classes'],
                 lstm_impl=params['lstm_impl'],
                 use_peephole=params['use_peephole'],
                 parameter_init=params['weight_init'],
-                clip_grad=params['clip_grad'],
+                clip_grad_norm=params['clip_grad_norm'],
                 clip_activation=params['clip_activation'],
                 num_proj=params['num_proj'],
                 weight_decay=params['weight_decay'])
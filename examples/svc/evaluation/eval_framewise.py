@@ -30,10 +30,7 @@ def do_eval_uaauc(session, posteriors_op, network, dataset, rate=1.0, is_trainin
     """
     num_examples = dataset.data_num * rate
     iteration = max(1, int(num_examples / network.batch_size) + 1)
-    iter_laughter = iteration
-    iter_filler = iteration
-    auc_l_sum = 0
-    auc_f_sum = 0
+    metrics = metric.StreamingMetrics(num_classes=3, label_indices=(1, 2))
 
     # setting for progressbar
     if is_training:
@@ -59,23 +56,10 @@ def do_eval_uaauc(session, posteriors_op, network, dataset, rate=1.0, is_trainin
 
         # logistic regression
 
-        # check if positive label is included in mini batch
-        labels_tmp = np.copy(labels)
-        auc_l_batch = metric.compute_auc(labels, posteriors, label_index=1)
-        auc_f_batch = metric.compute_auc(labels_tmp, posteriors, label_index=2)
-
-        # nan check
-        if auc_l_batch != auc_l_batch:
-            iter_laughter -= 1
-        else:
-            auc_l_sum += auc_l_batch
-        if auc_f_batch != auc_f_batch:
-            iter_filler -= 1
-        else:
-            auc_f_sum += auc_f_batch
-
-    auc_l = auc_l_sum / iter_laughter
-    auc_f = auc_f_sum / iter_filler
+        # accumulate histograms of posteriors over the whole corpus
+        metrics.update(posteriors, labels)
+
+    auc_l, auc_f = metrics.auc()
     uaauc = (auc_l + auc_f) / 2.
 
     acc_l = [auc_l, uaauc]
@@ -90,11 +74,12 @@ def do_eval_uaauc(session, posteriors_op, network, dataset, rate=1.0, is_trainin
     return auc_l, auc_f, uaauc
 
 
-def do_eval_fmeasure(session, decode_op, network, dataset, rate=1.0, is_training=True):
-    """Evaluate trained model by F-measure.
+def do_eval_fmeasure(session, posteriors_op, network, dataset, rate=1.0,
+                     is_training=True):
+    """Evaluate trained model by frame-level F-measure.
     Args:
         session: session of training model
-        decode_op: operation for decoding
+        posteriors_op: operation for computing posteriors
         network: network to evaluate
         dataset: `Dataset' class
         rate: A float value. Rate of evaluation data to use
@@ -106,18 +91,13 @@ def do_eval_fmeasure(session, decode_op, network, dataset, rate=1.0, is_training
     """
     num_examples = dataset.data_num * rate
     iteration = max(1, int(num_examples / network.batch_size) + 1)
-    tp_l, fp_l, fn_l = 0, 0, 0
-    tp_f, fp_f, fn_f = 0, 0, 0
-
-    iter_laughter = iteration
-    iter_filler = iteration
+    metrics = metric.StreamingMetrics(num_classes=3, label_indices=(1, 2))
 
     # setting for progressbar
     if is_training:
         iterator = range(iteration)
     else:
-        p = ProgressBar(max_value=iteration)
-        iterator = p(range(iteration))
+        iterator = tqdm(range(iteration))
 
     for step in iterator:
         # create feed dictionary for next mini batch
@@ -128,8 +108,6 @@ def do_eval_fmeasure(session, decode_op, network, dataset, rate=1.0, is_training
             network.labels_pl: labels
         }
 
-        batch_size = len(labels)
-
         for i in range(len(network.keep_prob_pl_list)):
             feed_dict[network.keep_prob_pl_list[i]] = 1.0
 
@@ -137,35 +115,11 @@ def do_eval_fmeasure(session, decode_op, network, dataset, rate=1.0, is_training
 
         # HMM processing
 
-        for i_batch in range(batch_size):
-            detected_l_num = np.sum(np.array(labels_pred[i_batch]) == 1)
-            detected_f_num = np.sum(np.array(labels_pred[i_batch]) == 2)
-            true_l_num = np.sum(labels[i_batch] == 1)
-            true_f_num = np.sum(labels[i_batch] == 2)
-
-            # laughter
-            if detected_l_num <= true_l_num:
-                tp_l += detected_l_num
-                fn_l += true_l_num - detected_l_num
-            else:
-                tp_l += true_l_num
-                fp_l += detected_l_num - true_l_num
-
-            # filler
-            if detected_f_num <= true_f_num:
-                tp_f += detected_f_num
-                fn_f += true_f_num - detected_f_num
-            else:
-                tp_f += true_f_num
-                fp_f += detected_f_num - true_f_num
-
-    p_l = tp_l / (tp_l + fp_l) if (tp_l + fp_l) != 0 else 0
-    r_l = tp_l / (tp_l + fn_l) if (tp_l + fn_l) != 0 else 0
-    f_l = 2 * r_l * p_l / (r_l + p_l) if (r_l + p_l) != 0 else 0
-
-    r_f = tp_f / (tp_f + fn_f) if (tp_f + fn_f) != 0 else 0
-    p_f = tp_f / (tp_f + fp_f) if (tp_f + fp_f) != 0 else 0
-    f_f = 2 * r_f * p_f / (r_f + p_f) if (r_f + p_f) != 0 else 0
+        # accumulate the confusion matrix over the whole corpus
+        metrics.update(posteriors, labels)
+
+    (tp_l, tp_f), (fp_l, fp_f), (fn_l, fn_f) = metrics.tp_fp_fn()
+    (p_l, p_f), (r_l, r_f), (f_l, f_f) = metrics.fmeasure()
 
     confusion_l = [tp_l, fp_l, fn_l, tp_l + fp_l + fn_l]
     confusion_f = [tp_f, fp_f, fn_f, tp_f + fp_f + fn_f]
@@ -30,3 +30,128 @@ def compute_auc(y_true, y_pred, label_index):
         pass
     auc_val = auc(fpr, tpr)
     return auc_val
+
+
+class StreamingMetrics(object):
+    """Accumulate frame-level statistics for laughter & filler detection over
+       the whole corpus in constant memory. AUC is computed from fixed-bin
+       histograms of posteriors, and precision, recall and F-measure are
+       computed from the confusion matrix.
+    Args:
+        num_classes (int, optional): the number of classes
+        label_indices (tuple, optional): indices of classes to evaluate
+            1 => laughter
+            2 => filler
+        num_bins (int, optional): the number of bins of histograms. AUC is
+            exact up to ties of posteriors in each bin.
+    """
+
+    def __init__(self, num_classes=3, label_indices=(1, 2), num_bins=1000):
+        self.num_classes = num_classes
+        self.label_indices = list(label_indices)
+        self.num_bins = num_bins
+        self.reset()
+
+    def reset(self):
+        """Clear all statistics."""
+        # `[num_labels, num_bins]`
+        self.pos_hist = np.zeros(
+            (len(self.label_indices), self.num_bins), dtype=np.int64)
+        self.neg_hist = np.zeros(
+            (len(self.label_indices), self.num_bins), dtype=np.int64)
+        # `[num_classes (true), num_classes (predicted)]`
+        self.confusion = np.zeros(
+            (self.num_classes, self.num_classes), dtype=np.int64)
+
+    def update(self, posteriors, labels, seq_len=None):
+        """Accumulate statistics of a mini-batch.
+        Args:
+            posteriors (np.ndarray): A tensor of size `[B, T, num_classes]`
+                or `[B * T, num_classes]`
+            labels (np.ndarray): A tensor of size `[B, T]` or `[B * T]`
+            seq_len (np.ndarray, optional): A tensor of size `[B]`. Frames
+                beyond the length of each utterance are ignored.
+        """
+        posteriors = np.asarray(posteriors)
+        labels = np.asarray(labels)
+        if posteriors.ndim == 3:
+            if seq_len is not None:
+                mask = np.arange(labels.shape[1]) < np.asarray(
+                    seq_len)[:, np.newaxis]
+            else:
+                mask = labels >= 0
+            posteriors = posteriors[mask]
+            labels = labels[mask]
+        labels = labels.astype(np.int64)
+
+        # Confusion matrix
+        labels_pred = np.argmax(posteriors, axis=-1)
+        self.confusion += np.bincount(
+            labels * self.num_classes + labels_pred,
+            minlength=self.num_classes ** 2).reshape(
+                self.num_classes, self.num_classes)
+
+        # Histograms of posteriors of positive & negative frames
+        bins = np.clip((posteriors[:, self.label_indices] *
+                        self.num_bins).astype(np.int64), 0, self.num_bins - 1)
+        for i, label_index in enumerate(self.label_indices):
+            is_positive = labels == label_index
+            self.pos_hist[i] += np.bincount(bins[is_positive, i],
+                                            minlength=self.num_bins)
+            self.neg_hist[i] += np.bincount(bins[~is_positive, i],
+                                            minlength=self.num_bins)
+
+    def auc(self):
+        """Compute AUC of each class.
+        Returns:
+            auc_list (np.ndarray): A tensor of size `[num_labels]`. NaN if
+                positive or negative frames are not observed.
+        """
+        # Sweep the threshold from the highest bin
+        tp = np.cumsum(self.pos_hist[:, ::-1], axis=1)
+        fp = np.cumsum(self.neg_hist[:, ::-1], axis=1)
+        num_pos = tp[:, -1:].astype(np.float64)
+        num_neg = fp[:, -1:].astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tpr = np.concatenate([np.zeros_like(num_pos), tp / num_pos], axis=1)
+            fpr = np.concatenate([np.zeros_like(num_neg), fp / num_neg], axis=1)
+
+        # Trapezoidal rule
+        return np.sum((fpr[:, 1:] - fpr[:, :-1]) *
+                      (tpr[:, 1:] + tpr[:, :-1]) / 2., axis=1)
+
+    def uaauc(self):
+        """Compute unweighted average of AUC over classes.
+        Returns:
+            uaauc (float)
+        """
+        return float(np.mean(self.auc()))
+
+    def fmeasure(self):
+        """Compute precision, recall and F-measure of each class.
+        Returns:
+            precision (np.ndarray): A tensor of size `[num_labels]`
+            recall (np.ndarray): A tensor of size `[num_labels]`
+            f_measure (np.ndarray): A tensor of size `[num_labels]`
+        """
+        tp, fp, fn = self.tp_fp_fn()
+        precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 0.)
+        recall = np.where(tp + fn > 0, tp / np.maximum(tp + fn, 1), 0.)
+        f_measure = np.where(
+            precision + recall > 0,
+            2 * precision * recall / np.maximum(precision + recall, 1e-12),
+            0.)
+        return precision, recall, f_measure
+
+    def tp_fp_fn(self):
+        """Count true positives, false positives and false negatives.
+        Returns:
+            tp (np.ndarray): A tensor of size `[num_labels]`
+            fp (np.ndarray): A tensor of size `[num_labels]`
+            fn (np.ndarray): A tensor of size `[num_labels]`
+        """
+        tp = np.diag(self.confusion)[self.label_indices].astype(np.float64)
+        fp = self.confusion.sum(axis=0)[self.label_indices] - tp
+        fn = self.confusion.sum(axis=1)[self.label_indices] - tp
+        return tp, fp, fn
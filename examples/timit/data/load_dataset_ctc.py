@@ -23,7 +23,7 @@ class Dataset(DatasetBase):
                  max_epoch=None, splice=1,
                  num_stack=1, num_skip=1,
                  shuffle=False, sort_utt=False, sort_stop_epoch=None,
-                 progressbar=False):
+                 progressbar=False, seed=None):
         """A class for loading dataset.
         Args:
             data_type (string): train or dev or test
@@ -42,8 +42,9 @@ class Dataset(DatasetBase):
             sort_stop_epoch (int, optional): After sort_stop_epoch, training
                 will revert back to a random order
             progressbar (bool, optional): if True, visualize progressbar
+            seed (int, optional): the seed of the random generator
         """
-        super(Dataset, self).__init__()
+        super(Dataset, self).__init__(seed=seed)
 
         self.is_test = True if data_type == 'test' else False
 
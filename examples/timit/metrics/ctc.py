@@ -10,11 +10,11 @@ from __future__ import print_function
 import re
 from tqdm import tqdm
 
-from examples.timit.metrics.mapping import Map2phone39
+from examples.timit.metrics.mapping import Map2phone39idx
 from utils.io.labels.character import Idx2char
-from utils.io.labels.phone import Idx2phone
 from utils.io.labels.sparsetensor import sparsetensor2list
-from utils.evaluation.edit_distance import compute_per, compute_cer, compute_wer, wer_align
+from utils.io.labels.ragged import padded2ragged, sparsetensor2ragged, list2ragged
+from utils.evaluation.edit_distance import compute_ler_batch, compute_cer, compute_wer, wer_align
 
 
 def do_eval_per(session, decode_op, per_op, model, dataset, label_type,
@@ -47,16 +47,16 @@ def do_eval_per(session, decode_op, per_op, model, dataset, label_type,
     train_label_type = label_type
     eval_label_type = dataset.label_type_sub if is_multitask else dataset.label_type
 
-    idx2phone_train = Idx2phone(
-        map_file_path='../metrics/mapping_files/' + train_label_type + '.txt')
-    idx2phone_eval = Idx2phone(
-        map_file_path='../metrics/mapping_files/' + eval_label_type + '.txt')
-    map2phone39_train = Map2phone39(
+    map2phone39_train = Map2phone39idx(
         label_type=train_label_type,
-        map_file_path='../metrics/mapping_files/phone2phone.txt')
-    map2phone39_eval = Map2phone39(
+        map_file_path='../metrics/mapping_files/phone2phone.txt',
+        phone_map_file_path='../metrics/mapping_files/' + train_label_type + '.txt',
+        phone39_map_file_path='../metrics/mapping_files/phone39.txt')
+    map2phone39_eval = Map2phone39idx(
         label_type=eval_label_type,
-        map_file_path='../metrics/mapping_files/phone2phone.txt')
+        map_file_path='../metrics/mapping_files/phone2phone.txt',
+        phone_map_file_path='../metrics/mapping_files/' + eval_label_type + '.txt',
+        phone39_map_file_path='../metrics/mapping_files/phone39.txt')
 
     per_mean = 0
     if progressbar:
@@ -79,38 +79,35 @@ def do_eval_per(session, decode_op, per_op, model, dataset, label_type,
 
         # Evaluate by 39 phones
         labels_pred_st = session.run(decode_op, feed_dict=feed_dict)
-        labels_pred = sparsetensor2list(labels_pred_st, batch_size)
-
-        for i_batch in range(batch_size):
-            ###############
-            # Hypothesis
-            ###############
-            # Convert from index to phone (-> list of phone strings)
-            phone_pred_list = idx2phone_train(labels_pred[i_batch]).split(' ')
-
-            # Mapping to 39 phones (-> list of phone strings)
-            phone_pred_list = map2phone39_train(phone_pred_list)
-
-            ###############
-            # Reference
-            ###############
-            if is_test:
-                phone_true_list = labels_true[0][i_batch][0].split(' ')
-            else:
-                # Convert from index to phone (-> list of phone strings)
-                phone_true_list = idx2phone_eval(
-                    labels_true[0][i_batch]).split(' ')
-
-            # Mapping to 39 phones (-> list of phone strings)
-            phone_true_list = map2phone39_eval(phone_true_list)
 
-            # Compute PER
-            per_mean += compute_per(ref=phone_pred_list,
-                                    hyp=phone_true_list,
-                                    normalize=True)
-
-            if progressbar:
-                pbar.update(1)
+        ###############
+        # Hypothesis
+        ###############
+        # Mapping to indices of 39 phones per mini-batch
+        hyp_values, hyp_offsets = map2phone39_train.batch(
+            *sparsetensor2ragged(labels_pred_st, batch_size))
+
+        ###############
+        # Reference
+        ###############
+        if is_test:
+            # Convert from phone strings to indices of 39 phones
+            ref_values, ref_offsets = list2ragged(
+                [map2phone39_eval.phone2idx(labels_true[0][i_batch][0].split(' '))
+                 for i_batch in range(batch_size)])
+        else:
+            # Mapping to indices of 39 phones per mini-batch
+            ref_values, ref_offsets = map2phone39_eval.batch(
+                *padded2ragged(labels_true[0],
+                               padded_value=dataset.padded_value))
+
+        # Compute PER
+        per_mean += compute_ler_batch(ref_values, ref_offsets,
+                                      hyp_values, hyp_offsets,
+                                      normalize=True).sum()
+
+        if progressbar:
+            pbar.update(batch_size)
 
         if is_new_epoch:
             break
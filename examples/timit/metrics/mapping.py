@@ -7,6 +7,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
+
 
 class Map2phone39(object):
     """Map from 61 or 48 phones to 39 phones.
@@ -51,3 +53,110 @@ class Map2phone39(object):
             phone_list.remove('')
 
         return phone_list
+
+
+class Map2phone39idx(object):
+    """Map from indices of 61 or 48 phones to indices of 39 phones. The
+       mapping is precomputed as an integer table, so that whole mini-batches
+       of indices can be mapped without converting them to strings.
+    Args:
+        label_type (string): phone39 or phone48 or phone61
+        map_file_path (string): path to the mapping file between phones
+        phone_map_file_path (string): path to the mapping file from phones
+            of label_type to indices
+        phone39_map_file_path (string): path to the mapping file from 39
+            phones to indices
+    """
+
+    # Index of labels to be ignored (q, <SOS> and <EOS>)
+    DROP_INDEX = -1
+
+    def __init__(self, label_type, map_file_path, phone_map_file_path,
+                 phone39_map_file_path):
+        self.label_type = label_type
+
+        # Read the mapping files
+        map2phone39 = Map2phone39(label_type, map_file_path)
+        phone2idx = self._read_map_file(phone_map_file_path)
+        self.phone392idx = self._read_map_file(phone39_map_file_path)
+
+        # Indices of <SOS> and <EOS> (only for attention-based models)
+        self.sos_index = phone2idx.get('<')
+        self.eos_index = phone2idx.get('>')
+
+        # Build the integer table
+        self.map_array = np.full((max(phone2idx.values()) + 1,),
+                                 self.DROP_INDEX, dtype=np.int32)
+        self.map_dict = {}
+        for phone, index in phone2idx.items():
+            if phone in ['<', '>']:
+                # Ignore <SOS> and <EOS>
+                continue
+            if label_type == 'phone39':
+                phone39 = phone
+            else:
+                phone39 = map2phone39.map_dict[phone]
+
+            if phone39 == '':
+                # Ignore q (only if 61 phones)
+                self.map_dict[phone] = self.DROP_INDEX
+            else:
+                self.map_dict[phone] = self.phone392idx[phone39]
+            self.map_array[index] = self.map_dict[phone]
+
+    def _read_map_file(self, map_file_path):
+        """
+        Args:
+            map_file_path (string): path to the mapping file
+        Returns:
+            phone2idx (dict): A dictionary from phone to index
+        """
+        phone2idx = {}
+        with open(map_file_path, 'r') as f:
+            for line in f:
+                line = line.strip().split()
+                phone2idx[line[0]] = int(line[1])
+        return phone2idx
+
+    def __call__(self, index_list, padded_value=-1):
+        """
+        Args:
+            index_list (np.ndarray): list of phone indices.
+                Batch size 1 is expected.
+            padded_value (int): the value used for padding
+        Returns:
+            index_list (np.ndarray): list of indices of 39 phones
+        """
+        if padded_value is not None:
+            index_list = index_list[index_list != padded_value]
+        index_list = self.map_array[index_list]
+        return index_list[index_list != self.DROP_INDEX]
+
+    def batch(self, values, offsets):
+        """Map a ragged batch of phone indices at once.
+        Args:
+            values (np.ndarray): concatenated phone indices of all
+                utterances, size of `[total_label_len]`
+            offsets (np.ndarray): A tensor of size `[B + 1]`
+        Returns:
+            values (np.ndarray): concatenated indices of 39 phones
+            offsets (np.ndarray): A tensor of size `[B + 1]`
+        """
+        values = self.map_array[np.asarray(values, dtype=np.int64)]
+        keep = values != self.DROP_INDEX
+
+        # Recompute boundaries after ignoring phones
+        keep_cumsum = np.zeros((len(values) + 1,), dtype=np.int64)
+        np.cumsum(keep, out=keep_cumsum[1:])
+        return values[keep], keep_cumsum[np.asarray(offsets)]
+
+    def phone2idx(self, phone_list):
+        """
+        Args:
+            phone_list (list): list of phones (string) of label_type
+        Returns:
+            index_list (np.ndarray): list of indices of 39 phones
+        """
+        index_list = np.array([self.map_dict[phone] for phone in phone_list],
+                              dtype=np.int32)
+        return index_list[index_list != self.DROP_INDEX]
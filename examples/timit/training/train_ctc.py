@@ -18,9 +18,9 @@ import shutil
 sys.path.append(abspath('../../../'))
 from examples.timit.data.load_dataset_ctc import Dataset
 from examples.timit.metrics.ctc import do_eval_per, do_eval_cer
-from utils.io.labels.sparsetensor import list2sparsetensor
 from utils.training.learning_rate_controller import Controller
-from utils.training.plot import plot_loss, plot_ler
+from utils.training.trainer import Trainer
+from utils.training.checkpoint import CheckpointManager
 from utils.directory import mkdir_join, mkdir
 from utils.parameter import count_total_parameters
 from models.ctc.ctc import CTC
@@ -39,7 +39,8 @@ def do_train(model, params):
         batch_size=params['batch_size'], max_epoch=params['num_epoch'],
         splice=params['splice'],
         num_stack=params['num_stack'], num_skip=params['num_skip'],
-        sort_utt=True, sort_stop_epoch=params['sort_stop_epoch'])
+        sort_utt=True, sort_stop_epoch=params['sort_stop_epoch'],
+        seed=params.get('seed', None))
     dev_data = Dataset(
         data_type='dev', label_type=params['label_type'],
         batch_size=params['batch_size'], splice=params['splice'],
@@ -71,14 +72,30 @@ def do_train(model, params):
             model.labels_pl_list[0],
             model.inputs_seq_len_pl_list[0],
             model.keep_prob_pl_list[0])
+        accumulate_steps = params.get('accumulate_steps', 1)
         train_op = model.train(
             loss_op,
             optimizer=params['optimizer'],
-            learning_rate=learning_rate_pl)
+            learning_rate=learning_rate_pl,
+            accumulate_steps=accumulate_steps)
+        if accumulate_steps > 1:
+            # Gradients are accumulated every step and applied every
+            # accumulate_steps steps
+            train_op, apply_op = train_op
+        else:
+            apply_op = None
         decode_op = model.decoder(logits,
                                   model.inputs_seq_len_pl_list[0],
                                   beam_width=params['beam_width'])
-        ler_op = model.compute_ler(decode_op, model.labels_pl_list[0])
+        # NOTE: LER for monitoring is computed by greedy decoding by default
+        monitor_beam_width = params.get('monitor_beam_width', 1)
+        if monitor_beam_width == params['beam_width']:
+            decode_op_monitor = decode_op
+        else:
+            decode_op_monitor = model.decoder(logits,
+                                              model.inputs_seq_len_pl_list[0],
+                                              beam_width=monitor_beam_width)
+        ler_op = model.compute_ler(decode_op_monitor, model.labels_pl_list[0])
 
         # Define learning rate controller
         lr_controller = Controller(
@@ -96,8 +113,18 @@ def do_train(model, params):
         # Add the variable initializer operation
         init_op = tf.global_variables_initializer()
 
-        # Create a saver for writing training checkpoints
-        saver = tf.train.Saver(max_to_keep=None)
+        # Create a checkpoint manager for writing training checkpoints
+        checkpoint_manager = CheckpointManager(
+            save_path=model.save_path,
+            keep_best=params.get('keep_best_checkpoints', 3),
+            keep_last=params.get('keep_last_checkpoints', 1),
+            lower_better=True)
+        # NOTE: the latest checkpoint with the state of training is kept
+        # separately for resuming training
+        resume_manager = CheckpointManager(
+            save_path=mkdir_join(model.save_path, 'resume'),
+            keep_best=0,
+            keep_last=1)
 
         # Count total parameters
         parameters_dict, total_parameters = count_total_parameters(
@@ -108,8 +135,122 @@ def do_train(model, params):
               (len(parameters_dict.keys()),
                "{:,}".format(total_parameters / 1000000)))
 
-        csv_steps, csv_loss_train, csv_loss_dev = [], [], []
-        csv_ler_train, csv_ler_dev = [], []
+        trainer = Trainer(model=model,
+                          params=params,
+                          train_data=train_data,
+                          dev_data=dev_data,
+                          train_op=train_op,
+                          loss_op=loss_op,
+                          ler_op=ler_op,
+                          learning_rate_pl=learning_rate_pl,
+                          summary_train=summary_train,
+                          summary_dev=summary_dev,
+                          apply_op=apply_op,
+                          lr_controller=lr_controller,
+                          checkpoint_manager=resume_manager)
+
+        def evaluate(sess, trainer):
+            """Evaluate the model per epoch and save checkpoints.
+            Args:
+                sess: session
+                trainer: An instance of `Trainer`
+            Returns:
+                stop (bool): If True, training is stopped
+            """
+            if trainer.epoch < params['eval_start_epoch']:
+                return False
+
+            start_time_eval = time.time()
+            if 'char' in params['label_type']:
+                print('=== Dev Data Evaluation ===')
+                ler_dev_epoch, wer_dev_epoch = do_eval_cer(
+                    session=sess,
+                    decode_op=decode_op,
+                    model=model,
+                    dataset=dev_data,
+                    label_type=params['label_type'],
+                    eval_batch_size=1)
+                print('  CER: %f %%' % (ler_dev_epoch * 100))
+                print('  WER: %f %%' % (wer_dev_epoch * 100))
+
+                # Save model (check point)
+                # NOTE: checkpoints are written in the background, and only
+                # the best and the latest ones are kept
+                save_path = checkpoint_manager.save(
+                    sess, global_step=trainer.epoch, metric=ler_dev_epoch)
+                print("Model saved in file: %s" % save_path)
+
+                if ler_dev_epoch < trainer.ler_dev_best:
+                    trainer.ler_dev_best = ler_dev_epoch
+                    trainer.not_improved_epoch = 0
+                    print('■■■ ↑Best Score (CER)↑ ■■■')
+
+                    print('=== Test Data Evaluation ===')
+                    ler_test, wer_test = do_eval_cer(
+                        session=sess,
+                        decode_op=decode_op,
+                        model=model,
+                        dataset=test_data,
+                        label_type=params['label_type'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  CER: %f %%' % (ler_test * 100))
+                    print('  WER: %f %%' % (wer_test * 100))
+                else:
+                    trainer.not_improved_epoch += 1
+
+            else:
+                print('=== Dev Data Evaluation ===')
+                ler_dev_epoch = do_eval_per(
+                    session=sess,
+                    decode_op=decode_op,
+                    per_op=ler_op,
+                    model=model,
+                    dataset=dev_data,
+                    label_type=params['label_type'],
+                    eval_batch_size=1)
+                print('  PER: %f %%' % (ler_dev_epoch * 100))
+
+                # Save model (check point)
+                # NOTE: checkpoints are written in the background, and only
+                # the best and the latest ones are kept
+                save_path = checkpoint_manager.save(
+                    sess, global_step=trainer.epoch, metric=ler_dev_epoch)
+                print("Model saved in file: %s" % save_path)
+
+                if ler_dev_epoch < trainer.ler_dev_best:
+                    trainer.ler_dev_best = ler_dev_epoch
+                    trainer.not_improved_epoch = 0
+                    print('■■■ ↑Best Score (PER)↑ ■■■')
+
+                    print('=== Test Data Evaluation ===')
+                    ler_test = do_eval_per(
+                        session=sess,
+                        decode_op=decode_op,
+                        per_op=ler_op,
+                        model=model,
+                        dataset=test_data,
+                        label_type=params['label_type'],
+                        is_test=True,
+                        eval_batch_size=1)
+                    print('  PER: %f %%' % (ler_test * 100))
+                else:
+                    trainer.not_improved_epoch += 1
+
+            duration_eval = time.time() - start_time_eval
+            print('Evaluation time: %.3f min' % (duration_eval / 60))
+
+            # Early stopping
+            if trainer.not_improved_epoch == params['not_improved_patient_epoch']:
+                return True
+
+            # Update learning rate
+            trainer.learning_rate = lr_controller.decay_lr(
+                learning_rate=trainer.learning_rate,
+                epoch=trainer.epoch,
+                value=ler_dev_epoch)
+            return False
+
         # Create a session for running operation on the graph
         with tf.Session() as sess:
 
@@ -120,180 +261,18 @@ def do_train(model, params):
             # Initialize parameters
             sess.run(init_op)
 
+            # Resume training from the latest checkpoint
+            checkpoint_path = trainer.restore(sess)
+            if checkpoint_path is not None:
+                print("Model restored: %s (step %d)" %
+                      (checkpoint_path, trainer.step))
+
             # Train model
-            start_time_train = time.time()
-            start_time_epoch = time.time()
-            start_time_step = time.time()
-            ler_dev_best = 1
-            not_improved_epoch = 0
-            learning_rate = float(params['learning_rate'])
-            for step, (data, is_new_epoch) in enumerate(train_data):
-
-                # Create feed dictionary for next mini batch (train)
-                inputs, labels, inputs_seq_len, _ = data
-                feed_dict_train = {
-                    model.inputs_pl_list[0]: inputs[0],
-                    model.labels_pl_list[0]: list2sparsetensor(
-                        labels[0], padded_value=train_data.padded_value),
-                    model.inputs_seq_len_pl_list[0]: inputs_seq_len[0],
-                    model.keep_prob_pl_list[0]: 1 - float(params['dropout']),
-                    learning_rate_pl: learning_rate
-                }
-
-                # Update parameters
-                sess.run(train_op, feed_dict=feed_dict_train)
-
-                if (step + 1) % params['print_step'] == 0:
-
-                    # Create feed dictionary for next mini batch (dev)
-                    (inputs, labels, inputs_seq_len, _), _ = dev_data.next()
-                    feed_dict_dev = {
-                        model.inputs_pl_list[0]: inputs[0],
-                        model.labels_pl_list[0]: list2sparsetensor(
-                            labels[0], padded_value=dev_data.padded_value),
-                        model.inputs_seq_len_pl_list[0]: inputs_seq_len[0],
-                        model.keep_prob_pl_list[0]: 1.0
-                    }
-
-                    # Compute loss
-                    loss_train = sess.run(loss_op, feed_dict=feed_dict_train)
-                    loss_dev = sess.run(loss_op, feed_dict=feed_dict_dev)
-                    csv_steps.append(step)
-                    csv_loss_train.append(loss_train)
-                    csv_loss_dev.append(loss_dev)
-
-                    # Change to evaluation mode
-                    feed_dict_train[model.keep_prob_pl_list[0]] = 1.0
-
-                    # Compute accuracy & update event files
-                    ler_train, summary_str_train = sess.run(
-                        [ler_op, summary_train], feed_dict=feed_dict_train)
-                    ler_dev, summary_str_dev = sess.run(
-                        [ler_op, summary_dev], feed_dict=feed_dict_dev)
-                    csv_ler_train.append(ler_train)
-                    csv_ler_dev.append(ler_dev)
-                    summary_writer.add_summary(summary_str_train, step + 1)
-                    summary_writer.add_summary(summary_str_dev, step + 1)
-                    summary_writer.flush()
-
-                    duration_step = time.time() - start_time_step
-                    print("Step %d (epoch: %.3f): loss = %.3f (%.3f) / ler = %.3f (%.3f) / lr = %.5f (%.3f min)" %
-                          (step + 1, train_data.epoch_detail, loss_train, loss_dev, ler_train, ler_dev,
-                           learning_rate, duration_step / 60))
-                    sys.stdout.flush()
-                    start_time_step = time.time()
-
-                # Save checkpoint and evaluate model per epoch
-                if is_new_epoch:
-                    duration_epoch = time.time() - start_time_epoch
-                    print('-----EPOCH:%d (%.3f min)-----' %
-                          (train_data.epoch, duration_epoch / 60))
-
-                    # Save fugure of loss & ler
-                    plot_loss(csv_loss_train, csv_loss_dev, csv_steps,
-                              save_path=model.save_path)
-                    plot_ler(csv_ler_train, csv_ler_dev, csv_steps,
-                             label_type=params['label_type'],
-                             save_path=model.save_path)
-
-                    if train_data.epoch >= params['eval_start_epoch']:
-                        start_time_eval = time.time()
-                        if 'char' in params['label_type']:
-                            print('=== Dev Data Evaluation ===')
-                            ler_dev_epoch, wer_dev_epoch = do_eval_cer(
-                                session=sess,
-                                decode_op=decode_op,
-                                model=model,
-                                dataset=dev_data,
-                                label_type=params['label_type'],
-                                eval_batch_size=1)
-                            print('  CER: %f %%' % (ler_dev_epoch * 100))
-                            print('  WER: %f %%' % (wer_dev_epoch * 100))
-
-                            if ler_dev_epoch < ler_dev_best:
-                                ler_dev_best = ler_dev_epoch
-                                not_improved_epoch = 0
-                                print('■■■ ↑Best Score (CER)↑ ■■■')
-
-                                # Save model only when best accuracy is
-                                # obtained (check point)
-                                checkpoint_file = join(
-                                    model.save_path, 'model.ckpt')
-                                save_path = saver.save(
-                                    sess, checkpoint_file, global_step=train_data.epoch)
-                                print("Model saved in file: %s" % save_path)
-
-                                print('=== Test Data Evaluation ===')
-                                ler_test, wer_test = do_eval_cer(
-                                    session=sess,
-                                    decode_op=decode_op,
-                                    model=model,
-                                    dataset=test_data,
-                                    label_type=params['label_type'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  CER: %f %%' % (ler_test * 100))
-                                print('  WER: %f %%' % (wer_test * 100))
-                            else:
-                                not_improved_epoch += 1
-
-                        else:
-                            print('=== Dev Data Evaluation ===')
-                            ler_dev_epoch = do_eval_per(
-                                session=sess,
-                                decode_op=decode_op,
-                                per_op=ler_op,
-                                model=model,
-                                dataset=dev_data,
-                                label_type=params['label_type'],
-                                eval_batch_size=1)
-                            print('  PER: %f %%' % (ler_dev_epoch * 100))
-
-                            if ler_dev_epoch < ler_dev_best:
-                                ler_dev_best = ler_dev_epoch
-                                not_improved_epoch = 0
-                                print('■■■ ↑Best Score (PER)↑ ■■■')
-
-                                # Save model only when best accuracy is
-                                # obtained (check point)
-                                checkpoint_file = join(
-                                    model.save_path, 'model.ckpt')
-                                save_path = saver.save(
-                                    sess, checkpoint_file, global_step=train_data.epoch)
-                                print("Model saved in file: %s" % save_path)
-
-                                print('=== Test Data Evaluation ===')
-                                ler_test = do_eval_per(
-                                    session=sess,
-                                    decode_op=decode_op,
-                                    per_op=ler_op,
-                                    model=model,
-                                    dataset=test_data,
-                                    label_type=params['label_type'],
-                                    is_test=True,
-                                    eval_batch_size=1)
-                                print('  PER: %f %%' % (ler_test * 100))
-                            else:
-                                not_improved_epoch += 1
-
-                        duration_eval = time.time() - start_time_eval
-                        print('Evaluation time: %.3f min' %
-                              (duration_eval / 60))
-
-                        # Early stopping
-                        if not_improved_epoch == params['not_improved_patient_epoch']:
-                            break
-
-                        # Update learning rate
-                        learning_rate = lr_controller.decay_lr(
-                            learning_rate=learning_rate,
-                            epoch=train_data.epoch,
-                            value=ler_dev_epoch)
-
-                    start_time_epoch = time.time()
-
-            duration_train = time.time() - start_time_train
-            print('Total time: %.3f hour' % (duration_train / 3600))
+            trainer.run(sess, summary_writer, epoch_end_fn=evaluate)
+
+            # Wait for checkpoints to be written
+            checkpoint_manager.close()
+            resume_manager.close()
 
             # Training was finished correctly
             with open(join(model.save_path, 'complete.txt'), 'w') as f:
@@ -359,6 +338,7 @@ def main(config_path, model_save_path):
 
     # Reset model directory
     model_index = 0
+    is_resumed = False
     new_model_path = model.save_path
     while True:
         if isfile(join(new_model_path, 'complete.txt')):
@@ -367,6 +347,10 @@ def main(config_path, model_save_path):
             new_model_path = model.save_path + '_' + str(model_index)
         elif isfile(join(new_model_path, 'config.yml')):
             # Training of the first model have not been finished yet
+            if params.get('resume', False):
+                # Resume training from the latest checkpoint
+                is_resumed = True
+                break
             model_index += 1
             new_model_path = model.save_path + '_' + str(model_index)
         else:
@@ -374,9 +358,11 @@ def main(config_path, model_save_path):
     model.save_path = mkdir(new_model_path)
 
     # Save config file
-    shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
+    if not is_resumed:
+        shutil.copyfile(config_path, join(model.save_path, 'config.yml'))
 
-    sys.stdout = open(join(model.save_path, 'train.log'), 'w')
+    sys.stdout = open(join(model.save_path, 'train.log'),
+                      'a' if is_resumed else 'w')
     # TODO(hirofumi): change to logger
     do_train(model=model, params=params)
 
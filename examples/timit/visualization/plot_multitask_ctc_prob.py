@@ -56,15 +56,12 @@ def do_plot(model, params, epoch, eval_batch_size):
         sort_utt=False, progressbar=True)
 
     # Define placeholders
-    model.create_placeholders()
+    model.create_placeholders_inference()
 
     # Add to the graph each operation (including model definition)
-    _, logits_main, logits_sub = model.compute_loss(
+    logits_main, logits_sub = model.build_inference(
         model.inputs_pl_list[0],
-        model.labels_pl_list[0],
-        model.labels_sub_pl_list[0],
-        model.inputs_seq_len_pl_list[0],
-        model.keep_prob_pl_list[0])
+        model.inputs_seq_len_pl_list[0])
     posteriors_op_main, posteriors_op_sub = model.posteriors(
         logits_main, logits_sub)
 
@@ -38,7 +38,7 @@ class AttentionSeq2Seq(ModelBase):
     """Attention-based model.
     Args:
         input_size (int): the dimension of input vectors
-        encoder_type (string): blstm or lstm
+        encoder_type (string): blstm or lstm or bqrnn or qrnn
         encoder_num_units (int): the number of units in each layer of the
             encoder
         encoder_num_layers (int): the number of layers of the encoder
@@ -276,13 +276,15 @@ class AttentionSeq2Seq(ModelBase):
 
         return logits, decoder_outputs_train, decoder_outputs_infer, encoder_outputs.outputs
 
-    def _encode(self, inputs, inputs_seq_len, keep_prob_encoder):
+    def _encode(self, inputs, inputs_seq_len, keep_prob_encoder,
+                is_training=True):
         """Encode input features.
         Args:
             inputs (placeholder): A tensor of size`[B, T, input_size]`
             inputs_seq_len (placeholder): A tensor of size` [B]`
             keep_prob_encoder (placeholder, float): A probability to keep nodes
                 in the hidden-hidden connection
+            is_training (bool, optional):
         Returns:
             encoder_outputs (namedtuple): A namedtuple of
                 `(outputs, final_state, seq_len)`
@@ -302,6 +304,12 @@ class AttentionSeq2Seq(ModelBase):
                 parameter_init=self.parameter_init,
                 clip_activation=self.clip_activation_encoder,
                 time_major=self.time_major)
+        elif self.encoder_type in ['bqrnn', 'qrnn']:
+            self.encoder = load_encoder(self.encoder_type)(
+                num_units=self.encoder_num_units,
+                num_layers=self.encoder_num_layers,
+                parameter_init=self.parameter_init,
+                time_major=self.time_major)
         else:
             # TODO: add other encoders
             raise NotImplementedError
@@ -310,8 +318,7 @@ class AttentionSeq2Seq(ModelBase):
             inputs=inputs,
             inputs_seq_len=inputs_seq_len,
             keep_prob=keep_prob_encoder,
-            is_training=True)
-        # TODO: fix this
+            is_training=is_training)
 
         if self.time_major:
             # Convert from time-major to batch-major
@@ -459,7 +466,7 @@ class AttentionSeq2Seq(ModelBase):
 
         return decoder_outputs, decoder_final_state
 
-    def _decode_infer(self, decoder, bridge, encoder_outputs):
+    def _decode_infer(self, decoder, bridge, encoder_outputs, reuse=True):
         """Runs decoding in inference mode.
         Args:
             decoder (callable): A callable function of `AttentionDecoder` class
@@ -467,6 +474,9 @@ class AttentionSeq2Seq(ModelBase):
                 encoder and decoder
             encoder_outputs (namedtuple): A namedtuple of
                 `(outputs, final_state, seq_len)`
+            reuse (bool, optional): if False, the embedding and bridge
+                variables are created here. This is used when the training
+                decoder is not built.
         Returns:
             decoder_outputs (namedtuple): A namedtuple of
                 `(logits, predicted_ids, decoder_output, attention_weights,
@@ -479,7 +489,7 @@ class AttentionSeq2Seq(ModelBase):
         #     batch_size = self.beam_width
         # TODO: make this batch version
 
-        with tf.variable_scope("output_embedding", reuse=True):
+        with tf.variable_scope("output_embedding", reuse=reuse):
             output_embedding = tf.get_variable(
                 name="W_embedding",
                 shape=[self.num_classes, self.embedding_dim],
@@ -497,7 +507,7 @@ class AttentionSeq2Seq(ModelBase):
         #                         [9, 9, 9]]
 
         # The initial decoder state is the final encoder state
-        with tf.variable_scope("bridge", reuse=True):
+        with tf.variable_scope("bridge", reuse=reuse):
             decoder_initial_state = bridge()
 
         # Call decoder class
@@ -547,6 +557,28 @@ class AttentionSeq2Seq(ModelBase):
             tf.placeholder(tf.int32, name='values_pred'),
             tf.placeholder(tf.int64, name='shape_pred')))
 
+    def create_placeholders_inference(self):
+        """Create placeholders for inference and append them to list.
+           Label placeholders are not created.
+        """
+        self.inputs_pl_list.append(
+            tf.placeholder(tf.float32, shape=[None, None, self.input_size],
+                           name='input'))
+        self.inputs_seq_len_pl_list.append(
+            tf.placeholder(tf.int32, shape=[None], name='inputs_seq_len'))
+
+        # NOTE: keep_prob is not used in the inference graph, but it is
+        # created so that the same feed_dict can be used as in training
+        self.keep_prob_encoder_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[],
+                                        name='keep_prob_encoder'))
+        self.keep_prob_decoder_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[],
+                                        name='keep_prob_decoder'))
+        self.keep_prob_embedding_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[],
+                                        name='keep_prob_embedding'))
+
     def _beam_search_decoder_wrapper(self, decoder, beam_width=1,
                                      length_penalty_weight=0.6):
         """Wraps a decoder into a Beam Search decoder.
@@ -663,6 +695,80 @@ class AttentionSeq2Seq(ModelBase):
 
         return total_loss, logits, decoder_outputs_train, decoder_outputs_infer
 
+    def _build_inference(self, inputs, inputs_seq_len):
+        """Construct the encoder and the inference decoder only.
+        Args:
+            inputs: A tensor of size `[B, T_in, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            decoder_outputs_infer (namedtuple): A namedtuple of
+                `(logits, predicted_ids, decoder_output, attention_weights,
+                    context_vector)`
+            encoder_outputs.outputs: A tensor of size `[B, T_in, encoder_num_units]`
+        """
+        with tf.variable_scope('encoder'):
+            encoder_outputs = self._encode(
+                inputs, inputs_seq_len, keep_prob_encoder=1.0,
+                is_training=False)
+
+        decoder_infer = self._create_decoder(
+            encoder_outputs=encoder_outputs,
+            labels=None,
+            keep_prob_decoder=1.0,
+            mode=tf.contrib.learn.ModeKeys.INFER)
+        # NOTE: the inference decoder reuses variables of the training
+        # decoder by default, so they are created here instead
+        decoder_infer.reuse = False
+        self.attention_layer.reuse = False
+
+        bridge = InitialStateBridge(
+            encoder_outputs=encoder_outputs,
+            decoder_state_size=decoder_infer.rnn_cell.state_size,
+            parameter_init=self.parameter_init)
+
+        decoder_outputs_infer, _ = self._decode_infer(
+            decoder=decoder_infer,
+            bridge=bridge,
+            encoder_outputs=encoder_outputs,
+            reuse=False)
+
+        if self.time_major:
+            # Convert from time-major to batch-major
+            decoder_outputs_infer = self._convert_to_batch_major(
+                decoder_outputs_infer)
+
+        return decoder_outputs_infer, encoder_outputs.outputs
+
+    def build_inference(self, inputs, inputs_seq_len):
+        """Construct the forward path only. Neither the training decoder, the
+           loss, weight decay nor summaries are built.
+        Args:
+            inputs: A tensor of size `[B, T_in, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            decoder_outputs_infer (namedtuple): A namedtuple of
+                `(logits, predicted_ids, decoder_output, attention_weights,
+                    context_vector)`
+        """
+        decoder_outputs_infer, _ = self._build_inference(
+            inputs, inputs_seq_len)
+        return decoder_outputs_infer
+
+    def predict(self, inputs, inputs_seq_len):
+        """Operation for decoding in inference.
+        Args:
+            inputs: A tensor of size `[B, T_in, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            decoded_infer: operation for decoding in inference.
+                A tensor of size `[B, max_decode_length]`
+            attention_weights: A tensor of size
+                `[B, max_decode_length, T_in]`
+        """
+        decoder_outputs_infer = self.build_inference(inputs, inputs_seq_len)
+        return (decoder_outputs_infer.predicted_ids,
+                decoder_outputs_infer.attention_weights)
+
     def decode(self, decoder_outputs_train, decoder_outputs_infer):
         """Operation for decoding.
         Args:
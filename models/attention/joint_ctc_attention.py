@@ -22,7 +22,7 @@ class JointCTCAttention(AttentionSeq2Seq):
     """Joint CTC-Attention model. Encoder is BLSTM as in the paper.
     Args:
         input_size (int): the dimension of input vectors
-        encoder_type (string): blstm or lstm
+        encoder_type (string): blstm or lstm or bqrnn or qrnn
         encoder_num_units (int): the number of units in each layer of the
             encoder
         encoder_num_layers (int): the number of layers of the encoder
@@ -344,3 +344,45 @@ class JointCTCAttention(AttentionSeq2Seq):
             tf.summary.scalar('ctc_loss_dev', ctc_loss))
 
         return total_loss, logits, ctc_logits, decoder_outputs_train, decoder_outputs_infer
+
+    def build_inference(self, inputs, inputs_seq_len):
+        """Construct the forward path only. Neither the training decoder, the
+           losses, weight decay nor summaries are built.
+        Args:
+            inputs: A tensor of size `[B, T_in, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            decoder_outputs_infer (namedtuple): A namedtuple of
+                `(logits, predicted_ids, decoder_output, attention_weights,
+                    context_vector)`
+            ctc_logits: A tensor of size `[T_in, B, num_classes + 1 (blank)]`
+        """
+        decoder_outputs_infer, encoder_outputs = self._build_inference(
+            inputs, inputs_seq_len)
+        ctc_logits = self.ctc_logits(encoder_outputs)
+        return decoder_outputs_infer, ctc_logits
+
+    def predict(self, inputs, inputs_seq_len):
+        """Operation for decoding in inference.
+        Args:
+            inputs: A tensor of size `[B, T_in, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            decoded_infer: operation for decoding in inference.
+                A tensor of size `[B, max_decode_length]`
+            attention_weights: A tensor of size
+                `[B, max_decode_length, T_in]`
+            ctc_posteriors: A tensor of size
+                `[B * T_in, num_classes + 1 (blank)]`
+        """
+        decoder_outputs_infer, ctc_logits = self.build_inference(
+            inputs, inputs_seq_len)
+
+        # Convert to batch-major: `[B, T_in, num_classes + 1]'
+        ctc_logits = tf.transpose(ctc_logits, (1, 0, 2))
+        ctc_posteriors = tf.nn.softmax(
+            tf.reshape(ctc_logits, [-1, self.ctc_num_classes]))
+
+        return (decoder_outputs_infer.predicted_ids,
+                decoder_outputs_infer.attention_weights,
+                ctc_posteriors)
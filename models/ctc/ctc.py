@@ -21,6 +21,10 @@ class CTC(ModelBase):
             lstm: Unidirectional LSTM
             bgru: Bidirectional GRU
             gru: Unidirectional GRU
+            bqrnn: Bidirectional QRNN
+            qrnn: Unidirectional QRNN
+            pyramid_blstm: Pyramidal bidirectional LSTM
+            lc_blstm: Latency-controlled bidirectional LSTM
             vgg_blstm: VGG + Bidirectional LSTM
             vgg_lstm: VGG + Unidirectional LSTM
         input_size (int): the dimensions of input vectors
@@ -29,11 +33,11 @@ class CTC(ModelBase):
         num_classes (int): the number of classes of target labels
             (except for a blank label)
         lstm_impl (string, optional): a base implementation of LSTM. This is
-            not used for GRU models.
+            not used for GRU and QRNN models.
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
             Default is LSTMBlockCell.
@@ -54,6 +58,16 @@ class CTC(ModelBase):
         bottleneck_dim (int, optional): the dimensions of the bottleneck layer
         time_major (bool, optional): if True, time-major computation will be
             performed
+        subsample_list (list, optional): the factor of subsampling after
+            each layer. This is used for LSTM-based encoders.
+        subsample_type (string, optional): the way of subsampling.
+                - concat: concatenate consecutive frames
+                - max_pool: strided max-pooling over time
+                - conv: strided 1-D convolution over time
+        chunk_size (int, optional): the number of frames in each chunk.
+            This is used for lc_blstm.
+        right_context (int, optional): the number of future frames for the
+            backward LSTM of each chunk. This is used for lc_blstm.
     """
 
     def __init__(self,
@@ -72,7 +86,11 @@ class CTC(ModelBase):
                  num_proj=None,
                  weight_decay=0.0,
                  bottleneck_dim=None,
-                 time_major=True):
+                 time_major=True,
+                 subsample_list=None,
+                 subsample_type='concat',
+                 chunk_size=None,
+                 right_context=0):
 
         super(CTC, self).__init__()
 
@@ -121,7 +139,7 @@ class CTC(ModelBase):
         self.time_major = time_major
         self.name = encoder_type + '_ctc'
 
-        if encoder_type in ['blstm', 'lstm']:
+        if encoder_type in ['blstm', 'lstm', 'pyramid_blstm']:
             self.encoder = load(encoder_type)(
                 num_units=num_units,
                 num_proj=self.num_proj,
@@ -130,9 +148,26 @@ class CTC(ModelBase):
                 use_peephole=use_peephole,
                 parameter_init=parameter_init,
                 clip_activation=clip_activation,
+                subsample_list=subsample_list,
+                subsample_type=subsample_type,
                 time_major=time_major)
 
-        elif encoder_type in ['vgg_blstm', 'vgg_lstm', 'cldnn_wang']:
+        elif encoder_type == 'lc_blstm':
+            if chunk_size is None:
+                raise ValueError('chunk_size must be given for lc_blstm.')
+            self.encoder = load(encoder_type)(
+                num_units=num_units,
+                num_proj=self.num_proj,
+                num_layers=num_layers,
+                lstm_impl=lstm_impl,
+                use_peephole=use_peephole,
+                parameter_init=parameter_init,
+                clip_activation=clip_activation,
+                chunk_size=chunk_size,
+                right_context=right_context,
+                time_major=time_major)
+
+        elif encoder_type in ['vgg_blstm', 'vgg_lstm']:
             self.encoder = load(encoder_type)(
                 input_size=input_size,
                 splice=splice,
@@ -144,9 +179,25 @@ class CTC(ModelBase):
                 use_peephole=use_peephole,
                 parameter_init=parameter_init,
                 clip_activation=clip_activation,
+                subsample_list=subsample_list,
+                subsample_type=subsample_type,
                 time_major=time_major)
 
-        elif encoder_type in ['bgru', 'gru']:
+        elif encoder_type == 'cldnn_wang':
+            self.encoder = load(encoder_type)(
+                input_size=input_size,
+                splice=splice,
+                num_stack=num_stack,
+                num_units=num_units,
+                num_proj=self.num_proj,
+                num_layers=num_layers,
+                lstm_impl=lstm_impl,
+                use_peephole=use_peephole,
+                parameter_init=parameter_init,
+                clip_activation=clip_activation,
+                time_major=time_major)
+
+        elif encoder_type in ['bgru', 'gru', 'bqrnn', 'qrnn']:
             self.encoder = load(encoder_type)(
                 num_units=num_units,
                 num_layers=num_layers,
@@ -172,7 +223,8 @@ class CTC(ModelBase):
         else:
             raise NotImplementedError
 
-    def _build(self, inputs, inputs_seq_len, keep_prob, is_training):
+    def _build(self, inputs, inputs_seq_len, keep_prob, is_training,
+               initial_state=None):
         """Construct model graph.
         Args:
             inputs: A tensor of size `[B, T, input_size]`
@@ -180,15 +232,28 @@ class CTC(ModelBase):
             keep_prob (placeholder, float): A probability to keep nodes
                 in the hidden-hidden connection
             is_training (bool):
+            initial_state (optional): initial states of the encoder.
+                Default is zero states.
         Returns:
             logits: A tensor of size `[T, B, num_classes]`
         """
-        # inputs: `[B, T, input_size]`
-        batch_size = tf.shape(inputs)[0]
-        max_time = tf.shape(inputs)[1]
-
-        encoder_outputs, final_state = self.encoder(
-            inputs, inputs_seq_len, keep_prob, is_training)
+        if initial_state is None:
+            encoder_outputs, final_state = self.encoder(
+                inputs, inputs_seq_len, keep_prob, is_training)
+        else:
+            encoder_outputs, final_state = self.encoder(
+                inputs, inputs_seq_len, keep_prob, is_training,
+                initial_state=initial_state)
+        self.encoder_final_state = final_state
+
+        # NOTE: the length of encoder outputs may be shorter than that of
+        # inputs when the encoder reduces the time resolution
+        if self.time_major:
+            max_time = tf.shape(encoder_outputs)[0]
+            batch_size = tf.shape(encoder_outputs)[1]
+        else:
+            batch_size = tf.shape(encoder_outputs)[0]
+            max_time = tf.shape(encoder_outputs)[1]
 
         # for debug
         self.encoder_outputs = encoder_outputs
@@ -253,6 +318,22 @@ class CTC(ModelBase):
         self.keep_prob_pl_list.append(
             tf.placeholder(tf.float32, name='keep_prob'))
 
+    def create_placeholders_inference(self):
+        """Create placeholders for inference and append them to list.
+           Label placeholders are not created.
+        """
+        self.inputs_pl_list.append(
+            tf.placeholder(tf.float32,
+                           shape=[None, None, self.input_size *
+                                  self.num_stack * self.splice],
+                           name='input'))
+        self.inputs_seq_len_pl_list.append(
+            tf.placeholder(tf.int32, shape=[None], name='inputs_seq_len'))
+        # NOTE: keep_prob is not used in the inference graph, but it is
+        # created so that the same feed_dict can be used as in training
+        self.keep_prob_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[], name='keep_prob'))
+
     def compute_loss(self, inputs, labels, inputs_seq_len,
                      keep_prob, scope=None, softmax_temperature=1,
                      is_training=True):
@@ -289,7 +370,7 @@ class CTC(ModelBase):
             ctc_losses = tf.nn.ctc_loss(
                 labels,
                 logits / softmax_temperature,
-                tf.cast(inputs_seq_len, tf.int32),
+                self.output_seq_len(tf.cast(inputs_seq_len, tf.int32)),
                 # inputs_seq_len,
                 preprocess_collapse_repeated=False,
                 ctc_merge_repeated=True,
@@ -322,6 +403,83 @@ class CTC(ModelBase):
 
         return total_loss, logits
 
+    def build_inference(self, inputs, inputs_seq_len, softmax_temperature=1):
+        """Construct the forward path only. Neither the loss, weight decay
+           nor summaries are built.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            softmax_temperature (int, optional): temperature parameter for
+                ths softmax layer
+        Returns:
+            logits: A tensor of size `[T, B, num_classes]`
+        """
+        logits = self._build(inputs, inputs_seq_len,
+                             keep_prob=1.0, is_training=False)
+        if softmax_temperature != 1:
+            logits /= softmax_temperature
+        return logits
+
+    def predict(self, inputs, inputs_seq_len, beam_width=1,
+                softmax_temperature=1):
+        """Operation for decoding and computing posteriors in inference.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            beam_width (int, optional): beam width for beam search.
+                1 disables beam search, which mean greedy decoding.
+            softmax_temperature (int, optional): temperature parameter for
+                ths softmax layer
+        Returns:
+            decode_op: A SparseTensor
+            posteriors_op: operation for computing posteriors for each class
+        """
+        logits = self.build_inference(inputs, inputs_seq_len,
+                                      softmax_temperature=softmax_temperature)
+        decode_op = self.decoder(logits, inputs_seq_len,
+                                 beam_width=beam_width)
+        posteriors_op = self.posteriors(logits)
+        return decode_op, posteriors_op
+
+    def build_streaming(self, inputs, inputs_seq_len):
+        """Construct model graph for streaming inference. Utterances are fed
+           in chunks, and final states of the encoder are fed back as initial
+           states of the next chunk, so that outputs are the same as those
+           over the whole utterance. This is supported by unidirectional
+           encoders only. When frames are subsampled in the encoder, the
+           length of each chunk must be a multiple of the total factor.
+        Args:
+            inputs: A tensor of size `[B, T_chunk, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            logits: A tensor of size `[T_chunk, B, num_classes]`
+            initial_state: placeholders of initial states of the encoder.
+                Zero states are used unless they are fed.
+            final_state: final states of the encoder, which should be fed
+                to initial_state for the next chunk
+        """
+        if not hasattr(self.encoder, 'create_state_placeholders'):
+            raise TypeError('%s encoder does not support streaming inference.' %
+                            self.encoder_type)
+
+        initial_state = self.encoder.create_state_placeholders(
+            tf.shape(inputs)[0])
+        logits = self._build(inputs, inputs_seq_len,
+                             keep_prob=1.0, is_training=False,
+                             initial_state=initial_state)
+        return logits, initial_state, self.encoder_final_state
+
+    def output_seq_len(self, inputs_seq_len):
+        """Compute the length of logits.
+        Args:
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            outputs_seq_len: A tensor of size `[B]`
+        """
+        if hasattr(self.encoder, 'output_seq_len'):
+            return self.encoder.output_seq_len(inputs_seq_len)
+        return inputs_seq_len
+
     def decoder(self, logits, inputs_seq_len, beam_width=1):
         """Operation for decoding.
         Args:
@@ -336,6 +494,7 @@ class CTC(ModelBase):
         assert beam_width >= 1, "beam_width must be >= 1"
 
         # inputs_seq_len = tf.cast(inputs_seq_len, tf.int32)
+        inputs_seq_len = self.output_seq_len(inputs_seq_len)
 
         if beam_width == 1:
             decoded, _ = tf.nn.ctc_greedy_decoder(
@@ -232,6 +232,20 @@ class MultitaskCTC(CTC):
         self.keep_prob_pl_list.append(
             tf.placeholder(tf.float32, name='keep_prob'))
 
+    def create_placeholders_inference(self):
+        """Create placeholders for inference and append them to list.
+           Label placeholders are not created.
+        """
+        self.inputs_pl_list.append(
+            tf.placeholder(tf.float32, shape=[None, None, self.input_size],
+                           name='input'))
+        self.inputs_seq_len_pl_list.append(
+            tf.placeholder(tf.int32, shape=[None], name='inputs_seq_len'))
+        # NOTE: keep_prob is not used in the inference graph, but it is
+        # created so that the same feed_dict can be used as in training
+        self.keep_prob_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[], name='keep_prob'))
+
     def compute_loss(self, inputs, labels_main, labels_sub, inputs_seq_len,
                      keep_prob, scope=None):
         """Operation for computing ctc loss.
@@ -324,6 +338,41 @@ class MultitaskCTC(CTC):
 
         return total_loss, logits_main, logits_sub
 
+    def build_inference(self, inputs, inputs_seq_len):
+        """Construct the forward path only. Neither the loss, weight decay
+           nor summaries are built.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            logits_main: A tensor of size `[T, B, num_classes]`
+            logits_sub: A tensor of size `[T, B, num_classes_sub]`
+        """
+        return self._build(inputs, inputs_seq_len, keep_prob=1.0)
+
+    def predict(self, inputs, inputs_seq_len, beam_width=1):
+        """Operation for decoding and computing posteriors in inference.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            beam_width (int, optional): beam width for beam search.
+                1 disables beam search, which mean greedy decoding.
+        Returns:
+            decode_op_main: operation for decoding of the main task
+            decode_op_sub: operation for decoding of the sub task
+            posteriors_op_main: operation for computing posteriors for each
+                class in the main task
+            posteriors_op_sub: operation for computing posteriors for each
+                class in the sub task
+        """
+        logits_main, logits_sub = self.build_inference(inputs, inputs_seq_len)
+        decode_op_main, decode_op_sub = self.decoder(
+            logits_main, logits_sub, inputs_seq_len, beam_width=beam_width)
+        posteriors_op_main, posteriors_op_sub = self.posteriors(
+            logits_main, logits_sub)
+        return (decode_op_main, decode_op_sub,
+                posteriors_op_main, posteriors_op_sub)
+
     def decoder(self, logits_main, logits_sub, inputs_seq_len, beam_width=1):
         """Operation for decoding.
         Args:
@@ -205,6 +205,21 @@ class StudentCTC(ModelBase):
         self.keep_prob_pl_list.append(
             tf.placeholder(tf.float32, name='keep_prob'))
 
+    def create_placeholders_inference(self):
+        """Create placeholders for CTC inference and append them to list.
+           Label placeholders are not created.
+        """
+        self.inputs_pl_list.append(
+            tf.placeholder(tf.float32,
+                           shape=[None, None, self.input_size * self.splice],
+                           name='input'))
+        self.inputs_seq_len_pl_list.append(
+            tf.placeholder(tf.int32, shape=[None], name='inputs_seq_len'))
+        # NOTE: keep_prob is not used in the inference graph, but it is
+        # created so that the same feed_dict can be used as in training
+        self.keep_prob_pl_list.append(
+            tf.placeholder_with_default(1.0, shape=[], name='keep_prob'))
+
     def create_placeholders_xe(self):
         """Create placeholders for XE training and append them to list."""
         self.inputs_pl_list.append(
@@ -351,6 +366,114 @@ class StudentCTC(ModelBase):
 
         return total_loss, logits
 
+    def compute_distillation_loss(self, inputs, inputs_seq_len,
+                                  teacher_outputs, keep_prob, scope=None,
+                                  teacher_temperature=1, softmax_temperature=1,
+                                  num_frames=None, is_training=True):
+        """Operation for computing distillation loss from outputs of the
+           teacher computed for the same mini-batch. The frame-level XE loss
+           is used for XE encoders, and the CTC loss for the hypotheses of the
+           teacher is used for CTC encoders.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            teacher_outputs (dict): A dictionary of outputs of the teacher.
+                `posteriors` of size `[B, T, num_classes]` is used for XE
+                encoders, and `decoded_indices`, `decoded_values` and
+                `decoded_shape` are used for CTC encoders.
+            keep_prob (placeholder, float): A probability to keep nodes
+                in the hidden-hidden connection
+            scope (optional): A scope in the model tower
+            teacher_temperature (int, optional): temperature parameter for
+                soft targets of the teacher
+            softmax_temperature (int, optional): temperature parameter for
+                ths softmax layer in the student training stage
+            num_frames (int, optional): the number of frames sampled from the
+                mini-batch for XE encoders. Default is all frames.
+            is_training (bool, optional):
+        Returns:
+            total_loss: operation for computing total loss.
+                 This is a single scalar tensor to minimize.
+            logits: A tensor of size `[B, num_classes]` for XE encoders,
+                `[T, B, num_classes]` for CTC encoders
+        """
+        if self.encoder_type in ['student_cnn', 'student_cnn_compact']:
+            # Hypotheses of the teacher are used as labels
+            labels = tf.SparseTensor(
+                tf.stop_gradient(teacher_outputs['decoded_indices']),
+                tf.stop_gradient(teacher_outputs['decoded_values']),
+                tf.stop_gradient(teacher_outputs['decoded_shape']))
+            return self.compute_ctc_loss(
+                inputs, labels, inputs_seq_len, keep_prob, scope,
+                softmax_temperature=softmax_temperature,
+                is_training=is_training)
+
+        # Flatten valid frames: `[N, input_size]`, `[N, num_classes]`
+        mask = tf.sequence_mask(inputs_seq_len, maxlen=tf.shape(inputs)[1])
+        inputs_2d = tf.boolean_mask(inputs, mask)
+        posteriors_2d = tf.boolean_mask(teacher_outputs['posteriors'], mask)
+
+        if num_frames is not None:
+            # Sample frames to decorrelate the mini-batch
+            indices = tf.random_shuffle(tf.range(tf.shape(inputs_2d)[0]))
+            indices = indices[:num_frames]
+            inputs_2d = tf.gather(inputs_2d, indices)
+            posteriors_2d = tf.gather(posteriors_2d, indices)
+
+        # NOTE: softmax(log(p) / T) is equal to softmax(logits / T)
+        soft_targets = posteriors_2d
+        if teacher_temperature != 1:
+            soft_targets = tf.nn.softmax(
+                tf.log(tf.maximum(posteriors_2d, 1e-20)) / teacher_temperature)
+        soft_targets = tf.stop_gradient(soft_targets)
+
+        return self.compute_xe_loss(
+            inputs_2d, soft_targets, keep_prob, scope,
+            softmax_temperature=softmax_temperature,
+            is_training=is_training)
+
+    def build_inference(self, inputs, inputs_seq_len, softmax_temperature=1):
+        """Construct the forward path of the CTC model only. Neither the loss,
+           weight decay nor summaries are built.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            softmax_temperature (int, optional): temperature parameter for
+                ths softmax layer
+        Returns:
+            logits: A tensor of size `[T, B, num_classes]`
+        """
+        if self.encoder_type in ['student_cnn_xe', 'student_cnn_compact_xe']:
+            raise ValueError('%s encoder is not a CTC encoder.' %
+                             self.encoder_type)
+
+        logits = self._build_ctc(inputs, inputs_seq_len,
+                                 keep_prob=1.0, is_training=False)
+        if softmax_temperature != 1:
+            logits /= softmax_temperature
+        return logits
+
+    def predict(self, inputs, inputs_seq_len, beam_width=1,
+                softmax_temperature=1):
+        """Operation for decoding and computing posteriors in inference.
+        Args:
+            inputs: A tensor of size `[B, T, input_size]`
+            inputs_seq_len: A tensor of size `[B]`
+            beam_width (int, optional): beam width for beam search.
+                1 disables beam search, which mean greedy decoding.
+            softmax_temperature (int, optional): temperature parameter for
+                ths softmax layer
+        Returns:
+            decode_op: A SparseTensor
+            posteriors_op: operation for computing posteriors for each class
+        """
+        logits = self.build_inference(inputs, inputs_seq_len,
+                                      softmax_temperature=softmax_temperature)
+        decode_op = self.decoder(logits, inputs_seq_len,
+                                 beam_width=beam_width)
+        posteriors_op = self.posteriors(logits)
+        return decode_op, posteriors_op
+
     def decoder(self, logits, inputs_seq_len, beam_width=1):
         """Operation for decoding.
         Args:
@@ -9,6 +9,8 @@ from __future__ import print_function
 
 import tensorflow as tf
 
+from models.encoders.core.rnn_util import lstm_block_cell_getter, fused_lstm, subsample, reduce_seq_len
+
 
 class BLSTMEncoder(object):
     """Bidirectional LSTM encoder.
@@ -20,7 +22,7 @@ class BLSTMEncoder(object):
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
         use_peephole (bool): if True, use peephole
@@ -29,6 +31,12 @@ class BLSTMEncoder(object):
         clip_activation (float): the range of activation clipping (> 0)
         time_major (bool, optional): if True, time-major computation will be
             performed
+        subsample_list (list, optional): the factor of subsampling after
+            each layer. Default is None, which means no subsampling.
+        subsample_type (string, optional): the way of subsampling.
+                - concat: concatenate consecutive frames
+                - max_pool: strided max-pooling over time
+                - conv: strided 1-D convolution over time
         name (string, optional): the name of encoder
     """
 
@@ -41,12 +49,14 @@ class BLSTMEncoder(object):
                  parameter_init,
                  clip_activation,
                  time_major=True,
+                 subsample_list=None,
+                 subsample_type='concat',
                  name='lstm_encoder'):
 
         assert num_proj != 0
 
         self.num_units = num_units
-        if lstm_impl != 'LSTMCell':
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
             self.num_proj = None
         else:
             self.num_proj = num_proj
@@ -56,6 +66,15 @@ class BLSTMEncoder(object):
         self.use_peephole = use_peephole
         self.parameter_init = parameter_init
         self.clip_activation = clip_activation
+        if subsample_list is not None:
+            if len(subsample_list) != num_layers:
+                raise ValueError(
+                    'subsample_list must have the factor of each layer.')
+            if lstm_impl == 'CudnnLSTM':
+                raise ValueError('CudnnLSTM does not support subsampling.')
+            subsample_list = [int(factor) for factor in subsample_list]
+        self.subsample_list = subsample_list
+        self.subsample_type = subsample_type
         self.time_major = time_major
         self.name = name
 
@@ -71,7 +90,9 @@ class BLSTMEncoder(object):
             outputs: Encoder states.
                 if time_major is True, a tensor of size
                     `[T, B, num_units (num_proj)]`
-                otherwise, `[B, T, num_units (num_proj)]`
+                otherwise, `[B, T, num_units (num_proj)]`.
+                T is reduced when subsample_list is given. Use
+                `output_seq_len()` for the length of each sequence.
             final_state: A final hidden state of the encoder
         """
         # inputs = tf.nn.dropout(inputs, keep_prob)
@@ -83,28 +104,36 @@ class BLSTMEncoder(object):
             outputs, final_state = basiclstmcell(
                 self.num_units, self.num_layers,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMCell':
             outputs, final_state = lstmcell(
                 self.num_units, self.num_proj, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMBlockCell':
             outputs, final_state = lstmblockcell(
                 self.num_units, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMBlockFusedCell':
             outputs, final_state = lstmblockfusedcell(
-                self.num_units, self.num_layers,
+                self.num_units, self.num_proj, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'CudnnLSTM':
             outputs, final_state = cudnnlstm(
@@ -120,10 +149,23 @@ class BLSTMEncoder(object):
 
         return outputs, final_state
 
+    def output_seq_len(self, inputs_seq_len):
+        """Compute the length of outputs of the encoder.
+        Args:
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            outputs_seq_len: A tensor of size `[B]`
+        """
+        if self.subsample_list is not None:
+            for factor in self.subsample_list:
+                inputs_seq_len = reduce_seq_len(inputs_seq_len, factor)
+        return inputs_seq_len
+
 
 def basiclstmcell(num_units, num_layers,
                   inputs, inputs_seq_len, keep_prob,
-                  initializer, time_major, num_layers_sub=None):
+                  initializer, time_major, num_layers_sub=None,
+                  subsample_list=None, subsample_type='concat'):
     """
     Args:
         num_units (int): the number of units in each layer
@@ -135,6 +177,9 @@ def basiclstmcell(num_units, num_layers,
         initializer ():
         time_major (bool): if True, time-major computation will be performed
         num_layers_sub (int, optional): the number of layers of the sub task
+        subsample_list (list, optional): the factor of subsampling after
+            each layer
+        subsample_type (string, optional): concat or max_pool or conv
     """
     if time_major:
         # Convert form batch-major to time-major
@@ -178,6 +223,11 @@ def basiclstmcell(num_units, num_layers,
                 outputs_sub = outputs
                 final_state_sub = final_state
 
+            if subsample_list is not None:
+                outputs, inputs_seq_len = subsample(
+                    outputs, inputs_seq_len, subsample_list[i_layer - 1],
+                    subsample_type, time_major)
+
     if num_layers_sub is not None:
         return outputs, final_state, outputs_sub, final_state_sub
     else:
@@ -187,7 +237,8 @@ def basiclstmcell(num_units, num_layers,
 def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
              inputs, inputs_seq_len, keep_prob,
              initializer, time_major,
-             num_layers_sub=None):
+             num_layers_sub=None, subsample_list=None,
+             subsample_type='concat'):
     """
     Args:
         num_units (int): the number of units in each layer
@@ -202,6 +253,9 @@ def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
         initializer ():
         time_major (bool): if True, time-major computation will be performed
         num_layers_sub (int, optional): the number of layers of the sub task
+        subsample_list (list, optional): the factor of subsampling after
+            each layer
+        subsample_type (string, optional): concat or max_pool or conv
     """
     if time_major:
         # Convert form batch-major to time-major
@@ -249,6 +303,11 @@ def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
                 outputs_sub = outputs
                 final_state_sub = final_state
 
+            if subsample_list is not None:
+                outputs, inputs_seq_len = subsample(
+                    outputs, inputs_seq_len, subsample_list[i_layer - 1],
+                    subsample_type, time_major)
+
     if num_layers_sub is not None:
         return outputs, final_state, outputs_sub, final_state_sub
     else:
@@ -258,7 +317,8 @@ def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
 def lstmblockcell(num_units, num_layers, use_peephole, clip_activation,
                   inputs, inputs_seq_len, keep_prob,
                   initializer, time_major,
-                  num_layers_sub=None):
+                  num_layers_sub=None, subsample_list=None,
+                  subsample_type='concat'):
     """
     Args:
         num_units (int): the number of units in each layer
@@ -273,6 +333,9 @@ def lstmblockcell(num_units, num_layers, use_peephole, clip_activation,
         initializer ():
         time_major (bool): if True, time-major computation will be performed
         num_layers_sub (int, optional): the number of layers of the sub task
+        subsample_list (list, optional): the factor of subsampling after
+            each layer
+        subsample_type (string, optional): concat or max_pool or conv
     """
     if time_major:
         # Convert form batch-major to time-major
@@ -326,20 +389,27 @@ def lstmblockcell(num_units, num_layers, use_peephole, clip_activation,
                 outputs_sub = outputs
                 final_state_sub = final_state
 
+            if subsample_list is not None:
+                outputs, inputs_seq_len = subsample(
+                    outputs, inputs_seq_len, subsample_list[i_layer - 1],
+                    subsample_type, time_major)
+
     if num_layers_sub is not None:
         return outputs, final_state, outputs_sub, final_state_sub
     else:
         return outputs, final_state
 
 
-def lstmblockfusedcell(num_units, num_layers, use_peephole, clip_activation,
-                       inputs, inputs_seq_len, keep_prob,
-                       initializer, time_major,
-                       num_layers_sub=None):
+def lstmblockfusedcell(num_units, num_proj, num_layers, use_peephole,
+                       clip_activation, inputs, inputs_seq_len, keep_prob,
+                       initializer, time_major, num_layers_sub=None,
+                       subsample_list=None, subsample_type='concat'):
     """
     Args:
         num_units (int): the number of units in each layer
-        num_proj (int):
+        num_proj (int): the number of nodes in the projection layer. Outputs
+            of each direction are projected linearly (not recurrently) if
+            not None.
         num_layers (int): the number of layers
         use_peephole (bool):
         clip_activation (float):
@@ -350,59 +420,61 @@ def lstmblockfusedcell(num_units, num_layers, use_peephole, clip_activation,
         initializer ():
         time_major (bool): if True, time-major computation will be performed
         num_layers_sub (int, optional): the number of layers of the sub task
+        subsample_list (list, optional): the factor of subsampling after
+            each layer
+        subsample_type (string, optional): concat or max_pool or conv
     """
-    # TODO: add time-major
-
-    outputs = inputs
+    # NOTE: the fused kernel is always time-major
+    outputs = tf.transpose(inputs, [1, 0, 2])
     for i_layer in range(1, num_layers + 1, 1):
+        # NOTE: variables are shared with LSTMBlockCell
         with tf.variable_scope('blstm_hidden' + str(i_layer),
-                               initializer=initializer) as scope:
+                               initializer=initializer,
+                               custom_getter=lstm_block_cell_getter):
+
+            with tf.variable_scope('fw'):
+                outputs_fw, final_state_fw = fused_lstm(
+                    num_units, outputs, inputs_seq_len,
+                    use_peephole, clip_activation)
+            with tf.variable_scope('bw'):
+                outputs_bw, final_state_bw = fused_lstm(
+                    num_units, outputs, inputs_seq_len,
+                    use_peephole, clip_activation, reverse=True)
+            final_state = (final_state_fw, final_state_bw)
+
+            if num_proj is not None:
+                outputs_fw = tf.contrib.layers.fully_connected(
+                    outputs_fw, num_outputs=num_proj, activation_fn=None,
+                    biases_initializer=None, scope='fw/projection')
+                outputs_bw = tf.contrib.layers.fully_connected(
+                    outputs_bw, num_outputs=num_proj, activation_fn=None,
+                    biases_initializer=None, scope='bw/projection')
 
-            if tf.__version__ == '1.3.0':
-                lstm_fw = tf.contrib.rnn.LSTMBlockFusedCell(
-                    num_units,
-                    forget_bias=1.0,
-                    cell_clip=clip_activation,
-                    use_peephole=use_peephole)
-                lstm_bw = tf.contrib.rnn.LSTMBlockFusedCell(
-                    num_units,
-                    forget_bias=1.0,
-                    cell_clip=clip_activation,
-                    use_peephole=use_peephole)
-            else:
-                lstm_fw = tf.contrib.rnn.LSTMBlockFusedCell(
-                    num_units,
-                    forget_bias=1.0,
-                    use_peephole=use_peephole)
-                lstm_bw = tf.contrib.rnn.LSTMBlockFusedCell(
-                    num_units,
-                    forget_bias=1.0,
-                    use_peephole=use_peephole)
-
-            lstm_bw = tf.contrib.rnn.TimeReversedFusedRNN(lstm_bw)
+            # Dropout for the hidden-hidden connections
+            outputs_fw = tf.nn.dropout(outputs_fw, keep_prob)
+            outputs_bw = tf.nn.dropout(outputs_bw, keep_prob)
 
-            with tf.variable_scope("lstm_fw") as scope:
-                outputs_fw, final_state_fw = lstm_fw(
-                    outputs, dtype=tf.float32,
-                    sequence_length=inputs_seq_len, scope=scope)
-            with tf.variable_scope("lstm_bw") as scope:
-                outputs_bw, final_state_bw = lstm_bw(
-                    outputs, dtype=tf.float32,
-                    sequence_length=inputs_seq_len, scope=scope)
-            final_state = tf.contrib.rnn.LSTMStateTuple(
-                h=final_state_fw, c=final_state_bw)
+            outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
 
-            # TODO: add dropout
+            if num_layers_sub is not None and i_layer == num_layers_sub:
+                outputs_sub = outputs
+                final_state_sub = final_state
 
-            outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
+            if subsample_list is not None:
+                outputs, inputs_seq_len = subsample(
+                    outputs, inputs_seq_len, subsample_list[i_layer - 1],
+                    subsample_type, time_major=True)
 
-            # if self.num_proj > 0:
-            #     outputs = tf.contrib.layers.fully_connected(
-            #         activation_fn=None, inputs=outputs,
-            #         num_outputs=self.num_proj, scope="projection")
-            # TODO: add projection layers
+    if not time_major:
+        # Convert form time-major to batch-major
+        outputs = tf.transpose(outputs, [1, 0, 2])
+        if num_layers_sub is not None:
+            outputs_sub = tf.transpose(outputs_sub, [1, 0, 2])
 
-    return outputs, final_state
+    if num_layers_sub is not None:
+        return outputs, final_state, outputs_sub, final_state_sub
+    else:
+        return outputs, final_state
 
 
 def cudnnlstm(num_units, num_layers, parameter_init,
@@ -63,7 +63,7 @@ class CLDNNEncoder(object):
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
         use_peephole (bool): if True, use peephole
@@ -96,7 +96,7 @@ class CLDNNEncoder(object):
         self.splice = splice
         self.num_stack = num_stack
         self.num_units = num_units
-        if lstm_impl != 'LSTMCell':
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
             self.num_proj = None
         else:
             self.num_proj = num_proj
@@ -213,7 +213,8 @@ class CLDNNEncoder(object):
 
         elif self.lstm_impl == 'LSTMBlockFusedCell':
             outputs, final_state = lstmblockfusedcell(
-                self.num_units, self.num_layers,
+                self.num_units, self.num_proj, self.num_layers,
+                self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
                 self.time_major)
 
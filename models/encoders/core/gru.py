@@ -31,7 +31,8 @@ class GRUEncoder(object):
         self.time_major = time_major
         self.name = name
 
-    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training):
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training,
+                 initial_state=None):
         """Construct model graph.
         Args:
             inputs (placeholder): A tensor of size`[B, T, input_size]`
@@ -39,9 +40,13 @@ class GRUEncoder(object):
             keep_prob (placeholder, float): A probability to keep nodes
                 in the hidden-hidden connection
             is_training (bool):
+            initial_state (tuple, optional): initial states of each layer,
+                which are carried over from the previous chunk in streaming
+                inference. See `create_state_placeholders()`.
+                Default is zero states.
         Returns:
             outputs: Encoder states, a tensor of size `[T, B, num_units]`
-            final_state: A final hidden state of the encoder
+            final_state: A tuple of final states of each layer
         """
         if self.time_major:
             # Convert form batch-major to time-major
@@ -72,12 +77,29 @@ class GRUEncoder(object):
                 cell=stacked_gru,
                 inputs=inputs,
                 sequence_length=inputs_seq_len,
+                initial_state=initial_state,
                 dtype=tf.float32,
                 time_major=self.time_major)
             # NOTE: initial states are zero states by default
 
         return outputs, final_state
 
+    def create_state_placeholders(self, batch_size):
+        """Create placeholders of initial states of each layer for streaming
+           inference. Zero states are used unless they are fed.
+        Args:
+            batch_size: A scalar tensor
+        Returns:
+            initial_state: A tuple of tensors of size `[B, num_units]`
+        """
+        initial_state = []
+        for i_layer in range(1, self.num_layers + 1, 1):
+            initial_state.append(tf.placeholder_with_default(
+                tf.zeros([batch_size, self.num_units]),
+                shape=[None, self.num_units],
+                name='initial_state' + str(i_layer)))
+        return tuple(initial_state)
+
 
 class BGRUEncoder(object):
     """Bidirectional GRU encoder.
@@ -0,0 +1,334 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Latency-controlled bidirectional LSTM encoder.
+   See details in https://arxiv.org/abs/1510.08983.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+
+class LCBLSTMEncoder(object):
+    """Latency-controlled bidirectional LSTM encoder. Each utterance is
+       split into chunks. The forward LSTM carries its state across chunks,
+       and the backward LSTM runs over each chunk plus a fixed number of
+       right context frames from zero state. The context frames are passed
+       through all layers, and only outputs of the chunk are kept.
+    Args:
+        num_units (int): the number of units in each layer
+        num_proj (int): the number of nodes in the projection layer
+        num_layers (int): the number of layers
+        lstm_impl (string, optional): a base implementation of LSTM.
+                - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
+                - LSTMCell: tf.contrib.rnn.LSTMCell
+                - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
+            Choose the background implementation of tensorflow.
+        use_peephole (bool): if True, use peephole
+        parameter_init (float): the range of uniform distribution to
+            initialize weight parameters (>= 0)
+        clip_activation (float): the range of activation clipping (> 0)
+        chunk_size (int): the number of frames in each chunk
+        right_context (int): the number of future frames for the backward
+            LSTM of each chunk
+        time_major (bool, optional): if True, time-major computation will be
+            performed
+        name (string, optional): the name of encoder
+    """
+
+    def __init__(self,
+                 num_units,
+                 num_proj,
+                 num_layers,
+                 lstm_impl,
+                 use_peephole,
+                 parameter_init,
+                 clip_activation,
+                 chunk_size,
+                 right_context,
+                 time_major=False,
+                 name='lc_blstm_encoder'):
+
+        assert num_proj != 0
+        if lstm_impl not in ['BasicLSTMCell', 'LSTMCell', 'LSTMBlockCell']:
+            raise ValueError(
+                'lstm_impl is "BasicLSTMCell" or "LSTMCell" or ' +
+                '"LSTMBlockCell".')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be larger than 0.')
+        if right_context < 0:
+            raise ValueError('right_context must not be a negative value.')
+
+        self.num_units = num_units
+        if lstm_impl != 'LSTMCell':
+            self.num_proj = None
+        else:
+            self.num_proj = num_proj
+        self.num_layers = num_layers
+        self.lstm_impl = lstm_impl
+        self.use_peephole = use_peephole
+        self.parameter_init = parameter_init
+        self.clip_activation = clip_activation
+        self.chunk_size = int(chunk_size)
+        self.right_context = int(right_context)
+        self.time_major = time_major
+        self.name = name
+
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training,
+                 initial_state=None):
+        """Construct model graph.
+        Args:
+            inputs (placeholder): A tensor of size`[B, T, input_size]`
+            inputs_seq_len (placeholder): A tensor of size` [B]`
+            keep_prob (placeholder, float): A probability to keep nodes
+                in the hidden-hidden connection
+            is_training (bool):
+            initial_state (tuple, optional): initial states of the forward
+                LSTM of each layer. If given, inputs are regarded as a single
+                chunk for streaming inference: the first chunk_size frames
+                are the chunk and the rest (up to right_context frames) are
+                the right context. See `create_state_placeholders()`.
+        Returns:
+            outputs: Encoder states.
+                if time_major is True, a tensor of size
+                    `[T, B, num_units (num_proj) * 2]`
+                otherwise, `[B, T, num_units (num_proj) * 2]`.
+                In streaming inference, T is min(T, chunk_size).
+            final_state: A tuple of final states of the forward LSTM of each
+                layer. In streaming inference, these are the states at the
+                end of the chunk, which should be fed to initial_state for
+                the next chunk.
+        """
+        initializer = tf.random_uniform_initializer(
+            minval=-self.parameter_init, maxval=self.parameter_init)
+
+        if initial_state is None:
+            initial_state = [None] * self.num_layers
+            max_time = tf.shape(inputs)[1]
+            chunk_seq_len = inputs_seq_len
+        else:
+            max_time = tf.minimum(tf.shape(inputs)[1], self.chunk_size)
+            chunk_seq_len = tf.minimum(inputs_seq_len, self.chunk_size)
+
+        batch_size = tf.shape(inputs)[0]
+        num_chunks = (max_time + self.chunk_size - 1) // self.chunk_size
+
+        # Gather right context frames of each chunk
+        # `[num_chunks, right_context]`
+        context_indices = tf.expand_dims(
+            tf.range(num_chunks) * self.chunk_size + self.chunk_size, axis=1) + \
+            tf.expand_dims(tf.range(self.right_context), axis=0)
+        num_pad = tf.maximum(
+            num_chunks * self.chunk_size + self.right_context - tf.shape(inputs)[1], 0)
+        inputs_padded = tf.pad(inputs, [[0, 0], [0, num_pad], [0, 0]])
+        # `[num_chunks, right_context, B, input_size]`
+        context = tf.gather(tf.transpose(inputs_padded, [1, 0, 2]),
+                            context_indices)
+        # `[B * num_chunks, right_context, input_size]`
+        context = tf.reshape(
+            tf.transpose(context, [2, 0, 1, 3]),
+            [batch_size * num_chunks, self.right_context,
+             inputs.shape.as_list()[-1]])
+
+        # `[B * num_chunks]`
+        chunk_offsets = tf.range(num_chunks) * self.chunk_size
+        chunk_len = tf.reshape(tf.clip_by_value(
+            tf.expand_dims(chunk_seq_len, axis=1) - chunk_offsets,
+            0, self.chunk_size), [-1])
+        context_len = tf.reshape(tf.clip_by_value(
+            tf.expand_dims(inputs_seq_len, axis=1) - chunk_offsets - self.chunk_size,
+            0, self.right_context), [-1])
+
+        # Hidden layers
+        outputs = inputs[:, :max_time]
+        final_state = []
+        for i_layer in range(1, self.num_layers + 1, 1):
+            with tf.variable_scope('blstm_hidden' + str(i_layer),
+                                   initializer=initializer):
+                outputs, context, final_state_layer = lc_blstm_layer(
+                    outputs, chunk_seq_len, context, chunk_len, context_len,
+                    self._lstm_cell(), self._lstm_cell(),
+                    self.chunk_size, keep_prob, initial_state[i_layer - 1])
+                final_state.append(final_state_layer)
+
+        if self.time_major:
+            # Convert form batch-major to time-major
+            outputs = tf.transpose(outputs, [1, 0, 2])
+
+        return outputs, tuple(final_state)
+
+    def _lstm_cell(self):
+        if self.lstm_impl == 'BasicLSTMCell':
+            return tf.contrib.rnn.BasicLSTMCell(
+                self.num_units,
+                forget_bias=1.0,
+                state_is_tuple=True,
+                activation=tf.tanh)
+        elif self.lstm_impl == 'LSTMCell':
+            return tf.contrib.rnn.LSTMCell(
+                self.num_units,
+                use_peepholes=self.use_peephole,
+                cell_clip=self.clip_activation,
+                num_proj=self.num_proj,
+                forget_bias=1.0,
+                state_is_tuple=True)
+        elif tf.__version__ == '1.3.0':
+            return tf.contrib.rnn.LSTMBlockCell(
+                self.num_units,
+                forget_bias=1.0,
+                clip_cell=self.clip_activation,
+                use_peephole=self.use_peephole)
+        else:
+            return tf.contrib.rnn.LSTMBlockCell(
+                self.num_units,
+                forget_bias=1.0,
+                use_peephole=self.use_peephole)
+
+    def create_state_placeholders(self, batch_size):
+        """Create placeholders of initial states of the forward LSTM of each
+           layer for streaming inference. Zero states are used unless they
+           are fed.
+        Args:
+            batch_size: A scalar tensor
+        Returns:
+            initial_state: A tuple of `LSTMStateTuple` of each layer
+        """
+        h_size = self.num_units if self.num_proj is None else self.num_proj
+
+        initial_state = []
+        for i_layer in range(1, self.num_layers + 1, 1):
+            c = tf.placeholder_with_default(
+                tf.zeros([batch_size, self.num_units]),
+                shape=[None, self.num_units],
+                name='initial_c' + str(i_layer))
+            h = tf.placeholder_with_default(
+                tf.zeros([batch_size, h_size]),
+                shape=[None, h_size],
+                name='initial_h' + str(i_layer))
+            initial_state.append(tf.contrib.rnn.LSTMStateTuple(c, h))
+        return tuple(initial_state)
+
+
+class StateOutputWrapper(tf.contrib.rnn.RNNCell):
+    """Output states `(c, h)` of a LSTM cell at each timestep, so that states
+       at boundaries of chunks can be gathered.
+    Args:
+        cell: A LSTM cell whose state is `LSTMStateTuple`
+    """
+
+    def __init__(self, cell):
+        super(StateOutputWrapper, self).__init__()
+        self._cell = cell
+
+    @property
+    def state_size(self):
+        return self._cell.state_size
+
+    @property
+    def output_size(self):
+        return self._cell.state_size.c + self._cell.state_size.h
+
+    def __call__(self, inputs, state, scope=None):
+        _, new_state = self._cell(inputs, state, scope=scope)
+        return tf.concat([new_state.c, new_state.h], axis=1), new_state
+
+
+def lc_blstm_layer(inputs, inputs_seq_len, context, chunk_len, context_len,
+                   lstm_fw, lstm_bw, chunk_size, keep_prob,
+                   initial_state=None):
+    """A latency-controlled BLSTM layer.
+    Args:
+        inputs: A tensor of size `[B, T, input_size]`
+        inputs_seq_len: A tensor of size `[B]`
+        context: A tensor of size `[B * num_chunks, right_context, input_size]`,
+            inputs of right context frames of each chunk
+        chunk_len: A tensor of size `[B * num_chunks]`
+        context_len: A tensor of size `[B * num_chunks]`
+        lstm_fw: A LSTM cell of the forward direction
+        lstm_bw: A LSTM cell of the backward direction
+        chunk_size (int): the number of frames in each chunk
+        keep_prob (placeholder, float): A probability to keep nodes
+            in the hidden-hidden connection
+        initial_state (LSTMStateTuple, optional): the initial state of the
+            forward LSTM. Default is zero state.
+    Returns:
+        outputs: A tensor of size `[B, T, num_units * 2]`
+        context: A tensor of size `[B * num_chunks, right_context, num_units * 2]`
+        final_state: A final state of the forward LSTM
+    """
+    batch_size = tf.shape(inputs)[0]
+    max_time = tf.shape(inputs)[1]
+    input_size = inputs.shape.as_list()[-1]
+    num_chunks = (max_time + chunk_size - 1) // chunk_size
+    num_pad = num_chunks * chunk_size - max_time
+    c_size = lstm_fw.state_size.c
+    h_size = lstm_fw.state_size.h
+
+    with tf.variable_scope('fw') as scope:
+        # NOTE: the forward state is carried across chunks, which is the
+        # same as running over the whole sequence
+        states_fw, final_state = tf.nn.dynamic_rnn(
+            cell=StateOutputWrapper(lstm_fw),
+            inputs=inputs,
+            sequence_length=inputs_seq_len,
+            initial_state=initial_state,
+            dtype=tf.float32,
+            scope=scope)
+        outputs_fw = states_fw[:, :, c_size:]
+
+        # Continue from the state at the end of each chunk over the right
+        # context frames
+        # `[B, num_chunks * chunk_size, c_size + h_size]`
+        states_fw = tf.pad(states_fw, [[0, 0], [0, num_pad], [0, 0]])
+        states_fw = tf.reshape(
+            states_fw, [batch_size, num_chunks, chunk_size, c_size + h_size])
+        states_fw = tf.reshape(
+            states_fw[:, :, -1], [batch_size * num_chunks, c_size + h_size])
+        if context.shape.as_list()[1] == 0:
+            context_fw = tf.zeros([batch_size * num_chunks, 0, h_size])
+        else:
+            scope.reuse_variables()
+            context_fw, _ = tf.nn.dynamic_rnn(
+                cell=lstm_fw,
+                inputs=context,
+                sequence_length=context_len,
+                initial_state=tf.contrib.rnn.LSTMStateTuple(
+                    states_fw[:, :c_size], states_fw[:, c_size:]),
+                dtype=tf.float32,
+                scope=scope)
+
+    with tf.variable_scope('bw') as scope:
+        # Run over each chunk plus right context frames from zero state
+        # `[B * num_chunks, chunk_size + right_context, input_size]`
+        inputs_chunk = tf.pad(inputs, [[0, 0], [0, num_pad], [0, 0]])
+        inputs_chunk = tf.reshape(
+            inputs_chunk, [batch_size * num_chunks, chunk_size, input_size])
+        inputs_chunk = tf.concat([inputs_chunk, context], axis=1)
+        inputs_chunk_len = chunk_len + context_len
+
+        # NOTE: only valid frames are reversed
+        outputs_bw, _ = tf.nn.dynamic_rnn(
+            cell=lstm_bw,
+            inputs=tf.reverse_sequence(inputs_chunk, inputs_chunk_len,
+                                       seq_axis=1, batch_axis=0),
+            sequence_length=inputs_chunk_len,
+            dtype=tf.float32,
+            scope=scope)
+        outputs_bw = tf.reverse_sequence(outputs_bw, inputs_chunk_len,
+                                         seq_axis=1, batch_axis=0)
+        context_bw = outputs_bw[:, chunk_size:]
+        outputs_bw = tf.reshape(
+            outputs_bw[:, :chunk_size], [batch_size, num_chunks * chunk_size, h_size])
+        outputs_bw = outputs_bw[:, :max_time]
+
+    outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
+    context = tf.concat(axis=2, values=[context_fw, context_bw])
+
+    # Dropout for the hidden-hidden connections
+    outputs = tf.nn.dropout(outputs, keep_prob)
+    context = tf.nn.dropout(context, keep_prob)
+
+    return outputs, context, final_state
@@ -9,6 +9,8 @@ from __future__ import print_function
 
 import tensorflow as tf
 
+from models.encoders.core.rnn_util import lstm_block_cell_getter, fused_lstm, subsample, reduce_seq_len
+
 
 class LSTMEncoder(object):
     """Unidirectional LSTM encoder.
@@ -20,7 +22,7 @@ class LSTMEncoder(object):
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
         use_peephole (bool): if True, use peephole
@@ -29,6 +31,12 @@ class LSTMEncoder(object):
         clip_activation (float): the range of activation clipping (> 0)
         time_major (bool, optional): if True, time-major computation will be
             performed
+        subsample_list (list, optional): the factor of subsampling after
+            each layer. Default is None, which means no subsampling.
+        subsample_type (string, optional): the way of subsampling.
+                - concat: concatenate consecutive frames
+                - max_pool: strided max-pooling over time
+                - conv: strided 1-D convolution over time
         name (string, optional): the name of encoder
     """
 
@@ -41,12 +49,14 @@ class LSTMEncoder(object):
                  parameter_init,
                  clip_activation,
                  time_major=False,
+                 subsample_list=None,
+                 subsample_type='concat',
                  name='lstm_encoder'):
 
         assert num_proj != 0
 
         self.num_units = num_units
-        if lstm_impl != 'LSTMCell':
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
             self.num_proj = None
         else:
             self.num_proj = num_proj
@@ -56,10 +66,20 @@ class LSTMEncoder(object):
         self.use_peephole = use_peephole
         self.parameter_init = parameter_init
         self.clip_activation = clip_activation
+        if subsample_list is not None:
+            if len(subsample_list) != num_layers:
+                raise ValueError(
+                    'subsample_list must have the factor of each layer.')
+            if lstm_impl == 'CudnnLSTM':
+                raise ValueError('CudnnLSTM does not support subsampling.')
+            subsample_list = [int(factor) for factor in subsample_list]
+        self.subsample_list = subsample_list
+        self.subsample_type = subsample_type
         self.time_major = time_major
         self.name = name
 
-    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training):
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training,
+                 initial_state=None):
         """Construct model graph.
         Args:
             inputs (placeholder): A tensor of size`[B, T, input_size]`
@@ -67,12 +87,18 @@ class LSTMEncoder(object):
             keep_prob (placeholder, float): A probability to keep nodes
                 in the hidden-hidden connection
             is_training (bool):
+            initial_state (tuple, optional): initial states of each layer,
+                which are carried over from the previous chunk in streaming
+                inference. See `create_state_placeholders()`.
+                Default is zero states.
         Returns:
             outputs: Encoder states.
                 if time_major is True, a tensor of size
                     `[T, B, num_units (num_proj)]`
-                otherwise, `[B, T, num_units (num_proj)]`
-            final_state: A final hidden state of the encoder
+                otherwise, `[B, T, num_units (num_proj)]`.
+                T is reduced when subsample_list is given. Use
+                `output_seq_len()` for the length of each sequence.
+            final_state: A tuple of final states of each layer
         """
         initializer = tf.random_uniform_initializer(
             minval=-self.parameter_init, maxval=self.parameter_init)
@@ -81,27 +107,40 @@ class LSTMEncoder(object):
             outputs, final_state = basiclstmcell(
                 self.num_units, self.num_layers,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type,
+                initial_state=initial_state)
 
         elif self.lstm_impl == 'LSTMCell':
             outputs, final_state = lstmcell(
                 self.num_units, self.num_proj, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type,
+                initial_state=initial_state)
 
         elif self.lstm_impl == 'LSTMBlockCell':
             outputs, final_state = lstmblockcell(
                 self.num_units, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type,
+                initial_state=initial_state)
 
         elif self.lstm_impl == 'LSTMBlockFusedCell':
             outputs, final_state = lstmblockfusedcell(
-                self.num_units, self.num_layers,
+                self.num_units, self.num_proj, self.num_layers,
+                self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type,
+                initial_state=initial_state)
 
         elif self.lstm_impl == 'CudnnLSTM':
             outputs, final_state = cudnnlstm(
@@ -116,9 +155,50 @@ class LSTMEncoder(object):
 
         return outputs, final_state
 
+    def output_seq_len(self, inputs_seq_len):
+        """Compute the length of outputs of the encoder.
+        Args:
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            outputs_seq_len: A tensor of size `[B]`
+        """
+        if self.subsample_list is not None:
+            for factor in self.subsample_list:
+                inputs_seq_len = reduce_seq_len(inputs_seq_len, factor)
+        return inputs_seq_len
+
+    def create_state_placeholders(self, batch_size):
+        """Create placeholders of initial states of each layer for streaming
+           inference. Zero states are used unless they are fed.
+        Args:
+            batch_size: A scalar tensor
+        Returns:
+            initial_state: A tuple of `LSTMStateTuple` of each layer
+        """
+        # NOTE: only LSTMCell projects outputs recurrently
+        if self.lstm_impl == 'LSTMCell' and self.num_proj is not None:
+            h_size = self.num_proj
+        else:
+            h_size = self.num_units
+
+        initial_state = []
+        for i_layer in range(1, self.num_layers + 1, 1):
+            c = tf.placeholder_with_default(
+                tf.zeros([batch_size, self.num_units]),
+                shape=[None, self.num_units],
+                name='initial_c' + str(i_layer))
+            h = tf.placeholder_with_default(
+                tf.zeros([batch_size, h_size]),
+                shape=[None, h_size],
+                name='initial_h' + str(i_layer))
+            initial_state.append(tf.contrib.rnn.LSTMStateTuple(c, h))
+        return tuple(initial_state)
+
 
 def basiclstmcell(num_units, num_layers, inputs, inputs_seq_len,
-                  keep_prob, initializer, time_major, num_layers_sub=None):
+                  keep_prob, initializer, time_major, num_layers_sub=None,
+                  subsample_list=None, subsample_type='concat',
+                  initial_state=None):
 
     if time_major:
         # Convert form batch-major to time-major
@@ -143,19 +223,25 @@ def basiclstmcell(num_units, num_layers, inputs, inputs_seq_len,
             if num_layers_sub is not None and i_layer == num_layers_sub:
                 lstm_list_sub = lstm_list
 
-        # Stack multiple cells
-        stacked_lstm = tf.contrib.rnn.MultiRNNCell(
-            lstm_list, state_is_tuple=True)
+        if subsample_list is not None:
+            outputs, final_state = stacked_lstm_with_subsampling(
+                lstm_list, inputs, inputs_seq_len, time_major,
+                subsample_list, subsample_type, initial_state)
+        else:
+            # Stack multiple cells
+            stacked_lstm = tf.contrib.rnn.MultiRNNCell(
+                lstm_list, state_is_tuple=True)
 
-        # Ignore 2nd return (the last state)
-        outputs, final_state = tf.nn.dynamic_rnn(
-            cell=stacked_lstm,
-            inputs=inputs,
-            sequence_length=inputs_seq_len,
-            dtype=tf.float32,
-            time_major=time_major,
-            scope=scope)
-        # NOTE: initial states are zero states by default
+            # Ignore 2nd return (the last state)
+            outputs, final_state = tf.nn.dynamic_rnn(
+                cell=stacked_lstm,
+                inputs=inputs,
+                sequence_length=inputs_seq_len,
+                initial_state=initial_state,
+                dtype=tf.float32,
+                time_major=time_major,
+                scope=scope)
+            # NOTE: initial states are zero states by default
 
     if num_layers_sub is not None:
         with tf.variable_scope('multi_lstm', initializer=initializer, reuse=True) as scope:
@@ -178,7 +264,8 @@ def basiclstmcell(num_units, num_layers, inputs, inputs_seq_len,
 
 def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
              inputs, inputs_seq_len, keep_prob, initializer, time_major,
-             num_layers_sub=None):
+             num_layers_sub=None, subsample_list=None,
+             subsample_type='concat', initial_state=None):
 
     if time_major:
         # Convert form batch-major to time-major
@@ -205,19 +292,25 @@ def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
             if num_layers_sub is not None and i_layer == num_layers_sub:
                 lstm_list_sub = lstm_list
 
-        # Stack multiple cells
-        stacked_lstm = tf.contrib.rnn.MultiRNNCell(
-            lstm_list, state_is_tuple=True)
+        if subsample_list is not None:
+            outputs, final_state = stacked_lstm_with_subsampling(
+                lstm_list, inputs, inputs_seq_len, time_major,
+                subsample_list, subsample_type, initial_state)
+        else:
+            # Stack multiple cells
+            stacked_lstm = tf.contrib.rnn.MultiRNNCell(
+                lstm_list, state_is_tuple=True)
 
-        # Ignore 2nd return (the last state)
-        outputs, final_state = tf.nn.dynamic_rnn(
-            cell=stacked_lstm,
-            inputs=inputs,
-            sequence_length=inputs_seq_len,
-            dtype=tf.float32,
-            time_major=time_major,
-            scope=scope)
-        # NOTE: initial states are zero states by default
+            # Ignore 2nd return (the last state)
+            outputs, final_state = tf.nn.dynamic_rnn(
+                cell=stacked_lstm,
+                inputs=inputs,
+                sequence_length=inputs_seq_len,
+                initial_state=initial_state,
+                dtype=tf.float32,
+                time_major=time_major,
+                scope=scope)
+            # NOTE: initial states are zero states by default
 
     if num_layers_sub is not None:
         with tf.variable_scope('multi_lstm', initializer=initializer, reuse=True) as scope:
@@ -240,7 +333,8 @@ def lstmcell(num_units, num_proj, num_layers, use_peephole, clip_activation,
 
 def lstmblockcell(num_units, num_layers, use_peephole, clip_activation, inputs,
                   inputs_seq_len, keep_prob, initializer, time_major,
-                  num_layers_sub=None):
+                  num_layers_sub=None, subsample_list=None,
+                  subsample_type='concat', initial_state=None):
 
     if time_major:
         # Convert form batch-major to time-major
@@ -271,19 +365,25 @@ def lstmblockcell(num_units, num_layers, use_peephole, clip_activation, inputs,
             if num_layers_sub is not None and i_layer == num_layers_sub:
                 lstm_list_sub = lstm_list
 
-        # Stack multiple cells
-        stacked_lstm = tf.contrib.rnn.MultiRNNCell(
-            lstm_list, state_is_tuple=True)
+        if subsample_list is not None:
+            outputs, final_state = stacked_lstm_with_subsampling(
+                lstm_list, inputs, inputs_seq_len, time_major,
+                subsample_list, subsample_type, initial_state)
+        else:
+            # Stack multiple cells
+            stacked_lstm = tf.contrib.rnn.MultiRNNCell(
+                lstm_list, state_is_tuple=True)
 
-        # Ignore 2nd return (the last state)
-        outputs, final_state = tf.nn.dynamic_rnn(
-            cell=stacked_lstm,
-            inputs=inputs,
-            sequence_length=inputs_seq_len,
-            dtype=tf.float32,
-            time_major=time_major,
-            scope=scope)
-        # NOTE: initial states are zero states by default
+            # Ignore 2nd return (the last state)
+            outputs, final_state = tf.nn.dynamic_rnn(
+                cell=stacked_lstm,
+                inputs=inputs,
+                sequence_length=inputs_seq_len,
+                initial_state=initial_state,
+                dtype=tf.float32,
+                time_major=time_major,
+                scope=scope)
+            # NOTE: initial states are zero states by default
 
     if num_layers_sub is not None:
         with tf.variable_scope('multi_lstm', initializer=initializer, reuse=True) as scope:
@@ -304,10 +404,100 @@ def lstmblockcell(num_units, num_layers, use_peephole, clip_activation, inputs,
         return outputs, final_state
 
 
-def lstmblockfusedcell(num_units, num_layers, use_peephole, clip_activation,
-                       inputs, inputs_seq_len, keep_prob, initializer,
-                       time_major, num_layers_sub=None):
-    raise NotImplementedError
+def lstmblockfusedcell(num_units, num_proj, num_layers, use_peephole,
+                       clip_activation, inputs, inputs_seq_len, keep_prob,
+                       initializer, time_major, num_layers_sub=None,
+                       subsample_list=None, subsample_type='concat',
+                       initial_state=None):
+
+    # NOTE: the fused kernel is always time-major
+    outputs = tf.transpose(inputs, [1, 0, 2])
+    if initial_state is None:
+        initial_state = [None] * num_layers
+    # NOTE: variables are shared with LSTMBlockCell
+    with tf.variable_scope('multi_lstm', initializer=initializer,
+                           custom_getter=lstm_block_cell_getter):
+        final_state = []
+        for i_layer in range(1, num_layers + 1, 1):
+            with tf.variable_scope('multi_rnn_cell/cell_' + str(i_layer - 1)):
+                outputs, final_state_layer = fused_lstm(
+                    num_units, outputs, inputs_seq_len,
+                    use_peephole, clip_activation,
+                    initial_state=initial_state[i_layer - 1])
+                final_state.append(final_state_layer)
+
+                if num_proj is not None:
+                    outputs = tf.contrib.layers.fully_connected(
+                        outputs, num_outputs=num_proj, activation_fn=None,
+                        biases_initializer=None, scope='projection')
+
+                # Dropout for the hidden-hidden connections
+                outputs = tf.nn.dropout(outputs, keep_prob)
+
+                if subsample_list is not None:
+                    outputs, inputs_seq_len = subsample(
+                        outputs, inputs_seq_len, subsample_list[i_layer - 1],
+                        subsample_type, time_major=True)
+
+            if num_layers_sub is not None and i_layer == num_layers_sub:
+                outputs_sub = outputs
+                final_state_sub = tuple(final_state)
+        final_state = tuple(final_state)
+
+    if not time_major:
+        # Convert form time-major to batch-major
+        outputs = tf.transpose(outputs, [1, 0, 2])
+        if num_layers_sub is not None:
+            outputs_sub = tf.transpose(outputs_sub, [1, 0, 2])
+
+    if num_layers_sub is not None:
+        return outputs, final_state, outputs_sub, final_state_sub
+    else:
+        return outputs, final_state
+
+
+def stacked_lstm_with_subsampling(lstm_list, inputs, inputs_seq_len,
+                                  time_major, subsample_list,
+                                  subsample_type, initial_state=None):
+    """Run stacked LSTM layers one by one to subsample frames between
+       layers. Variables have the same names as those of MultiRNNCell.
+    Args:
+        lstm_list (list): LSTM cells of each layer
+        inputs: A tensor of size `[B, T, input_size]`
+            (`[T, B, input_size]` if time_major is True)
+        inputs_seq_len: A tensor of size `[B]`
+        time_major (bool): if True, time-major computation will be performed
+        subsample_list (list): the factor of subsampling after each layer
+        subsample_type (string): concat or max_pool or conv
+        initial_state (tuple, optional): initial states of each layer.
+            Default is zero states.
+    Returns:
+        outputs: A tensor of size `[B, T', num_units (num_proj)]`
+            (`[T', B, num_units (num_proj)]` if time_major is True)
+        final_state: A tuple of final states of each layer
+    """
+    if initial_state is None:
+        initial_state = [None] * len(lstm_list)
+
+    outputs = inputs
+    final_state = []
+    for i_layer, lstm in enumerate(lstm_list):
+        with tf.variable_scope('multi_rnn_cell/cell_' + str(i_layer)) as scope:
+            outputs, final_state_layer = tf.nn.dynamic_rnn(
+                cell=lstm,
+                inputs=outputs,
+                sequence_length=inputs_seq_len,
+                initial_state=initial_state[i_layer],
+                dtype=tf.float32,
+                time_major=time_major,
+                scope=scope)
+            final_state.append(final_state_layer)
+
+            outputs, inputs_seq_len = subsample(
+                outputs, inputs_seq_len, subsample_list[i_layer],
+                subsample_type, time_major)
+
+    return outputs, tuple(final_state)
 
 
 def cudnnlstm(num_units, num_layers, parameter_init,
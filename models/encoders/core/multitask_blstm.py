@@ -22,7 +22,7 @@ class MultitaskBLSTMEncoder(object):
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
         use_peephole (bool): if True, use peephole
@@ -49,7 +49,7 @@ class MultitaskBLSTMEncoder(object):
         assert num_proj != 0
 
         self.num_units = num_units
-        if lstm_impl != 'LSTMCell':
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
             self.num_proj = None
         else:
             self.num_proj = num_proj
@@ -106,7 +106,8 @@ class MultitaskBLSTMEncoder(object):
 
         elif self.lstm_impl == 'LSTMBlockFusedCell':
             outputs, final_state, outputs_sub, final_state_sub = lstmblockfusedcell(
-                self.num_units, self.num_layers_main,
+                self.num_units, self.num_proj, self.num_layers_main,
+                self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
                 self.time_major, self.num_layers_sub)
 
@@ -9,50 +9,72 @@ from __future__ import print_function
 
 import tensorflow as tf
 
+from models.encoders.core.blstm import basiclstmcell, lstmcell, lstmblockcell, lstmblockfusedcell
+from models.encoders.core.rnn_util import subsample, reduce_seq_len
+
 
 class PyramidBLSTMEncoder(object):
-    """Pyramidal bidirectional LSTM Encoder.
+    """Pyramidal bidirectional LSTM Encoder. Outputs of consecutive frames
+       are concatenated between layers, so that upper layers run on fewer
+       frames.
     Args:
         num_units (int): the number of units in each layer
+        num_proj (int): the number of nodes in the projection layer
         num_layers (int): the number of layers
         lstm_impl (string, optional): BasicLSTMCell or LSTMCell or
-            LSTMBlockCell or LSTMBlockFusedCell or CudnnLSTM.
+            LSTMBlockCell or LSTMBlockFusedCell.
             Choose the background implementation of tensorflow.
-            Default is LSTMBlockCell.
-        use_peephole (bool, optional): if True, use peephole
-        parameter_init (float, optional): the range of uniform distribution to
+        use_peephole (bool): if True, use peephole
+        parameter_init (float): the range of uniform distribution to
             initialize weight parameters (>= 0)
-        clip_activation (float, optional): the range of activation clipping (> 0)
-        # num_proj (int, optional): the number of nodes in the projection layer
-        concat (bool, optional):
+        clip_activation (float): the range of activation clipping (> 0)
+        subsample_list (list, optional): the factor of time reduction after
+            each layer. Default is 2 after each layer except for the last
+            layer (2x, 4x, 8x ... fewer frames in upper layers).
+        subsample_type (string, optional): concat or max_pool or conv.
+            Default is concat, which concatenates consecutive frames.
+        time_major (bool, optional): if True, time-major computation will be
+            performed
         name (string, optional): the name of encoder
     """
 
     def __init__(self,
                  num_units,
+                 num_proj,
                  num_layers,
                  lstm_impl,
                  use_peephole,
                  parameter_init,
                  clip_activation,
-                 num_proj,
-                 concat=False,
+                 subsample_list=None,
+                 subsample_type='concat',
+                 time_major=False,
                  name='pblstm_encoder'):
 
         assert num_proj != 0
-        assert num_units % 2 == 0, 'num_unit should be even number.'
 
         self.num_units = num_units
-        self.num_proj = None
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
+            self.num_proj = None
+        else:
+            self.num_proj = num_proj
         self.num_layers = num_layers
         self.lstm_impl = lstm_impl
         self.use_peephole = use_peephole
         self.parameter_init = parameter_init
         self.clip_activation = clip_activation
+        if subsample_list is None:
+            subsample_list = [2] * (num_layers - 1) + [1]
+        if len(subsample_list) != num_layers:
+            raise ValueError(
+                'subsample_list must have the factor of each layer.')
+        self.subsample_list = [int(factor) for factor in subsample_list]
+        self.subsample_type = subsample_type
+        self.time_major = time_major
         self.name = name
 
-    def _build(self, inputs, inputs_seq_len, keep_prob, is_training):
-        """Construct Pyramidal Bidirectional LSTM encoder.
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training):
+        """Construct model graph.
         Args:
             inputs (placeholder): A tensor of size`[B, T, input_size]`
             inputs_seq_len (placeholder): A tensor of size` [B]`
@@ -60,8 +82,13 @@ class PyramidBLSTMEncoder(object):
                 in the hidden-hidden connection
             is_training (bool):
         Returns:
-            outputs: Encoder states, a tensor of size
-                `[T, B, num_units (num_proj)]`
+            outputs: Encoder states.
+                if time_major is True, a tensor of size
+                    `[T', B, num_units (num_proj) * 2 * factor]`
+                otherwise, `[B, T', num_units (num_proj) * 2 * factor]`,
+                where T' is the length after time reduction and factor is
+                the last element of subsample_list (1 except for concat).
+                Use `output_seq_len()` for the length of each sequence.
             final_state: A final hidden state of the encoder
         """
         initializer = tf.random_uniform_initializer(
@@ -70,108 +97,57 @@ class PyramidBLSTMEncoder(object):
         # Hidden layers
         outputs = inputs
         for i_layer in range(1, self.num_layers + 1, 1):
-            with tf.variable_scope('pblstm_hidden' + str(i_layer),
-                                   initializer=initializer) as scope:
-
-                lstm_fw = tf.contrib.rnn.LSTMCell(
-                    self.num_units,
-                    use_peepholes=self.use_peephole,
-                    cell_clip=self.clip_activation,
-                    initializer=initializer,
-                    num_proj=None,
-                    forget_bias=1.0,
-                    state_is_tuple=True)
-                lstm_bw = tf.contrib.rnn.LSTMCell(
-                    self.num_units,
-                    use_peepholes=self.use_peephole,
-                    cell_clip=self.clip_activation,
-                    initializer=initializer,
-                    num_proj=self.num_proj,
-                    forget_bias=1.0,
-                    state_is_tuple=True)
-
-                # Dropout for the hidden-hidden connections
-                lstm_fw = tf.contrib.rnn.DropoutWrapper(
-                    lstm_fw, output_keep_prob=keep_prob)
-                lstm_bw = tf.contrib.rnn.DropoutWrapper(
-                    lstm_bw, output_keep_prob=keep_prob)
-
-                if i_layer > 0:
-                    # Convert to time-major: `[T, B, input_size]`
-                    outputs = tf.transpose(outputs, (1, 0, 2))
-                    max_time = tf.shape(outputs)[0]
-
-                    max_time_half = tf.floor(max_time / 2) + 1
-
-                    # Apply concat_fn to each tensor in outputs along
-                    # dimension 0 (times-axis)
-                    i_time = tf.constant(0)
-                    final_time, outputs, tensor_list = tf.while_loop(
-                        cond=lambda t, hidden, tensor_list: t < max_time,
-                        body=lambda t, hidden, tensor_list: self._concat_fn(
-                            t, hidden, tensor_list),
-                        loop_vars=[i_time, outputs, tf.Variable([])],
-                        shape_invariants=[i_time.get_shape(),
-                                          outputs.get_shape(),
-                                          tf.TensorShape([None])])
-
-                    outputs = tf.stack(tensor_list, axis=0)
-
-                    inputs_seq_len = tf.cast(tf.floor(
-                        tf.cast(inputs_seq_len, tf.float32) / 2),
-                        tf.int32)
-
-                    # Transpose to `[batch_size, time, input_size]`
-                    outputs = tf.transpose(outputs, (1, 0, 2))
-
-                (outputs_fw, outputs_bw), final_state = tf.nn.bidirectional_dynamic_rnn(
-                    cell_fw=lstm_fw,
-                    cell_bw=lstm_bw,
-                    inputs=outputs,
-                    sequence_length=inputs_seq_len,
-                    dtype=tf.float32,
-                    time_major=False,
-                    scope=scope)
-                # NOTE: initial states are zero states by default
-
-                # Concatenate each direction
-                outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
+            with tf.variable_scope('pblstm_hidden' + str(i_layer)):
+                if self.lstm_impl == 'BasicLSTMCell':
+                    outputs, final_state = basiclstmcell(
+                        self.num_units, 1,
+                        outputs, inputs_seq_len, keep_prob, initializer,
+                        time_major=False)
+
+                elif self.lstm_impl == 'LSTMCell':
+                    outputs, final_state = lstmcell(
+                        self.num_units, self.num_proj, 1,
+                        self.use_peephole, self.clip_activation,
+                        outputs, inputs_seq_len, keep_prob, initializer,
+                        time_major=False)
+
+                elif self.lstm_impl == 'LSTMBlockCell':
+                    outputs, final_state = lstmblockcell(
+                        self.num_units, 1,
+                        self.use_peephole, self.clip_activation,
+                        outputs, inputs_seq_len, keep_prob, initializer,
+                        time_major=False)
+
+                elif self.lstm_impl == 'LSTMBlockFusedCell':
+                    outputs, final_state = lstmblockfusedcell(
+                        self.num_units, self.num_proj, 1,
+                        self.use_peephole, self.clip_activation,
+                        outputs, inputs_seq_len, keep_prob, initializer,
+                        time_major=False)
+
+                else:
+                    raise IndexError(
+                        'lstm_impl is "BasicLSTMCell" or "LSTMCell" or ' +
+                        '"LSTMBlockCell" or "LSTMBlockFusedCell".')
+
+                # Subsample frames
+                outputs, inputs_seq_len = subsample(
+                    outputs, inputs_seq_len, self.subsample_list[i_layer - 1],
+                    self.subsample_type)
+
+        if self.time_major:
+            # Convert form batch-major to time-major
+            outputs = tf.transpose(outputs, [1, 0, 2])
 
         return outputs, final_state
 
-    def _concat_fn(self, current_time, x, tensor_list):
-        """Concatenate each 2 time steps to reduce time resolution.
+    def output_seq_len(self, inputs_seq_len):
+        """Compute the length of outputs of the encoder.
         Args:
-            current_time: The current timestep
-            x: A tensor of size `[max_time, batch_size, feature_dim]`
-            result: A tensor of size `[t, batch_size, feature_dim * 2]`
+            inputs_seq_len: A tensor of size `[B]`
         Returns:
-            current_time: current_time + 2
-            x: A tensor of size `[max_time, batch_size, feature_dim]`
-            result: A tensor of size `[t + 1, batch_size, feature_dim * 2]`
+            outputs_seq_len: A tensor of size `[B]`
         """
-        print(tensor_list)
-        print(current_time)
-        print('-----')
-
-        batch_size = tf.shape(x)[1]
-        feature_dim = x.get_shape().as_list()[2]
-
-        # Concat features in 2 timesteps
-        concat_x = tf.concat(
-            axis=0,
-            values=[tf.reshape(x[current_time],
-                               shape=[1, batch_size, feature_dim]),
-                    tf.reshape(x[current_time + 1],
-                               shape=[1, batch_size, feature_dim])])
-
-        # Reshape to `[1, batch_size, feature_dim * 2]`
-        concat_x = tf.reshape(concat_x,
-                              shape=[1, batch_size, feature_dim * 2])
-
-        tensor_list = tf.concat(axis=0, values=[tensor_list, [concat_x]])
-
-        # Skip 2 timesteps
-        current_time += 2
-
-        return current_time, x, tensor_list
+        for factor in self.subsample_list:
+            inputs_seq_len = reduce_seq_len(inputs_seq_len, factor)
+        return inputs_seq_len
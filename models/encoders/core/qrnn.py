@@ -0,0 +1,207 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""QRNN encoders.
+   See details in https://arxiv.org/abs/1611.01576.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+
+class QRNNEncoder(object):
+    """Unidirectional QRNN encoder. Gates of all timesteps are computed by a
+       single causal convolution, and only the element-wise fo-pooling is
+       recurrent.
+    Args:
+        num_units (int): the number of units in each layer
+        num_layers (int): the number of layers
+        parameter_init (float, optional): the range of uniform distribution to
+            initialize weight parameters (>= 0)
+        conv_width (int, optional): the width of the convolution filter
+        time_major (bool, optional): if True, time-major computation will be
+            performed
+        name (string, optional): the name of encoder
+    """
+
+    def __init__(self,
+                 num_units,
+                 num_layers,
+                 parameter_init,
+                 conv_width=2,
+                 time_major=False,
+                 name='qrnn_encoder'):
+
+        self.num_units = num_units
+        self.num_layers = num_layers
+        self.parameter_init = parameter_init
+        self.conv_width = conv_width
+        self.time_major = time_major
+        self.name = name
+
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training):
+        """Construct model graph.
+        Args:
+            inputs (placeholder): A tensor of size`[B, T, input_size]`
+            inputs_seq_len (placeholder): A tensor of size` [B]`
+            keep_prob (placeholder, float): A probability to keep nodes
+                in the hidden-hidden connection
+            is_training (bool):
+        Returns:
+            outputs: Encoder states.
+                if time_major is True, a tensor of size `[T, B, num_units]`
+                otherwise, `[B, T, num_units]`
+            final_state: A tuple of final cell states of each layer
+        """
+        initializer = tf.random_uniform_initializer(
+            minval=-self.parameter_init, maxval=self.parameter_init)
+
+        # Hidden layers
+        outputs = inputs
+        final_state = []
+        with tf.variable_scope('multi_qrnn', initializer=initializer):
+            for i_layer in range(1, self.num_layers + 1, 1):
+                with tf.variable_scope('qrnn_hidden' + str(i_layer)):
+                    outputs, final_state_layer = qrnn_layer(
+                        outputs, inputs_seq_len, self.num_units,
+                        self.conv_width)
+
+                    # Dropout for the hidden-hidden connections
+                    outputs = tf.nn.dropout(outputs, keep_prob)
+                    final_state.append(final_state_layer)
+
+        if self.time_major:
+            # Convert form batch-major to time-major
+            outputs = tf.transpose(outputs, [1, 0, 2])
+
+        return outputs, tuple(final_state)
+
+
+class BQRNNEncoder(object):
+    """Bidirectional QRNN encoder.
+    Args:
+        num_units (int): the number of units in each layer
+        num_layers (int): the number of layers
+        parameter_init (float, optional): the range of uniform distribution to
+            initialize weight parameters (>= 0)
+        conv_width (int, optional): the width of the convolution filter
+        time_major (bool, optional): if True, time-major computation will be
+            performed
+        name (string, optional): the name of the encoder
+    """
+
+    def __init__(self,
+                 num_units,
+                 num_layers,
+                 parameter_init,
+                 conv_width=2,
+                 time_major=False,
+                 name='bqrnn_encoder'):
+
+        self.num_units = num_units
+        self.num_layers = num_layers
+        self.parameter_init = parameter_init
+        self.conv_width = conv_width
+        self.time_major = time_major
+        self.name = name
+
+    def __call__(self, inputs, inputs_seq_len, keep_prob, is_training):
+        """Construct model graph.
+        Args:
+            inputs (placeholder): A tensor of size`[B, T, input_size]`
+            inputs_seq_len (placeholder): A tensor of size` [B]`
+            keep_prob (placeholder, float): A probability to keep nodes
+                in the hidden-hidden connection
+            is_training (bool):
+        Returns:
+            outputs: Encoder states.
+                if time_major is True, a tensor of size
+                    `[T, B, num_units * 2]`
+                otherwise, `[B, T, num_units * 2]`
+            final_state: A tuple of final cell states of the forward and
+                backward QRNN of the last layer
+        """
+        initializer = tf.random_uniform_initializer(
+            minval=-self.parameter_init, maxval=self.parameter_init)
+
+        # Hidden layers
+        outputs = inputs
+        for i_layer in range(1, self.num_layers + 1, 1):
+            with tf.variable_scope('bqrnn_hidden' + str(i_layer),
+                                   initializer=initializer):
+                with tf.variable_scope('fw'):
+                    outputs_fw, final_state_fw = qrnn_layer(
+                        outputs, inputs_seq_len, self.num_units,
+                        self.conv_width)
+                with tf.variable_scope('bw'):
+                    # NOTE: only valid frames are reversed
+                    outputs_bw, final_state_bw = qrnn_layer(
+                        tf.reverse_sequence(outputs, inputs_seq_len,
+                                            seq_axis=1, batch_axis=0),
+                        inputs_seq_len, self.num_units, self.conv_width)
+                    outputs_bw = tf.reverse_sequence(
+                        outputs_bw, inputs_seq_len, seq_axis=1, batch_axis=0)
+
+                outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
+
+                # Dropout for the hidden-hidden connections
+                outputs = tf.nn.dropout(outputs, keep_prob)
+
+        if self.time_major:
+            # Convert form batch-major to time-major
+            outputs = tf.transpose(outputs, [1, 0, 2])
+
+        return outputs, (final_state_fw, final_state_bw)
+
+
+def qrnn_layer(inputs, inputs_seq_len, num_units, conv_width):
+    """A QRNN layer with fo-pooling.
+    Args:
+        inputs: A tensor of size `[B, T, input_size]`
+        inputs_seq_len: A tensor of size `[B]`
+        num_units (int): the number of units
+        conv_width (int): the width of the convolution filter
+    Returns:
+        outputs: A tensor of size `[B, T, num_units]`. Outputs after the
+            length of each sequence are zero.
+        final_state: A tensor of size `[B, num_units]`, the cell state at the
+            last frame of each sequence
+    """
+    input_size = inputs.shape.as_list()[-1]
+    max_time = tf.shape(inputs)[1]
+
+    # `[B, T, 1]`
+    mask = tf.expand_dims(
+        tf.sequence_mask(inputs_seq_len, max_time, dtype=tf.float32), axis=2)
+    inputs *= mask
+
+    # Compute gates of all timesteps by a causal convolution
+    conv_filter = tf.get_variable(
+        'conv_filter', shape=[conv_width, input_size, num_units * 3])
+    biases = tf.get_variable(
+        'biases', shape=[num_units * 3], initializer=tf.zeros_initializer())
+    inputs_padded = tf.pad(inputs, [[0, 0], [conv_width - 1, 0], [0, 0]])
+    gates = tf.nn.conv1d(inputs_padded, conv_filter, stride=1,
+                         padding='VALID') + biases
+    z, f, o = tf.split(gates, num_or_size_splits=3, axis=2)
+    z = tf.tanh(z)
+    # NOTE: the cell state is kept after the length of each sequence
+    f = tf.sigmoid(f) * mask + (1 - mask)
+    o = tf.sigmoid(o)
+
+    # fo-pooling: c_t = f_t * c_{t-1} + (1 - f_t) * z_t
+    # NOTE: only this element-wise recurrence is computed sequentially
+    fz = (1 - f) * z
+    # Convert form batch-major to time-major for tf.scan
+    f = tf.transpose(f, [1, 0, 2])
+    fz = tf.transpose(fz, [1, 0, 2])
+    c = tf.scan(lambda c_prev, elems: elems[0] * c_prev + elems[1],
+                (f, fz), initializer=tf.zeros_like(fz[0]))
+    c = tf.transpose(c, [1, 0, 2])
+
+    outputs = o * c * mask
+    final_state = c[:, -1, :]
+    return outputs, final_state
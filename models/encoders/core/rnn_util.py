@@ -7,6 +7,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import re
 import tensorflow as tf
 
 
@@ -25,3 +26,179 @@ def sequence_length(inputs, time_major=True, dtype=tf.int32):
         seq_len = tf.reduce_sum(used, axis=time_axis)
         seq_len = tf.cast(seq_len, dtype)
     return seq_len
+
+
+def lstm_block_cell_getter(getter, name, *args, **kwargs):
+    """A custom getter to share variables of `LSTMBlockFusedCell` with
+       `LSTMBlockCell`. Both cells have the same layout of weights, so that
+       checkpoints can be restored by either implementation.
+    """
+    # NOTE: the scope of LSTMBlockFusedCell depends on the version of
+    # tensorflow, and is uniquified in each tower
+    name = re.sub(r'/(lstm_fused_cell(_\d+)?|lstm_block_wrapper)/',
+                  '/lstm_cell/', name)
+    return getter(name, *args, **kwargs)
+
+
+def fused_lstm(num_units, inputs, inputs_seq_len, use_peephole,
+               clip_activation, reverse=False, initial_state=None):
+    """Run a LSTM layer over the whole sequence with a single fused kernel.
+    Args:
+        num_units (int): the number of units
+        inputs: A tensor of size `[T, B, input_size]` (time-major)
+        inputs_seq_len: A tensor of size `[B]`
+        use_peephole (bool): if True, use peephole
+        clip_activation (float): the range of activation clipping (> 0)
+        reverse (bool, optional): if True, the sequence is processed
+            backward
+        initial_state (LSTMStateTuple, optional): the initial state.
+            Default is zero state.
+    Returns:
+        outputs: A tensor of size `[T, B, num_units]`. Outputs after the
+            length of each sequence are zero.
+        final_state: A `LSTMStateTuple` of the final state
+    """
+    if tf.__version__ == '1.3.0':
+        lstm = tf.contrib.rnn.LSTMBlockFusedCell(
+            num_units,
+            forget_bias=1.0,
+            cell_clip=clip_activation,
+            use_peephole=use_peephole)
+    else:
+        lstm = tf.contrib.rnn.LSTMBlockFusedCell(
+            num_units,
+            forget_bias=1.0,
+            use_peephole=use_peephole)
+
+    if reverse:
+        # NOTE: only valid frames are reversed
+        inputs = tf.reverse_sequence(inputs, inputs_seq_len,
+                                     seq_axis=0, batch_axis=1)
+    outputs, final_state = lstm(inputs, initial_state=initial_state,
+                                dtype=tf.float32,
+                                sequence_length=inputs_seq_len)
+    if reverse:
+        outputs = tf.reverse_sequence(outputs, inputs_seq_len,
+                                      seq_axis=0, batch_axis=1)
+    # NOTE: final_state is `(c, h)`
+    return outputs, tf.contrib.rnn.LSTMStateTuple(*final_state)
+
+
+def time_reduction(inputs, inputs_seq_len, factor):
+    """Reduce the time resolution by concatenating consecutive frames. The
+       sequence is padded to a multiple of factor and reshaped, so that the
+       static shape of features is kept.
+    Args:
+        inputs: A tensor of size `[B, T, input_size]`
+        inputs_seq_len: A tensor of size `[B]`
+        factor (int): the number of frames to concatenate
+    Returns:
+        outputs: A tensor of size `[B, ceil(T / factor), input_size * factor]`
+        outputs_seq_len: A tensor of size `[B]`
+    """
+    if factor == 1:
+        return inputs, inputs_seq_len
+
+    batch_size = tf.shape(inputs)[0]
+    max_time = tf.shape(inputs)[1]
+    input_size = inputs.shape.as_list()[-1]
+
+    # Pad to a multiple of factor
+    num_pad = (factor - max_time % factor) % factor
+    outputs = tf.pad(inputs, [[0, 0], [0, num_pad], [0, 0]])
+    outputs = tf.reshape(outputs, [batch_size, -1, input_size * factor])
+    return outputs, reduce_seq_len(inputs_seq_len, factor)
+
+
+def reduce_seq_len(inputs_seq_len, factor):
+    """Compute the length of sequences after time reduction.
+    Args:
+        inputs_seq_len: A tensor of size `[B]`
+        factor (int): the factor of time reduction
+    Returns:
+        outputs_seq_len: A tensor of size `[B]`
+    """
+    if factor == 1:
+        return inputs_seq_len
+    return (inputs_seq_len + factor - 1) // factor
+
+
+def subsample(inputs, inputs_seq_len, factor, subsample_type='concat',
+              time_major=False):
+    """Subsample frames between layers.
+    Args:
+        inputs: A tensor of size `[B, T, input_size]`
+            (`[T, B, input_size]` if time_major is True)
+        inputs_seq_len: A tensor of size `[B]`
+        factor (int): the factor of subsampling
+        subsample_type (string, optional):
+                - concat: concatenate consecutive frames
+                - max_pool: strided max-pooling over time
+                - conv: 1-D convolution over time with stride of factor,
+                    which keeps the number of dimensions
+        time_major (bool, optional): if True, inputs and outputs are
+            time-major
+    Returns:
+        outputs: A tensor of size `[B, ceil(T / factor), output_size]`
+            (`[ceil(T / factor), B, output_size]` if time_major is True).
+            output_size is input_size * factor for concat, and input_size
+            otherwise.
+        outputs_seq_len: A tensor of size `[B]`
+    """
+    if subsample_type not in ['concat', 'max_pool', 'conv']:
+        raise ValueError(
+            'subsample_type is "concat" or "max_pool" or "conv".')
+    if factor == 1:
+        return inputs, inputs_seq_len
+
+    if time_major:
+        # Convert form time-major to batch-major
+        inputs = tf.transpose(inputs, [1, 0, 2])
+
+    if subsample_type == 'concat':
+        outputs, outputs_seq_len = time_reduction(
+            inputs, inputs_seq_len, factor)
+    else:
+        batch_size = tf.shape(inputs)[0]
+        max_time = tf.shape(inputs)[1]
+        input_size = inputs.shape.as_list()[-1]
+
+        # Pad to a multiple of factor
+        num_pad = (factor - max_time % factor) % factor
+        inputs = tf.pad(inputs, [[0, 0], [0, num_pad], [0, 0]])
+
+        if subsample_type == 'max_pool':
+            # NOTE: padded frames and frames past the sequence lengths are
+            # filled with the lowest value, so that they are never selected
+            mask = tf.tile(tf.expand_dims(tf.sequence_mask(
+                inputs_seq_len, max_time + num_pad), axis=2),
+                [1, 1, input_size])
+            inputs = tf.where(mask, inputs, tf.fill(
+                tf.shape(inputs), inputs.dtype.min))
+
+            # `[B, T / factor, factor, input_size]`
+            outputs = tf.reshape(
+                inputs, [batch_size, -1, factor, input_size])
+            outputs = tf.reduce_max(outputs, axis=2)
+
+            # Reset outputs past the sequence lengths to zero
+            mask = tf.tile(tf.expand_dims(tf.sequence_mask(
+                reduce_seq_len(inputs_seq_len, factor), tf.shape(outputs)[1]),
+                axis=2), [1, 1, input_size])
+            outputs = tf.where(mask, outputs, tf.zeros_like(outputs))
+        else:
+            with tf.variable_scope('subsample'):
+                conv_filter = tf.get_variable(
+                    'conv_filter', shape=[factor, input_size, input_size])
+                biases = tf.get_variable(
+                    'biases', shape=[input_size],
+                    initializer=tf.zeros_initializer())
+                outputs = tf.nn.conv1d(inputs, conv_filter, stride=factor,
+                                       padding='VALID') + biases
+        outputs_seq_len = reduce_seq_len(inputs_seq_len, factor)
+
+    if time_major:
+        # Convert form batch-major to time-major
+        outputs = tf.transpose(outputs, [1, 0, 2])
+
+    return outputs, outputs_seq_len
@@ -12,6 +12,7 @@ import tensorflow as tf
 
 from models.encoders.core.cnn_util import conv_layer, max_pool, batch_normalization
 from models.encoders.core.blstm import basiclstmcell, lstmcell, lstmblockcell, lstmblockfusedcell, cudnnlstm
+from models.encoders.core.rnn_util import reduce_seq_len
 
 
 class VGGBLSTMEncoder(object):
@@ -28,7 +29,7 @@ class VGGBLSTMEncoder(object):
                 - BasicLSTMCell: tf.contrib.rnn.BasicLSTMCell (no peephole)
                 - LSTMCell: tf.contrib.rnn.LSTMCell
                 - LSTMBlockCell: tf.contrib.rnn.LSTMBlockCell
-                - LSTMBlockFusedCell: under implementation
+                - LSTMBlockFusedCell: tf.contrib.rnn.LSTMBlockFusedCell
                 - CudnnLSTM: under implementation
             Choose the background implementation of tensorflow.
         use_peephole (bool): if True, use peephole
@@ -37,6 +38,12 @@ class VGGBLSTMEncoder(object):
         clip_activation (float): the range of activation clipping (> 0)
         time_major (bool, optional): if True, time-major computation will be
             performed
+        subsample_list (list, optional): the factor of subsampling after
+            each layer. Default is None, which means no subsampling.
+        subsample_type (string, optional): the way of subsampling.
+                - concat: concatenate consecutive frames
+                - max_pool: strided max-pooling over time
+                - conv: strided 1-D convolution over time
         name (string, optional): the name of encoder
     """
 
@@ -52,6 +59,8 @@ class VGGBLSTMEncoder(object):
                  parameter_init,
                  clip_activation,
                  time_major=False,
+                 subsample_list=None,
+                 subsample_type='concat',
                  name='vgg_blstm_encoder'):
 
         assert num_proj != 0
@@ -61,7 +70,7 @@ class VGGBLSTMEncoder(object):
         self.splice = splice
         self.num_stack = num_stack
         self.num_units = num_units
-        if lstm_impl != 'LSTMCell':
+        if lstm_impl not in ['LSTMCell', 'LSTMBlockFusedCell']:
             self.num_proj = None
         else:
             self.num_proj = num_proj
@@ -71,6 +80,15 @@ class VGGBLSTMEncoder(object):
         self.use_peephole = use_peephole
         self.parameter_init = parameter_init
         self.clip_activation = clip_activation
+        if subsample_list is not None:
+            if len(subsample_list) != num_layers:
+                raise ValueError(
+                    'subsample_list must have the factor of each layer.')
+            if lstm_impl == 'CudnnLSTM':
+                raise ValueError('CudnnLSTM does not support subsampling.')
+            subsample_list = [int(factor) for factor in subsample_list]
+        self.subsample_list = subsample_list
+        self.subsample_type = subsample_type
         self.time_major = time_major
         self.name = name
 
@@ -87,7 +105,9 @@ class VGGBLSTMEncoder(object):
             outputs: Encoder states.
                 if time_major is True, a tensor of size
                     `[T, B, num_units (num_proj)]`
-                otherwise, `[B, T, num_units (num_proj)]`
+                otherwise, `[B, T, num_units (num_proj)]`.
+                T is reduced when subsample_list is given. Use
+                `output_seq_len()` for the length of each sequence.
             final_state: A final hidden state of the encoder
         """
         # inputs: 3D tensor `[B, T, input_dim]`
@@ -183,28 +203,36 @@ class VGGBLSTMEncoder(object):
             outputs, final_state = basiclstmcell(
                 self.num_units, self.num_layers,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMCell':
             outputs, final_state = lstmcell(
                 self.num_units, self.num_proj, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMBlockCell':
             outputs, final_state = lstmblockcell(
                 self.num_units, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'LSTMBlockFusedCell':
             outputs, final_state = lstmblockfusedcell(
-                self.num_units, self.num_layers,
+                self.num_units, self.num_proj, self.num_layers,
                 self.use_peephole, self.clip_activation,
                 inputs, inputs_seq_len, keep_prob, initializer,
-                self.time_major)
+                self.time_major,
+                subsample_list=self.subsample_list,
+                subsample_type=self.subsample_type)
 
         elif self.lstm_impl == 'CudnnLSTM':
             outputs, final_state = cudnnlstm(
@@ -218,3 +246,15 @@ class VGGBLSTMEncoder(object):
                 '"CudnnLSTM".')
 
         return outputs, final_state
+
+    def output_seq_len(self, inputs_seq_len):
+        """Compute the length of outputs of the encoder.
+        Args:
+            inputs_seq_len: A tensor of size `[B]`
+        Returns:
+            outputs_seq_len: A tensor of size `[B]`
+        """
+        if self.subsample_list is not None:
+            for factor in self.subsample_list:
+                inputs_seq_len = reduce_seq_len(inputs_seq_len, factor)
+        return inputs_seq_len
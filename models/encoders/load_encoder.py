@@ -10,6 +10,7 @@ from __future__ import print_function
 from models.encoders.core.blstm import BLSTMEncoder
 from models.encoders.core.lstm import LSTMEncoder
 from models.encoders.core.gru import GRUEncoder, BGRUEncoder
+from models.encoders.core.qrnn import QRNNEncoder, BQRNNEncoder
 from models.encoders.core.cnn_zhang import CNNEncoder
 from models.encoders.core.vgg_blstm import VGGBLSTMEncoder
 from models.encoders.core.vgg_lstm import VGGLSTMEncoder
@@ -18,6 +19,7 @@ from models.encoders.core.vgg_wang import VGGEncoder
 from models.encoders.core.multitask_blstm import MultitaskBLSTMEncoder
 from models.encoders.core.multitask_lstm import MultitaskLSTMEncoder
 from models.encoders.core.pyramidal_blstm import PyramidBLSTMEncoder
+from models.encoders.core.lc_blstm import LCBLSTMEncoder
 from models.encoders.core.cldnn_wang import CLDNNEncoder
 
 from models.encoders.core.student_cnn_ctc import StudentCNNCTCEncoder
@@ -28,6 +30,8 @@ ENCODERS = {
     "lstm": LSTMEncoder,
     "bgru": BGRUEncoder,
     "gru": GRUEncoder,
+    "bqrnn": BQRNNEncoder,
+    "qrnn": QRNNEncoder,
     "vgg_blstm": VGGBLSTMEncoder,
     "vgg_lstm": VGGLSTMEncoder,
     "cnn_zhang": CNNEncoder,
@@ -36,6 +40,7 @@ ENCODERS = {
     "multitask_blstm": MultitaskBLSTMEncoder,
     "multitask_lstm": MultitaskLSTMEncoder,
     "pyramid_blstm": PyramidBLSTMEncoder,
+    "lc_blstm": LCBLSTMEncoder,
     "cldnn_wang": CLDNNEncoder,
 
     "student_cnn_ctc": StudentCNNCTCEncoder,
@@ -94,14 +94,23 @@ class ModelBase(object):
             return OPTIMIZER_CLS_NAMES[optimizer](
                 learning_rate=learning_rate)
 
-    def train(self, loss, optimizer, learning_rate):
+    def train(self, loss, optimizer, learning_rate, accumulate_steps=1,
+              pruning=None):
         """Operation for training. Only the sigle GPU training is supported.
         Args:
             loss: An operation for computing loss
             optimizer (string): name of the optimizer in OPTIMIZER_CLS_NAMES
             learning_rate (placeholder): A learning rate
+            accumulate_steps (int, optional): the number of steps to
+                accumulate gradients before updating parameters
+            pruning (optional): An instance of `MagnitudePruning` in
+                utils.training.pruning. If given, parameters are pruned
+                after each update.
         Returns:
-            train_op: operation for training
+            train_op: operation for training. If accumulate_steps > 1, a tuple
+                of `(accumulate_op, apply_op)` is returned. accumulate_op
+                should be run every step, and apply_op every
+                accumulate_steps steps.
         """
         # Create a variable to track the global step
         global_step = tf.Variable(0, name='global_step', trainable=False)
@@ -109,7 +118,25 @@ class ModelBase(object):
         # Set optimizer
         self.optimizer = self._set_optimizer(optimizer, learning_rate)
 
-        if self.clip_grad_norm is not None:
+        if accumulate_steps > 1:
+            # Compute gradients
+            grads_and_vars = self.optimizer.compute_gradients(loss)
+
+            # Sum gradients over mini-batches
+            with tf.control_dependencies(tf.get_collection(tf.GraphKeys.UPDATE_OPS)):
+                accumulate_op, accumulators_and_vars = self._accumulate_gradients(
+                    grads_and_vars)
+
+            # Create operation for gradient update
+            apply_op = self._apply_accumulated_gradients(
+                self.optimizer, accumulators_and_vars, accumulate_steps,
+                global_step)
+            if pruning is not None:
+                apply_op = pruning.prune(apply_op, global_step)
+
+            return accumulate_op, apply_op
+
+        elif self.clip_grad_norm is not None:
             # Compute gradients
             grads_and_vars = self.optimizer.compute_gradients(loss)
 
@@ -130,8 +157,67 @@ class ModelBase(object):
                 train_op = self.optimizer.minimize(
                     loss, global_step=global_step)
 
+        if pruning is not None:
+            train_op = pruning.prune(train_op, global_step)
+
         return train_op
 
+    def _accumulate_gradients(self, grads_and_vars):
+        """Sum gradients into non-trainable accumulators.
+        Args:
+            grads_and_vars (list): list of tuples of `(grads, vars)`
+        Returns:
+            accumulate_op: operation for adding gradients to accumulators
+            accumulators_and_vars (list): list of tuples of
+                `(accumulators, vars)`
+        """
+        accumulate_ops, accumulators_and_vars = [], []
+        with tf.variable_scope('gradient_accumulators'):
+            for grad, var in grads_and_vars:
+                if grad is None:
+                    continue
+                accumulator = tf.get_variable(
+                    var.op.name, shape=var.get_shape(), dtype=var.dtype.base_dtype,
+                    initializer=tf.zeros_initializer(), trainable=False)
+                if isinstance(grad, tf.IndexedSlices):
+                    # Sparse gradients (e.g. embeddings)
+                    accumulate_ops.append(tf.scatter_add(
+                        accumulator, grad.indices, grad.values))
+                else:
+                    accumulate_ops.append(tf.assign_add(accumulator, grad))
+                accumulators_and_vars.append((accumulator, var))
+        return tf.group(*accumulate_ops), accumulators_and_vars
+
+    def _apply_accumulated_gradients(self, optimizer, accumulators_and_vars,
+                                     accumulate_steps, global_step):
+        """Average accumulated gradients, clip them, update parameters and
+           reset accumulators.
+        Args:
+            optimizer: An instance of the optimizer
+            accumulators_and_vars (list): list of tuples of
+                `(accumulators, vars)`
+            accumulate_steps (int): the number of accumulated steps
+            global_step: A variable to track the global step
+        Returns:
+            apply_op: operation for updating parameters
+        """
+        grads_and_vars = [(accumulator / accumulate_steps, var)
+                          for accumulator, var in accumulators_and_vars]
+
+        # Clip gradients
+        if self.clip_grad_norm is not None:
+            grads_and_vars = self._clip_gradients(grads_and_vars)
+
+        update_op = optimizer.apply_gradients(
+            grads_and_vars, global_step=global_step)
+
+        # Reset accumulators after the update
+        with tf.control_dependencies([update_op]):
+            apply_op = tf.group(
+                *[tf.assign(accumulator, tf.zeros_like(accumulator))
+                  for accumulator, _ in accumulators_and_vars])
+        return apply_op
+
     def _clip_gradients(self, grads_and_vars):
         """Clip gradients.
         Args:
@@ -8,6 +8,8 @@ from __future__ import print_function
 import os
 import sys
 import time
+import tempfile
+import numpy as np
 import tensorflow as tf
 # from tensorflow.python import debug as tf_debug
 
@@ -18,6 +20,9 @@ from utils.io.labels.phone import Idx2phone
 from utils.io.labels.sparsetensor import list2sparsetensor, sparsetensor2list
 from utils.parameter import count_total_parameters
 from utils.training.learning_rate_controller import Controller
+from utils.training.pruning import MagnitudePruning
+from utils.frozen_graph import freeze_graph, export_frozen_graph, FrozenGraph
+from utils.sparse_graph import sparsify_graph_def
 from utils.measure_time_func import measure_time
 
 
@@ -37,29 +42,306 @@ class TestCTCTraining(tf.test.TestCase):
         self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell')
         self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell',
                    time_major=False)
+        self.check(encoder_type='blstm', lstm_impl='LSTMBlockFusedCell')
+        self.check(encoder_type='blstm', lstm_impl='LSTMBlockFusedCell',
+                   time_major=False)
 
         # LSTM-CTC
         self.check(encoder_type='lstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='lstm', lstm_impl='LSTMCell')
         self.check(encoder_type='lstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='lstm', lstm_impl='LSTMBlockFusedCell')
 
         # GRU-CTC
         self.check(encoder_type='bgru')
         self.check(encoder_type='gru')
 
+        # QRNN-CTC
+        self.check(encoder_type='bqrnn')
+        self.check(encoder_type='qrnn')
+
+        # Pyramidal BLSTM-CTC
+        self.check(encoder_type='pyramid_blstm', lstm_impl='LSTMBlockCell')
+
+        # Latency-controlled BLSTM-CTC
+        self.check(encoder_type='lc_blstm', lstm_impl='LSTMBlockCell')
+
+        # BLSTM-CTC with subsampling
+        self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell',
+                   subsample_list=[2, 1], subsample_type='max_pool')
+
         # VGG-BLSTM-CTC
         self.check(encoder_type='vgg_blstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='vgg_blstm', lstm_impl='LSTMCell')
         self.check(encoder_type='vgg_blstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='vgg_blstm', lstm_impl='LSTMBlockFusedCell')
 
         # VGG-LSTM-CTC
         self.check(encoder_type='vgg_lstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='vgg_lstm', lstm_impl='LSTMCell')
         self.check(encoder_type='vgg_lstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='vgg_lstm', lstm_impl='LSTMBlockFusedCell')
+
+    def test_inference(self):
+        print("CTC inference graph working check.")
+
+        self.check_inference(encoder_type='blstm', lstm_impl='LSTMBlockCell')
+        self.check_inference(encoder_type='lstm', lstm_impl='LSTMBlockCell',
+                             subsample_list=[2, 1])
+
+    @measure_time
+    def check_inference(self, encoder_type, lstm_impl, subsample_list=None):
+
+        print('==================================================')
+        print('  encoder_type: %s' % encoder_type)
+        print('  lstm_impl: %s' % lstm_impl)
+        print('  subsample_list: %s' % str(subsample_list))
+        print('==================================================')
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 2
+            num_stack = 2
+            inputs, _, inputs_seq_len = generate_data(
+                label_type='character',
+                model='ctc',
+                batch_size=batch_size,
+                num_stack=num_stack,
+                splice=1)
+
+            # Define model graph
+            model = CTC(encoder_type=encoder_type,
+                        input_size=inputs[0].shape[-1] // num_stack,
+                        num_stack=num_stack,
+                        num_units=256,
+                        num_layers=2,
+                        num_classes=27,
+                        lstm_impl=lstm_impl,
+                        parameter_init=0.1,
+                        num_proj=256,
+                        weight_decay=1e-10,
+                        subsample_list=subsample_list)
+
+            # Define placeholders without labels
+            model.create_placeholders_inference()
+            decode_op, posteriors_op = model.predict(
+                model.inputs_pl_list[0],
+                model.inputs_seq_len_pl_list[0],
+                beam_width=20)
+
+            # Neither the loss nor summaries should be built
+            self.assertEqual(len(tf.get_collection('losses')), 0)
+            self.assertEqual(len(model.summaries_train), 0)
+
+            feed_dict = {
+                model.inputs_pl_list[0]: inputs,
+                model.inputs_seq_len_pl_list[0]: inputs_seq_len
+            }
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                _, posteriors = sess.run(
+                    [decode_op, posteriors_op], feed_dict=feed_dict)
+                self.assertEqual(posteriors.shape[-1], 28)
+
+    def test_frozen_graph(self):
+        print("CTC frozen graph working check.")
+
+        self.check_frozen_graph(encoder_type='blstm', lstm_impl='LSTMBlockCell')
+        self.check_frozen_graph(encoder_type='lstm', lstm_impl='LSTMCell')
+
+    def check_frozen_graph(self, encoder_type, lstm_impl):
+
+        print('==================================================')
+        print('  encoder_type: %s' % encoder_type)
+        print('  lstm_impl: %s' % lstm_impl)
+        print('==================================================')
+
+        save_path = tempfile.mkdtemp()
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 2
+            num_stack = 2
+            inputs, _, inputs_seq_len = generate_data(
+                label_type='character',
+                model='ctc',
+                batch_size=batch_size,
+                num_stack=num_stack,
+                splice=1)
+
+            # Define model graph
+            model = CTC(encoder_type=encoder_type,
+                        input_size=inputs[0].shape[-1] // num_stack,
+                        num_stack=num_stack,
+                        num_units=64,
+                        num_layers=2,
+                        num_classes=27,
+                        lstm_impl=lstm_impl,
+                        parameter_init=0.1)
+
+            # Build the inference graph in the same way as export_ctc.py
+            model.create_placeholders_inference()
+            inputs_pl = model.inputs_pl_list[0]
+            inputs_seq_len_pl = model.inputs_seq_len_pl_list[0]
+            logits = model.build_inference(inputs_pl, inputs_seq_len_pl)
+            decode_op = model.decoder(logits, inputs_seq_len_pl,
+                                      beam_width=1)
+            posteriors_op = tf.reshape(
+                model.posteriors(logits),
+                shape=[tf.shape(logits)[1], tf.shape(logits)[0],
+                       model.num_classes],
+                name='posteriors')
+            decoded_values = tf.identity(
+                decode_op.values, name='decoded_values')
+
+            feed_dict = {inputs_pl: inputs, inputs_seq_len_pl: inputs_seq_len}
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                posteriors, labels_pred = sess.run(
+                    [posteriors_op, decoded_values], feed_dict=feed_dict)
+
+                export_frozen_graph(
+                    sess, save_path,
+                    inputs={'inputs': inputs_pl,
+                            'inputs_seq_len': inputs_seq_len_pl},
+                    outputs={'posteriors': posteriors_op,
+                             'decoded_values': decoded_values},
+                    metadata={'num_stack': num_stack})
+
+        # Reload without the model definition
+        frozen_graph = FrozenGraph(save_path)
+        self.assertEqual(frozen_graph.metadata['num_stack'], num_stack)
+        self.assertEqual(frozen_graph.metadata['contrib_rnn'],
+                         lstm_impl == 'LSTMBlockCell')
+        self.assertFalse(any(
+            op.type in ['Variable', 'VariableV2']
+            for op in frozen_graph.graph.get_operations()))
+
+        outputs = frozen_graph({'inputs': inputs,
+                                'inputs_seq_len': inputs_seq_len})
+        frozen_graph.close()
+        self.assertAllClose(posteriors, outputs['posteriors'], atol=1e-5)
+        self.assertAllEqual(labels_pred, outputs['decoded_values'])
+
+    def test_pruning(self):
+        print("CTC pruning working check.")
+
+        self.check_pruning(encoder_type='blstm', lstm_impl='LSTMBlockCell')
+        self.check_pruning(encoder_type='blstm', lstm_impl='LSTMCell')
+
+    @measure_time
+    def check_pruning(self, encoder_type, lstm_impl):
+
+        print('==================================================')
+        print('  encoder_type: %s' % encoder_type)
+        print('  lstm_impl: %s' % lstm_impl)
+        print('==================================================')
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 2
+            num_stack = 2
+            inputs, labels, inputs_seq_len = generate_data(
+                label_type='character',
+                model='ctc',
+                batch_size=batch_size,
+                num_stack=num_stack,
+                splice=1)
+
+            # Define model graph
+            model = CTC(encoder_type=encoder_type,
+                        input_size=inputs[0].shape[-1] // num_stack,
+                        num_stack=num_stack,
+                        num_units=64,
+                        num_layers=2,
+                        num_classes=27,
+                        lstm_impl=lstm_impl,
+                        parameter_init=0.1,
+                        clip_grad_norm=5.0)
+
+            # Define placeholders
+            model.create_placeholders()
+            learning_rate_pl = tf.placeholder(tf.float32, name='learning_rate')
+
+            loss_op, logits = model.compute_loss(
+                model.inputs_pl_list[0],
+                model.labels_pl_list[0],
+                model.inputs_seq_len_pl_list[0],
+                model.keep_prob_pl_list[0])
+            pruning = MagnitudePruning(target_sparsity=0.8,
+                                       begin_step=1, end_step=4, frequency=1,
+                                       layer_sparsity={'output': 0.5})
+            train_op = model.train(loss_op,
+                                   optimizer='adam',
+                                   learning_rate=learning_rate_pl,
+                                   pruning=pruning)
+            posteriors_op = tf.identity(
+                model.posteriors(logits), name='posteriors')
+
+            feed_dict = {
+                model.inputs_pl_list[0]: inputs,
+                model.labels_pl_list[0]: list2sparsetensor(labels, padded_value=-1),
+                model.inputs_seq_len_pl_list[0]: inputs_seq_len,
+                model.keep_prob_pl_list[0]: 1.0,
+                learning_rate_pl: 1e-3
+            }
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                for _ in range(6):
+                    sess.run(train_op, feed_dict=feed_dict)
+
+                # The target sparsity is reached at end_step
+                for mask, var in pruning.masks_and_vars:
+                    weights = sess.run(var)
+                    sparsity = 1 - np.count_nonzero(weights) / weights.size
+                    self.assertAllClose(
+                        sparsity, pruning.sparsity[var.op.name], atol=0.01)
+
+                # Sparse graph must compute the same posteriors
+                input_names = [model.inputs_pl_list[0].op.name,
+                               model.inputs_seq_len_pl_list[0].op.name,
+                               model.keep_prob_pl_list[0].op.name]
+                graph_def = freeze_graph(sess, input_names, ['posteriors'])
+                # NOTE: Identity nodes (`weights/read`) are not folded
+                # without graph transforms
+                graph_def_identity = tf.graph_util.convert_variables_to_constants(
+                    sess, sess.graph.as_graph_def(), ['posteriors'])
+                posteriors = sess.run(posteriors_op, feed_dict=feed_dict)
+
+        # Nodes in reverse order must be rewritten in the same way
+        graph_def_reversed = tf.GraphDef()
+        graph_def_reversed.CopyFrom(graph_def_identity)
+        del graph_def_reversed.node[:]
+        graph_def_reversed.node.extend(reversed(graph_def_identity.node))
+
+        for graph_def in [graph_def, graph_def_identity, graph_def_reversed]:
+            sparse_graph_def, sparsity = sparsify_graph_def(
+                graph_def, min_sparsity=0.4, min_elements=0)
+            self.assertEqual(len(sparsity), len(pruning.masks_and_vars))
+
+            with tf.Graph().as_default() as graph:
+                tf.import_graph_def(sparse_graph_def, name='')
+                with tf.Session() as sess:
+                    posteriors_sparse = sess.run(
+                        'posteriors:0',
+                        feed_dict=dict((name + ':0', feed_dict[pl])
+                                       for name, pl in zip(
+                                           input_names,
+                                           [model.inputs_pl_list[0],
+                                            model.inputs_seq_len_pl_list[0],
+                                            model.keep_prob_pl_list[0]])))
+            self.assertAllClose(posteriors, posteriors_sparse, atol=1e-5)
 
     @measure_time
     def check(self, encoder_type, label_type='character',
-              lstm_impl=None, time_major=True, save_params=False):
+              lstm_impl=None, time_major=True, save_params=False,
+              subsample_list=None, subsample_type='concat'):
 
         print('==================================================')
         print('  encoder_type: %s' % encoder_type)
@@ -67,6 +349,8 @@ class TestCTCTraining(tf.test.TestCase):
         print('  lstm_impl: %s' % lstm_impl)
         print('  time_major: %s' % str(time_major))
         print('  save_params: %s' % str(save_params))
+        print('  subsample_list: %s' % str(subsample_list))
+        print('  subsample_type: %s' % subsample_type)
         print('==================================================')
 
         tf.reset_default_graph()
@@ -101,7 +385,11 @@ class TestCTCTraining(tf.test.TestCase):
                         weight_decay=1e-10,
                         # bottleneck_dim=50,
                         bottleneck_dim=None,
-                        time_major=time_major)
+                        time_major=time_major,
+                        subsample_list=subsample_list,
+                        subsample_type=subsample_type,
+                        chunk_size=20,
+                        right_context=10)
 
             # Define placeholders
             model.create_placeholders()
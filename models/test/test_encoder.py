@@ -6,15 +6,20 @@ from __future__ import division
 from __future__ import print_function
 
 import os
+from os.path import join
 import sys
+import tempfile
 import unittest
+import numpy as np
 import tensorflow as tf
 
 sys.path.append(os.path.abspath('../../'))
 from models.encoders.load_encoder import load
+from models.encoders.core.rnn_util import subsample
 from models.test.data import generate_data
 from utils.parameter import count_total_parameters
 from utils.measure_time_func import measure_time
+from utils.io.inputs.frame_stacking import stack_frame, FrameStacker
 
 
 class TestEncoder(unittest.TestCase):
@@ -39,6 +44,8 @@ class TestEncoder(unittest.TestCase):
                    time_major=True)
         self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell',
                    time_major=True)
+        self.check(encoder_type='blstm', lstm_impl='LSTMBlockFusedCell',
+                   time_major=True)
 
         # LSTM
         self.check(encoder_type='lstm', lstm_impl='BasicLSTMCell',
@@ -47,11 +54,17 @@ class TestEncoder(unittest.TestCase):
                    time_major=True)
         self.check(encoder_type='lstm', lstm_impl='LSTMBlockCell',
                    time_major=True)
+        self.check(encoder_type='lstm', lstm_impl='LSTMBlockFusedCell',
+                   time_major=True)
 
         # GRUs
         self.check(encoder_type='bgru', time_major=True)
         self.check(encoder_type='gru', time_major=True)
 
+        # QRNNs
+        self.check(encoder_type='bqrnn', time_major=True)
+        self.check(encoder_type='qrnn', time_major=True)
+
         # VGG-BLSTM
         self.check(encoder_type='vgg_blstm', lstm_impl='BasicLSTMCell',
                    time_major=True)
@@ -75,16 +88,22 @@ class TestEncoder(unittest.TestCase):
         self.check(encoder_type='blstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='blstm', lstm_impl='LSTMCell')
         self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='blstm', lstm_impl='LSTMBlockFusedCell')
 
         # LSTM
         self.check(encoder_type='lstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='lstm', lstm_impl='LSTMCell')
         self.check(encoder_type='lstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='lstm', lstm_impl='LSTMBlockFusedCell')
 
         # GRUs
         self.check(encoder_type='bgru')
         self.check(encoder_type='gru')
 
+        # QRNNs
+        self.check(encoder_type='bqrnn')
+        self.check(encoder_type='qrnn')
+
         # VGG-BLSTM
         self.check(encoder_type='vgg_blstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='vgg_blstm', lstm_impl='LSTMCell')
@@ -101,6 +120,8 @@ class TestEncoder(unittest.TestCase):
         self.check(encoder_type='multitask_blstm', lstm_impl='LSTMCell')
         self.check(encoder_type='multitask_blstm',
                    lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='multitask_blstm',
+                   lstm_impl='LSTMBlockFusedCell')
 
         # Multi-task LSTM
         self.check(encoder_type='multitask_lstm',
@@ -108,18 +129,240 @@ class TestEncoder(unittest.TestCase):
         self.check(encoder_type='multitask_lstm', lstm_impl='LSTMCell')
         self.check(encoder_type='multitask_lstm',
                    lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='multitask_lstm',
+                   lstm_impl='LSTMBlockFusedCell')
+
+        # Subsampling
+        for subsample_type in ['concat', 'max_pool', 'conv']:
+            self.check(encoder_type='blstm', lstm_impl='LSTMBlockCell',
+                       subsample_list=[1, 2, 2, 1, 1],
+                       subsample_type=subsample_type)
+            self.check(encoder_type='blstm', lstm_impl='LSTMBlockFusedCell',
+                       subsample_list=[1, 2, 2, 1, 1],
+                       subsample_type=subsample_type, time_major=True)
+            self.check(encoder_type='lstm', lstm_impl='LSTMBlockCell',
+                       subsample_list=[1, 2, 2, 1, 1],
+                       subsample_type=subsample_type)
+            self.check(encoder_type='lstm', lstm_impl='LSTMBlockFusedCell',
+                       subsample_list=[1, 2, 2, 1, 1],
+                       subsample_type=subsample_type)
+
+        # Latency-controlled BLSTM
+        self.check(encoder_type='lc_blstm', lstm_impl='BasicLSTMCell')
+        self.check(encoder_type='lc_blstm', lstm_impl='LSTMCell')
+        self.check(encoder_type='lc_blstm', lstm_impl='LSTMBlockCell',
+                   time_major=True)
+
+        # Pyramidal BLSTM
+        self.check(encoder_type='pyramid_blstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='pyramid_blstm',
+                   lstm_impl='LSTMBlockFusedCell')
+        self.check(encoder_type='pyramid_blstm', lstm_impl='LSTMBlockCell',
+                   time_major=True)
+
+    def test_subsample_max_pool(self):
+        print("Max-pooling subsampling check.")
+
+        # NOTE: all inputs are negative, so that zero padding and frames
+        # past the sequence lengths are selected unless they are masked
+        np.random.seed(0)
+        inputs = -np.abs(np.random.randn(2, 7, 3)).astype(np.float32) - 1
+        inputs_seq_len = np.array([7, 4], dtype=np.int32)
+        inputs[1, 4:] = 0
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            outputs_op, outputs_seq_len_op = subsample(
+                tf.constant(inputs), tf.constant(inputs_seq_len), factor=3,
+                subsample_type='max_pool')
+            with tf.Session() as sess:
+                outputs, outputs_seq_len = sess.run(
+                    [outputs_op, outputs_seq_len_op])
+
+        self.assertEqual(list(outputs_seq_len), [3, 2])
+        for i_batch in range(len(inputs)):
+            for t in range(outputs.shape[1]):
+                if t < outputs_seq_len[i_batch]:
+                    frames = inputs[i_batch,
+                                    t * 3:min(t * 3 + 3, inputs_seq_len[i_batch])]
+                    output_ref = frames.max(axis=0)
+                else:
+                    output_ref = np.zeros(inputs.shape[-1])
+                self.assertTrue(np.allclose(outputs[i_batch, t], output_ref))
+
+    def test_fused_lstm_compatibility(self):
+        print("LSTMBlockFusedCell compatibility check.")
+
+        self.check_fused_lstm(encoder_type='blstm')
+        self.check_fused_lstm(encoder_type='lstm')
+
+    def check_fused_lstm(self, encoder_type):
+        """Checkpoints of LSTMBlockCell must be restored by
+           LSTMBlockFusedCell, and both must give the same outputs."""
+        inputs, _, inputs_seq_len = generate_data(
+            label_type='character',
+            model='ctc',
+            batch_size=4,
+            num_stack=1,
+            splice=1)
+        save_path = join(tempfile.mkdtemp(), 'model.ckpt')
+
+        outputs_list = []
+        for lstm_impl in ['LSTMBlockCell', 'LSTMBlockFusedCell']:
+            tf.reset_default_graph()
+            with tf.Graph().as_default():
+                encoder = load(encoder_type)(
+                    num_units=64,
+                    num_proj=None,
+                    num_layers=2,
+                    lstm_impl=lstm_impl,
+                    use_peephole=True,
+                    parameter_init=0.1,
+                    clip_activation=5,
+                    time_major=False)
+                inputs_pl = tf.placeholder(
+                    tf.float32, shape=[None, None, inputs[0].shape[-1]])
+                inputs_seq_len_pl = tf.placeholder(tf.int32, shape=[None])
+                outputs, _ = encoder(inputs_pl, inputs_seq_len_pl,
+                                     keep_prob=1.0, is_training=False)
+                saver = tf.train.Saver()
+                with tf.Session() as sess:
+                    if lstm_impl == 'LSTMBlockCell':
+                        sess.run(tf.global_variables_initializer())
+                        saver.save(sess, save_path)
+                    else:
+                        saver.restore(sess, save_path)
+                    outputs_list.append(sess.run(
+                        outputs, feed_dict={inputs_pl: inputs,
+                                            inputs_seq_len_pl: inputs_seq_len}))
+
+        self.assertTrue(np.allclose(outputs_list[0], outputs_list[1],
+                                    atol=1e-5))
+
+    def test_streaming(self):
+        print("Streaming inference check.")
+
+        self.check_streaming(encoder_type='lstm', lstm_impl='LSTMCell')
+        self.check_streaming(encoder_type='lstm', lstm_impl='LSTMBlockCell')
+        self.check_streaming(encoder_type='lstm',
+                             lstm_impl='LSTMBlockFusedCell')
+        self.check_streaming(encoder_type='gru')
+        self.check_streaming(encoder_type='lc_blstm',
+                             lstm_impl='LSTMBlockCell')
+        self.check_streaming(encoder_type='lc_blstm', lstm_impl='LSTMCell')
+
+    def check_streaming(self, encoder_type, lstm_impl=None,
+                        num_stack=3, num_skip=3, chunk_size=20):
+        """Outputs over chunks with states carried over must be the same as
+           outputs over the whole utterance."""
+        inputs, _, inputs_seq_len = generate_data(
+            label_type='character',
+            model='ctc',
+            batch_size=1,
+            num_stack=1,
+            splice=1)
+        frames = inputs[0][:inputs_seq_len[0]]
+        inputs_stacked = stack_frame([frames], num_stack, num_skip)
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            if encoder_type == 'lstm':
+                encoder = load(encoder_type)(
+                    num_units=64,
+                    num_proj=32 if lstm_impl == 'LSTMCell' else None,
+                    num_layers=2,
+                    lstm_impl=lstm_impl,
+                    use_peephole=True,
+                    parameter_init=0.1,
+                    clip_activation=5,
+                    time_major=False)
+            elif encoder_type == 'lc_blstm':
+                encoder = load(encoder_type)(
+                    num_units=64,
+                    num_proj=32 if lstm_impl == 'LSTMCell' else None,
+                    num_layers=2,
+                    lstm_impl=lstm_impl,
+                    use_peephole=True,
+                    parameter_init=0.1,
+                    clip_activation=5,
+                    chunk_size=chunk_size,
+                    right_context=7,
+                    time_major=False)
+            else:
+                encoder = load(encoder_type)(
+                    num_units=64,
+                    num_layers=2,
+                    parameter_init=0.1,
+                    time_major=False)
+            inputs_pl = tf.placeholder(
+                tf.float32, shape=[None, None, inputs_stacked[0].shape[-1]])
+            inputs_seq_len_pl = tf.placeholder(tf.int32, shape=[None])
+            # NOTE: the reference over the whole utterance is computed
+            # without initial states, because inputs are regarded as a single
+            # chunk if initial states are given
+            with tf.variable_scope('encoder') as scope:
+                outputs_ref, _ = encoder(
+                    inputs_pl, inputs_seq_len_pl, keep_prob=1.0,
+                    is_training=False)
+            with tf.variable_scope(scope, reuse=True):
+                initial_state = encoder.create_state_placeholders(
+                    tf.shape(inputs_pl)[0])
+                outputs, final_state = encoder(
+                    inputs_pl, inputs_seq_len_pl, keep_prob=1.0,
+                    is_training=False, initial_state=initial_state)
 
-        # Dynamic
-        # self.check(encoder_type='pyramid_blstm')
-        # NOTE: this is under implementation
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+
+                # Whole utterance
+                outputs_utt = sess.run(
+                    outputs_ref, feed_dict={inputs_pl: inputs_stacked,
+                                            inputs_seq_len_pl: [len(inputs_stacked[0])]})
+
+                # Chunks
+                if encoder_type == 'lc_blstm':
+                    # NOTE: each chunk is fed with right context frames
+                    inputs_chunk_list = [
+                        inputs_stacked[0][t:t + encoder.chunk_size +
+                                          encoder.right_context]
+                        for t in range(0, len(inputs_stacked[0]),
+                                       encoder.chunk_size)]
+                else:
+                    stacker = FrameStacker(num_stack, num_skip)
+                    inputs_chunk_list = [
+                        stacker(frames[t:t + chunk_size],
+                                is_final=t + chunk_size >= len(frames))
+                        for t in range(0, len(frames), chunk_size)]
+
+                outputs_chunk_list = []
+                state = None
+                for inputs_chunk in inputs_chunk_list:
+                    if len(inputs_chunk) == 0:
+                        continue
+                    feed_dict = {
+                        inputs_pl: inputs_chunk[np.newaxis],
+                        inputs_seq_len_pl: [len(inputs_chunk)]
+                    }
+                    if state is not None:
+                        feed_dict[initial_state] = state
+                    outputs_chunk, state = sess.run(
+                        [outputs, final_state], feed_dict=feed_dict)
+                    outputs_chunk_list.append(outputs_chunk[0])
+
+        outputs_stream = np.concatenate(outputs_chunk_list, axis=0)
+        self.assertEqual(outputs_utt[0].shape, outputs_stream.shape)
+        self.assertTrue(np.allclose(outputs_utt[0], outputs_stream, atol=1e-5))
 
     @measure_time
-    def check(self, encoder_type, lstm_impl=None, time_major=False):
+    def check(self, encoder_type, lstm_impl=None, time_major=False,
+              subsample_list=None, subsample_type='concat'):
 
         print('==================================================')
         print('  encoder_type: %s' % encoder_type)
         print('  lstm_impl: %s' % lstm_impl)
         print('  time_major: %s' % time_major)
+        print('  subsample_list: %s' % str(subsample_list))
+        print('  subsample_type: %s' % subsample_type)
         print('==================================================')
 
         tf.reset_default_graph()
@@ -140,6 +383,30 @@ class TestEncoder(unittest.TestCase):
 
             # Define model graph
             if encoder_type in ['blstm', 'lstm']:
+                encoder = load(encoder_type)(
+                    num_units=256,
+                    num_proj=None,
+                    num_layers=5,
+                    lstm_impl=lstm_impl,
+                    use_peephole=True,
+                    parameter_init=0.1,
+                    clip_activation=5,
+                    time_major=time_major,
+                    subsample_list=subsample_list,
+                    subsample_type=subsample_type)
+            elif encoder_type == 'lc_blstm':
+                encoder = load(encoder_type)(
+                    num_units=256,
+                    num_proj=None,
+                    num_layers=5,
+                    lstm_impl=lstm_impl,
+                    use_peephole=True,
+                    parameter_init=0.1,
+                    clip_activation=5,
+                    chunk_size=20,
+                    right_context=10,
+                    time_major=time_major)
+            elif encoder_type == 'pyramid_blstm':
                 encoder = load(encoder_type)(
                     num_units=256,
                     num_proj=None,
@@ -149,7 +416,7 @@ class TestEncoder(unittest.TestCase):
                     parameter_init=0.1,
                     clip_activation=5,
                     time_major=time_major)
-            elif encoder_type in ['bgru', 'gru']:
+            elif encoder_type in ['bgru', 'gru', 'bqrnn', 'qrnn']:
                 encoder = load(encoder_type)(
                     num_units=256,
                     num_layers=5,
@@ -255,12 +522,16 @@ class TestEncoder(unittest.TestCase):
                 if time_major:
                     encoder_outputs = encoder_outputs.transpose(1, 0, 2)
 
-                if encoder_type in ['blstm', 'bgru', 'vgg_blstm', 'multitask_blstm', 'cldnn_wang']:
+                if subsample_list is not None:
+                    for factor in subsample_list:
+                        frame_num = int(np.ceil(frame_num / factor))
+
+                if encoder_type in ['blstm', 'bgru', 'bqrnn', 'vgg_blstm', 'multitask_blstm', 'cldnn_wang']:
                     if encoder_type != 'cldnn_wang':
                         self.assertEqual(
                             (batch_size, frame_num, encoder.num_units * 2), encoder_outputs.shape)
 
-                    if encoder_type != 'bgru':
+                    if encoder_type not in ['bgru', 'bqrnn']:
                         self.assertEqual(
                             (batch_size, encoder.num_units), final_state[0].c.shape)
                         self.assertEqual(
@@ -287,11 +558,25 @@ class TestEncoder(unittest.TestCase):
                         self.assertEqual(
                             (batch_size, encoder.num_units), final_state[1].shape)
 
-                elif encoder_type in ['lstm', 'gru', 'vgg_lstm', 'multitask_lstm']:
+                elif encoder_type == 'lc_blstm':
+                    self.assertEqual(
+                        (batch_size, frame_num, encoder.num_units * 2),
+                        encoder_outputs.shape)
+                    self.assertEqual(
+                        (batch_size, encoder.num_units), final_state[-1].c.shape)
+
+                elif encoder_type == 'pyramid_blstm':
+                    # 2x time reduction after each layer except the last
+                    frame_num_reduced = int(np.ceil(frame_num / 16))
+                    self.assertEqual(
+                        (batch_size, frame_num_reduced, encoder.num_units * 2),
+                        encoder_outputs.shape)
+
+                elif encoder_type in ['lstm', 'gru', 'qrnn', 'vgg_lstm', 'multitask_lstm']:
                     self.assertEqual(
                         (batch_size, frame_num, encoder.num_units), encoder_outputs.shape)
 
-                    if encoder_type != 'gru':
+                    if encoder_type not in ['gru', 'qrnn']:
                         self.assertEqual(
                             (batch_size, encoder.num_units), final_state[0].c.shape)
                         self.assertEqual(
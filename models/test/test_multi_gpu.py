@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import itertools
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(os.path.abspath('../../'))
+from utils.dataset.base import Base
+from utils.training.multi_gpu import average_gradients, average_losses
+
+
+def min_max_cost(seq_len, num_towers):
+    """Brute-force minimum cost of the most expensive tower."""
+    seq_len = sorted(seq_len, reverse=True)
+    num_utt = len(seq_len)
+    min_cost = None
+    for cuts in itertools.combinations(range(1, num_utt),
+                                       min(num_towers, num_utt) - 1):
+        bounds = [0] + list(cuts) + [num_utt]
+        cost = max(seq_len[bounds[i]] * (bounds[i + 1] - bounds[i])
+                   for i in range(len(bounds) - 1))
+        if min_cost is None or cost < min_cost:
+            min_cost = cost
+    return min_cost
+
+
+class TestMultiGPU(tf.test.TestCase):
+
+    def test(self):
+        print("Multi-tower gradient averaging working check.")
+
+        # The numbers of utterances differ between towers
+        self.check(seq_len=[5, 3, 9, 1, 7, 2, 8], num_towers=3)
+        self.check(seq_len=[5, 3, 9, 1, 7, 2, 8], num_towers=3,
+                   reduction='ring')
+        # A tower of a long utterance is balanced with many short ones
+        self.check(seq_len=[1, 1, 20, 1, 1, 1, 1, 1], num_towers=2)
+        # A tower receives no utterances
+        self.check(seq_len=[5, 3, 9], num_towers=4)
+
+    def check(self, seq_len, num_towers, reduction='tree'):
+
+        print('==================================================')
+        print('  seq_len: %s' % str(seq_len))
+        print('  num_towers: %d' % num_towers)
+        print('  reduction: %s' % reduction)
+        print('==================================================')
+
+        tower_indices = Base().split_by_length(seq_len, num_towers)
+        tower_sizes = [len(indices) for indices in tower_indices]
+        self.assertEqual(sorted(sum(tower_indices, [])),
+                         list(range(len(seq_len))))
+        if len(seq_len) >= num_towers:
+            self.assertGreater(min(tower_sizes), 0)
+
+        # The cost of the most expensive tower (the max length x the number
+        # of utterances) must be the minimum over all contiguous splits
+        max_cost = max(seq_len[indices[0]] * len(indices)
+                       for indices in tower_indices if len(indices) > 0)
+        self.assertEqual(max_cost, min_max_cost(seq_len, num_towers))
+
+        np.random.seed(0)
+        inputs = np.random.randn(len(seq_len), 4).astype(np.float32)
+        targets = np.random.randn(len(seq_len), 2).astype(np.float32)
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            weights = tf.Variable(
+                np.random.randn(4, 2).astype(np.float32), name='weights')
+
+            def compute_loss(x, y):
+                # Mean over utterances in the tower (NaN if empty)
+                return tf.reduce_mean(
+                    tf.reduce_sum(tf.square(tf.matmul(x, weights) - y), 1))
+
+            # Towers
+            inputs_pl_list, targets_pl_list = [], []
+            total_losses, total_grads_and_vars = [], []
+            for _ in range(num_towers):
+                inputs_pl_list.append(tf.placeholder(tf.float32, [None, 4]))
+                targets_pl_list.append(tf.placeholder(tf.float32, [None, 2]))
+                tower_loss = compute_loss(
+                    inputs_pl_list[-1], targets_pl_list[-1])
+                total_losses.append(tower_loss)
+                total_grads_and_vars.append(
+                    [(tf.gradients(tower_loss, weights)[0], weights)])
+            tower_weights = [tf.shape(x)[0] for x in inputs_pl_list]
+            loss_op = average_losses(total_losses, tower_weights)
+            grad_op = average_gradients(
+                total_grads_and_vars, reduction=reduction,
+                weights=tower_weights)[0][0]
+
+            # Reference: a single tower with all utterances
+            loss_ref_op = compute_loss(inputs, targets)
+            grad_ref_op = tf.gradients(loss_ref_op, weights)[0]
+
+            feed_dict = {}
+            for i_tower, indices in enumerate(tower_indices):
+                feed_dict[inputs_pl_list[i_tower]] = inputs[indices]
+                feed_dict[targets_pl_list[i_tower]] = targets[indices]
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                loss, grad, loss_ref, grad_ref = sess.run(
+                    [loss_op, grad_op, loss_ref_op, grad_ref_op],
+                    feed_dict=feed_dict)
+                self.assertAllClose(loss, loss_ref, rtol=1e-5)
+                self.assertAllClose(grad, grad_ref, rtol=1e-5)
+
+
+if __name__ == '__main__':
+    tf.test.main()
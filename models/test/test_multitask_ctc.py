@@ -30,6 +30,7 @@ class TestMultitaskCTC(tf.test.TestCase):
         self.check(encoder_type='multitask_blstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='multitask_blstm', lstm_impl='LSTMCell')
         self.check(encoder_type='multitask_blstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='multitask_blstm', lstm_impl='LSTMBlockFusedCell')
         self.check(encoder_type='multitask_blstm', lstm_impl='LSTMBlockCell',
                    time_major=True)
 
@@ -37,6 +38,7 @@ class TestMultitaskCTC(tf.test.TestCase):
         self.check(encoder_type='multitask_lstm', lstm_impl='BasicLSTMCell')
         self.check(encoder_type='multitask_lstm', lstm_impl='LSTMCell')
         self.check(encoder_type='multitask_lstm', lstm_impl='LSTMBlockCell')
+        self.check(encoder_type='multitask_lstm', lstm_impl='LSTMBlockFusedCell')
 
     @measure_time
     def check(self, encoder_type, lstm_impl, time_major=False):
@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(os.path.abspath('../../'))
+from utils.frozen_graph import freeze_graph
+from utils.quantization import find_weights, quantize_graph_def
+
+
+class TestQuantization(tf.test.TestCase):
+
+    def test(self):
+        print("Weight quantization working check.")
+
+        self.check(cell_type='LSTMBlockCell')
+        self.check(cell_type='GRUBlockCell')
+
+    def check(self, cell_type, num_units=32, input_size=16):
+
+        print('==================================================')
+        print('  cell_type: %s' % cell_type)
+        print('==================================================')
+
+        np.random.seed(0)
+        inputs = np.random.randn(2, 10, input_size).astype(np.float32)
+        inputs_seq_len = np.array([10, 7], dtype=np.int32)
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            inputs_pl = tf.placeholder(
+                tf.float32, shape=[None, None, input_size], name='inputs')
+            inputs_seq_len_pl = tf.placeholder(
+                tf.int32, shape=[None], name='inputs_seq_len')
+
+            initializer = tf.random_uniform_initializer(
+                minval=-0.1, maxval=0.1)
+            with tf.variable_scope('rnn', initializer=initializer):
+                if cell_type == 'LSTMBlockCell':
+                    cell = tf.contrib.rnn.LSTMBlockCell(num_units)
+                else:
+                    cell = tf.contrib.rnn.GRUBlockCell(num_units)
+                outputs, _ = tf.nn.dynamic_rnn(
+                    cell=cell,
+                    inputs=inputs_pl,
+                    sequence_length=inputs_seq_len_pl,
+                    dtype=tf.float32)
+            with tf.variable_scope('output', initializer=initializer):
+                weights = tf.get_variable('weights', [num_units, 8])
+                logits = tf.matmul(
+                    tf.reshape(outputs, [-1, num_units]), weights)
+            logits = tf.identity(logits, name='logits')
+
+            feed_dict = {inputs_pl: inputs,
+                         inputs_seq_len_pl: inputs_seq_len}
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                logits_float = sess.run(logits, feed_dict=feed_dict)
+                graph_def = freeze_graph(
+                    sess, ['inputs', 'inputs_seq_len'], ['logits'])
+
+        # All weight matrices of the cell must be found
+        weights = find_weights(graph_def, min_elements=0)
+        num_weights = 2 if cell_type == 'LSTMBlockCell' else 3
+        self.assertEqual(len(weights), num_weights)
+        for axis in weights.values():
+            self.assertEqual(axis, 1)
+
+        quantized_graph_def, errors = quantize_graph_def(
+            graph_def, min_elements=0)
+        self.assertEqual(sorted(errors.keys()), sorted(weights.keys()))
+        for error in errors.values():
+            self.assertLess(error, 0.01)
+
+        with tf.Graph().as_default():
+            tf.import_graph_def(quantized_graph_def, name='')
+            with tf.Session() as sess:
+                logits_quantized = sess.run(
+                    'logits:0',
+                    feed_dict={'inputs:0': inputs,
+                               'inputs_seq_len:0': inputs_seq_len})
+        self.assertAllClose(logits_float, logits_quantized, atol=1e-2)
+
+
+if __name__ == '__main__':
+    tf.test.main()
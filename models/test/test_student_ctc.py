@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(os.path.abspath('../../'))
+from models.ctc.student_ctc import StudentCTC
+from utils.frozen_graph import freeze_graph, import_frozen_graph
+
+
+def softmax(x, axis=-1):
+    x = x - np.max(x, axis=axis, keepdims=True)
+    return np.exp(x) / np.sum(np.exp(x), axis=axis, keepdims=True)
+
+
+class TestStudentCTC(tf.test.TestCase):
+
+    def test_distillation_loss(self):
+        print("Online distillation loss working check.")
+
+        self.check_distillation_loss(teacher_temperature=1)
+        self.check_distillation_loss(teacher_temperature=2)
+
+    def check_distillation_loss(self, teacher_temperature):
+
+        print('==================================================')
+        print('  teacher_temperature: %d' % teacher_temperature)
+        print('==================================================')
+
+        splice, num_stack = 5, 2
+        input_size = 40 * 3 * splice * num_stack
+        num_classes = 28
+        inputs_seq_len = np.array([6, 4], dtype=np.int32)
+
+        np.random.seed(0)
+        inputs = np.random.randn(2, 6, input_size).astype(np.float32)
+        posteriors = softmax(np.random.randn(
+            2, 6, num_classes + 1)).astype(np.float32)
+
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            model = StudentCTC(encoder_type='student_cnn_compact_xe',
+                               input_size=input_size,
+                               splice=splice,
+                               num_stack=num_stack,
+                               num_classes=num_classes,
+                               parameter_init=0.1)
+            loss_op, logits = model.compute_distillation_loss(
+                tf.constant(inputs), tf.constant(inputs_seq_len),
+                {'posteriors': tf.constant(posteriors)},
+                keep_prob=1.0,
+                teacher_temperature=teacher_temperature,
+                is_training=False)
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                loss, logits = sess.run([loss_op, logits])
+
+        # Reference: soft targets of valid frames only
+        mask = np.arange(6)[np.newaxis, :] < inputs_seq_len[:, np.newaxis]
+        soft_targets = softmax(
+            np.log(np.maximum(posteriors[mask], 1e-20)) / teacher_temperature)
+        self.assertEqual(logits.shape, soft_targets.shape)
+        log_probs = np.log(softmax(logits.astype(np.float64)))
+        loss_ref = np.mean(-np.sum(soft_targets * log_probs, axis=-1))
+        self.assertAllClose(loss, loss_ref, rtol=1e-5)
+
+    def test_import_teacher(self):
+        print("Teacher import working check.")
+
+        np.random.seed(0)
+        inputs = np.random.randn(2, 5, 3).astype(np.float32)
+        inputs_seq_len = np.array([5, 3], dtype=np.int32)
+        weights = np.random.randn(3, 4).astype(np.float32)
+
+        # Freeze a small teacher
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            inputs_pl = tf.placeholder(
+                tf.float32, shape=[None, None, 3], name='inputs')
+            inputs_seq_len_pl = tf.placeholder(
+                tf.int32, shape=[None], name='inputs_seq_len')
+            weights_var = tf.Variable(weights, name='weights')
+            logits = tf.reshape(
+                tf.matmul(tf.reshape(inputs_pl, [-1, 3]), weights_var),
+                [tf.shape(inputs_pl)[0], -1, 4])
+            posteriors = tf.nn.softmax(logits, name='posteriors')
+            outputs_seq_len = tf.identity(
+                inputs_seq_len_pl, name='outputs_seq_len')
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                graph_def = freeze_graph(
+                    sess, ['inputs', 'inputs_seq_len'],
+                    ['posteriors', 'outputs_seq_len'])
+        metadata = {
+            'inputs': {'inputs': inputs_pl.name,
+                       'inputs_seq_len': inputs_seq_len_pl.name},
+            'outputs': {'posteriors': posteriors.name,
+                        'outputs_seq_len': outputs_seq_len.name},
+            'contrib_rnn': False
+        }
+
+        # Import the teacher into each tower, fed by student placeholders
+        with tf.Graph().as_default():
+            tower_pl_list, teacher_outputs_list = [], []
+            for i_tower in range(2):
+                with tf.name_scope('tower_gpu%d' % i_tower):
+                    student_inputs_pl = tf.placeholder(
+                        tf.float32, shape=[None, None, 3], name='input')
+                    student_inputs_seq_len_pl = tf.placeholder(
+                        tf.int32, shape=[None], name='inputs_seq_len')
+                    teacher_outputs = import_frozen_graph(
+                        graph_def, metadata,
+                        inputs={'inputs': student_inputs_pl,
+                                'inputs_seq_len': student_inputs_seq_len_pl})
+                tower_pl_list.append(
+                    (student_inputs_pl, student_inputs_seq_len_pl))
+                teacher_outputs_list.append(teacher_outputs)
+
+            # The teacher is neither trained nor saved
+            self.assertEqual(len(tf.global_variables()), 0)
+            self.assertEqual(sorted(teacher_outputs_list[0].keys()),
+                             ['outputs_seq_len', 'posteriors'])
+            self.assertTrue(teacher_outputs_list[1]['posteriors'].name.startswith(
+                'tower_gpu1/teacher/'))
+
+            with tf.Session() as sess:
+                for i_tower, (x_pl, x_len_pl) in enumerate(tower_pl_list):
+                    # Only the placeholders of the student are fed
+                    outputs = sess.run(
+                        teacher_outputs_list[i_tower],
+                        feed_dict={x_pl: inputs * (i_tower + 1),
+                                   x_len_pl: inputs_seq_len})
+                    self.assertAllClose(
+                        outputs['posteriors'],
+                        softmax(np.dot(inputs * (i_tower + 1), weights)),
+                        rtol=1e-5)
+                    self.assertAllEqual(outputs['outputs_seq_len'],
+                                        inputs_seq_len)
+
+
+if __name__ == '__main__':
+    tf.test.main()
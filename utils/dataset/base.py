@@ -7,6 +7,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import random
+
 
 class Base(object):
 
@@ -16,6 +18,9 @@ class Base(object):
         self.iteration = 0
         self.is_new_epoch = False
 
+        # Random generator for each dataset
+        self.rng = random.Random(kwargs['seed'] if 'seed' in kwargs else None)
+
         self.map_dict = {}
         if 'map_file_path' in kwargs.keys():
             # Read the mapping file
@@ -52,6 +57,82 @@ class Base(object):
         """
         self.rest = set(range(0, len(self), 1))
 
+    def shard(self, num_shards, shard_index):
+        """Keep only one shard of utterances. This is useful when each worker
+        reads its own part of the dataset in distributed training. Utterances
+        are taken at intervals of num_shards, so that all shards have similar
+        distributions of lengths. The remainder of utterances is dropped, so
+        that all shards have the same number of utterances (and mini-batches).
+        Args:
+            num_shards (int): the number of shards
+            shard_index (int): the index of the shard to keep
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError('shard_index must be in [0, num_shards).')
+        num_utt = len(self.input_paths) // num_shards * num_shards
+        self.input_paths = self.input_paths[:num_utt][shard_index::num_shards]
+        self.label_paths = self.label_paths[:num_utt][shard_index::num_shards]
+        self.reset()
+
+    def split_by_length(self, seq_len, num_splits):
+        """Split utterances in a mini-batch into towers by length balancing.
+           Utterances sorted by length are divided into contiguous groups, so
+           that each tower is padded only to the max length of similar
+           utterances. The cost of each tower (the max length x the number of
+           utterances) is balanced, so that towers finish at similar times.
+           No tower is empty unless there are fewer utterances than towers.
+           NOTE: towers of shorter utterances receive more utterances, so
+           towers should be weighted by the numbers of utterances (see
+           `average_gradients` and `average_losses` in
+           utils.training.multi_gpu).
+        Args:
+            seq_len (list): list of length of utterances
+            num_splits (int): the number of towers
+        Returns:
+            tower_indices (list): list of indices of utterances of each tower.
+                Indices in each tower are in descending order of length.
+        """
+        order = sorted(range(len(seq_len)), key=lambda i: -seq_len[i])
+        if len(order) == 0:
+            return [[] for _ in range(num_splits)]
+
+        def partition(max_cost):
+            # Fill each tower greedily up to max_cost
+            groups = [[]]
+            for i in order:
+                group = groups[-1]
+                if len(group) > 0 and \
+                        seq_len[group[0]] * (len(group) + 1) > max_cost:
+                    groups.append([i])
+                else:
+                    group.append(i)
+            return groups
+
+        # Binary search of the minimum cost of the most expensive tower
+        low, high = seq_len[order[0]], seq_len[order[0]] * len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if len(partition(middle)) <= num_splits:
+                high = middle
+            else:
+                low = middle + 1
+        tower_indices = partition(low)
+
+        # Every tower receives at least one utterance if possible. Splitting
+        # the most expensive tower never increases the max cost.
+        while len(tower_indices) < num_splits:
+            splittable = [i for i in range(len(tower_indices))
+                          if len(tower_indices[i]) > 1]
+            if len(splittable) == 0:
+                tower_indices.append([])
+                continue
+            i_max = max(splittable, key=lambda i: seq_len[
+                tower_indices[i][0]] * len(tower_indices[i]))
+            group = tower_indices[i_max]
+            half = len(group) // 2
+            tower_indices[i_max:i_max + 1] = [group[:half], group[half:]]
+        return tower_indices
+
     @property
     def epoch_detail(self):
         # Floating point version of epoch.
@@ -11,7 +11,6 @@ from __future__ import division
 from __future__ import print_function
 
 from os.path import basename
-import random
 import numpy as np
 
 from utils.dataset.base import Base
@@ -24,43 +23,27 @@ class DatasetBase(Base):
     def __init__(self, *args, **kwargs):
         super(DatasetBase, self).__init__(*args, **kwargs)
 
+        # For saving the position in the dataset
+        self.num_batches_epoch = 0
+        self._epoch_start_state = None
+
+        # Ratio of padded frames of each tower in the last mini-batch
+        self.padding_ratio = []
+
     def __getitem__(self, index):
         input_i = np.array(self.input_paths[index])
         label_i = np.array(self.label_paths[index])
         return (input_i, label_i)
 
-    def __next__(self, batch_size=None):
-        """Generate each mini-batch.
+    def _sample_indices(self, batch_size):
+        """Select utterances in the next mini-batch.
         Args:
-            batch_size (int, optional): the size of mini-batch
+            batch_size (int): the size of mini-batch
         Returns:
-            A tuple of `(inputs, labels, inputs_seq_len, input_names)`
-                inputs: list of input data of size
-                    `[num_gpu, B, T_in, input_size]`
-                labels: list of target labels of size
-                    `[num_gpu, B, T_out]`
-                inputs_seq_len: list of length of inputs of size
-                    `[num_gpu, B]`
-                input_names: list of file name of input data of size
-                    `[num_gpu, B]`
-            is_new_epoch (bool): If true, 1 epoch is finished
+            data_indices (list): indices of utterances
         """
-        if self.max_epoch is not None and self.epoch >= self.max_epoch:
-            raise StopIteration
-        # NOTE: max_epoch = None means infinite loop
-
-        if batch_size is None:
-            batch_size = self.batch_size
-
-        # reset
-        if self.is_new_epoch:
-            self.is_new_epoch = False
-
-        if not self.is_test:
-            self.padded_value = -1
-        else:
-            self.padded_value = None
-        # TODO(hirofumi): move this
+        if self._epoch_start_state is None:
+            self._epoch_start_state = self._snapshot()
 
         if self.sort_utt:
             # Sort all uttrances by length
@@ -79,12 +62,12 @@ class DatasetBase(Base):
                     self.shuffle = True
 
             # Shuffle data in the mini-batch
-            random.shuffle(data_indices)
+            self.rng.shuffle(data_indices)
 
         elif self.shuffle:
             # Randomly sample uttrances
             if len(self.rest) > batch_size:
-                data_indices = random.sample(list(self.rest), batch_size)
+                data_indices = self.rng.sample(list(self.rest), batch_size)
                 self.rest -= set(data_indices)
             else:
                 # Last mini-batch
@@ -94,7 +77,7 @@ class DatasetBase(Base):
                 self.epoch += 1
 
                 # Shuffle selected mini-batch
-                random.shuffle(data_indices)
+                self.rng.shuffle(data_indices)
 
         else:
             if len(self.rest) > batch_size:
@@ -108,6 +91,99 @@ class DatasetBase(Base):
                 self.is_new_epoch = True
                 self.epoch += 1
 
+        self.num_batches_epoch += 1
+        if self.is_new_epoch:
+            self.num_batches_epoch = 0
+            self._epoch_start_state = self._snapshot()
+
+        return data_indices
+
+    def _snapshot(self):
+        """Save the state of sampling at the start of an epoch."""
+        version, internal_state, gauss_next = self.rng.getstate()
+        return {'rng_state': [version, list(internal_state), gauss_next],
+                'sort_utt': self.sort_utt,
+                'shuffle': self.shuffle}
+
+    def state_dict(self):
+        """Returns the position in the dataset. The remaining utterances are
+           not saved but recovered by replaying the sampling of the current
+           epoch from the saved random state.
+        Returns:
+            state (dict): A JSON serializable dictionary
+        """
+        if self._epoch_start_state is None:
+            self._epoch_start_state = self._snapshot()
+        return {'epoch': self.epoch,
+                'iteration': self.iteration,
+                'is_new_epoch': self.is_new_epoch,
+                'batch_size': self.batch_size,
+                'num_batches_epoch': self.num_batches_epoch,
+                'epoch_start': self._epoch_start_state}
+
+    def load_state_dict(self, state):
+        """Restore the position in the dataset.
+        Args:
+            state (dict): A dictionary returned by `state_dict()`
+        """
+        if state['batch_size'] != self.batch_size:
+            raise ValueError('batch_size must be the same as the saved one.')
+
+        epoch_start = state['epoch_start']
+        version, internal_state, gauss_next = epoch_start['rng_state']
+        self.rng.setstate((version, tuple(internal_state), gauss_next))
+        self.sort_utt = epoch_start['sort_utt']
+        self.shuffle = epoch_start['shuffle']
+        self.epoch = state['epoch']
+        self._epoch_start_state = epoch_start
+
+        # Replay the sampling of the current epoch
+        self.reset()
+        self.is_new_epoch = False
+        self.num_batches_epoch = 0
+        for _ in range(state['num_batches_epoch']):
+            self._sample_indices(self.batch_size)
+
+        self.iteration = state['iteration']
+        self.is_new_epoch = state['is_new_epoch']
+
+    def __next__(self, batch_size=None):
+        """Generate each mini-batch.
+        Args:
+            batch_size (int, optional): the size of mini-batch
+        Returns:
+            A tuple of `(inputs, labels, inputs_seq_len, input_names)`
+                inputs: list of input data of size
+                    `[num_gpu, B, T_in, input_size]`
+                labels: list of target labels of size
+                    `[num_gpu, B, T_out]`
+                inputs_seq_len: list of length of inputs of size
+                    `[num_gpu, B]`
+                input_names: list of file name of input data of size
+                    `[num_gpu, B]`
+                NOTE: when num_gpu > 1, utterances are assigned to towers by
+                their lengths, so that B and T_in differ between towers.
+            is_new_epoch (bool): If true, 1 epoch is finished
+        """
+        if self.max_epoch is not None and self.epoch >= self.max_epoch:
+            raise StopIteration
+        # NOTE: max_epoch = None means infinite loop
+
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        # reset
+        if self.is_new_epoch:
+            self.is_new_epoch = False
+
+        if not self.is_test:
+            self.padded_value = -1
+        else:
+            self.padded_value = None
+        # TODO(hirofumi): move this
+
+        data_indices = self._sample_indices(batch_size)
+
         # Load dataset in mini-batch
         input_list = np.array(list(
             map(lambda path: np.load(path),
@@ -127,59 +203,75 @@ class DatasetBase(Base):
                                  self.num_skip,
                                  progressbar=False)
 
-        # Compute max frame num in mini-batch
-        max_frame_num = max(map(lambda x: x.shape[0], input_list))
-
-        # Compute max target label length in mini-batch
-        max_seq_len = max(map(len, label_list))
-
-        # Initialization
-        inputs = np.zeros(
-            (len(data_indices), max_frame_num, self.input_size * self.splice),
-            dtype=np.float32)
-        labels = np.array(
-            [[self.padded_value] * max_seq_len] * len(data_indices))
-        inputs_seq_len = np.zeros((len(data_indices),), dtype=np.int32)
-        input_names = list(
-            map(lambda path: basename(path).split('.')[0],
-                np.take(self.input_paths, data_indices, axis=0)))
-
-        # Set values of each data in mini-batch
-        for i_batch in range(len(data_indices)):
-            data_i = input_list[i_batch]
-            frame_num, input_size = data_i.shape
-
-            # Splicing
-            data_i = data_i.reshape(1, frame_num, input_size)
-            data_i = do_splice(data_i,
-                               splice=self.splice,
-                               batch_size=1,
-                               num_stack=self.num_stack)
-            data_i = data_i.reshape(frame_num, -1)
-
-            inputs[i_batch, :frame_num, :] = data_i
-            if self.is_test:
-                labels[i_batch, 0] = label_list[i_batch]
-            else:
-                labels[i_batch, :len(label_list[i_batch])
-                       ] = label_list[i_batch]
-            inputs_seq_len[i_batch] = frame_num
-
         ###############
         # Multi-GPUs
         ###############
         if self.num_gpu > 1:
-            # Now we split the mini-batch data by num_gpu
-            inputs = np.array_split(inputs, self.num_gpu, axis=0)
-            labels = np.array_split(labels, self.num_gpu, axis=0)
-            inputs_seq_len = np.array_split(
-                inputs_seq_len, self.num_gpu, axis=0)
-            input_names = np.array_split(input_names, self.num_gpu, axis=0)
+            # Assign utterances to towers by their lengths, and pad each tower
+            # only to its own max length
+            tower_indices = self.split_by_length(
+                [x.shape[0] for x in input_list], self.num_gpu)
         else:
-            inputs = inputs[np.newaxis, :, :, :]
-            labels = labels[np.newaxis, :, :]
-            inputs_seq_len = inputs_seq_len[np.newaxis, :]
-            input_names = np.array(input_names)[np.newaxis, :]
+            tower_indices = [list(range(len(data_indices)))]
+
+        input_names_all = list(
+            map(lambda path: basename(path).split('.')[0],
+                np.take(self.input_paths, data_indices, axis=0)))
+
+        inputs, labels, inputs_seq_len, input_names = [], [], [], []
+        for indices in tower_indices:
+            # Compute max frame num in the tower
+            max_frame_num = max([input_list[i].shape[0] for i in indices] +
+                                [0])
+
+            # Compute max target label length in the tower
+            max_seq_len = max([len(label_list[i]) for i in indices] + [0])
+
+            # Initialization
+            inputs_tower = np.zeros(
+                (len(indices), max_frame_num, self.input_size * self.splice),
+                dtype=np.float32)
+            labels_tower = np.array(
+                [[self.padded_value] * max_seq_len] * len(indices)).reshape(
+                    len(indices), max_seq_len)
+            inputs_seq_len_tower = np.zeros((len(indices),), dtype=np.int32)
+
+            # Set values of each data in the tower
+            for i_batch, i in enumerate(indices):
+                data_i = input_list[i]
+                frame_num, input_size = data_i.shape
+
+                # Splicing
+                data_i = data_i.reshape(1, frame_num, input_size)
+                data_i = do_splice(data_i,
+                                   splice=self.splice,
+                                   batch_size=1,
+                                   num_stack=self.num_stack)
+                data_i = data_i.reshape(frame_num, -1)
+
+                inputs_tower[i_batch, :frame_num, :] = data_i
+                if self.is_test:
+                    labels_tower[i_batch, 0] = label_list[i]
+                else:
+                    labels_tower[i_batch, :len(label_list[i])] = label_list[i]
+                inputs_seq_len_tower[i_batch] = frame_num
+
+            inputs.append(inputs_tower)
+            labels.append(labels_tower)
+            inputs_seq_len.append(inputs_seq_len_tower)
+            input_names.append(np.array(
+                [input_names_all[i] for i in indices]))
+
+        # Ratio of padded frames of each tower
+        self.padding_ratio = [
+            1 - np.sum(x_len) / max(x.shape[0] * x.shape[1], 1)
+            for x, x_len in zip(inputs, inputs_seq_len)]
+
+        if self.num_gpu == 1:
+            inputs = np.array(inputs)
+            labels = np.array(labels)
+            inputs_seq_len = np.array(inputs_seq_len)
+            input_names = np.array(input_names)
 
         self.iteration += len(data_indices)
 
@@ -56,6 +56,51 @@ def compute_per(ref, hyp, normalize=True):
     return per
 
 
+def compute_ler_batch(ref_values, ref_offsets, hyp_values, hyp_offsets,
+                      normalize=True):
+    """Compute Label Error Rate of each utterance in ragged batches of label
+       indices. Label indices are packed into a single unicode string at once,
+       so strings of symbols are not needed.
+    Args:
+        ref_values (np.ndarray): concatenated label indices of references
+        ref_offsets (np.ndarray): A tensor of size `[B + 1]`
+        hyp_values (np.ndarray): concatenated label indices of hypotheses
+        hyp_offsets (np.ndarray): A tensor of size `[B + 1]`
+        normalize (bool, optional): if True, divide by the length of each
+            reference
+    Returns:
+        ler (np.ndarray): A tensor of size `[B]`
+    """
+    assert len(ref_offsets) == len(hyp_offsets), \
+        'the number of references and hypotheses do not match.'
+
+    # Map label indices to unicode code points
+    # NOTE: Levenshtein packages only accepts strings
+    ref_str = _idx2unicode(ref_values)
+    hyp_str = _idx2unicode(hyp_values)
+
+    ler = np.array(
+        [lev.distance(ref_str[ref_offsets[i]:ref_offsets[i + 1]],
+                      hyp_str[hyp_offsets[i]:hyp_offsets[i + 1]])
+         for i in range(len(ref_offsets) - 1)], dtype=np.float64)
+    if normalize:
+        ler /= np.maximum(np.diff(ref_offsets), 1)
+    return ler
+
+
+def _idx2unicode(index_list):
+    """Convert label indices to a unicode string (1 index per character).
+    Args:
+        index_list (np.ndarray): label indices
+    Returns:
+        A unicode string
+    """
+    index_list = np.asarray(index_list, dtype=np.int64)
+    assert np.all((index_list >= 0) & (index_list < 0xD800)), \
+        'label indices must be in [0, 55296).'
+    return index_list.astype('<u4').tobytes().decode('utf-32-le')
+
+
 def compute_cer(str_pred, str_true, normalize=True):
     """Compute Character Error Rate.
     Args:
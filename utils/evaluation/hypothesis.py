@@ -0,0 +1,237 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Import hypotheses of external decoders (e.g. Julius) and compare them
+   with the references used in the evaluation of end-to-end models.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import basename
+import re
+import codecs
+import functools
+import numpy as np
+
+from utils.parallel import make_parallel
+
+
+def parse_text(path, encoding='utf-8'):
+    """Parse a file of `utt_name text` lines.
+    Args:
+        path (string): path to the file
+        encoding (string, optional): encoding of the file
+    Returns:
+        result_list (list): list of tuples of `(utt_name, text)`
+    """
+    result_list = []
+    with codecs.open(path, 'r', encoding) as f:
+        for line in f:
+            line = line.strip().split(' ', 1)
+            if len(line[0]) == 0:
+                continue
+            result_list.append((line[0], line[1] if len(line) == 2 else ''))
+    return result_list
+
+
+def parse_julius_kana(path, encoding='euc_jp'):
+    """Parse a result file (.kana) of Julius. Each line of the path to the
+       wav file is followed by the line of the recognition result.
+    Args:
+        path (string): path to the file
+        encoding (string, optional): encoding of the file
+    Returns:
+        result_list (list): list of tuples of `(utt_name, text)`
+    """
+    result_list = []
+    with codecs.open(path, 'r', encoding) as f:
+        utt_name = ''
+        for line in f:
+            line = line.strip()
+            if 'wav' in line:
+                utt_name = '_'.join(line.split('/')[-2:])
+                utt_name = re.sub('.wav', '', utt_name)
+            else:
+                result_list.append((utt_name, re.sub('sp', '', line)))
+    return result_list
+
+
+def parse_julius_log(path, encoding='euc_jp', field='sentence1',
+                     basename_only=False):
+    """Parse a log file of Julius.
+    Args:
+        path (string): path to the file
+        encoding (string, optional): encoding of the file
+        field (string, optional): sentence1 or wseq1
+        basename_only (bool, optional): if True, the basename of the input
+            file is used as the utterance name. Otherwise, the name of
+            the parent directory is concatenated.
+    Returns:
+        result_list (list): list of tuples of `(utt_name, text)`
+    """
+    result_list = []
+    with codecs.open(path, 'r', encoding) as f:
+        start_flag = False
+        utt_name = ''
+        for line in f:
+            line = line.strip()
+            if line == '----------------------- System Information end -----------------------':
+                start_flag = True
+            if not start_flag:
+                continue
+
+            if 'input MFCC file' in line:
+                utt_name = line.split(': ')[-1]
+                if basename_only:
+                    utt_name = basename(utt_name)
+                else:
+                    utt_name = '_'.join(utt_name.split('/')[-2:])
+                utt_name = re.sub('.wav', '', utt_name)
+                utt_name = re.sub('.htk', '', utt_name)
+
+            if field in line:
+                text = line.split(': ')[-1]
+                text = re.sub('<s>', '', text)
+                text = re.sub('</s>', '', text)
+                text = re.sub('<sp>', '', text)
+                result_list.append((utt_name, text.strip()))
+    return result_list
+
+
+PARSERS = {
+    "text": parse_text,
+    "julius_kana": parse_julius_kana,
+    "julius_log": parse_julius_log
+}
+
+
+def _load_label(label_path):
+    """Load a transcript saved as npy file."""
+    return np.load(label_path).tolist()
+
+
+class HypothesisStore(object):
+    """Indexed store of transcripts per utterance. All transcripts are kept
+       in a single string, and utterances are looked up by binary search over
+       the sorted utterance names.
+    Args:
+        utt_names (list): list of utterance names
+        texts (list): list of transcripts
+    """
+
+    def __init__(self, utt_names, texts):
+        # NOTE: the last one is used if utterance names are duplicated
+        text_dict = dict(zip(utt_names, texts))
+
+        self.utt_names = np.array(sorted(text_dict.keys()), dtype=np.str_)
+        texts = [text_dict[utt_name] for utt_name in self.utt_names]
+        self.text = ''.join(texts)
+        self.offsets = np.zeros((len(texts) + 1,), dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=self.offsets[1:])
+
+    @classmethod
+    def from_files(cls, paths, file_format='text', num_jobs=1, **kwargs):
+        """Parse files of an external decoder.
+        Args:
+            paths (list): paths to result files
+            file_format (string, optional): the name of the parser in the key
+                of PARSERS
+            num_jobs (int, optional): the number of processes
+            kwargs: arguments for the parser
+        Returns:
+            An instance of `HypothesisStore`
+        """
+        if file_format not in PARSERS.keys():
+            raise ValueError(
+                "file_format should be one of [%s], you provided %s." %
+                (", ".join(PARSERS), file_format))
+        parser = functools.partial(PARSERS[file_format], **kwargs)
+
+        paths = sorted(paths)
+        if num_jobs > 1 and len(paths) > 1:
+            result_lists = make_parallel(parser, paths,
+                                         core=min(num_jobs, len(paths)))
+        else:
+            result_lists = list(map(parser, paths))
+
+        utt_names, texts = [], []
+        for result_list in result_lists:
+            for utt_name, text in result_list:
+                utt_names.append(utt_name)
+                texts.append(text)
+        return cls(utt_names, texts)
+
+    @classmethod
+    def from_dataset(cls, dataset, num_jobs=1):
+        """Load references of the test set from the same index as the
+           evaluation of end-to-end models. Input features are not loaded.
+        Args:
+            dataset: An instance of a `Dataset` class of the test set
+            num_jobs (int, optional): the number of processes
+        Returns:
+            An instance of `HypothesisStore`
+        """
+        assert dataset.is_test, 'transcripts are saved only in the test set.'
+        utt_names = [basename(path).split('.')[0]
+                     for path in dataset.input_paths]
+        if num_jobs > 1:
+            texts = make_parallel(_load_label, dataset.label_paths,
+                                  core=num_jobs)
+        else:
+            texts = list(map(_load_label, dataset.label_paths))
+        return cls(utt_names, texts)
+
+    def __len__(self):
+        return len(self.utt_names)
+
+    def __contains__(self, utt_name):
+        i = np.searchsorted(self.utt_names, utt_name)
+        return i < len(self.utt_names) and self.utt_names[i] == utt_name
+
+    def __getitem__(self, utt_name):
+        i = np.searchsorted(self.utt_names, utt_name)
+        if i == len(self.utt_names) or self.utt_names[i] != utt_name:
+            raise KeyError(utt_name)
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def keys(self):
+        return self.utt_names.tolist()
+
+    def items(self):
+        for i, utt_name in enumerate(self.utt_names.tolist()):
+            yield utt_name, self.text[self.offsets[i]:self.offsets[i + 1]]
+
+
+def score(ref_store, hyp_store, error_fn):
+    """Compare hypotheses with references of the same utterances.
+    Args:
+        ref_store: An instance of `HypothesisStore` of references
+        hyp_store: An instance of `HypothesisStore` of hypotheses
+        error_fn (function): A function which takes `(ref, hyp)` and returns
+            the error of the utterance
+    Returns:
+        error_mean (float): An average of errors over scored utterances
+        num_missing (int): the number of references without hypotheses
+    """
+    # Intersect sorted utterance names
+    hyp_indices = np.searchsorted(hyp_store.utt_names, ref_store.utt_names)
+    hyp_indices = np.minimum(hyp_indices, max(len(hyp_store) - 1, 0))
+    if len(hyp_store) > 0:
+        is_found = hyp_store.utt_names[hyp_indices] == ref_store.utt_names
+    else:
+        is_found = np.zeros((len(ref_store),), dtype=np.bool_)
+    ref_indices = np.where(is_found)[0]
+    hyp_indices = hyp_indices[is_found]
+
+    error_sum = 0
+    for i_ref, i_hyp in zip(ref_indices, hyp_indices):
+        ref = ref_store.text[ref_store.offsets[i_ref]:
+                             ref_store.offsets[i_ref + 1]]
+        hyp = hyp_store.text[hyp_store.offsets[i_hyp]:
+                             hyp_store.offsets[i_hyp + 1]]
+        error_sum += error_fn(ref, hyp)
+
+    error_mean = error_sum / max(len(ref_indices), 1)
+    return error_mean, len(ref_store) - len(ref_indices)
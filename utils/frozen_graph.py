@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Export and load self-contained frozen inference graphs. The loader does
+   not depend on the model definitions in `models/`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join
+import json
+import tensorflow as tf
+try:
+    from tensorflow.tools.graph_transforms import TransformGraph
+except ImportError:
+    # NOTE: graph transforms are available from TensorFlow 1.3
+    TransformGraph = None
+
+GRAPH_FILE_NAME = 'frozen_graph.pb'
+METADATA_FILE_NAME = 'metadata.json'
+
+# Ops defined in tf.contrib.rnn, which must be registered before importing
+CONTRIB_RNN_OPS = ['LSTMBlockCell', 'BlockLSTM', 'GRUBlockCell']
+
+TRANSFORMS = [
+    'strip_unused_nodes',
+    'fold_constants(ignore_errors=true)',
+    'sort_by_execution_order'
+]
+
+
+def freeze_graph(session, input_names, output_names):
+    """Convert variables to constants and strip nodes not needed to compute
+       outputs, such as training and summary ops.
+    Args:
+        session: session where the variables are restored
+        input_names (list): names of input nodes
+        output_names (list): names of output nodes
+    Returns:
+        graph_def: A frozen `GraphDef`
+    """
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        session, session.graph.as_graph_def(), output_names)
+
+    if TransformGraph is not None:
+        # Fold constants
+        graph_def = TransformGraph(graph_def, input_names, output_names,
+                                   TRANSFORMS)
+    return graph_def
+
+
+def export_frozen_graph(session, save_path, inputs, outputs, metadata=None):
+    """Export a frozen inference graph and its metadata.
+    Args:
+        session: session where the variables are restored
+        save_path (string): path to the directory to save files
+        inputs (dict): A dictionary of input names and placeholders
+        outputs (dict): A dictionary of output names and tensors
+        metadata (dict, optional): information needed to feed inputs and
+            interpret outputs, such as vocabulary, num_stack and splice
+    Returns:
+        graph_path (string): path to the frozen graph
+    """
+    input_names = [t.op.name for t in inputs.values()]
+    output_names = [t.op.name for t in outputs.values()]
+    graph_def = freeze_graph(session, input_names, output_names)
+
+    metadata = dict(metadata) if metadata is not None else {}
+    metadata['inputs'] = dict((k, t.name) for k, t in inputs.items())
+    metadata['outputs'] = dict((k, t.name) for k, t in outputs.items())
+    metadata['contrib_rnn'] = any(
+        node.op in CONTRIB_RNN_OPS for node in graph_def.node)
+
+    return save_frozen_graph(save_path, graph_def, metadata)
+
+
+def save_frozen_graph(save_path, graph_def, metadata):
+    """Save a frozen graph and its metadata.
+    Args:
+        save_path (string): path to the directory to save files
+        graph_def: A frozen `GraphDef`
+        metadata (dict): metadata of the graph
+    Returns:
+        graph_path (string): path to the frozen graph
+    """
+    graph_path = join(save_path, GRAPH_FILE_NAME)
+    with open(graph_path, 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    with open(join(save_path, METADATA_FILE_NAME), 'w') as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+
+    return graph_path
+
+
+def load_frozen_graph(model_path):
+    """Load a frozen graph and its metadata.
+    Args:
+        model_path (string): path to the directory of the exported graph
+    Returns:
+        graph_def: A frozen `GraphDef`
+        metadata (dict): metadata of the graph
+    """
+    with open(join(model_path, METADATA_FILE_NAME), 'r') as f:
+        metadata = json.load(f)
+
+    graph_def = tf.GraphDef()
+    with open(join(model_path, GRAPH_FILE_NAME), 'rb') as f:
+        graph_def.ParseFromString(f.read())
+
+    return graph_def, metadata
+
+
+def import_frozen_graph(graph_def, metadata, inputs, name='teacher'):
+    """Import a frozen graph into the default graph, feeding its inputs
+       from tensors of the graph. The imported graph has no variables, so it
+       is neither trained nor saved in checkpoints.
+    Args:
+        graph_def: A frozen `GraphDef`
+        metadata (dict): metadata of the graph
+        inputs (dict): A dictionary of input names and tensors to feed
+        name (string, optional): the prefix of imported nodes
+    Returns:
+        outputs (dict): A dictionary of output names and tensors
+    """
+    if metadata['contrib_rnn']:
+        # Register ops of tf.contrib.rnn (loaded lazily)
+        tf.contrib.rnn
+
+    input_map = dict((metadata['inputs'][k], t) for k, t in inputs.items())
+    output_keys = sorted(metadata['outputs'].keys())
+    output_tensors = tf.import_graph_def(
+        graph_def, input_map=input_map,
+        return_elements=[metadata['outputs'][k] for k in output_keys],
+        name=name)
+    return dict(zip(output_keys, output_tensors))
+
+
+class FrozenGraph(object):
+    """Load a frozen inference graph exported by `export_frozen_graph`.
+    Args:
+        model_path (string): path to the directory of the exported graph
+        config (optional): A `tf.ConfigProto` of the session
+        graph_def (optional): A frozen `GraphDef`. This is used instead of
+            the files in model_path if given with metadata.
+        metadata (dict, optional): metadata of graph_def
+    """
+
+    def __init__(self, model_path=None, config=None, graph_def=None,
+                 metadata=None):
+
+        if graph_def is None or metadata is None:
+            graph_def, metadata = load_frozen_graph(model_path)
+        self.metadata = metadata
+
+        if self.metadata['contrib_rnn']:
+            # Register ops of tf.contrib.rnn (loaded lazily)
+            tf.contrib.rnn
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+
+        self.inputs = dict(
+            (k, self.graph.get_tensor_by_name(name))
+            for k, name in self.metadata['inputs'].items())
+        self.outputs = dict(
+            (k, self.graph.get_tensor_by_name(name))
+            for k, name in self.metadata['outputs'].items())
+
+        self.session = tf.Session(graph=self.graph, config=config)
+
+    def __call__(self, feeds, fetches=None):
+        """Run the graph.
+        Args:
+            feeds (dict): A dictionary of input names and values
+            fetches (list, optional): names of outputs to compute.
+                Default is all outputs.
+        Returns:
+            A dictionary of output names and values
+        """
+        if fetches is None:
+            fetches = list(self.outputs.keys())
+        feed_dict = dict((self.inputs[k], v) for k, v in feeds.items())
+        values = self.session.run([self.outputs[k] for k in fetches],
+                                  feed_dict=feed_dict)
+        return dict(zip(fetches, values))
+
+    def close(self):
+        self.session.close()
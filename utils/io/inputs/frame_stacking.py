@@ -83,3 +83,63 @@ def stack_frame(input_list, num_stack, num_skip, progressbar=False):
         input_list_new.append(stacked_frames)
 
     return np.array(input_list_new)
+
+
+class FrameStacker(object):
+    """Stack & skip frames of an utterance fed in chunks. Frames which are
+       not stacked yet are kept until the next chunk, so that outputs are the
+       same as those of `stack_frame` over the whole utterance.
+    Args:
+        num_stack (int): the number of frames to stack
+        num_skip (int): the number of frames to skip
+    """
+
+    def __init__(self, num_stack, num_skip):
+        if num_stack < num_skip:
+            raise ValueError('num_skip must be less than num_stack.')
+
+        self.num_stack = num_stack
+        self.num_skip = num_skip
+        self.reset()
+
+    def reset(self):
+        """Clear frames kept from the previous chunk."""
+        self.frames_left = None
+
+    def __call__(self, frames, is_final=False):
+        """
+        Args:
+            frames (np.ndarray): A tensor of size `[T_chunk, input_size]`
+            is_final (bool, optional): if True, the chunk is the end of the
+                utterance, and the last frames are stacked with zero padding
+        Returns:
+            stacked_frames (np.ndarray): A tensor of size
+                `[T_chunk', input_size * num_stack]`
+        """
+        if self.num_stack == 1 and self.num_skip == 1:
+            return frames
+
+        if self.frames_left is not None:
+            frames = np.concatenate([self.frames_left, frames], axis=0)
+        frame_num, input_size = frames.shape
+
+        if is_final:
+            frame_num_new = int(math.ceil(frame_num / self.num_skip))
+        else:
+            # Stack only frames whose context is filled
+            frame_num_new = max(
+                0, (frame_num - self.num_stack) // self.num_skip + 1)
+
+        stacked_frames = np.zeros(
+            (frame_num_new, input_size * self.num_stack))
+        for t in range(frame_num_new):
+            stack = frames[t * self.num_skip:t *
+                           self.num_skip + self.num_stack]
+            stacked_frames[t, :stack.size] = stack.reshape(-1)
+
+        if is_final:
+            self.reset()
+        else:
+            self.frames_left = frames[frame_num_new * self.num_skip:]
+
+        return stacked_frames
@@ -0,0 +1,45 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Save & load label archives. A label archive stores the labels of all
+   utterances in a corpus as a single ragged batch.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+
+def save_label_archive(save_path, utt_names, values, offsets):
+    """Save labels of all utterances as a npz file.
+    Args:
+        save_path (string): path to the archive (.npz)
+        utt_names (list): list of utterance names, size of `[B]`
+        values (np.ndarray): concatenated label indices of all utterances,
+            size of `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    assert len(utt_names) + 1 == len(offsets), \
+        'the number of utterances and offsets do not match.'
+    np.savez(save_path,
+             utt_names=np.array(utt_names),
+             values=values,
+             offsets=offsets)
+
+
+def load_label_archive(archive_path):
+    """Load a label archive.
+    Args:
+        archive_path (string): path to the archive (.npz)
+    Returns:
+        label_dict (dict):
+            key (string) => utterance name
+            value (np.ndarray) => label indices
+    """
+    archive = np.load(archive_path)
+    utt_names = archive['utt_names'].tolist()
+    values = archive['values']
+    offsets = archive['offsets']
+    return dict(zip(utt_names, np.split(values, offsets[1:-1])))
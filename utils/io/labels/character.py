@@ -5,8 +5,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import itertools
 import numpy as np
 
+from utils.io.labels.ragged import ragged_join
+
 
 class Char2idx(object):
     """Convert from character to index.
@@ -26,6 +29,18 @@ class Char2idx(object):
                 line = line.strip().split()
                 self.map_dict[line[0]] = int(line[1])
 
+        # Build a trie for the longest-match tokenization.
+        # Each node is a list of `[index, children]`, where index is None
+        # if the path from the root is not a token.
+        self.trie = [None, {}]
+        for token, index in self.map_dict.items():
+            if len(token) > 1 and not double_letter:
+                continue
+            node = self.trie
+            for char in token:
+                node = node[1].setdefault(char, [None, {}])
+            node[0] = index
+
     def __call__(self, str_char):
         """
         Args:
@@ -33,39 +48,44 @@ class Char2idx(object):
         Returns:
             char_list (list): character indices
         """
-        char_list = list(str_char)
-
-        # Convert from character to index
-        if self.double_letter:
-            skip_flag = False
-            for i in range(len(char_list) - 1):
-                if skip_flag:
-                    char_list[i] = ''
-                    skip_flag = False
-                    continue
-
-                if char_list[i] + char_list[i + 1] in self.map_dict.keys():
-                    char_list[i] = self.map_dict[char_list[i] +
-                                                 char_list[i + 1]]
-                    skip_flag = True
-                else:
-                    char_list[i] = self.map_dict[char_list[i]]
-
-            # Final character
-            if skip_flag:
-                char_list[-1] = ''
-            else:
-                char_list[-1] = self.map_dict[char_list[-1]]
-
-            # Remove skipped characters
-            while '' in char_list:
-                char_list.remove('')
-        else:
-            for i in range(len(char_list)):
-                char_list[i] = self.map_dict[char_list[i]]
+        char_list = []
+        pos, length = 0, len(str_char)
+        while pos < length:
+            # Find the longest token starting from pos
+            node = self.trie
+            index, token_len = None, 0
+            for i in range(pos, length):
+                node = node[1].get(str_char[i])
+                if node is None:
+                    break
+                if node[0] is not None:
+                    index, token_len = node[0], i - pos + 1
+            if index is None:
+                raise KeyError(str_char[pos])
+
+            char_list.append(index)
+            pos += token_len
 
         return char_list
 
+    def batch(self, str_char_list):
+        """Convert a list of transcripts to a ragged batch at once.
+        Args:
+            str_char_list (list): list of strings of characters
+        Returns:
+            values (np.ndarray): concatenated character indices of all
+                transcripts, size of `[total_label_len]`
+            offsets (np.ndarray): A tensor of size `[B + 1]`. The indices of
+                the i-th transcript are `values[offsets[i]:offsets[i + 1]]`.
+        """
+        char_list_batch = [self(str_char) for str_char in str_char_list]
+        offsets = np.zeros((len(char_list_batch) + 1,), dtype=np.int64)
+        np.cumsum([len(char_list) for char_list in char_list_batch],
+                  out=offsets[1:])
+        values = np.fromiter(itertools.chain.from_iterable(char_list_batch),
+                             dtype=np.int32, count=offsets[-1])
+        return values, offsets
+
 
 class Idx2char(object):
     """Convert from index to character.
@@ -87,6 +107,20 @@ class Idx2char(object):
                 line = line.strip().split()
                 self.map_dict[int(line[1])] = line[0]
 
+        # Build lookup tables indexed by label index
+        vocab_size = max(self.map_dict.keys()) + 1
+        self.map_array = np.full((vocab_size,), '', dtype=object)
+        self.is_capital = np.zeros((vocab_size,), dtype=np.bool_)
+        for index, char in self.map_dict.items():
+            if capital_divide:
+                self.is_capital[index] = 'A' <= char <= 'Z'
+                char = char.lower()
+            self.map_array[index] = char
+        self.head_array = np.array(
+            [self.space_mark + char for char in self.map_array], dtype=object)
+        self.length_array = np.array(
+            [len(char) for char in self.map_array], dtype=np.int64)
+
     def __call__(self, index_list, padded_value=-1):
         """
         Args:
@@ -99,22 +133,35 @@ class Idx2char(object):
         # Remove padded values
         assert type(
             index_list) == np.ndarray, 'index_list should be np.ndarray.'
-        index_list = np.delete(index_list, np.where(
-            index_list == padded_value), axis=0)
+        if padded_value is not None:
+            index_list = index_list[index_list != padded_value]
+
+        return self.batch(index_list, np.array([0, len(index_list)]))[0]
+
+    def batch(self, values, offsets):
+        """Convert a ragged batch of indices to strings at once.
+        Args:
+            values (np.ndarray): concatenated character indices of all
+                utterances, size of `[total_label_len]`
+            offsets (np.ndarray): A tensor of size `[B + 1]`. The indices of
+                the i-th utterance are `values[offsets[i]:offsets[i + 1]]`.
+        Returns:
+            str_char_list (list): list of strings, size of `[B]`
+        """
+        values = np.asarray(values, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
 
         # Convert from indices to the corresponding characters
-        char_list = list(map(lambda x: self.map_dict[x], index_list))
+        char_array = self.map_array[values]
+        lengths = self.length_array[values]
 
         if self.capital_divide:
-            char_list_tmp = []
-            for i in range(len(char_list)):
-                if i != 0 and 'A' <= char_list[i] <= 'Z':
-                    char_list_tmp += [self.space_mark, char_list[i].lower()]
-                else:
-                    char_list_tmp += [char_list[i].lower()]
-            str_char = ''.join(char_list_tmp)
-        else:
-            str_char = ''.join(char_list)
-
-        return str_char
-        # TODO: change to batch version
+            # Insert the space mark before capital letters except for the
+            # first character of each utterance
+            is_head = self.is_capital[values]
+            begins = offsets[:-1]
+            is_head[begins[begins < len(values)]] = False
+            char_array = np.where(is_head, self.head_array[values], char_array)
+            lengths = lengths + is_head * len(self.space_mark)
+
+        return ragged_join(char_array, lengths, offsets)
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Encode transcripts of a whole corpus to character indices and save them
+   as a label archive. This is useful when the vocabulary has been changed.
+
+   Each line of the transcript files is expected to be `utt_name transcript`.
+
+   ex.)
+   python encode_corpus.py \
+       --map_file_path ../../../examples/csj/metrics/mapping_files/kana.txt \
+       --save_path labels.npz \
+       --num_jobs 8 \
+       text1.txt text2.txt
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import abspath, dirname, join
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(abspath(join(dirname(__file__), '../../../')))
+from utils.io.labels.character import Char2idx
+from utils.io.labels.archive import save_label_archive
+from utils.parallel import make_parallel
+
+parser = argparse.ArgumentParser()
+parser.add_argument('transcript_paths', type=str, nargs='+',
+                    help='paths to transcript files')
+parser.add_argument('--map_file_path', type=str,
+                    help='path to the mapping file')
+parser.add_argument('--save_path', type=str,
+                    help='path to the label archive (.npz)')
+parser.add_argument('--double_letter', action='store_true',
+                    help='if set, group repeated letters')
+parser.add_argument('--num_jobs', type=int, default=1,
+                    help='the number of processes')
+
+
+def _encode(args):
+    """Encode transcripts in a process.
+    Args:
+        args (tuple): A tuple of `(map_file_path, double_letter, transcripts)`
+    Returns:
+        values (np.ndarray): concatenated character indices
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    map_file_path, double_letter, transcripts = args
+    char2idx = Char2idx(map_file_path, double_letter=double_letter)
+    return char2idx.batch(transcripts)
+
+
+def encode_corpus(transcript_paths, map_file_path, double_letter=False,
+                  num_jobs=1):
+    """Encode transcripts of a whole corpus.
+    Args:
+        transcript_paths (list): paths to transcript files
+        map_file_path (string): path to the mapping file
+        double_letter (bool, optional): if True, group repeated letters
+        num_jobs (int, optional): the number of processes
+    Returns:
+        utt_names (list): list of utterance names, size of `[B]`
+        values (np.ndarray): concatenated character indices of all
+            utterances, size of `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    # Read transcripts
+    utt_names, transcripts = [], []
+    for transcript_path in transcript_paths:
+        with open(transcript_path, 'r') as f:
+            for line in f:
+                line = line.strip().split(' ', 1)
+                if len(line[0]) == 0:
+                    continue
+                utt_names.append(line[0])
+                transcripts.append(line[1] if len(line) == 2 else '')
+
+    # Encode transcripts by chunk
+    chunk_size = -(-len(transcripts) // max(num_jobs, 1))
+    args = [(map_file_path, double_letter, transcripts[i:i + chunk_size])
+            for i in range(0, len(transcripts), max(chunk_size, 1))]
+    if num_jobs > 1 and len(args) > 1:
+        results = make_parallel(_encode, args, core=num_jobs)
+    else:
+        results = list(map(_encode, args))
+
+    # Concatenate ragged batches of all chunks
+    values = np.concatenate(
+        [values for values, _ in results] + [np.zeros((0,), np.int32)])
+    offsets = [np.zeros((1,), dtype=np.int64)]
+    for _, offsets_chunk in results:
+        offsets.append(offsets_chunk[1:] + offsets[-1][-1])
+    offsets = np.concatenate(offsets)
+
+    return utt_names, values, offsets
+
+
+def main():
+
+    args = parser.parse_args()
+
+    utt_names, values, offsets = encode_corpus(
+        transcript_paths=args.transcript_paths,
+        map_file_path=args.map_file_path,
+        double_letter=args.double_letter,
+        num_jobs=args.num_jobs)
+    save_label_archive(args.save_path, utt_names, values, offsets)
+    print('%d utterances (%d labels) were saved in %s' %
+          (len(utt_names), len(values), args.save_path))
+
+
+if __name__ == '__main__':
+    main()
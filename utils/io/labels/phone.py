@@ -7,6 +7,8 @@ from __future__ import print_function
 
 import numpy as np
 
+from utils.io.labels.ragged import ragged_join
+
 
 class Phone2idx(object):
     """Convert from phone to index.
@@ -49,6 +51,14 @@ class Idx2phone(object):
                 line = line.strip().split()
                 self.map_dict[int(line[1])] = line[0]
 
+        # Build lookup tables indexed by label index
+        self.map_array = np.full(
+            (max(self.map_dict.keys()) + 1,), '', dtype=object)
+        for index, phone in self.map_dict.items():
+            self.map_array[index] = phone
+        self.length_array = np.array(
+            [len(phone) for phone in self.map_array], dtype=np.int64)
+
     def __call__(self, index_list, padded_value=-1):
         """
         Args:
@@ -59,10 +69,26 @@ class Idx2phone(object):
         """
         # Remove padded values
         assert type(index_list) == np.ndarray, 'index_list should be np.ndarray.'
-        index_list = np.delete(index_list, np.where(index_list == -1), axis=0)
+        if padded_value is not None:
+            index_list = index_list[index_list != padded_value]
 
-        # Convert from indices to the corresponding phones
-        phone_list = list(map(lambda x: self.map_dict[x], index_list))
-        str_phone = ' '.join(phone_list)
+        return self.batch(index_list, np.array([0, len(index_list)]))[0]
+
+    def batch(self, values, offsets):
+        """Convert a ragged batch of indices to strings at once.
+        Args:
+            values (np.ndarray): concatenated phone indices of all
+                utterances, size of `[total_label_len]`
+            offsets (np.ndarray): A tensor of size `[B + 1]`. The indices of
+                the i-th utterance are `values[offsets[i]:offsets[i + 1]]`.
+        Returns:
+            str_phone_list (list): list of strings of phones divided by
+                spaces, size of `[B]`
+        """
+        values = np.asarray(values, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
 
-        return str_phone
+        # Convert from indices to the corresponding phones
+        return ragged_join(self.map_array[values],
+                           self.length_array[values],
+                           offsets, separator=' ')
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Ragged representation of label sequences in a mini-batch.
+   A ragged batch is a tuple of `(values, offsets)`, where `values` is the
+   concatenation of all label sequences and the labels of the i-th utterance
+   are `values[offsets[i]:offsets[i + 1]]`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+
+def padded2ragged(labels, padded_value=-1, eos_index=None):
+    """Convert padded labels to a ragged batch.
+    Args:
+        labels (np.ndarray): A tensor of size `[B, max_label_len]`
+        padded_value (int, optional): the value used for padding
+        eos_index (int, optional): the index of <EOS>. If given, each
+            sequence is truncated by the first <EOS>.
+    Returns:
+        values (np.ndarray): A tensor of size `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    labels = np.asarray(labels)
+    if labels.ndim == 1:
+        labels = labels[np.newaxis, :]
+    if padded_value is None:
+        mask = np.ones(labels.shape, dtype=np.bool_)
+    else:
+        mask = labels != padded_value
+    if eos_index is not None:
+        mask &= np.cumsum(labels == eos_index, axis=1) == 0
+    values = labels[mask]
+    offsets = np.zeros((labels.shape[0] + 1,), dtype=np.int64)
+    np.cumsum(mask.sum(axis=1), out=offsets[1:])
+    return values, offsets
+
+
+def list2ragged(labels):
+    """Convert list of label sequences to a ragged batch.
+    Args:
+        labels (list): list of np.ndarray, size of `[B]`
+    Returns:
+        values (np.ndarray): A tensor of size `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    offsets = np.zeros((len(labels) + 1,), dtype=np.int64)
+    np.cumsum([len(label) for label in labels], out=offsets[1:])
+    if len(labels) == 0:
+        return np.zeros((0,), dtype=np.int32), offsets
+    return np.concatenate(labels), offsets
+
+
+def sparsetensor2ragged(labels_st, batch_size):
+    """Convert labels from sparse tensor to a ragged batch. Unlike
+       `sparsetensor2list`, utterances without any outputs are kept as empty
+       sequences.
+    Args:
+        labels_st: A SparseTensor of labels, or list of
+            (indices, values, dense_shape)
+        batch_size (int): the size of mini-batch
+    Returns:
+        values (np.ndarray): A tensor of size `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    """
+    indices = np.asarray(labels_st[0])
+    values = np.asarray(labels_st[1])
+    offsets = np.zeros((batch_size + 1,), dtype=np.int64)
+    if len(values) > 0:
+        np.cumsum(np.bincount(indices[:, 0], minlength=batch_size),
+                  out=offsets[1:])
+    return values, offsets
+
+
+def ragged2list(values, offsets):
+    """Split a ragged batch into a list of sequences.
+    Args:
+        values (np.ndarray): A tensor of size `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+    Returns:
+        labels (list): list of np.ndarray, size of `[B]`
+    """
+    return np.split(values, offsets[1:-1])
+
+
+def ragged_join(symbols, lengths, offsets, separator=''):
+    """Join symbols of each utterance in a ragged batch into a string. All
+       symbols are joined at once and the result is sliced per utterance.
+    Args:
+        symbols (np.ndarray): An object array of strings of size
+            `[total_label_len]`
+        lengths (np.ndarray): the number of characters of each symbol, size of
+            `[total_label_len]`
+        offsets (np.ndarray): A tensor of size `[B + 1]`
+        separator (string, optional): a string inserted between symbols
+    Returns:
+        str_list (list): list of strings, size of `[B]`
+    """
+    # Start position of each symbol in the joined string
+    starts = np.zeros((len(symbols) + 1,), dtype=np.int64)
+    np.cumsum(np.asarray(lengths, dtype=np.int64) + len(separator),
+              out=starts[1:])
+    joined = separator.join(symbols.tolist())
+
+    begins = starts[offsets[:-1]]
+    ends = starts[offsets[1:]] - len(separator)
+    return [joined[b:e] if e > b else '' for b, e in zip(begins, ends)]
@@ -23,6 +23,12 @@ class Idx2word(object):
                 line = line.strip().split()
                 self.map_dict[int(line[1])] = line[0]
 
+        # Build a lookup table indexed by label index
+        self.map_array = np.full(
+            (max(self.map_dict.keys()) + 1,), '', dtype=object)
+        for index, word in self.map_dict.items():
+            self.map_array[index] = word
+
     def __call__(self, index_list, padded_value=-1):
         """
         Args:
@@ -34,9 +40,23 @@ class Idx2word(object):
         """
         # Remove padded values
         assert type(index_list) == np.ndarray, 'index_list should be np.ndarray.'
-        index_list = np.delete(index_list, np.where(index_list == -1), axis=0)
+        if padded_value is not None:
+            index_list = index_list[index_list != padded_value]
 
         # Convert from indices to the corresponding words
-        word_list = list(map(lambda x: self.map_dict[x], index_list))
+        return self.map_array[index_list.astype(np.int64)].tolist()
 
-        return word_list
+    def batch(self, values, offsets):
+        """Convert a ragged batch of indices to words at once.
+        Args:
+            values (np.ndarray): concatenated word indices of all
+                utterances, size of `[total_label_len]`
+            offsets (np.ndarray): A tensor of size `[B + 1]`. The indices of
+                the i-th utterance are `values[offsets[i]:offsets[i + 1]]`.
+        Returns:
+            word_list_batch (list): list of lists of words, size of `[B]`
+        """
+        word_list = self.map_array[np.asarray(values, dtype=np.int64)].tolist()
+        offsets = np.asarray(offsets, dtype=np.int64).tolist()
+        return [word_list[offsets[i]:offsets[i + 1]]
+                for i in range(len(offsets) - 1)]
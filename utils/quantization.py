@@ -0,0 +1,174 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Post-training weight quantization of frozen inference graphs."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import numpy as np
+import tensorflow as tf
+
+# Weight inputs of ops, and the axis of output channels of the weights.
+# MatMul is handled separately because of transpose_b.
+# LSTMBlockCell: (x, cs_prev, h_prev, w, wci, wcf, wco, b)
+# BlockLSTM: (seq_len_max, x, cs_prev, h_prev, w, wci, wcf, wco, b)
+# GRUBlockCell: (x, h_prev, w_ru, w_c, b_ru, b_c)
+WEIGHT_INPUTS = {
+    'LSTMBlockCell': {3: 1},
+    'BlockLSTM': {4: 1},
+    'GRUBlockCell': {2: 1, 3: 1}
+}
+
+# Ops which pass the input tensor through (Enter passes it into while loops)
+PASS_THROUGH_OPS = ['Identity', 'Enter']
+
+
+def quantize_per_channel(weights, num_bits=8, axis=-1):
+    """Quantize weights symmetrically with a scale for each output channel.
+    Args:
+        weights (np.ndarray): A tensor of size `[K, N]`
+        num_bits (int, optional): the number of bits of quantized weights
+        axis (int, optional): the axis of output channels
+    Returns:
+        quantized (np.ndarray): A tensor of integers of the same size as
+            weights
+        scale (np.ndarray): A tensor of size `[N]`. weights are approximated
+            by `quantized * scale` along axis.
+    """
+    if num_bits > 8:
+        raise ValueError('num_bits must be <= 8.')
+
+    max_int = 2 ** (num_bits - 1) - 1
+    reduce_axis = tuple(i for i in range(weights.ndim)
+                        if i != axis % weights.ndim)
+    max_abs = np.max(np.abs(weights), axis=reduce_axis, keepdims=True)
+    scale = np.where(max_abs > 0, max_abs / max_int, 1).astype(np.float32)
+    quantized = np.clip(np.round(weights / scale), -max_int, max_int)
+    return quantized.astype(np.int8), scale.reshape(-1)
+
+
+def _node_name(input_name):
+    return input_name.lstrip('^').split(':')[0]
+
+
+def find_weights(graph_def, min_elements=1024):
+    """Find weight matrices which can be quantized. These are float constants
+       only consumed as weights of MatMul or LSTM/GRU block ops.
+    Args:
+        graph_def: A frozen `GraphDef`
+        min_elements (int, optional): the minimum number of elements of
+            weights to quantize
+    Returns:
+        weights (dict): A dictionary of names of constant nodes and the axis
+            of output channels
+    """
+    consumers = {}
+    for node in graph_def.node:
+        for i, input_name in enumerate(node.input):
+            if input_name.startswith('^'):
+                continue
+            consumers.setdefault(_node_name(input_name), []).append((node, i))
+
+    def channel_axis(name):
+        # Return the axis of output channels if all terminal consumers use
+        # the tensor as weights, otherwise None
+        axes = set()
+        for node, i in consumers.get(name, []):
+            if node.op in PASS_THROUGH_OPS:
+                axis = channel_axis(node.name)
+            elif node.op == 'MatMul' and i == 1:
+                axis = 0 if node.attr['transpose_b'].b else 1
+            else:
+                axis = WEIGHT_INPUTS.get(node.op, {}).get(i)
+            if axis is None:
+                return None
+            axes.add(axis)
+        return axes.pop() if len(axes) == 1 else None
+
+    weights = {}
+    for node in graph_def.node:
+        if node.op != 'Const' or node.attr['dtype'].type != tf.float32.as_datatype_enum:
+            continue
+        shape = [d.size for d in node.attr['value'].tensor.tensor_shape.dim]
+        if len(shape) != 2 or np.prod(shape) < min_elements:
+            continue
+        axis = channel_axis(node.name)
+        if axis is not None:
+            weights[node.name] = axis
+    return weights
+
+
+def _make_node(op, name, inputs, device, **attrs):
+    node = tf.NodeDef()
+    node.op = op
+    node.name = name
+    node.input.extend(inputs)
+    node.device = device
+    for key, value in attrs.items():
+        node.attr[key].CopyFrom(value)
+    return node
+
+
+def quantize_graph_def(graph_def, num_bits=8, min_elements=1024,
+                       exclude=None):
+    """Quantize weight matrices of a frozen graph with per-channel scales.
+       Each weight constant is replaced with integer constants and scales,
+       and is dequantized once per run outside recurrent loops, so consumers
+       are unchanged.
+    Args:
+        graph_def: A frozen `GraphDef`
+        num_bits (int, optional): the number of bits of quantized weights
+        min_elements (int, optional): the minimum number of elements of
+            weights to quantize
+        exclude (list, optional): names of weights kept in float
+    Returns:
+        graph_def: A quantized `GraphDef`
+        errors (dict): A dictionary of names of quantized weights and their
+            relative quantization errors
+    """
+    exclude = [] if exclude is None else exclude
+    weights = find_weights(graph_def, min_elements=min_elements)
+
+    float_type = tf.AttrValue(type=tf.float32.as_datatype_enum)
+    int_type = tf.AttrValue(type=tf.int8.as_datatype_enum)
+
+    quantized_graph_def = tf.GraphDef()
+    quantized_graph_def.versions.CopyFrom(graph_def.versions)
+    quantized_graph_def.library.CopyFrom(graph_def.library)
+    errors = {}
+    for node in graph_def.node:
+        if node.name not in weights or node.name in exclude:
+            quantized_graph_def.node.extend([copy.deepcopy(node)])
+            continue
+
+        value = tf.make_ndarray(node.attr['value'].tensor)
+        axis = weights[node.name]
+        quantized, scale = quantize_per_channel(
+            value, num_bits=num_bits, axis=axis)
+        if axis == 0:
+            scale = scale.reshape(-1, 1)
+        errors[node.name] = float(
+            np.linalg.norm(value - quantized * scale) /
+            max(np.linalg.norm(value), 1e-10))
+
+        # weights = cast(quantized) * scale
+        quantized_graph_def.node.extend([
+            _make_node('Const', node.name + '/quantized', [], node.device,
+                       dtype=int_type,
+                       value=tf.AttrValue(
+                           tensor=tf.make_tensor_proto(quantized))),
+            _make_node('Const', node.name + '/scale', [], node.device,
+                       dtype=float_type,
+                       value=tf.AttrValue(
+                           tensor=tf.make_tensor_proto(scale))),
+            _make_node('Cast', node.name + '/dequantize',
+                       [node.name + '/quantized'], node.device,
+                       SrcT=int_type, DstT=float_type),
+            _make_node('Mul', node.name,
+                       [node.name + '/dequantize', node.name + '/scale'],
+                       node.device, T=float_type)])
+
+    return quantized_graph_def, errors
@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Store pruned weights of frozen inference graphs in a sparse format."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import numpy as np
+import tensorflow as tf
+
+from utils.quantization import find_weights, _make_node
+
+
+def _direct_matmuls(graph_def, name):
+    """Find MatMul nodes which use the constant as weights directly, that is,
+       not inside while loops.
+    Args:
+        graph_def: A frozen `GraphDef`
+        name (string): the name of the constant node
+    Returns:
+        matmuls (list): names of MatMul nodes
+        identities (list): names of Identity nodes between the constant and
+            MatMul nodes (e.g. `weights/read`)
+        others (bool): if True, the constant has other consumers
+    """
+    matmuls, identities, others = [], [], False
+    for node in graph_def.node:
+        for i, input_name in enumerate(node.input):
+            if input_name.lstrip('^').split(':')[0] != name:
+                continue
+            if input_name.startswith('^'):
+                others = True
+            elif node.op == 'Identity':
+                sub_matmuls, sub_identities, sub_others = _direct_matmuls(
+                    graph_def, node.name)
+                matmuls += sub_matmuls
+                identities += [node.name] + sub_identities
+                others = others or sub_others
+            elif node.op == 'MatMul' and i == 1 and \
+                    not node.attr['transpose_a'].b and \
+                    not node.attr['transpose_b'].b:
+                matmuls.append(node.name)
+            else:
+                others = True
+    return matmuls, identities, others
+
+
+def sparsify_graph_def(graph_def, min_sparsity=0.5, min_elements=1024,
+                       sparse_matmul=True):
+    """Store pruned weight matrices of a frozen graph as non-zero values and
+       their flattened indices.
+    Args:
+        graph_def: A frozen `GraphDef`
+        min_sparsity (float, optional): the minimum ratio of zeros of weights
+            to store in the sparse format
+        min_elements (int, optional): the minimum number of elements of
+            weights to store in the sparse format
+        sparse_matmul (bool, optional): if True, MatMul ops outside while
+            loops multiply the sparse weights directly, which skips zeros.
+            Otherwise (and inside while loops such as LSTM layers), weights
+            are restored to dense once per run.
+    Returns:
+        graph_def: A sparse `GraphDef`
+        sparsity (dict): A dictionary of names of sparse weights and their
+            ratios of zeros
+    """
+    float_type = tf.AttrValue(type=tf.float32.as_datatype_enum)
+    int32_type = tf.AttrValue(type=tf.int32.as_datatype_enum)
+    int64_type = tf.AttrValue(type=tf.int64.as_datatype_enum)
+
+    def const(name, value, device):
+        return _make_node(
+            'Const', name, [], device,
+            dtype=tf.AttrValue(type=tf.as_dtype(value.dtype).as_datatype_enum),
+            value=tf.AttrValue(tensor=tf.make_tensor_proto(value)))
+
+    nodes = dict((node.name, node) for node in graph_def.node)
+
+    sparsity = {}
+    for name in find_weights(graph_def, min_elements=min_elements):
+        value = tf.make_ndarray(nodes[name].attr['value'].tensor)
+        ratio = 1 - np.count_nonzero(value) / value.size
+        if ratio >= min_sparsity:
+            sparsity[name] = float(ratio)
+
+    # NOTE: MatMul nodes are found before rewriting, because nodes of a
+    # `GraphDef` are not always sorted in execution order
+    sparse_matmuls, dense_weights, removed = {}, set(), set()
+    for name in sparsity.keys():
+        matmuls, identities, others = _direct_matmuls(graph_def, name)
+        if sparse_matmul and len(matmuls) > 0:
+            for matmul in matmuls:
+                sparse_matmuls[matmul] = name
+        if not sparse_matmul or len(matmuls) == 0 or others:
+            dense_weights.add(name)
+        else:
+            # Identity nodes such as `weights/read` are no longer used
+            removed.update(identities)
+
+    sparse_graph_def = tf.GraphDef()
+    sparse_graph_def.versions.CopyFrom(graph_def.versions)
+    sparse_graph_def.library.CopyFrom(graph_def.library)
+    for node in graph_def.node:
+        if node.name in sparse_matmuls:
+            # Y = X W = (W^T X^T)^T
+            weights = nodes[sparse_matmuls[node.name]]
+            sparse_graph_def.node.extend([
+                _make_node('SparseTensorDenseMatMul', node.name + '/sparse',
+                           [weights.name + '/sparse_indices',
+                            weights.name + '/values',
+                            weights.name + '/dense_shape',
+                            node.input[0]],
+                           node.device,
+                           T=float_type, Tindices=int64_type,
+                           adjoint_a=tf.AttrValue(b=True),
+                           adjoint_b=tf.AttrValue(b=True)),
+                const(node.name + '/perm', np.array([1, 0], dtype=np.int32),
+                      node.device),
+                _make_node('Transpose', node.name,
+                           [node.name + '/sparse', node.name + '/perm'],
+                           node.device, T=float_type, Tperm=int32_type)])
+            continue
+
+        if node.name in removed:
+            continue
+
+        if node.name not in sparsity:
+            sparse_graph_def.node.extend([copy.deepcopy(node)])
+            continue
+
+        value = tf.make_ndarray(node.attr['value'].tensor)
+        flat_value = value.reshape(-1)
+        indices = np.flatnonzero(flat_value).astype(np.int32)
+        sparse_graph_def.node.extend([
+            const(node.name + '/indices', indices, node.device),
+            const(node.name + '/values', flat_value[indices], node.device)])
+
+        if node.name in sparse_matmuls.values():
+            # Convert flattened indices to `[nnz, 2]`
+            sparse_graph_def.node.extend([
+                const(node.name + '/num_columns',
+                      np.array(value.shape[1], dtype=np.int32), node.device),
+                const(node.name + '/dense_shape',
+                      np.array(value.shape, dtype=np.int64), node.device),
+                _make_node('FloorDiv', node.name + '/rows',
+                           [node.name + '/indices', node.name + '/num_columns'],
+                           node.device, T=int32_type),
+                _make_node('FloorMod', node.name + '/columns',
+                           [node.name + '/indices', node.name + '/num_columns'],
+                           node.device, T=int32_type),
+                _make_node('Pack', node.name + '/pack',
+                           [node.name + '/rows', node.name + '/columns'],
+                           node.device, N=tf.AttrValue(i=2), T=int32_type,
+                           axis=tf.AttrValue(i=1)),
+                _make_node('Cast', node.name + '/sparse_indices',
+                           [node.name + '/pack'], node.device,
+                           SrcT=int32_type, DstT=int64_type)])
+
+        if node.name in dense_weights:
+            # Restore dense weights
+            sparse_graph_def.node.extend([
+                const(node.name + '/size',
+                      np.array([value.size], dtype=np.int32), node.device),
+                const(node.name + '/default_value',
+                      np.array(0, dtype=np.float32), node.device),
+                _make_node('SparseToDense', node.name + '/dense',
+                           [node.name + '/indices', node.name + '/size',
+                            node.name + '/values',
+                            node.name + '/default_value'],
+                           node.device, T=float_type, Tindices=int32_type,
+                           validate_indices=tf.AttrValue(b=False)),
+                const(node.name + '/shape',
+                      np.array(value.shape, dtype=np.int32), node.device),
+                _make_node('Reshape', node.name,
+                           [node.name + '/dense', node.name + '/shape'],
+                           node.device, T=float_type, Tshape=int32_type)])
+
+    return sparse_graph_def, sparsity
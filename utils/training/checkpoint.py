@@ -0,0 +1,383 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Save checkpoints without blocking the training loop, and average
+   checkpoints of a training run.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from os.path import join, abspath, isfile, basename
+import json
+from glob import glob
+import re
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import numpy as np
+import tensorflow as tf
+
+
+class CheckpointManager(object):
+    """Snapshot variables to host memory and serialize them to disk in a
+       background thread. Each checkpoint is written under a temporary name
+       and renamed when completed, so that readers never see partially
+       written checkpoints. Checkpoints are compatible with `tf.train.Saver`.
+    Args:
+        save_path (string): path to the directory to save checkpoints
+        var_list (list, optional): variables to save. Default is all global
+            variables of the default graph.
+        keep_best (int, optional): the number of the best checkpoints to keep
+        keep_last (int, optional): the number of the latest checkpoints to keep
+        lower_better (bool, optional): if True, the lower metric is better
+        name (string, optional): the prefix of checkpoint files
+        max_queue_size (int, optional): the maximum number of snapshots
+            waiting to be written. `save()` blocks when the queue is full.
+    """
+
+    def __init__(self, save_path, var_list=None, keep_best=3, keep_last=1,
+                 lower_better=True, name='model.ckpt', max_queue_size=1):
+        if keep_best < 0 or keep_last < 0:
+            raise ValueError('keep_best and keep_last must be >= 0.')
+        if keep_best + keep_last == 0:
+            raise ValueError('At least one checkpoint must be kept.')
+
+        self.save_path = abspath(save_path)
+        self.var_list = tf.global_variables() if var_list is None else var_list
+        self.var_names = [var.op.name for var in self.var_list]
+        self.keep_best = keep_best
+        self.keep_last = keep_last
+        self.lower_better = lower_better
+        self.name = name
+
+        # list of tuples of `(global_step, metric, checkpoint_path)`
+        self.checkpoints = []
+        self.best_checkpoint = None
+        self._error = None
+
+        # Remove temporary files left by a crash of the previous run
+        self._remove_tmp_files()
+
+        # Continue the retention of checkpoints of the previous run
+        history_path = join(self.save_path, 'checkpoints.json')
+        if isfile(history_path):
+            with open(history_path, 'r') as f:
+                history = json.load(f)
+            self.checkpoints = [tuple(c) for c in history['checkpoints']
+                                if isfile(c[2] + '.index')]
+            self.best_checkpoint = history['best_checkpoint']
+
+        # Graph to write snapshots (built in the writer thread)
+        self._graph = None
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def save(self, sess, global_step, metric=None, state=None):
+        """Snapshot variables and enqueue them to be written.
+        Args:
+            sess: session
+            global_step (int): the step (or epoch) of the checkpoint
+            metric (float, optional): the metric used to keep the best
+                checkpoints. If None, the checkpoint is kept only as one of
+                the latest ones.
+            state (dict, optional): A JSON serializable dictionary saved
+                with the checkpoint (e.g. the state of the training loop)
+        Returns:
+            checkpoint_path (string): the path of the checkpoint to be written
+        """
+        self._raise_error()
+        values = sess.run(self.var_list)
+        checkpoint_path = join(self.save_path,
+                               self.name + '-' + str(global_step))
+        if metric is not None:
+            metric = float(metric)
+        self._queue.put((global_step, metric, checkpoint_path, values, state))
+        return checkpoint_path
+
+    def latest_checkpoint(self):
+        """Returns the path of the latest checkpoint, or None if there are no
+           checkpoints.
+        """
+        if len(self.checkpoints) == 0:
+            return None
+        return sorted(self.checkpoints, key=lambda c: c[0])[-1][2]
+
+    @staticmethod
+    def load_state(checkpoint_path):
+        """Load the dictionary saved with a checkpoint.
+        Args:
+            checkpoint_path (string): path to the checkpoint
+        Returns:
+            state (dict): the dictionary, or None if not saved
+        """
+        if not isfile(checkpoint_path + '.state.json'):
+            return None
+        with open(checkpoint_path + '.state.json', 'r') as f:
+            return json.load(f)
+
+    def wait(self):
+        """Block until all snapshots are written."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Write all snapshots and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _build_graph(self, values):
+        self._graph = tf.Graph()
+        with self._graph.as_default():
+            self._placeholders = []
+            variables = {}
+            for var_name, value in zip(self.var_names, values):
+                value_pl = tf.placeholder(value.dtype, shape=value.shape)
+                self._placeholders.append(value_pl)
+                variables[var_name] = tf.Variable(
+                    value_pl, trainable=False, name=var_name)
+            self._init_op = tf.variables_initializer(list(variables.values()))
+            self._saver = tf.train.Saver(variables, max_to_keep=None)
+        self._sess = tf.Session(graph=self._graph)
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                # Re-raised in the training loop
+                self._error = e
+            finally:
+                self._queue.task_done()
+        if self._graph is not None:
+            self._sess.close()
+
+    def _write(self, global_step, metric, checkpoint_path, values, state):
+        if self._graph is None:
+            self._build_graph(values)
+
+        # Write to a temporary path
+        tmp_path = checkpoint_path + '.tmp'
+        self._sess.run(self._init_op,
+                       feed_dict=dict(zip(self._placeholders, values)))
+        self._saver.save(self._sess, tmp_path,
+                         write_meta_graph=False, write_state=False)
+        if state is not None:
+            with open(tmp_path + '.state.json', 'w') as f:
+                json.dump(state, f)
+
+        # Atomic rename (the index file is renamed at last)
+        tmp_files = sorted(glob(tmp_path + '.*'),
+                           key=lambda path: path.endswith('.index'))
+        for tmp_file in tmp_files:
+            os.rename(tmp_file, checkpoint_path + tmp_file[len(tmp_path):])
+
+        self.checkpoints = [c for c in self.checkpoints
+                            if c[2] != checkpoint_path]
+        self.checkpoints.append((global_step, metric, checkpoint_path))
+        self._apply_retention()
+        self._update_state()
+
+    def _remove_tmp_files(self):
+        """Remove temporary files of checkpoints and state files which were
+           being written when the previous run was stopped."""
+        tmp_files = glob(join(self.save_path, self.name + '-*.tmp.*'))
+        tmp_files += [join(self.save_path, 'checkpoint.tmp'),
+                      join(self.save_path, 'checkpoints.json.tmp')]
+        for tmp_file in tmp_files:
+            if isfile(tmp_file):
+                os.remove(tmp_file)
+
+    def _apply_retention(self):
+        """Remove checkpoints which are neither the best nor the latest."""
+        keep_paths = set()
+
+        latest = sorted(self.checkpoints, key=lambda c: c[0])
+        if self.keep_last > 0:
+            keep_paths |= set(c[2] for c in latest[-self.keep_last:])
+
+        scored = [c for c in self.checkpoints if c[1] is not None]
+        scored = sorted(scored, key=lambda c: c[1],
+                        reverse=not self.lower_better)
+        if len(scored) > 0 and self.keep_best > 0:
+            self.best_checkpoint = scored[0][2]
+        keep_paths |= set(c[2] for c in scored[:self.keep_best])
+
+        for _, _, checkpoint_path in self.checkpoints:
+            if checkpoint_path not in keep_paths:
+                for path in glob(checkpoint_path + '.*'):
+                    os.remove(path)
+        self.checkpoints = [c for c in self.checkpoints if c[2] in keep_paths]
+
+    def _update_state(self):
+        """Atomically rewrite the `checkpoint` file read by
+           `tf.train.get_checkpoint_state`. model_checkpoint_path points to the
+           best checkpoint (the latest one if no metric is given).
+        """
+        latest = sorted(self.checkpoints, key=lambda c: c[0])
+        if self.best_checkpoint is not None:
+            model_checkpoint_path = self.best_checkpoint
+        else:
+            model_checkpoint_path = latest[-1][2]
+
+        lines = ['model_checkpoint_path: "%s"' % model_checkpoint_path]
+        for _, _, checkpoint_path in latest:
+            lines.append('all_model_checkpoint_paths: "%s"' % checkpoint_path)
+
+        state_path = join(self.save_path, 'checkpoint')
+        with open(state_path + '.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.rename(state_path + '.tmp', state_path)
+
+        history_path = join(self.save_path, 'checkpoints.json')
+        with open(history_path + '.tmp', 'w') as f:
+            json.dump({'checkpoints': self.checkpoints,
+                       'best_checkpoint': self.best_checkpoint,
+                       'keep_last': self.keep_last}, f)
+        os.rename(history_path + '.tmp', history_path)
+
+
+def list_checkpoints(save_path, name='model.ckpt'):
+    """List checkpoints in the directory.
+    Args:
+        save_path (string): path to the directory of checkpoints
+        name (string, optional): the prefix of checkpoint files
+    Returns:
+        checkpoints (list): list of tuples of `(global_step, checkpoint_path)`
+            sorted by global_step
+    """
+    checkpoints = []
+    for index_path in glob(join(abspath(save_path), name + '-*.index')):
+        checkpoint_path = index_path[:-len('.index')]
+        match = re.match(r'^%s-(\d+)$' % re.escape(name),
+                         basename(checkpoint_path))
+        if match is not None:
+            checkpoints.append((int(match.group(1)), checkpoint_path))
+    return sorted(checkpoints)
+
+
+def select_checkpoints(save_path, num_checkpoints, criterion='last',
+                       name='model.ckpt', lower_better=True):
+    """Select checkpoints of a training run to average.
+       NOTE: `CheckpointManager` keeps only `keep_last` latest checkpoints
+       (keep_last_checkpoints in config files) besides the best ones, so
+       criterion=last selects the last num_checkpoints consecutive
+       checkpoints only if keep_last >= num_checkpoints. Otherwise older
+       checkpoints kept as the best ones are selected, and a warning is
+       printed.
+    Args:
+        save_path (string): path to the directory of checkpoints
+        num_checkpoints (int): the number of checkpoints to select
+        criterion (string, optional): last or best. best selects checkpoints
+            by the metric recorded by `CheckpointManager`.
+        name (string, optional): the prefix of checkpoint files
+        lower_better (bool, optional): if True, the lower metric is better
+    Returns:
+        checkpoint_paths (list): paths to the selected checkpoints
+    """
+    if num_checkpoints < 1:
+        raise ValueError('num_checkpoints must be >= 1.')
+
+    history = None
+    history_path = join(abspath(save_path), 'checkpoints.json')
+    if isfile(history_path):
+        with open(history_path, 'r') as f:
+            history = json.load(f)
+
+    if criterion == 'last':
+        if history is None:
+            # Checkpoints saved by `tf.train.Saver`
+            checkpoints = list_checkpoints(save_path, name=name)
+        else:
+            checkpoints = sorted((c[0], c[2]) for c in history['checkpoints']
+                                 if isfile(c[2] + '.index'))
+            keep_last = history.get('keep_last')
+            if keep_last is not None and keep_last < num_checkpoints:
+                print('WARNING: only the last %d checkpoint(s) are kept '
+                      '(keep_last_checkpoints), so the last %d checkpoints '
+                      'are not consecutive and include older best ones.'
+                      % (keep_last, num_checkpoints))
+    elif criterion == 'best':
+        if history is None:
+            raise ValueError('Metrics of checkpoints are not recorded in %s.'
+                             % save_path)
+        checkpoints = [(c[1], c[2]) for c in history['checkpoints']
+                       if c[1] is not None and isfile(c[2] + '.index')]
+        checkpoints = sorted(checkpoints, key=lambda c: c[0],
+                             reverse=lower_better)
+    else:
+        raise ValueError('criterion must be last or best.')
+
+    if len(checkpoints) < num_checkpoints:
+        raise ValueError('There are only %d checkpoints.' % len(checkpoints))
+    return [c[1] for c in checkpoints[-num_checkpoints:]]
+
+
+def average_checkpoints(checkpoint_paths, save_path, global_step,
+                        name='model.ckpt'):
+    """Average variables of checkpoints tensor by tensor, so that only one
+       model is kept in memory. Non-float variables (e.g. global_step) are
+       copied from the last checkpoint. The averaged checkpoint is compatible
+       with `tf.train.Saver`.
+    Args:
+        checkpoint_paths (list): paths to the checkpoints to average
+        save_path (string): path to the directory to save the checkpoint
+        global_step (int): the step (or epoch) of the averaged checkpoint
+        name (string, optional): the prefix of checkpoint files
+    Returns:
+        checkpoint_path (string): path to the averaged checkpoint
+    """
+    if len(checkpoint_paths) == 0:
+        raise ValueError('There are not any checkpoints to average.')
+
+    readers = [tf.train.NewCheckpointReader(path)
+               for path in checkpoint_paths]
+    var_shapes = readers[-1].get_variable_to_shape_map()
+    var_dtypes = readers[-1].get_variable_to_dtype_map()
+    for path, reader in zip(checkpoint_paths, readers):
+        if reader.get_variable_to_shape_map() != var_shapes:
+            raise ValueError('Variables of %s are different.' % path)
+
+    with tf.Graph().as_default():
+        placeholders, variables = {}, {}
+        for var_name in sorted(var_shapes.keys()):
+            placeholders[var_name] = tf.placeholder(
+                var_dtypes[var_name], shape=var_shapes[var_name])
+            variables[var_name] = tf.Variable(
+                placeholders[var_name], trainable=False, name=var_name)
+        saver = tf.train.Saver(variables, max_to_keep=None)
+
+        with tf.Session() as sess:
+            for var_name in sorted(var_shapes.keys()):
+                if var_dtypes[var_name].is_floating:
+                    value = np.zeros(var_shapes[var_name], dtype=np.float64)
+                    for reader in readers:
+                        value += reader.get_tensor(var_name)
+                    value /= len(readers)
+                else:
+                    value = readers[-1].get_tensor(var_name)
+                sess.run(variables[var_name].initializer,
+                         feed_dict={placeholders[var_name]: value})
+
+            checkpoint_path = saver.save(
+                sess, join(abspath(save_path), name),
+                global_step=global_step, write_meta_graph=False)
+
+    return checkpoint_path
@@ -0,0 +1,166 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Utilities for distributed training with between-graph replication."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import time
+import numpy as np
+import tensorflow as tf
+
+
+def create_cluster(ps_hosts, worker_hosts):
+    """Create a cluster of parameter servers and workers.
+    Args:
+        ps_hosts (list): list of `hostname:port` of parameter servers
+        worker_hosts (list): list of `hostname:port` of workers
+    Returns:
+        cluster: A `tf.train.ClusterSpec`
+    """
+    return tf.train.ClusterSpec({'ps': ps_hosts, 'worker': worker_hosts})
+
+
+def get_server_config(job_name, task_index):
+    """Get the configuration of a server. Each worker only communicates with
+       parameter servers, so that workers do not wait for each other when
+       starting sessions.
+    Args:
+        job_name (string): ps or worker
+        task_index (int): the index of the task in the job
+    Returns:
+        config: A `tf.ConfigProto`
+    """
+    config = tf.ConfigProto(allow_soft_placement=True,
+                            log_device_placement=False)
+    if job_name == 'worker':
+        config.device_filters.extend(
+            ['/job:ps', '/job:worker/task:%d' % task_index])
+    return config
+
+
+class StopAtSharedStepHook(tf.train.SessionRunHook):
+    """Request to stop training when the global step reaches the step shared
+       by all workers. The step is set by the chief (e.g. for early stopping),
+       and read by every worker after each step, so that all workers stop
+       after the same update. In synchronous training, the chief must run one
+       more step after setting the step, because the other workers are waiting
+       for its gradients.
+    Args:
+        global_step: A `Variable` of the global step
+        stop_step: A `Variable` of the step to stop at, which is placed on
+            parameter servers (0: not stopped)
+    """
+
+    def __init__(self, global_step, stop_step):
+        self.global_step = global_step
+        self.stop_step = stop_step
+
+    def after_run(self, run_context, run_values):
+        global_step, stop_step = run_context.session.run(
+            [self.global_step, self.stop_step])
+        if stop_step > 0 and global_step >= stop_step:
+            run_context.request_stop()
+
+
+class WorkerBarrierHook(tf.train.SessionRunHook):
+    """Wait for all workers at the end of training. Each worker increments a
+       counter on parameter servers when its session is closed, and the chief
+       waits until all workers have finished, because the other workers
+       cannot finish the last update of synchronous training without the
+       chief. The counter is updated with the raw session passed to `end()`,
+       because a `MonitoredSession` must not be run after a stop request.
+    Args:
+        num_finished_workers: A `Variable` of the number of finished workers,
+            which is placed on parameter servers
+        num_workers (int): the number of workers
+        is_chief (bool): if True, wait for the other workers
+        poll_secs (float, optional): the interval to read the counter
+    """
+
+    def __init__(self, num_finished_workers, num_workers, is_chief,
+                 poll_secs=1):
+        self.num_finished_workers = num_finished_workers
+        self.num_workers = num_workers
+        self.is_chief = is_chief
+        self.poll_secs = poll_secs
+
+    def begin(self):
+        # NOTE: ops must be created before the graph is finalized
+        self._finish_op = tf.assign_add(self.num_finished_workers, 1)
+
+    def end(self, session):
+        session.run(self._finish_op)
+        if self.is_chief:
+            while session.run(self.num_finished_workers) < self.num_workers:
+                time.sleep(self.poll_secs)
+
+
+def load_throughput(log_path, skip=1):
+    """Load the throughput of a worker from the metrics log of `Trainer`.
+    Args:
+        log_path (string): path to the metrics log (JSON lines)
+        skip (int, optional): the number of summaries to skip for warming up
+    Returns:
+        frames_per_sec (float): An average of frames/sec
+        utt_per_sec (float): An average of utterances/sec
+    """
+    with open(log_path, 'r') as f:
+        summaries = [json.loads(line) for line in f if line.strip()]
+    if len(summaries) > skip:
+        summaries = summaries[skip:]
+    if len(summaries) == 0:
+        return 0., 0.
+    frames_per_sec = np.mean([s['frames_per_sec'] for s in summaries])
+    utt_per_sec = np.mean([s['utt_per_sec'] for s in summaries])
+    return float(frames_per_sec), float(utt_per_sec)
+
+
+def scaling_report(log_paths_dict, skip=1):
+    """Compute scaling efficiency of distributed training.
+    Args:
+        log_paths_dict (dict): A dictionary whose keys are the number of
+            workers and values are lists of paths to metrics logs of all
+            workers. The smallest number of workers is used as the baseline.
+        skip (int, optional): the number of summaries to skip for warming up
+    Returns:
+        report (list): list of dictionaries of each number of workers
+    """
+    report = []
+    baseline = None
+    for num_workers in sorted(log_paths_dict.keys()):
+        frames_per_sec = 0.
+        utt_per_sec = 0.
+        for log_path in log_paths_dict[num_workers]:
+            frames_per_sec_i, utt_per_sec_i = load_throughput(log_path, skip)
+            frames_per_sec += frames_per_sec_i
+            utt_per_sec += utt_per_sec_i
+
+        if baseline is None:
+            baseline = (num_workers, frames_per_sec)
+        # Throughput per worker relative to the baseline
+        efficiency = (frames_per_sec / num_workers) / \
+            max(baseline[1] / baseline[0], 1e-8)
+
+        report.append({'num_workers': num_workers,
+                       'frames_per_sec': frames_per_sec,
+                       'utt_per_sec': utt_per_sec,
+                       'speedup': frames_per_sec / max(baseline[1], 1e-8),
+                       'efficiency': efficiency})
+    return report
+
+
+def print_scaling_report(report):
+    """Print the result of `scaling_report`.
+    Args:
+        report (list): list of dictionaries
+    """
+    print('%8s %14s %10s %8s %10s' %
+          ('workers', 'frames/sec', 'utt/sec', 'speedup', 'efficiency'))
+    for r in report:
+        print('%8d %14.1f %10.2f %8.2f %9.1f%%' %
+              (r['num_workers'], r['frames_per_sec'], r['utt_per_sec'],
+               r['speedup'], r['efficiency'] * 100))
@@ -63,3 +63,19 @@ class Controller(object):
             self.not_improved_epoch = 0
             learning_rate_decayed = learning_rate * self.decay_rate
             return learning_rate_decayed
+
+    def state_dict(self):
+        """Returns the state of the controller.
+        Returns:
+            state (dict): A JSON serializable dictionary
+        """
+        return {'not_improved_epoch': self.not_improved_epoch,
+                'best_value': float(self.best_value)}
+
+    def load_state_dict(self, state):
+        """Restore the state of the controller.
+        Args:
+            state (dict): A dictionary returned by `state_dict()`
+        """
+        self.not_improved_epoch = state['not_improved_epoch']
+        self.best_value = state['best_value']
@@ -1,7 +1,9 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
-"""Utilities for mulit-GPU implementation."""
+"""Utilities for mulit-GPU implementation. Towers can be also placed on
+   multiple CPU devices.
+"""
 
 from __future__ import absolute_import
 from __future__ import division
@@ -9,35 +11,117 @@ from __future__ import print_function
 
 import tensorflow as tf
 
+REDUCTIONS = ['tree', 'ring']
 
-def average_gradients(total_grads_and_vars):
+
+def get_tower_devices(num_towers, device_type='gpu'):
+    """Get devices to place towers.
+    Args:
+        num_towers (int): the number of towers
+        device_type (string, optional): gpu or cpu
+    Returns:
+        devices (list): list of device names
+    """
+    if device_type not in ['gpu', 'cpu']:
+        raise ValueError('device_type should be gpu or cpu.')
+    if num_towers < 1:
+        raise ValueError('num_towers must be >= 1, but %d %s towers are '
+                         'given.' % (num_towers, device_type))
+    return ['/%s:%d' % (device_type, i) for i in range(num_towers)]
+
+
+def get_session_config(num_towers, device_type='gpu', intra_op_threads=0,
+                       inter_op_threads=0):
+    """Get the configuration of a session for multi-tower training.
+    Args:
+        num_towers (int): the number of towers
+        device_type (string, optional): gpu or cpu
+        intra_op_threads (int, optional): the number of threads for each
+            tower to run an operation. 0 means the system picks.
+        inter_op_threads (int, optional): the number of threads to run
+            operations in parallel. 0 means the system picks.
+    Returns:
+        config: A `tf.ConfigProto`
+    """
+    # NOTE: allow_soft_placement must be set to True to build towers on GPU,
+    # as some of the ops do not have GPU implementations.
+    config = tf.ConfigProto(allow_soft_placement=True,
+                            log_device_placement=False)
+    if device_type == 'cpu':
+        # Create a CPU device for each tower
+        config.device_count['CPU'] = num_towers
+        # NOTE: CPU devices share the intra-op thread pool of the process,
+        # which is sized for all towers
+        config.intra_op_parallelism_threads = intra_op_threads * num_towers
+        # Run towers concurrently
+        config.inter_op_parallelism_threads = max(inter_op_threads,
+                                                  num_towers)
+    else:
+        config.intra_op_parallelism_threads = intra_op_threads
+        config.inter_op_parallelism_threads = inter_op_threads
+    return config
+
+
+def average_gradients(total_grads_and_vars, reduction='tree', weights=None):
     """Calculate the average gradient for each shared variable across all towers.
     Note that this function provides a synchronization point across all towers.
     Args:
         total_grads_and_vars: List of lists of (gradient, variable) tuples.
             The outer list is over individual gradients. The inner list is over
             the gradient calculation for each tower.
+        reduction (string, optional): tree or ring.
+            tree: gradients are summed pairwise, on the device of the first
+                tower of each pair.
+            ring: gradients are split into chunks, and each chunk is summed
+                along the ring of towers (reduce-scatter), then gathered.
+        weights (list, optional): A scalar tensor of each tower, such as the
+            number of utterances. Gradients are averaged with these weights,
+            and towers of zero weight (e.g. without utterances) are ignored.
+            Default is the uniform average.
     Returns:
         average_grads_and_vars: List of pairs of (gradient, variable) where
             the gradient has been averaged across all towers.
     """
+    if reduction not in REDUCTIONS:
+        raise ValueError("reduction should be one of [%s], you provided %s." %
+                         (", ".join(REDUCTIONS), reduction))
+
+    if weights is not None:
+        if len(weights) != len(total_grads_and_vars):
+            raise ValueError('The number of weights must be the same as '
+                             'the number of towers.')
+        weights = [tf.cast(w, tf.float32) for w in weights]
+        sum_weights = tf.maximum(tf.add_n(weights), 1.)
+
     average_grads_and_vars = []
     for tower_grads_and_vars in zip(*total_grads_and_vars):
         # Note that each tower_grads_and_vars looks like the following:
         #   ((grad0_gpu0, var0_gpu0), ... , (grad0_gpuN, var0_gpuN))
         tower_grads = []
-        for grad, _ in tower_grads_and_vars:  # var is ignored
+        for i_tower, (grad, _) in enumerate(tower_grads_and_vars):
             if grad is not None:
-                # Add 0 dimension to the gradients to represent the tower
-                expanded_grad = tf.expand_dims(grad, axis=0)
+                # NOTE: sparse gradients are summed as dense tensors
+                with tf.device(grad.device):
+                    grad = tf.convert_to_tensor(grad)
+                    if weights is not None:
+                        # NOTE: gradients of empty towers may be NaN
+                        weight = weights[i_tower] / sum_weights
+                        grad = tf.cond(weights[i_tower] > 0,
+                                       lambda g=grad, w=weight: g * w,
+                                       lambda g=grad: tf.zeros_like(g))
+                    tower_grads.append(grad)
+        if len(tower_grads) == 0:
+            continue
 
-                # Append on a 'tower' dimension which we will average over
-                # below
-                tower_grads.append(expanded_grad)
-
-        # Average over the 'tower' dimension.
-        tower_grads = tf.concat(axis=0, values=tower_grads)
-        mean_tower_grad = tf.reduce_mean(tower_grads, axis=0)
+        if reduction == 'ring' and len(tower_grads) > 2 and \
+                tower_grads[0].get_shape().is_fully_defined():
+            sum_grad = _ring_sum(tower_grads)
+        else:
+            sum_grad = _tree_sum(tower_grads)
+        if weights is not None:
+            mean_tower_grad = sum_grad
+        else:
+            mean_tower_grad = sum_grad / len(tower_grads)
 
         # Keep in mind that the Variables are redundant because they are shared
         # across towers. So .. we will just return the first tower's pointer to
@@ -46,3 +130,81 @@ def average_gradients(total_grads_and_vars):
         grad_and_var = (mean_tower_grad, var)
         average_grads_and_vars.append(grad_and_var)
     return average_grads_and_vars
+
+
+def average_losses(total_losses, weights=None):
+    """Calculate the average of scalars (e.g. loss) across all towers.
+    Args:
+        total_losses (list): list of scalar tensors of each tower
+        weights (list, optional): A scalar tensor of each tower, such as the
+            number of utterances. Towers of zero weight are ignored.
+            Default is the uniform average.
+    Returns:
+        average_loss: A scalar tensor
+    """
+    total_losses = tf.stack([tf.reshape(loss, []) for loss in total_losses])
+    if weights is None:
+        return tf.reduce_mean(total_losses)
+
+    weights = tf.cast(tf.stack(weights), tf.float32)
+    # NOTE: losses of empty towers are NaN
+    weighted_losses = tf.where(weights > 0, total_losses * weights,
+                               tf.zeros_like(total_losses))
+    return tf.reduce_sum(weighted_losses) / tf.maximum(
+        tf.reduce_sum(weights), 1.)
+
+
+def _tree_sum(tower_grads):
+    """Sum gradients of all towers by pairwise reduction.
+    Args:
+        tower_grads (list): list of gradients of each tower
+    Returns:
+        sum_grad: the sum of gradients
+    """
+    while len(tower_grads) > 1:
+        next_tower_grads = []
+        for i in range(0, len(tower_grads) - 1, 2):
+            with tf.device(tower_grads[i].device):
+                next_tower_grads.append(
+                    tf.add(tower_grads[i], tower_grads[i + 1]))
+        if len(tower_grads) % 2 == 1:
+            next_tower_grads.append(tower_grads[-1])
+        tower_grads = next_tower_grads
+    return tower_grads[0]
+
+
+def _ring_sum(tower_grads):
+    """Sum gradients of all towers by ring reduction.
+    Args:
+        tower_grads (list): list of gradients of each tower. The shape must be
+            fully defined.
+    Returns:
+        sum_grad: the sum of gradients
+    """
+    num_towers = len(tower_grads)
+    shape = tower_grads[0].get_shape()
+    num_elements = shape.num_elements()
+    chunk_sizes = [num_elements // num_towers +
+                   (1 if i < num_elements % num_towers else 0)
+                   for i in range(num_towers)]
+
+    # Split the gradient of each tower into chunks on its device
+    tower_chunks = []
+    for grad in tower_grads:
+        with tf.device(grad.device):
+            tower_chunks.append(
+                tf.split(tf.reshape(grad, [-1]), chunk_sizes, axis=0))
+
+    # Reduce-scatter: the j-th chunk starts from the j-th tower and is added
+    # on each tower along the ring
+    sum_chunks = []
+    for j in range(num_towers):
+        sum_chunk = tower_chunks[j][j]
+        for k in range(1, num_towers):
+            i_tower = (j + k) % num_towers
+            with tf.device(tower_grads[i_tower].device):
+                sum_chunk = tf.add(sum_chunk, tower_chunks[i_tower][j])
+        sum_chunks.append(sum_chunk)
+
+    # Gather
+    return tf.reshape(tf.concat(sum_chunks, axis=0), shape)
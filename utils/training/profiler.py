@@ -0,0 +1,160 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure where the wall-clock time of each training step goes."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import time
+import contextlib
+from collections import OrderedDict
+import numpy as np
+
+PHASES = ['load', 'queue_wait', 'feed', 'sparse', 'run', 'monitor', 'eval',
+          'checkpoint']
+# NOTE:
+# load: loading mini-batches (in the background thread when prefetching)
+# queue_wait: time the training loop is blocked waiting for mini-batches
+# feed: constructing feed dictionaries except for sparse labels
+# sparse: list2sparsetensor
+# run: sess.run for updating parameters
+# monitor: computing loss, LER and summaries at print_step
+# eval: evaluation per epoch
+# checkpoint: snapshot of variables for checkpoints
+
+
+class StepProfiler(object):
+    """Accumulate per-phase timings and throughput over a window of steps and
+       write rolling summaries to a metrics log (JSON lines).
+    Args:
+        log_path (string, optional): path to the metrics log. Summaries are
+            appended to the existing log. If None, the summaries are not saved.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._stack = []
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics of the current window."""
+        self.phase_time = OrderedDict([(name, 0.) for name in PHASES])
+        self.num_steps = 0
+        self.num_utt = 0
+        self.num_frames = 0
+        self.num_padded_frames = 0
+        self.num_frames_tower = []
+        self.num_padded_frames_tower = []
+        self.start_time = time.time()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measure the time of a phase. When phases are nested, the time of
+           inner phases is excluded from the outer phase.
+        Args:
+            name (string): the name of the phase in PHASES
+        """
+        # [start time, time of inner phases]
+        frame = [time.time(), 0.]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            duration = time.time() - frame[0]
+            self.phase_time[name] += duration - frame[1]
+            if len(self._stack) > 0:
+                self._stack[-1][1] += duration
+
+    def add_time(self, name, duration):
+        """Add the time of a phase measured outside of the profiler.
+        Args:
+            name (string): the name of the phase in PHASES
+            duration (float): time in seconds
+        """
+        self.phase_time[name] += duration
+
+    def add_batch(self, inputs, inputs_seq_len):
+        """Count frames of a mini-batch.
+        Args:
+            inputs (list): list of inputs of size
+                `[num_towers, B, T, input_size]`
+            inputs_seq_len (list): list of length of inputs of size
+                `[num_towers, B]`
+        """
+        self.num_steps += 1
+        if len(self.num_frames_tower) != len(inputs):
+            self.num_frames_tower = [0] * len(inputs)
+            self.num_padded_frames_tower = [0] * len(inputs)
+        for i_tower, (inputs_i, inputs_seq_len_i) in enumerate(
+                zip(inputs, inputs_seq_len)):
+            batch_size, max_time = inputs_i.shape[:2]
+            self.num_utt += batch_size
+            self.num_frames += int(np.sum(inputs_seq_len_i))
+            self.num_padded_frames += batch_size * max_time
+            self.num_frames_tower[i_tower] += int(np.sum(inputs_seq_len_i))
+            self.num_padded_frames_tower[i_tower] += batch_size * max_time
+
+    def summary(self, **kwargs):
+        """Summarize the current window, write it to the metrics log and
+           start a new window.
+        Args:
+            kwargs: additional values to record (step, loss etc.)
+        Returns:
+            summary (OrderedDict): A dictionary of summary
+        """
+        duration = time.time() - self.start_time
+        num_steps = max(self.num_steps, 1)
+
+        summary = OrderedDict()
+        for key, value in kwargs.items():
+            # NOTE: numpy values are not JSON serializable
+            summary[key] = value.item() if hasattr(value, 'item') else value
+        summary['num_steps'] = self.num_steps
+        summary['duration'] = duration
+        summary['time_per_step'] = OrderedDict(
+            [(name, t / num_steps) for name, t in self.phase_time.items()])
+        summary['other_per_step'] = max(
+            duration - sum(t for name, t in self.phase_time.items()
+                           if name != 'load'), 0.) / num_steps
+        # NOTE: load overlaps with queue_wait
+        summary['frames_per_sec'] = self.num_frames / max(duration, 1e-8)
+        summary['utt_per_sec'] = self.num_utt / max(duration, 1e-8)
+        summary['padding_efficiency'] = self.num_frames / \
+            max(self.num_padded_frames, 1)
+        summary['padding_ratio_per_tower'] = [
+            1 - num_frames / max(num_padded_frames, 1)
+            for num_frames, num_padded_frames in zip(
+                self.num_frames_tower, self.num_padded_frames_tower)]
+
+        if self.log_path is not None:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(summary) + '\n')
+
+        self.reset()
+        return summary
+
+    @staticmethod
+    def format(summary):
+        """Format a summary for printing.
+        Args:
+            summary (OrderedDict): A dictionary returned by `summary()`
+        Returns:
+            A string
+        """
+        time_str = ' / '.join(
+            ['%s %.1fms' % (name, t * 1000)
+             for name, t in summary['time_per_step'].items() if t > 0])
+        summary_str = ('  [time/step] %s / other %.1fms\n'
+                       '  [throughput] %.1f frames/sec, %.2f utt/sec, '
+                       'padding efficiency %.3f' %
+                       (time_str, summary['other_per_step'] * 1000,
+                        summary['frames_per_sec'], summary['utt_per_sec'],
+                        summary['padding_efficiency']))
+        if len(summary['padding_ratio_per_tower']) > 1:
+            summary_str += '\n  [padding ratio/tower] ' + ' / '.join(
+                ['%.3f' % r for r in summary['padding_ratio_per_tower']])
+        return summary_str
@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Gradual magnitude pruning of weight matrices (Zhu & Gupta, 2017)."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+# Base names of variables of LSTM/GRU kernels and fully connected layers
+WEIGHT_NAMES = ['weights', 'kernel']
+
+
+class MagnitudePruning(object):
+    """Prune the smallest weights by masks, increasing the sparsity from
+       initial_sparsity to the target sparsity between begin_step and
+       end_step as
+           s_t = s_f + (s_i - s_f) * (1 - (t - t_0) / (t_n - t_0)) ** exponent
+       Masks are non-trainable variables, so they are saved in checkpoints.
+    Args:
+        target_sparsity (float): the target ratio of pruned weights in [0, 1)
+        begin_step (int): the global step to start pruning
+        end_step (int): the global step to reach the target sparsity
+        frequency (int, optional): the interval of steps to update masks
+        initial_sparsity (float, optional): the sparsity at begin_step
+        exponent (int, optional): the exponent of the schedule. The larger,
+            the more weights are pruned at the beginning.
+        layer_sparsity (dict, optional): A dictionary of substrings of
+            variable names and their target sparsity, which overrides
+            target_sparsity. If several substrings match, the longest one is
+            used. A sparsity of 0 excludes the variables.
+        var_list (list, optional): variables to prune. Default is trainable
+            weight matrices of LSTM/GRU and fully connected layers.
+    """
+
+    def __init__(self, target_sparsity, begin_step, end_step, frequency=100,
+                 initial_sparsity=0, exponent=3, layer_sparsity=None,
+                 var_list=None):
+        if not 0 <= initial_sparsity <= target_sparsity < 1:
+            raise ValueError(
+                'Set 0 <= initial_sparsity <= target_sparsity < 1.')
+        if begin_step >= end_step:
+            raise ValueError('end_step must be larger than begin_step.')
+        if frequency < 1:
+            raise ValueError('frequency must be >= 1.')
+
+        self.target_sparsity = float(target_sparsity)
+        self.begin_step = begin_step
+        self.end_step = end_step
+        self.frequency = frequency
+        self.initial_sparsity = float(initial_sparsity)
+        self.exponent = exponent
+        self.layer_sparsity = {} if layer_sparsity is None else layer_sparsity
+
+        if var_list is None:
+            var_list = [var for var in tf.trainable_variables()
+                        if var.get_shape().ndims == 2 and
+                        var.op.name.split('/')[-1] in WEIGHT_NAMES]
+
+        # Create masks
+        self.masks_and_vars = []
+        self.sparsity = {}
+        with tf.variable_scope('pruning_masks'):
+            for var in var_list:
+                sparsity = self._get_target_sparsity(var.op.name)
+                if sparsity == 0:
+                    continue
+                mask = tf.get_variable(
+                    var.op.name, shape=var.get_shape(),
+                    dtype=var.dtype.base_dtype,
+                    initializer=tf.ones_initializer(), trainable=False)
+                self.masks_and_vars.append((mask, var))
+                self.sparsity[var.op.name] = sparsity
+
+        if len(self.masks_and_vars) == 0:
+            raise ValueError('There are not any variables to prune.')
+
+    def _get_target_sparsity(self, var_name):
+        """Get the target sparsity of the variable.
+        Args:
+            var_name (string): the name of the variable
+        Returns:
+            sparsity (float): the target sparsity
+        """
+        matches = [key for key in self.layer_sparsity if key in var_name]
+        if len(matches) == 0:
+            return self.target_sparsity
+        sparsity = float(self.layer_sparsity[max(matches, key=len)])
+        if not 0 <= sparsity < 1:
+            raise ValueError('sparsity of %s must be in [0, 1).' % var_name)
+        return sparsity
+
+    def _sparsity_schedule(self, global_step, target_sparsity):
+        """Compute the sparsity at the current step.
+        Args:
+            global_step: A tensor of the global step
+            target_sparsity (float): the target sparsity
+        Returns:
+            sparsity: A scalar tensor
+        """
+        progress = tf.clip_by_value(
+            (tf.cast(global_step, tf.float32) - self.begin_step) /
+            (self.end_step - self.begin_step), 0., 1.)
+        initial_sparsity = min(self.initial_sparsity, target_sparsity)
+        return target_sparsity + (initial_sparsity - target_sparsity) * \
+            tf.pow(1 - progress, self.exponent)
+
+    def _update_masks(self, global_step):
+        """Prune the smallest weights of each variable by magnitude.
+        Args:
+            global_step: A tensor of the global step
+        Returns:
+            update_op: operation for updating masks
+        """
+        update_ops = []
+        for mask, var in self.masks_and_vars:
+            num_weights = int(np.prod(var.get_shape().as_list()))
+            sparsity = self._sparsity_schedule(
+                global_step, self.sparsity[var.op.name])
+            num_kept = tf.maximum(
+                num_weights - tf.cast(tf.round(sparsity * num_weights),
+                                      tf.int32), 1)
+
+            # The threshold is the num_kept-th largest magnitude
+            abs_weights = tf.abs(var * mask)
+            sorted_weights, _ = tf.nn.top_k(
+                tf.reshape(abs_weights, [-1]), k=num_weights, sorted=True)
+            threshold = sorted_weights[num_kept - 1]
+
+            # NOTE: pruned weights stay pruned as the sparsity increases
+            new_mask = tf.logical_and(abs_weights >= threshold,
+                                      abs_weights > 0)
+            update_ops.append(tf.assign(
+                mask, tf.cast(new_mask, var.dtype.base_dtype)))
+        return tf.group(*update_ops)
+
+    def prune(self, train_op, global_step):
+        """Update masks on schedule and apply them to variables after each
+           parameter update.
+        Args:
+            train_op: operation for updating parameters
+            global_step: A variable to track the global step
+        Returns:
+            train_op: operation for updating and pruning parameters
+        """
+        with tf.control_dependencies([train_op]):
+            step = tf.identity(global_step)
+            is_update_step = tf.logical_and(
+                tf.logical_and(step >= self.begin_step,
+                               step <= self.end_step),
+                tf.logical_or(
+                    tf.equal((step - self.begin_step) % self.frequency, 0),
+                    tf.equal(step, self.end_step)))
+            update_op = tf.cond(
+                is_update_step,
+                lambda: self._update_masks(step),
+                tf.no_op)
+
+        with tf.control_dependencies([update_op]):
+            prune_op = tf.group(
+                *[tf.assign(var, var * mask)
+                  for mask, var in self.masks_and_vars])
+        return prune_op
+
+    def sparsity_summaries(self):
+        """Create summaries of the sparsity of each variable.
+        Returns:
+            summaries (list): list of scalar summaries
+        """
+        return [tf.summary.scalar('sparsity/' + var.op.name,
+                                  1 - tf.reduce_mean(mask))
+                for mask, var in self.masks_and_vars]
@@ -0,0 +1,472 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Training loop shared by training scripts of CTC models."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join
+import sys
+import time
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import tensorflow as tf
+
+from utils.io.labels.sparsetensor import list2sparsetensor
+from utils.training.plot import plot_loss, plot_ler
+from utils.training.profiler import StepProfiler
+
+
+class BatchPrefetcher(object):
+    """Load mini-batches in a background thread.
+    Args:
+        dataset: An instance of a `Dataset` class
+        capacity (int): the maximum number of mini-batches kept in the queue
+        save_state (bool, optional): if True, the position in the dataset
+            after each mini-batch is returned together
+    """
+
+    def __init__(self, dataset, capacity, save_state=False):
+        self.dataset = dataset
+        self.save_state = save_state
+        self.queue = queue.Queue(maxsize=capacity)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._produce)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _produce(self):
+        while not self.stop_event.is_set():
+            start_time = time.time()
+            try:
+                data, is_new_epoch = next(self.dataset)
+                data_state = self.dataset.state_dict() if self.save_state else None
+                item = (data, is_new_epoch, self.dataset.epoch,
+                        self.dataset.epoch_detail, data_state,
+                        time.time() - start_time)
+            except StopIteration:
+                item = None
+            except Exception as e:
+                # Re-raised in the training loop
+                item = e
+
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+            if item is None or isinstance(item, Exception):
+                break
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.queue.get()
+        if item is None:
+            raise StopIteration
+        elif isinstance(item, Exception):
+            raise item
+        return item
+
+    def next(self):
+        # For python2
+        return self.__next__()
+
+    def close(self):
+        self.stop_event.set()
+
+
+class Trainer(object):
+    """Run the training loop of CTC models and record where the wall-clock
+       time of each step goes (see utils/training/profiler.py).
+    Args:
+        model: the model to train. Placeholders of all towers must be created.
+        params (dict): A dictionary of parameters
+        train_data: An instance of a `Dataset` class for training
+        dev_data: An instance of a `Dataset` class for monitoring
+        train_op: operation for updating parameters, or accumulating
+            gradients if apply_op is given
+        loss_op: operation for computing loss
+        ler_op: operation for computing LER for monitoring. Greedy decoding
+            is recommended because it is run at every print_step. If None,
+            only loss is monitored (e.g. distillation without labels).
+        learning_rate_pl: placeholder of the learning rate
+        summary_train: merged summaries for training
+        summary_dev: merged summaries for monitoring
+        apply_op (optional): operation for updating parameters with
+            accumulated gradients, which is run every accumulate_steps steps
+        lr_controller (optional): An instance of `Controller`, whose state is
+            saved with checkpoints
+        checkpoint_manager (optional): An instance of `CheckpointManager` to
+            save checkpoints for resuming training
+        log_path (string, optional): path to the metrics log (JSON lines).
+            Default is `metrics.jsonl` in model.save_path.
+    """
+
+    def __init__(self, model, params, train_data, dev_data, train_op,
+                 loss_op, ler_op, learning_rate_pl, summary_train, summary_dev,
+                 apply_op=None, lr_controller=None, checkpoint_manager=None,
+                 log_path=None):
+        self.model = model
+        self.params = params
+        self.train_data = train_data
+        self.dev_data = dev_data
+        self.train_op = train_op
+        self.loss_op = loss_op
+        self.ler_op = ler_op
+        self.learning_rate_pl = learning_rate_pl
+        self.summary_train = summary_train
+        self.summary_dev = summary_dev
+        self.apply_op = apply_op
+        self.lr_controller = lr_controller
+        self.checkpoint_manager = checkpoint_manager
+        if checkpoint_manager is not None:
+            # NOTE: created before the graph is finalized
+            self.saver = tf.train.Saver(checkpoint_manager.var_list)
+
+        self.num_towers = len(model.inputs_pl_list)
+        self.print_step = max(int(params['print_step'] / self.num_towers), 1)
+        # The number of mini-batches loaded in advance (0: no prefetching)
+        self.prefetch = int(params.get('prefetch', 0))
+        # Save checkpoints for resuming training every checkpoint_step steps
+        # in addition to the end of each epoch (0: only per epoch)
+        self.checkpoint_step = int(params.get('checkpoint_step', 0))
+        # Stop training after max_steps steps (0: no limit)
+        self.max_steps = int(params.get('max_steps', 0))
+        # The number of steps to accumulate gradients
+        self.accumulate_steps = int(params.get('accumulate_steps', 1))
+        if (self.accumulate_steps > 1) != (apply_op is not None):
+            raise ValueError(
+                'apply_op must be given if and only if accumulate_steps > 1.')
+
+        self.learning_rate = float(params['learning_rate'])
+        self.step = 0
+        self.epoch = 0
+        self.epoch_detail = 0.
+        # Updated by epoch_end_fn for early stopping
+        self.ler_dev_best = 1
+        self.not_improved_epoch = 0
+        # The position in the training set after the last mini-batch
+        self.data_state = None
+
+        if log_path is None:
+            log_path = join(model.save_path, 'metrics.jsonl')
+        self.profiler = StepProfiler(log_path)
+
+        self.csv_steps, self.csv_loss_train, self.csv_loss_dev = [], [], []
+        self.csv_ler_train, self.csv_ler_dev = [], []
+
+    def make_feed_dict(self, data, padded_value, keep_prob):
+        """Create a feed dictionary for a mini-batch.
+        Args:
+            data (tuple): A tuple of `(inputs, labels, inputs_seq_len,
+                input_names)` returned by a `Dataset` class
+            padded_value (int): the value used for padding labels
+            keep_prob (float): the probability to keep units
+        Returns:
+            feed_dict (dict): A dictionary of all towers
+        """
+        inputs, labels, inputs_seq_len, _ = data
+        feed_dict = {}
+        with self.profiler.phase('feed'):
+            for i_tower in range(self.num_towers):
+                feed_dict[self.model.inputs_pl_list[i_tower]
+                          ] = inputs[i_tower]
+                feed_dict[self.model.inputs_seq_len_pl_list[i_tower]
+                          ] = inputs_seq_len[i_tower]
+                feed_dict[self.model.keep_prob_pl_list[i_tower]] = keep_prob
+            feed_dict[self.learning_rate_pl] = self.learning_rate
+        # NOTE: labels are not fed to models without label placeholders
+        if len(self.model.labels_pl_list) > 0:
+            with self.profiler.phase('sparse'):
+                for i_tower in range(self.num_towers):
+                    feed_dict[self.model.labels_pl_list[i_tower]] = list2sparsetensor(
+                        labels[i_tower], padded_value=padded_value)
+        return feed_dict
+
+    def monitor(self, sess, summary_writer):
+        """Compute loss and LER of a mini-batch of the dev set in a single
+           fetch, and update event files.
+        Args:
+            sess: session
+            summary_writer: A `tf.summary.FileWriter`, or None
+        Returns:
+            loss_dev (float): loss of the dev mini-batch
+            ler_dev (float): LER of the dev mini-batch, or None if ler_op is
+                not given
+        """
+        # Create feed dictionary for next mini batch (dev)
+        data_dev, _ = self.dev_data.next()
+        feed_dict_dev = self.make_feed_dict(
+            data_dev, padded_value=self.dev_data.padded_value, keep_prob=1.0)
+
+        if self.ler_op is not None:
+            loss_dev, ler_dev, summary_str_dev = sess.run(
+                [self.loss_op, self.ler_op, self.summary_dev],
+                feed_dict=feed_dict_dev)
+        else:
+            loss_dev, summary_str_dev = sess.run(
+                [self.loss_op, self.summary_dev], feed_dict=feed_dict_dev)
+            ler_dev = None
+        if summary_writer is not None:
+            summary_writer.add_summary(summary_str_dev, self.step)
+            summary_writer.flush()
+
+        return loss_dev, ler_dev
+
+    def state_dict(self):
+        """Returns the state of the training loop.
+        Returns:
+            state (dict): A JSON serializable dictionary
+        """
+        state = {
+            'step': self.step,
+            'epoch': self.epoch,
+            'epoch_detail': self.epoch_detail,
+            'learning_rate': self.learning_rate,
+            'ler_dev_best': float(self.ler_dev_best),
+            'not_improved_epoch': self.not_improved_epoch,
+            'csv_steps': [int(x) for x in self.csv_steps],
+            'csv_loss_train': [float(x) for x in self.csv_loss_train],
+            'csv_loss_dev': [float(x) for x in self.csv_loss_dev],
+            'csv_ler_train': [float(x) for x in self.csv_ler_train],
+            'csv_ler_dev': [float(x) for x in self.csv_ler_dev],
+            'dataset': self.data_state
+        }
+        if self.lr_controller is not None:
+            state['lr_controller'] = self.lr_controller.state_dict()
+        return state
+
+    def load_state_dict(self, state):
+        """Restore the state of the training loop.
+        Args:
+            state (dict): A dictionary returned by `state_dict()`
+        """
+        self.step = state['step']
+        self.epoch = state['epoch']
+        self.epoch_detail = state['epoch_detail']
+        self.learning_rate = state['learning_rate']
+        self.ler_dev_best = state['ler_dev_best']
+        self.not_improved_epoch = state['not_improved_epoch']
+        self.csv_steps = state['csv_steps']
+        self.csv_loss_train = state['csv_loss_train']
+        self.csv_loss_dev = state['csv_loss_dev']
+        self.csv_ler_train = state['csv_ler_train']
+        self.csv_ler_dev = state['csv_ler_dev']
+        if state['dataset'] is not None:
+            self.train_data.load_state_dict(state['dataset'])
+        self.data_state = state['dataset']
+        if self.lr_controller is not None and 'lr_controller' in state:
+            self.lr_controller.load_state_dict(state['lr_controller'])
+
+    def save(self, sess):
+        """Save a checkpoint for resuming training.
+        Args:
+            sess: session
+        Returns:
+            checkpoint_path (string): path to the checkpoint
+        """
+        return self.checkpoint_manager.save(
+            sess, global_step=self.step, state=self.state_dict())
+
+    def restore(self, sess):
+        """Restore the model, optimizer and the training loop from the latest
+           checkpoint saved by `save()`.
+        Args:
+            sess: session
+        Returns:
+            checkpoint_path (string): path to the restored checkpoint, or None
+                if there are no checkpoints
+        """
+        if self.checkpoint_manager is None:
+            return None
+        checkpoint_path = self.checkpoint_manager.latest_checkpoint()
+        if checkpoint_path is None:
+            return None
+        state = self.checkpoint_manager.load_state(checkpoint_path)
+        if state is None:
+            raise ValueError('The state of training is not saved in %s.' %
+                             checkpoint_path)
+
+        self.saver.restore(sess, checkpoint_path)
+        self.load_state_dict(state)
+        return checkpoint_path
+
+    def _batches(self):
+        """Iterate over the training set, measuring the time to load each
+           mini-batch and the time waiting for it.
+        Returns:
+            data (tuple): A mini-batch
+            is_new_epoch (bool): If true, one epoch is finished
+        """
+        if self.prefetch > 0:
+            prefetcher = BatchPrefetcher(
+                self.train_data, self.prefetch,
+                save_state=self.checkpoint_manager is not None)
+            try:
+                while True:
+                    start_time = time.time()
+                    try:
+                        (data, is_new_epoch, self.epoch, self.epoch_detail,
+                         self.data_state, duration_load) = next(prefetcher)
+                    except StopIteration:
+                        break
+                    self.profiler.add_time(
+                        'queue_wait', time.time() - start_time)
+                    self.profiler.add_time('load', duration_load)
+                    yield data, is_new_epoch
+            finally:
+                prefetcher.close()
+        else:
+            while True:
+                start_time = time.time()
+                try:
+                    data, is_new_epoch = next(self.train_data)
+                except StopIteration:
+                    break
+                # NOTE: the training loop waits for all the loading time
+                duration_load = time.time() - start_time
+                self.profiler.add_time('queue_wait', duration_load)
+                self.profiler.add_time('load', duration_load)
+                self.epoch = self.train_data.epoch
+                self.epoch_detail = self.train_data.epoch_detail
+                if self.checkpoint_manager is not None:
+                    self.data_state = self.train_data.state_dict()
+                yield data, is_new_epoch
+
+    def run(self, sess, summary_writer, epoch_end_fn=None):
+        """Train the model until the last epoch or early stopping.
+        Args:
+            sess: session
+            summary_writer: A `tf.summary.FileWriter`. If None, event files
+                and figures are not updated.
+            epoch_end_fn (function, optional): A function called at the end of
+                each epoch as `epoch_end_fn(sess, trainer)`. It can update
+                `trainer.learning_rate`, and training is stopped when it
+                returns True. Training is also stopped when a hook of a
+                `MonitoredSession` requests to stop.
+        """
+        start_time_train = time.time()
+        start_time_epoch = time.time()
+        keep_prob = 1 - float(self.params['dropout'])
+        loss_train_sum = 0.
+        batches = self._batches()
+        for data, is_new_epoch in batches:
+            self.step += 1
+
+            # Create feed dictionary for next mini batch (train)
+            feed_dict_train = self.make_feed_dict(
+                data, padded_value=self.train_data.padded_value,
+                keep_prob=keep_prob)
+            self.profiler.add_batch(inputs=data[0], inputs_seq_len=data[2])
+
+            # Update parameters
+            # NOTE: loss, LER and summaries of the training set are fetched
+            # from the forward pass of the update (with dropout)
+            with self.profiler.phase('run'):
+                if self.step % self.print_step == 0:
+                    if self.ler_op is not None:
+                        _, loss_train, ler_train, summary_str_train = sess.run(
+                            [self.train_op, self.loss_op, self.ler_op,
+                             self.summary_train], feed_dict=feed_dict_train)
+                    else:
+                        _, loss_train, summary_str_train = sess.run(
+                            [self.train_op, self.loss_op,
+                             self.summary_train], feed_dict=feed_dict_train)
+                        ler_train = None
+                    if summary_writer is not None:
+                        summary_writer.add_summary(
+                            summary_str_train, self.step)
+                else:
+                    _, loss_train = sess.run(
+                        [self.train_op, self.loss_op], feed_dict=feed_dict_train)
+                if (self.apply_op is not None and
+                        self.step % self.accumulate_steps == 0):
+                    # NOTE: only the learning rate is required
+                    sess.run(self.apply_op,
+                             feed_dict={self.learning_rate_pl: self.learning_rate})
+            loss_train_sum += loss_train
+
+            # NOTE: hooks of a `MonitoredSession` can request to stop after
+            # the update, and the session must not be run any more
+            if hasattr(sess, 'should_stop') and sess.should_stop():
+                break
+
+            if (self.checkpoint_manager is not None and
+                    self.checkpoint_step > 0 and
+                    self.step % self.checkpoint_step == 0 and
+                    not is_new_epoch):
+                with self.profiler.phase('checkpoint'):
+                    self.save(sess)
+
+            if self.step % self.print_step == 0:
+                with self.profiler.phase('monitor'):
+                    loss_dev, ler_dev = self.monitor(sess, summary_writer)
+
+                # Average training loss over steps since the last print_step
+                loss_train = loss_train_sum / self.profiler.num_steps
+                loss_train_sum = 0.
+                self.csv_steps.append(self.step - 1)
+                self.csv_loss_train.append(loss_train)
+                self.csv_loss_dev.append(loss_dev)
+                if self.ler_op is not None:
+                    self.csv_ler_train.append(ler_train)
+                    self.csv_ler_dev.append(ler_dev)
+
+                summary = self.profiler.summary(
+                    step=self.step, epoch=self.epoch_detail,
+                    learning_rate=self.learning_rate,
+                    loss_train=loss_train, loss_dev=loss_dev,
+                    ler_train=ler_train, ler_dev=ler_dev)
+                if self.ler_op is not None:
+                    print("Step %d (epoch: %.3f): loss = %.3f (%.3f) / ler = %.3f (%.3f) / lr = %.5f (%.3f min)" %
+                          (self.step, self.epoch_detail, loss_train, loss_dev,
+                           ler_train, ler_dev, self.learning_rate,
+                           summary['duration'] / 60))
+                else:
+                    print("Step %d (epoch: %.3f): loss = %.3f (%.3f) / lr = %.5f (%.3f min)" %
+                          (self.step, self.epoch_detail, loss_train, loss_dev,
+                           self.learning_rate, summary['duration'] / 60))
+                print(StepProfiler.format(summary))
+                sys.stdout.flush()
+
+            # Save checkpoint and evaluate model per epoch
+            if is_new_epoch:
+                print('-----EPOCH:%d (%.3f min)-----' %
+                      (self.epoch, (time.time() - start_time_epoch) / 60))
+
+                # Save fugure of loss & ler
+                if summary_writer is not None:
+                    plot_loss(self.csv_loss_train, self.csv_loss_dev,
+                              self.csv_steps, save_path=self.model.save_path)
+                    if self.ler_op is not None:
+                        plot_ler(self.csv_ler_train, self.csv_ler_dev,
+                                 self.csv_steps,
+                                 label_type=self.params['label_type'],
+                                 save_path=self.model.save_path)
+
+                stop = False
+                if epoch_end_fn is not None:
+                    with self.profiler.phase('eval'):
+                        stop = epoch_end_fn(sess, self)
+                if stop:
+                    break
+                if self.checkpoint_manager is not None:
+                    with self.profiler.phase('checkpoint'):
+                        self.save(sess)
+
+                start_time_epoch = time.time()
+
+            if self.max_steps > 0 and self.step >= self.max_steps:
+                break
+        batches.close()
+
+        duration_train = time.time() - start_time_train
+        print('Total time: %.3f hour' % (duration_train / 3600))